@@ -1,12 +1,13 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { TenantService, UpdateTenantRequest } from '@/lib/services/tenant-service'
 import { assertTenantAdminAccess } from '@/lib/server/tenant-admin-guard'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * GET /api/admin/tenants/[id]
  * Obtiene un tenant específico por ID
  */
-export async function GET(
+async function handleGet(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -51,7 +52,7 @@ export async function GET(
  * PUT /api/admin/tenants/[id]
  * Actualiza un tenant específico
  */
-export async function PUT(
+async function handlePut(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -90,3 +91,6 @@ export async function PUT(
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/admin/tenants/[id]', handleGet)
+export const PUT = withFirestoreMetrics('PUT /api/admin/tenants/[id]', handlePut)
@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { TenantService, CreateTenantRequest } from '@/lib/services/tenant-service'
 import { assertTenantAdminAccess } from '@/lib/server/tenant-admin-guard'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * GET /api/admin/tenants
@@ -8,7 +9,7 @@ import { assertTenantAdminAccess } from '@/lib/server/tenant-admin-guard'
  * 
  * TODO: Agregar verificación de rol super-admin
  */
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   const unauthorized = assertTenantAdminAccess(request)
   if (unauthorized) return unauthorized
 
@@ -40,7 +41,7 @@ export async function GET(request: NextRequest) {
  * 
  * TODO: Agregar verificación de rol super-admin
  */
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   const unauthorized = assertTenantAdminAccess(request)
   if (unauthorized) return unauthorized
 
@@ -71,3 +72,6 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/admin/tenants', handleGet)
+export const POST = withFirestoreMetrics('POST /api/admin/tenants', handlePost)
@@ -1,17 +1,15 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, updateDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { updateDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * PATCH /api/clients/[id]/status
  * Actualiza el estado (activo/inactivo) de un cliente
  */
-export async function PATCH(
+async function handlePatch(
   req: NextRequest,
   { params }: { params: Promise<{ id: string }> }
 ) {
@@ -36,10 +34,11 @@ export async function PATCH(
 
     // Actualizar el estado del cliente
     const clientRef = doc(db, 'clients', id)
-    await updateDoc(clientRef, {
+    const statusUpdate = {
       status,
       updatedAt: serverTimestamp()
-    })
+    }
+    await updateDoc(clientRef, statusUpdate)
 
     console.log(`✅ Estado del cliente ${id} actualizado a: ${status}`)
 
@@ -56,3 +55,5 @@ export async function PATCH(
     )
   }
 }
+
+export const PATCH = withFirestoreMetrics('PATCH /api/clients/[id]/status', handlePatch)
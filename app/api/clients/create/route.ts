@@ -1,13 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, addDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { collection, serverTimestamp } from 'firebase/firestore'
+import { addDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { EntitySearchService } from '@/lib/services/entity-search'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     console.log('🔍 API Clientes - Datos recibidos:', body)
@@ -162,7 +161,10 @@ export async function POST(request: NextRequest) {
     console.log('💾 Creando cliente en Firestore:', clientData)
 
     // Crear documento en Firestore
-    const docRef = await addDoc(collection(db, 'clients'), clientData)
+    const docRef = await addDoc(collection(db, 'clients'), {
+      ...clientData,
+      ...EntitySearchService.searchFields('clients', clientData)
+    })
     
     console.log('✅ Cliente creado exitosamente con ID:', docRef.id)
 
@@ -180,3 +182,5 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/clients/create', handlePost)
@@ -1,11 +1,9 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, query, where, getDocs, orderBy } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { collection, query, where, orderBy } from 'firebase/firestore'
+import { getDocs, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * Cuenta las facturas de un cliente específico
@@ -40,7 +38,7 @@ async function countClientInvoices(clientId: string, tenantId: string, companyId
  * GET /api/clients
  * Obtiene todos los clientes de la empresa seleccionada
  */
-export async function GET(req: NextRequest) {
+async function handleGet(req: NextRequest) {
   try {
     const { searchParams } = new URL(req.url)
     const tenantId = searchParams.get('tenantId')
@@ -75,7 +73,8 @@ export async function GET(req: NextRequest) {
 
     // Primero obtener todos los clientes
     for (const doc of snapshot.docs) {
-      const data = doc.data()
+      // Los campos del índice de búsqueda no se envían al navegador
+      const { searchTokens, searchSort, ...data } = doc.data()
       const clientId = doc.id
       
       // Contar facturas reales del cliente
@@ -115,3 +114,5 @@ export async function GET(req: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/clients', handleGet)
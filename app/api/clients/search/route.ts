@@ -0,0 +1,57 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { EntitySearchService } from '@/lib/services/entity-search'
+import { InvalidCursorError } from '@/lib/services/document-listing'
+
+const db = getFirestoreDb()
+
+/**
+ * GET /api/clients/search?tenantId=...&q=...
+ * Busca clientes por prefijo de nombre, nombre comercial, cédula o correo (sin tildes)
+ * Parámetros opcionales: companyId, status, limit (máx. 100), cursor
+ */
+async function handleGet(req: NextRequest) {
+  try {
+    const { searchParams } = new URL(req.url)
+    const tenantId = searchParams.get('tenantId')
+    const companyId = searchParams.get('companyId')
+    const status = searchParams.get('status')
+
+    if (!tenantId) {
+      return NextResponse.json(
+        { error: 'tenantId es requerido' },
+        { status: 400 }
+      )
+    }
+
+    const startedAt = performance.now()
+    const result = await EntitySearchService.search(db, 'clients', tenantId, searchParams.get('q') || '', {
+      limit: parseInt(searchParams.get('limit') || '', 10) || undefined,
+      cursor: searchParams.get('cursor'),
+      filter: client =>
+        (!companyId || (Array.isArray(client.companyIds) && client.companyIds.includes(companyId))) &&
+        (!status || client.status === status)
+    })
+
+    return NextResponse.json({
+      success: true,
+      clients: result.results,
+      nextCursor: result.nextCursor,
+      hasMore: result.nextCursor !== null,
+      tookMs: Math.round((performance.now() - startedAt) * 10) / 10
+    })
+
+  } catch (error) {
+    if (error instanceof InvalidCursorError) {
+      return NextResponse.json({ error: error.message }, { status: 400 })
+    }
+    console.error('❌ Error al buscar clientes:', error)
+    return NextResponse.json(
+      { error: 'Error interno del servidor' },
+      { status: 500 }
+    )
+  }
+}
+
+export const GET = withFirestoreMetrics('GET /api/clients/search', handleGet)
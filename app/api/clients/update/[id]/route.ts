@@ -1,13 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, updateDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { updateDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { EntitySearchService } from '@/lib/services/entity-search'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
-export async function PUT(
+async function handlePut(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -165,6 +164,9 @@ export async function PUT(
       updatedAt: serverTimestamp()
     }
 
+    // Campos de búsqueda (nombre, cédula y correo vienen siempre en la edición)
+    Object.assign(updateData, EntitySearchService.searchFields('clients', updateData))
+
     // Agregar companyIds si se proporciona selectedCompanyId
     if (selectedCompanyId) {
       updateData.companyIds = [selectedCompanyId]
@@ -208,3 +210,5 @@ export async function PUT(
     )
   }
 }
+
+export const PUT = withFirestoreMetrics('PUT /api/clients/update/[id]', handlePut)
@@ -1,11 +1,11 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, getDoc } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc } from 'firebase/firestore'
+import { getDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { LogoVariantService } from '@/lib/services/logo-variants'
+import { DigitalSignatureService } from '@/lib/services/digital-signature'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 // Función requerida por Next.js para rutas dinámicas
 export async function generateStaticParams() {
@@ -18,7 +18,7 @@ export async function generateStaticParams() {
  * GET /api/companies/[id]
  * Obtiene una empresa específica por ID
  */
-export async function GET(
+async function handleGet(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -83,7 +83,7 @@ export async function GET(
  * PUT /api/companies/[id]
  * Actualiza una empresa específica por ID
  */
-export async function PUT(
+async function handlePut(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -113,12 +113,23 @@ export async function PUT(
     }
 
     // Actualizar la empresa
-    const { updateDoc } = await import('firebase/firestore')
+    const { updateDoc } = await import('@/lib/firestore-metrics')
     await updateDoc(companyRef, {
       ...body,
       updatedAt: new Date()
     })
 
+    // Si cambió el certificado, no seguir firmando con el que está en caché (las demás
+    // instancias lo detectan al firmar, comparando la huella con el de la empresa)
+    if (body.certificadoDigital) {
+      DigitalSignatureService.invalidateCertificate(id)
+    }
+
+    // Si cambió el logo, precalcular su variante para PDF
+    if (body.logo) {
+      await LogoVariantService.precomputeForCompany(id, body.logo)
+    }
+
     console.log('🔍 API Company Update - empresa actualizada exitosamente')
 
     return NextResponse.json(
@@ -134,3 +145,6 @@ export async function PUT(
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/companies/[id]', handleGet)
+export const PUT = withFirestoreMetrics('PUT /api/companies/[id]', handlePut)
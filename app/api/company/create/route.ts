@@ -6,8 +6,10 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { CompanyService } from '@/lib/services/company-service'
 import { CompanyWizardData } from '@/lib/company-wizard-types'
+import { LogoVariantService } from '@/lib/services/logo-variants'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     console.log('Body recibido:', body)
@@ -48,6 +50,11 @@ export async function POST(request: NextRequest) {
       userId
     })
 
+    // Procesar el logo una sola vez para que los PDFs no tengan que hacerlo
+    if (result.company?.logo) {
+      await LogoVariantService.precomputeForCompany(result.id, result.company.logo)
+    }
+
     return NextResponse.json(result, { status: 201 })
 
   } catch (error) {
@@ -65,3 +72,5 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/company/create', handlePost)
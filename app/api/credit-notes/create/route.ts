@@ -1,7 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, getDoc, addDoc, collection, serverTimestamp, updateDoc, query, where, getDocs } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc, collection, serverTimestamp, query, where } from 'firebase/firestore'
+import { getDoc, addDoc, updateDoc, getDocs, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 import { HaciendaKeyGenerator } from '@/lib/services/hacienda-key-generator'
 import { CreditNoteGenerator, CreditNoteData } from '@/lib/services/credit-note-generator'
 import { ExoneracionXML } from '@/lib/services/xml-generator'
@@ -9,14 +9,15 @@ import { DigitalSignatureService } from '@/lib/services/digital-signature'
 import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
 import { HaciendaSubmissionService } from '@/lib/services/hacienda-submission'
 import { HaciendaStatusService } from '@/lib/services/hacienda-status'
+import { haciendaStatusScheduler } from '@/lib/services/hacienda-status-scheduler'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+import { CabysCatalogService } from '@/lib/services/cabys-catalog'
 import { XMLParser } from '@/lib/services/xml-parser'
-import { InvoiceEmailService } from '@/lib/services/invoice-email-service'
+import { InvoiceConsecutiveService } from '@/lib/services/invoice-consecutive'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const {
@@ -188,18 +189,26 @@ export async function POST(request: NextRequest) {
       console.log('ℹ️ La factura original NO tiene exoneración - NC sin exoneración')
     }
 
+    // Validar los códigos CABYS de la factura de referencia contra el catálogo oficial
+    const cabysValidation = await CabysCatalogService.validateItems(facturaData.items || [])
+    if (!cabysValidation.success) {
+      return NextResponse.json(
+        { error: cabysValidation.error, invalidLines: cabysValidation.invalidLines },
+        { status: 400 }
+      )
+    }
+
     // 3. Generar consecutivo para la NC usando consecutiveNT de la empresa
-    const currentConsecutiveNT = companyData.consecutiveNT || 0
-    const nextConsecutiveNT = currentConsecutiveNT + 1
-    
-    // Actualizar el consecutiveNT en la empresa
-    await updateDoc(doc(db, 'companies', companyId), {
-      consecutiveNT: nextConsecutiveNT,
-      updatedAt: serverTimestamp()
-    })
-    
-    const consecutivoNC = `NC-${String(nextConsecutiveNT).padStart(10, '0')}`
-    console.log('✅ Consecutivo NC generado:', consecutivoNC, '(consecutiveNT:', nextConsecutiveNT, ')')
+    const consecutiveResult = await InvoiceConsecutiveService.getAndUpdateConsecutive(companyId, 'notas-credito')
+    if (!consecutiveResult.success || !consecutiveResult.consecutive) {
+      return NextResponse.json(
+        { error: 'Error al generar consecutivo', details: consecutiveResult.error },
+        { status: 500 }
+      )
+    }
+
+    const consecutivoNC = consecutiveResult.consecutive
+    console.log('✅ Consecutivo NC generado:', consecutivoNC)
 
     // 4. Generar clave de Hacienda para la NC
     const fechaParaClave = new Date(fechaCostaRica)
@@ -488,11 +497,7 @@ export async function POST(request: NextRequest) {
 
     // 8. Firmar XML
     console.log('🔐 Firmando XML...')
-    const signResult = await DigitalSignatureService.signXMLWithEncryptedPassword(
-      xml,
-      companyData.certificadoDigital?.fileData,
-      companyData.certificadoDigital?.password
-    )
+    const signResult = await DigitalSignatureService.signXMLForCompany(xml, companyId, companyData.certificadoDigital)
 
     if (!signResult.success) {
       return NextResponse.json(
@@ -509,7 +514,7 @@ export async function POST(request: NextRequest) {
     let haciendaToken = null
     
     if (companyData.atvCredentials) {
-      const authResult = await HaciendaAuthService.authenticateFromCompany(companyData)
+      const authResult = await HaciendaAuthService.getValidToken(companyData)
       
       if (authResult.success) {
         haciendaToken = authResult.accessToken
@@ -679,7 +684,7 @@ export async function POST(request: NextRequest) {
     const docRef = await addDoc(collection(db, 'creditNotes'), creditNoteRecord)
     console.log('✅ Nota de Crédito guardada:', docRef.id)
 
-    // 12. Consultar estado real de Hacienda después de 10 segundos
+    // 12. Programar consulta del estado real de Hacienda
     if (submissionResult.response && (submissionResult.response as any).location) {
       const locationUrl = (submissionResult.response as any).location
       
@@ -695,84 +700,14 @@ export async function POST(request: NextRequest) {
           updatedAt: serverTimestamp()
         })
       } else {
-        console.log('⏰ Esperando 10 segundos para consultar estado real de Hacienda...')
-        console.log('📋 Datos de la NC:', {
-          id: docRef.id,
-          consecutivo: consecutivoNC,
-          tipoNotaCredito,
-          esAnulacionTotal
+        // La consulta de estado, la anulación de la factura y el correo se hacen en segundo plano
+        await haciendaStatusScheduler.enqueue({
+          collection: 'creditNotes',
+          documentId: docRef.id,
+          companyId,
+          locationUrl
         })
-        
-        // Esperar 10 segundos
-        await new Promise(resolve => setTimeout(resolve, 10000))
-        
-        console.log('🔍 Consultando estado real de Hacienda...')
-        console.log('📍 URL de consulta:', locationUrl)
-        console.log('🔑 Token de Hacienda disponible:', !!haciendaToken)
-        
-        // Usar la función directa de status de notas de crédito que incluye lógica de anulación
-        console.log('🚀 Iniciando consulta directa al status...')
-        try {
-          // Importar la función de status desde el servicio
-          const { checkCreditNoteStatus } = await import('@/lib/services/credit-note-status')
-          
-          const statusResult = await checkCreditNoteStatus(
-            docRef.id,
-            locationUrl,
-            haciendaToken || ''
-          )
-          
-          if (statusResult.success) {
-            console.log('✅ Estado real obtenido de Hacienda:', statusResult.status)
-            console.log('📋 Mensaje:', statusResult.message)
-            
-            // Si hay datos de factura anulada, mostrarlos
-            if (statusResult.facturaAnulada) {
-              console.log('🚨 Factura anulada automáticamente:', statusResult.facturaAnulada)
-            }
-            
-            // Enviar email si la nota de crédito fue aceptada
-            if (statusResult.status === 'Aceptado') {
-              console.log('📧 Enviando email de nota de crédito aceptada...')
-              try {
-                // Obtener datos completos de la nota de crédito para el email
-                const creditNoteDoc = await getDoc(docRef)
-                const creditNoteData = creditNoteDoc.data()
-                
-                if (creditNoteData) {
-                  const emailResult = await InvoiceEmailService.sendApprovalEmail({
-                    ...creditNoteData,
-                    consecutivo: creditNoteData.consecutivo,
-                    cliente: creditNoteData.cliente,
-                    total: creditNoteData.total,
-                    tipo: 'nota-credito'
-                  } as any)
-              
-              if (emailResult.success) {
-                    console.log('✅ Email de nota de crédito enviado exitosamente')
-                console.log('📧 Message ID:', emailResult.messageId)
-                
-                    // Actualizar nota de crédito con información del email enviado
-                await updateDoc(docRef, {
-                  emailSent: true,
-                  emailSentAt: serverTimestamp(),
-                  emailMessageId: emailResult.messageId,
-                  emailDeliveredTo: emailResult.deliveredTo
-                })
-              } else {
-                    console.error('❌ Error enviando email:', emailResult.error)
-                  }
-                }
-              } catch (emailError) {
-                console.error('❌ Error en envío de email:', emailError)
-              }
-            }
-          } else {
-            console.error('❌ Error consultando estado:', statusResult.error)
-          }
-        } catch (statusError) {
-          console.error('❌ Error en consulta de estado:', statusError)
-        }
+        console.log('📬 Consulta de estado de Hacienda programada para NC:', consecutivoNC)
       }
     } else {
       console.log('⚠️ No se pudo obtener URL de location de Hacienda')
@@ -785,6 +720,9 @@ export async function POST(request: NextRequest) {
       })
     }
 
+    // Sumar la nota de crédito a los resúmenes del dashboard
+    DashboardRollupService.syncDocumentInBackground(db, 'creditNotes', docRef.id)
+
     return NextResponse.json({
       success: true,
       creditNoteId: docRef.id,
@@ -869,3 +807,4 @@ export async function generateStaticParams() {
   return []
 }
 
+export const POST = withFirestoreMetrics('POST /api/credit-notes/create', handlePost)
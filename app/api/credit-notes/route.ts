@@ -1,13 +1,11 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, query, where, getDocs, Timestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { DocumentListingService, InvalidCursorError } from '@/lib/services/document-listing'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const tenantId = searchParams.get('tenantId')
@@ -22,50 +20,26 @@ export async function GET(request: NextRequest) {
 
     console.log('📋 Obteniendo notas de crédito para:', { tenantId, companyId })
 
-    // Consultar notas de crédito de la empresa
-    const creditNotesRef = collection(db, 'creditNotes')
-    const q = query(
-      creditNotesRef,
-      where('tenantId', '==', tenantId),
-      where('companyId', '==', companyId)
-    )
-
-    const querySnapshot = await getDocs(q)
-    const creditNotes = querySnapshot.docs.map(doc => {
-      const data = doc.data()
-      
-      // Convertir Timestamps a objetos Date
-      const createdAt = data.createdAt instanceof Timestamp 
-        ? data.createdAt.toDate()
-        : data.createdAt
-
-      return {
-        id: doc.id,
-        ...data,
-        createdAt
-      }
+    // Consultar notas de crédito ordenadas por Firestore (más recientes primero), paginadas con cursor
+    const page = await DocumentListingService.listDocuments(db, 'creditNotes', {
+      tenantId,
+      companyId,
+      ...DocumentListingService.parseSearchParams(searchParams)
     })
 
-    // Ordenar por consecutivo descendente (más alto primero)
-    creditNotes.sort((a, b) => {
-      const consecutivoA = a.consecutivo || ''
-      const consecutivoB = b.consecutivo || ''
-      
-      // Extraer número del consecutivo para comparación numérica
-      const numeroA = parseInt(consecutivoA.replace(/[^\d]/g, '')) || 0
-      const numeroB = parseInt(consecutivoB.replace(/[^\d]/g, '')) || 0
-      
-      return numeroB - numeroA // Descendente: mayor primero
-    })
-
-    console.log(`✅ ${creditNotes.length} notas de crédito encontradas`)
+    console.log(`✅ ${page.documents.length} notas de crédito encontradas`)
 
     return NextResponse.json({
-      creditNotes,
-      count: creditNotes.length
+      creditNotes: page.documents,
+      count: page.documents.length,
+      nextCursor: page.nextCursor,
+      hasMore: page.hasMore
     })
 
   } catch (error) {
+    if (error instanceof InvalidCursorError) {
+      return NextResponse.json({ error: error.message }, { status: 400 })
+    }
     console.error('❌ Error obteniendo notas de crédito:', error)
     return NextResponse.json(
       { error: error instanceof Error ? error.message : 'Error desconocido' },
@@ -79,3 +53,4 @@ export async function generateStaticParams() {
   return []
 }
 
+export const GET = withFirestoreMetrics('GET /api/credit-notes', handleGet)
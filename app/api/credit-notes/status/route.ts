@@ -1,11 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { checkCreditNoteStatus } from '@/lib/services/credit-note-status'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * POST /api/credit-notes/status
  * Endpoint HTTP que mantiene compatibilidad
  */
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const { creditNoteId, locationUrl, accessToken } = body
@@ -25,4 +26,6 @@ export async function POST(request: NextRequest) {
       { status: 500 }
     )
   }
-}
\ No newline at end of file
+}
+
+export const POST = withFirestoreMetrics('POST /api/credit-notes/status', handlePost)
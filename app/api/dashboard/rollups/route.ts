@@ -0,0 +1,51 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { assertTenantAdminAccess } from '@/lib/server/tenant-admin-guard'
+
+const db = getFirestoreDb()
+
+/**
+ * POST /api/dashboard/rollups
+ * Reconstruye los resúmenes mensuales de una empresa a partir de sus documentos
+ * (carga inicial de empresas existentes o corrección de descuadres). Solo para
+ * administradores de tenants y con la empresa sin emisión en curso (ver
+ * DashboardRollupService.rebuildCompany).
+ */
+async function handlePost(request: NextRequest) {
+  const denied = assertTenantAdminAccess(request)
+  if (denied) return denied
+
+  try {
+    const { companyId } = await request.json().catch(() => ({}))
+
+    if (!companyId) {
+      return NextResponse.json(
+        { error: 'companyId es requerido' },
+        { status: 400 }
+      )
+    }
+
+    console.log('🔄 Reconstruyendo resúmenes del dashboard para:', companyId)
+    const result = await DashboardRollupService.rebuildCompany(db, companyId)
+    console.log(`✅ Resúmenes reconstruidos: ${result.documents} documentos en ${result.months} meses (${result.resynced} resincronizados)`)
+
+    return NextResponse.json({
+      success: true,
+      ...result
+    })
+
+  } catch (error) {
+    console.error('❌ Error reconstruyendo resúmenes del dashboard:', error)
+    return NextResponse.json(
+      {
+        success: false,
+        error: error instanceof Error ? error.message : 'Error desconocido'
+      },
+      { status: 500 }
+    )
+  }
+}
+
+export const POST = withFirestoreMetrics('POST /api/dashboard/rollups', handlePost)
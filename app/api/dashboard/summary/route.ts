@@ -0,0 +1,66 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { collection, query, where } from 'firebase/firestore'
+import { getCountFromServer, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+
+const db = getFirestoreDb()
+
+/**
+ * GET /api/dashboard/summary
+ * Resúmenes mensuales de documentos y conteos de clientes y productos de una empresa
+ */
+async function handleGet(req: NextRequest) {
+  try {
+    const { searchParams } = new URL(req.url)
+    const tenantId = searchParams.get('tenantId')
+    const companyId = searchParams.get('companyId')
+
+    if (!tenantId || !companyId) {
+      return NextResponse.json(
+        { error: 'Faltan parámetros requeridos (tenantId, companyId)' },
+        { status: 400 }
+      )
+    }
+
+    // Conteos con agregación en Firestore en lugar de descargar las listas
+    const [access, months, clientsCount, productsCount] = await Promise.all([
+      DashboardRollupService.checkCompanyTenant(db, companyId, tenantId),
+      DashboardRollupService.getMonths(db, companyId),
+      getCountFromServer(query(
+        collection(db, 'clients'),
+        where('tenantId', '==', tenantId),
+        where('companyIds', 'array-contains', companyId)
+      )),
+      getCountFromServer(query(
+        collection(db, 'products'),
+        where('tenantId', '==', tenantId),
+        where('activo', '==', true)
+      ))
+    ])
+
+    if (access === 'not-found') {
+      return NextResponse.json({ error: 'Empresa no encontrada' }, { status: 404 })
+    }
+    if (access === 'forbidden') {
+      return NextResponse.json({ error: 'La empresa no pertenece al tenant' }, { status: 403 })
+    }
+
+    return NextResponse.json({
+      success: true,
+      currentMonth: DashboardRollupService.monthKey(new Date()),
+      months,
+      clientsCount: clientsCount.data().count,
+      productsCount: productsCount.data().count
+    })
+
+  } catch (error) {
+    console.error('❌ Error al obtener resumen del dashboard:', error)
+    return NextResponse.json(
+      { error: 'Error interno del servidor' },
+      { status: 500 }
+    )
+  }
+}
+
+export const GET = withFirestoreMetrics('GET /api/dashboard/summary', handleGet)
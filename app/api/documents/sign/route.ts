@@ -1,10 +1,11 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { DigitalSignatureService } from '@/lib/services/digital-signature'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * API para firmar documentos XML digitalmente
  */
-export async function POST(req: NextRequest) {
+async function handlePost(req: NextRequest) {
   try {
     const body = await req.json()
     const { xml, certificate_base64, password, document_type } = body
@@ -56,3 +57,5 @@ export async function POST(req: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/documents/sign', handlePost)
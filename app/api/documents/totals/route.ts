@@ -0,0 +1,62 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { DashboardRollupService, ROLLUP_COLLECTIONS, RollupDocumentKind } from '@/lib/services/dashboard-rollups'
+
+const db = getFirestoreDb()
+
+/**
+ * GET /api/documents/totals
+ * Totales de un tipo de documento de la empresa (conteos por estado, montos e IVA
+ * de los aceptados) a partir de los resúmenes mensuales, sin leer los documentos.
+ * Las empresas con resúmenes anteriores a los montos deben reconstruirlos con
+ * POST /api/dashboard/rollups.
+ */
+async function handleGet(req: NextRequest) {
+  try {
+    const { searchParams } = new URL(req.url)
+    const tenantId = searchParams.get('tenantId')
+    const companyId = searchParams.get('companyId')
+    const documentType = searchParams.get('documentType') as RollupDocumentKind | null
+
+    if (!tenantId || !companyId || !documentType) {
+      return NextResponse.json(
+        { error: 'Faltan parámetros requeridos (tenantId, companyId, documentType)' },
+        { status: 400 }
+      )
+    }
+
+    if (!(documentType in ROLLUP_COLLECTIONS)) {
+      return NextResponse.json(
+        { error: `Tipo de documento no soportado: ${documentType}` },
+        { status: 400 }
+      )
+    }
+
+    const [access, totals] = await Promise.all([
+      DashboardRollupService.checkCompanyTenant(db, companyId, tenantId),
+      DashboardRollupService.getDocumentTotals(db, companyId, documentType)
+    ])
+
+    if (access === 'not-found') {
+      return NextResponse.json({ error: 'Empresa no encontrada' }, { status: 404 })
+    }
+    if (access === 'forbidden') {
+      return NextResponse.json({ error: 'La empresa no pertenece al tenant' }, { status: 403 })
+    }
+
+    return NextResponse.json({
+      success: true,
+      totals
+    })
+
+  } catch (error) {
+    console.error('❌ Error al obtener totales de documentos:', error)
+    return NextResponse.json(
+      { error: 'Error interno del servidor' },
+      { status: 500 }
+    )
+  }
+}
+
+export const GET = withFirestoreMetrics('GET /api/documents/totals', handleGet)
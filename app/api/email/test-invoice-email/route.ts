@@ -1,11 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { InvoiceEmailService } from '@/lib/services/invoice-email-service'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * API route para probar el servicio de email de facturas aprobadas
  * POST /api/email/test-invoice-email
  */
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     console.log('⚠️ [EMAIL] Endpoint de prueba desactivado para evitar gastos innecesarios')
     
@@ -35,7 +36,7 @@ export async function POST(request: NextRequest) {
  * GET /api/email/test-invoice-email
  * Verifica la disponibilidad del servicio de email
  */
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     console.log('🔍 Verificando disponibilidad del servicio de email...')
 
@@ -74,3 +75,6 @@ export async function GET(request: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/email/test-invoice-email', handlePost)
+export const GET = withFirestoreMetrics('GET /api/email/test-invoice-email', handleGet)
@@ -1,12 +1,13 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * API route para autenticación con Hacienda
  * POST /api/hacienda/auth
  */
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     console.log('🔐 API: Iniciando autenticación con Hacienda...')
 
@@ -71,7 +72,7 @@ export async function POST(request: NextRequest) {
 /**
  * GET endpoint para obtener información sobre el servicio de autenticación
  */
-export async function GET() {
+async function handleGet() {
   return NextResponse.json({
     service: 'Hacienda Authentication Service',
     version: '1.0.0',
@@ -91,3 +92,6 @@ export async function GET() {
     }
   })
 }
+
+export const POST = withFirestoreMetrics('POST /api/hacienda/auth', handlePost)
+export const GET = withFirestoreMetrics('GET /api/hacienda/auth', handleGet)
@@ -0,0 +1,69 @@
+/**
+ * API Route para precargar la caché de consultas de contribuyentes
+ * POST /api/hacienda/company-info/prefetch { tenantId, wait? }
+ * GET  /api/hacienda/company-info/prefetch (métricas de la caché)
+ */
+
+import { NextRequest, NextResponse } from 'next/server'
+import { collection, query, where } from 'firebase/firestore'
+import { getDocs, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { getCompanyInfoCache } from '@/lib/services/hacienda-company-info'
+
+const db = getFirestoreDb()
+
+// Consultas simultáneas a Hacienda durante la precarga (para no provocar throttling)
+const PREFETCH_CONCURRENCY = 4
+
+async function handleGet() {
+  return NextResponse.json({
+    success: true,
+    stats: getCompanyInfoCache().getStats()
+  })
+}
+
+async function handlePost(request: NextRequest) {
+  try {
+    const { tenantId, wait } = await request.json().catch(() => ({}))
+
+    if (!tenantId) {
+      return NextResponse.json(
+        { message: 'tenantId es requerido' },
+        { status: 400 }
+      )
+    }
+
+    // Cédulas de todos los clientes del tenant
+    const snapshot = await getDocs(query(collection(db, 'clients'), where('tenantId', '==', tenantId)))
+    const identificaciones = snapshot.docs
+      .map(snap => snap.get('identification'))
+      .filter((identification): identification is string => typeof identification === 'string')
+
+    const prefetch = getCompanyInfoCache().prefetch(identificaciones, PREFETCH_CONCURRENCY)
+
+    if (!wait) {
+      // Precarga en segundo plano
+      prefetch
+        .then(result => console.log('✅ Precarga de contribuyentes completada:', { tenantId, ...result }))
+        .catch(error => console.error('❌ Error en precarga de contribuyentes:', error))
+
+      return NextResponse.json(
+        { success: true, clients: snapshot.size, message: 'Precarga iniciada' },
+        { status: 202 }
+      )
+    }
+
+    const result = await prefetch
+    return NextResponse.json({ success: true, clients: snapshot.size, ...result })
+
+  } catch (error) {
+    console.error('❌ Error precargando consultas de contribuyentes:', error)
+    return NextResponse.json(
+      { message: 'Error interno del servidor' },
+      { status: 500 }
+    )
+  }
+}
+
+export const GET = withFirestoreMetrics('GET /api/hacienda/company-info/prefetch', handleGet)
+export const POST = withFirestoreMetrics('POST /api/hacienda/company-info/prefetch', handlePost)
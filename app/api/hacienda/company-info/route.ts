@@ -4,7 +4,7 @@
  */
 
 import { NextRequest, NextResponse } from 'next/server'
-import { HaciendaCompanyInfo } from '@/lib/company-wizard-types'
+import { getCompanyInfoCache, normalizeIdentificacion } from '@/lib/services/hacienda-company-info'
 
 export async function GET(request: NextRequest) {
   try {
@@ -19,48 +19,26 @@ export async function GET(request: NextRequest) {
     }
 
     // Validar formato de identificación
-    const cleanId = identificacion.replace(/[-\s]/g, '')
-    if (!/^\d{9,10}$/.test(cleanId)) {
+    const cleanId = normalizeIdentificacion(identificacion)
+    if (!cleanId) {
       return NextResponse.json(
         { message: 'Formato de identificación inválido. Debe tener 9 o 10 dígitos.' },
         { status: 400 }
       )
     }
 
-    // Consultar API de Hacienda
-    const haciendaUrl = `https://api.hacienda.go.cr/fe/ae?identificacion=${cleanId}`
-    
-    const response = await fetch(haciendaUrl, {
-      method: 'GET',
-      headers: {
-        'Accept': 'application/json',
-        'User-Agent': 'InvoSell/1.0'
-      }
-    })
+    // Consultar API de Hacienda (con caché y solicitudes concurrentes combinadas)
+    const lookup = await getCompanyInfoCache().lookup(cleanId)
+    const cacheHeaders = { 'X-Cache': lookup.cached ? 'HIT' : 'MISS' }
 
-    if (!response.ok) {
-      if (response.status === 404) {
-        return NextResponse.json(
-          { message: 'No se encontró información para esta identificación en Hacienda' },
-          { status: 404 }
-        )
-      }
-      
+    if (lookup.status !== 'found' || !lookup.data) {
       return NextResponse.json(
-        { message: 'Error al consultar información en Hacienda' },
-        { status: response.status }
+        { message: lookup.message || 'Error al consultar información en Hacienda' },
+        { status: lookup.httpStatus, headers: cacheHeaders }
       )
     }
 
-    const data: HaciendaCompanyInfo = await response.json()
-
-    // Validar que la respuesta tiene la estructura esperada
-    if (!data.nombre || !data.actividades || !Array.isArray(data.actividades)) {
-      return NextResponse.json(
-        { message: 'Respuesta inválida de la API de Hacienda' },
-        { status: 500 }
-      )
-    }
+    const data = lookup.data
 
     // Filtrar solo actividades activas
     const actividadesActivas = data.actividades.filter(actividad => actividad.estado === 'A')
@@ -72,19 +50,10 @@ export async function GET(request: NextRequest) {
       actividadesActivas: actividadesActivas.length
     }
 
-    return NextResponse.json(responseData)
+    return NextResponse.json(responseData, { headers: cacheHeaders })
 
   } catch (error) {
     console.error('Error fetching company info from Hacienda:', error)
-    
-    // Si es un error de red o timeout
-    if (error instanceof TypeError && error.message.includes('fetch')) {
-      return NextResponse.json(
-        { message: 'Error de conexión con Hacienda. Intente nuevamente.' },
-        { status: 503 }
-      )
-    }
-
     return NextResponse.json(
       { message: 'Error interno del servidor' },
       { status: 500 }
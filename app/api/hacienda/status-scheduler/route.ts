@@ -0,0 +1,65 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { haciendaStatusScheduler } from '@/lib/services/hacienda-status-scheduler'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+
+/**
+ * GET /api/hacienda/status-scheduler
+ * Arranca el programador de consultas de estado (recupera pendientes) y devuelve sus métricas
+ */
+async function handleGet() {
+  try {
+    await haciendaStatusScheduler.start()
+
+    return NextResponse.json({
+      success: true,
+      stats: haciendaStatusScheduler.getStats()
+    })
+
+  } catch (error) {
+    console.error('❌ Error obteniendo estado del programador:', error)
+    return NextResponse.json(
+      {
+        success: false,
+        error: error instanceof Error ? error.message : 'Error desconocido'
+      },
+      { status: 500 }
+    )
+  }
+}
+
+/**
+ * POST /api/hacienda/status-scheduler
+ * Procesa las consultas vencidas y la cola de correos durante un máximo de `maxMs` (para un cron en entornos serverless)
+ */
+async function handlePost(request: NextRequest) {
+  try {
+    const body = await request.json().catch(() => ({}))
+    const maxMs = Math.min(Number(body.maxMs) || 50000, 55000)
+
+    const startedAt = Date.now()
+    const stats = await haciendaStatusScheduler.drain(maxMs)
+
+    // Los correos de aprobación encolados en esta pasada se envían en el tiempo que quede
+    const { getEmailQueue } = await import('@/lib/email/email-queue')
+    const emailStats = await getEmailQueue().drain(Math.max(0, maxMs - (Date.now() - startedAt)))
+
+    return NextResponse.json({
+      success: true,
+      stats,
+      emailStats
+    })
+
+  } catch (error) {
+    console.error('❌ Error procesando consultas de estado:', error)
+    return NextResponse.json(
+      {
+        success: false,
+        error: error instanceof Error ? error.message : 'Error desconocido'
+      },
+      { status: 500 }
+    )
+  }
+}
+
+export const GET = withFirestoreMetrics('GET /api/hacienda/status-scheduler', handleGet)
+export const POST = withFirestoreMetrics('POST /api/hacienda/status-scheduler', handlePost)
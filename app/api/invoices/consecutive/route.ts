@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { InvoiceConsecutiveService } from '@/lib/services/invoice-consecutive'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
 
 /**
  * API route para manejar consecutivos de facturas
@@ -7,7 +8,7 @@ import { InvoiceConsecutiveService } from '@/lib/services/invoice-consecutive'
  * POST /api/invoices/consecutive - Obtener siguiente consecutivo
  */
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const companyId = searchParams.get('companyId')
@@ -55,7 +56,7 @@ export async function GET(request: NextRequest) {
   }
 }
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const { companyId } = body
@@ -101,3 +102,6 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/invoices/consecutive', handleGet)
+export const POST = withFirestoreMetrics('POST /api/invoices/consecutive', handlePost)
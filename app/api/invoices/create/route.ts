@@ -1,20 +1,20 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, addDoc, serverTimestamp, doc, getDoc, updateDoc } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { collection, serverTimestamp, doc } from 'firebase/firestore'
+import { addDoc, getDoc, updateDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 import { XMLGenerator, FacturaData, ExoneracionXML } from '@/lib/services/xml-generator'
 import { DigitalSignatureService } from '@/lib/services/digital-signature'
 import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
 import { HaciendaSubmissionService } from '@/lib/services/hacienda-submission'
 import { HaciendaStatusService } from '@/lib/services/hacienda-status'
+import { haciendaStatusScheduler } from '@/lib/services/hacienda-status-scheduler'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+import { CabysCatalogService } from '@/lib/services/cabys-catalog'
 import { InvoiceConsecutiveService } from '@/lib/services/invoice-consecutive'
 import { HaciendaKeyGenerator } from '@/lib/services/hacienda-key-generator'
-import { InvoiceEmailService } from '@/lib/services/invoice-email-service'
 import { ExchangeRateService } from '@/lib/services/exchange-rate-service'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * Obtiene el tipo de cambio para una moneda específica
@@ -41,7 +41,7 @@ async function getExchangeRateForCurrency(currency: string): Promise<number> {
  * POST /api/invoices/create
  * Crea una nueva factura en Firestore
  */
-export async function POST(req: NextRequest) {
+async function handlePost(req: NextRequest) {
   try {
     const body = await req.json()
 
@@ -87,6 +87,15 @@ export async function POST(req: NextRequest) {
       )
     }
 
+    // Validar los códigos CABYS contra el catálogo oficial
+    const cabysValidation = await CabysCatalogService.validateItems(items, { defaultCode: '8399000000000' })
+    if (!cabysValidation.success) {
+      return NextResponse.json(
+        { error: cabysValidation.error, invalidLines: cabysValidation.invalidLines },
+        { status: 400 }
+      )
+    }
+
     // 1. Generar consecutivo automáticamente
     console.log('🔢 Generando consecutivo para empresa:', companyId)
     const consecutiveResult = await InvoiceConsecutiveService.getAndUpdateConsecutive(companyId)
@@ -428,11 +437,7 @@ export async function POST(req: NextRequest) {
       if (companyData.certificadoDigital?.fileData && companyData.certificadoDigital?.password) {
         console.log('🔐 Iniciando firma digital...')
         
-        const signingResult = await DigitalSignatureService.signXMLWithEncryptedPassword(
-          xml,
-          companyData.certificadoDigital.fileData,
-          companyData.certificadoDigital.password
-        )
+        const signingResult = await DigitalSignatureService.signXMLForCompany(xml, companyId, companyData.certificadoDigital)
 
         if (signingResult.success) {
           signedXml = signingResult.signed_xml
@@ -449,7 +454,7 @@ export async function POST(req: NextRequest) {
       if (companyData.atvCredentials) {
         console.log('🏛️ Iniciando autenticación con Hacienda...')
         
-        const authResult = await HaciendaAuthService.authenticateFromCompany(companyData)
+        const authResult = await HaciendaAuthService.getValidToken(companyData)
         
         if (authResult.success) {
           haciendaToken = authResult.accessToken
@@ -571,7 +576,7 @@ export async function POST(req: NextRequest) {
         clienteHasExemption: verificationData?.cliente?.hasExemption
       })
 
-      // 7. CONSULTAR ESTADO REAL DE HACIENDA DESPUÉS DE 10 SEGUNDOS (solo si se envió a Hacienda)
+      // 7. PROGRAMAR CONSULTA DEL ESTADO REAL DE HACIENDA (solo si se envió a Hacienda)
       if (haciendaSubmissionResult && (haciendaSubmissionResult as any).location) {
         const locationUrl = (haciendaSubmissionResult as any).location
         
@@ -587,121 +592,14 @@ export async function POST(req: NextRequest) {
             updatedAt: serverTimestamp()
           })
         } else {
-          console.log('⏰ Esperando 10 segundos para consultar estado real de Hacienda...')
-          
-          // Esperar 10 segundos
-          await new Promise(resolve => setTimeout(resolve, 10000))
-          
-          console.log('🔍 Consultando estado real de Hacienda...')
-          console.log('📍 URL de consulta:', locationUrl)
-          
-          // Usar el servicio de consulta de estado
-          const statusResult = await HaciendaStatusService.checkDocumentStatus(locationUrl, haciendaToken || '')
-          
-          if (statusResult.success) {
-            console.log('✅ Estado real obtenido de Hacienda:', statusResult.status)
-            
-            // Usar el campo "ind-estado" de la respuesta de Hacienda
-            const estadoHacienda = statusResult.status['ind-estado'] || statusResult.status.estado || statusResult.status.state
-            
-            // Interpretar el estado
-            const interpretedStatus = HaciendaStatusService.interpretStatus(statusResult.status)
-            
-            // Actualizar la factura con el estado real
-            await updateDoc(docRef, {
-              haciendaSubmission: statusResult.status,
-              status: estadoHacienda || interpretedStatus.status,
-              statusDescription: interpretedStatus.description,
-              isFinalStatus: interpretedStatus.isFinal,
-              updatedAt: serverTimestamp()
-            })
-            
-            console.log('✅ Factura actualizada con estado real de Hacienda:', interpretedStatus.status)
-            
-            // 📧 ENVIAR EMAIL SI LA FACTURA ES APROBADA
-            if (interpretedStatus.isFinal && interpretedStatus.status === 'Aceptado') {
-              console.log('🎉 Factura APROBADA - Enviando email al cliente...')
-              
-              try {
-                // 🔧 Leer la factura actualizada desde Firestore para obtener todos los campos, incluyendo exoneración
-                const updatedInvoiceSnap = await getDoc(docRef)
-                const updatedInvoiceData = updatedInvoiceSnap.exists() ? updatedInvoiceSnap.data() : invoiceData
-                
-                console.log('🔍 [CRÍTICO] updatedInvoiceData keys:', Object.keys(updatedInvoiceData || {}))
-                console.log('🔍 [CRÍTICO] tieneExoneracion:', updatedInvoiceData?.tieneExoneracion)
-                console.log('🔍 [CRÍTICO] exoneracion:', updatedInvoiceData?.exoneracion ? 'presente' : 'ausente')
-                
-                // Crear la factura completa con todos los datos actualizados desde Firestore
-                const completeInvoiceData = {
-                  ...updatedInvoiceData,
-                  id: docRef.id,
-                  status: interpretedStatus.status,
-                  statusDescription: interpretedStatus.description,
-                  isFinalStatus: interpretedStatus.isFinal,
-                  haciendaSubmission: statusResult.status,  // ← Incluir la respuesta completa de Hacienda
-                  xmlSigned: signedXml,  // ← Asegurar que el XML firmado esté incluido
-                  // 🔧 Asegurar que los campos de exoneración estén presentes
-                  tieneExoneracion: updatedInvoiceData?.tieneExoneracion,
-                  exoneracion: updatedInvoiceData?.exoneracion
-                }
-                
-                console.log('📧 Enviando email con factura completa:', {
-                  id: completeInvoiceData.id,
-                  consecutivo: completeInvoiceData.consecutivo,
-                  hasXmlSigned: !!completeInvoiceData.xmlSigned,
-                  hasHaciendaSubmission: !!completeInvoiceData.haciendaSubmission,
-                  hasRespuestaXml: !!completeInvoiceData.haciendaSubmission?.['respuesta-xml'],
-                  // 🔍 DEBUG: Verificar campos de exoneración antes de enviar email
-                  tieneExoneracion: completeInvoiceData.tieneExoneracion,
-                  exoneracion: completeInvoiceData.exoneracion ? 'presente' : 'ausente'
-                })
-                
-                const emailResult = await InvoiceEmailService.sendApprovalEmail(completeInvoiceData)
-
-                if (emailResult.success) {
-                  console.log('✅ Email de aprobación enviado exitosamente')
-                  console.log('📧 Message ID:', emailResult.messageId)
-                  
-                  // Actualizar factura con información del email enviado
-                  await updateDoc(docRef, {
-                    emailSent: true,
-                    emailSentAt: serverTimestamp(),
-                    emailMessageId: emailResult.messageId,
-                    emailDeliveredTo: emailResult.deliveredTo
-                  })
-                } else {
-                  console.error('❌ Error enviando email de aprobación:', emailResult.error)
-                  
-                  // Marcar que hubo error enviando email
-                  await updateDoc(docRef, {
-                    emailError: emailResult.error,
-                    emailErrorAt: serverTimestamp()
-                  })
-                }
-              } catch (emailError) {
-                console.error('❌ Error en proceso de email:', emailError)
-                
-                // Marcar error en la factura
-                await updateDoc(docRef, {
-                  emailError: emailError instanceof Error ? emailError.message : 'Error desconocido',
-                  emailErrorAt: serverTimestamp()
-                })
-              }
-            }
-          } else {
-            console.error('❌ Error al consultar estado de Hacienda:', statusResult.error)
-            
-            // Marcar como error en consulta
-            await updateDoc(docRef, {
-              status: 'Error Consulta Hacienda',
-              haciendaSubmission: {
-                error: statusResult.error,
-                locationUrl: locationUrl,
-                timestamp: new Date().toISOString()
-              },
-              updatedAt: serverTimestamp()
-            })
-          }
+          // La consulta de estado y el correo de aprobación se hacen en segundo plano
+          await haciendaStatusScheduler.enqueue({
+            collection: 'invoices',
+            documentId: docRef.id,
+            companyId,
+            locationUrl
+          })
+          console.log('📬 Consulta de estado de Hacienda programada')
         }
       } else {
         console.log('⚠️ No se puede consultar estado - no hay location URL disponible')
@@ -712,6 +610,11 @@ export async function POST(req: NextRequest) {
       // No fallar la creación de la factura si hay error con el XML
     }
 
+    // Sumar la factura a los resúmenes del dashboard
+    if (docRef) {
+      DashboardRollupService.syncDocumentInBackground(db, 'invoices', docRef.id)
+    }
+
     return NextResponse.json({
       success: true,
       invoiceId: docRef.id,
@@ -727,3 +630,5 @@ export async function POST(req: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/invoices/create', handlePost)
@@ -1,17 +1,15 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, getDoc } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc } from 'firebase/firestore'
+import { getDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * GET /api/invoices/get-by-id?id=xxx
  * Obtiene una factura específica por ID usando query parameter
  */
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const id = searchParams.get('id')
@@ -84,3 +82,5 @@ export async function GET(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/invoices/get-by-id', handleGet)
@@ -1,17 +1,16 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, query, where, getDocs, orderBy } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { DocumentListingService, InvalidCursorError } from '@/lib/services/document-listing'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * GET /api/invoices
- * Obtiene las facturas de una empresa específica
+ * Obtiene las facturas de una empresa específica, más recientes primero
+ * Parámetros opcionales: limit, cursor, status, search, from, to, fields
  */
-export async function GET(req: NextRequest) {
+async function handleGet(req: NextRequest) {
   try {
     const { searchParams } = new URL(req.url)
     const tenantId = searchParams.get('tenantId')
@@ -24,44 +23,25 @@ export async function GET(req: NextRequest) {
       )
     }
 
-    // Consultar facturas de la empresa específica
-    const invoicesRef = collection(db, 'invoices')
-    const q = query(
-      invoicesRef,
-      where('tenantId', '==', tenantId),
-      where('companyId', '==', companyId)
-      // Removido orderBy para evitar problemas de índice
-    )
-
-    const querySnapshot = await getDocs(q)
-    const invoices = []
-
-    querySnapshot.forEach((doc) => {
-      const data = doc.data()
-      invoices.push({
-        id: doc.id,
-        ...data,
-        // Convertir timestamps a fechas
-        createdAt: data.createdAt?.toDate ? data.createdAt.toDate() : data.createdAt,
-        updatedAt: data.updatedAt?.toDate ? data.updatedAt.toDate() : data.updatedAt,
-        haciendaValidationDate: data.haciendaValidationDate?.toDate ? data.haciendaValidationDate.toDate() : data.haciendaValidationDate
-      })
-    })
-
-    // Ordenar por fecha de creación (más reciente primero) del lado del cliente
-    invoices.sort((a, b) => {
-      const dateA = a.createdAt instanceof Date ? a.createdAt : new Date(a.createdAt)
-      const dateB = b.createdAt instanceof Date ? b.createdAt : new Date(b.createdAt)
-      return dateB.getTime() - dateA.getTime()
+    // Consultar facturas ordenadas por Firestore, paginadas con cursor
+    const page = await DocumentListingService.listDocuments(db, 'invoices', {
+      tenantId,
+      companyId,
+      ...DocumentListingService.parseSearchParams(searchParams)
     })
 
     return NextResponse.json({
       success: true,
-      invoices,
-      count: invoices.length
+      invoices: page.documents,
+      count: page.documents.length,
+      nextCursor: page.nextCursor,
+      hasMore: page.hasMore
     })
 
   } catch (error) {
+    if (error instanceof InvalidCursorError) {
+      return NextResponse.json({ error: error.message }, { status: 400 })
+    }
     console.error('❌ Error al obtener facturas:', error)
     return NextResponse.json(
       { error: 'Error interno del servidor' },
@@ -69,3 +49,5 @@ export async function GET(req: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/invoices', handleGet)
@@ -1,19 +1,17 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, getDoc, updateDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { getDoc, updateDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 import { HaciendaStatusService } from '@/lib/services/hacienda-status'
-import { InvoiceEmailService } from '@/lib/services/invoice-email-service'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * POST /api/invoices/status
  * Consulta el estado de una factura en Hacienda
  */
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const { invoiceId, locationUrl, accessToken } = body
@@ -73,8 +71,6 @@ export async function POST(request: NextRequest) {
         )
       }
 
-      const invoiceData = invoiceSnap.data()
-      
       await updateDoc(invoiceRef, {
         haciendaSubmission: statusResult.status,
         status: interpretedStatus.status,
@@ -85,91 +81,16 @@ export async function POST(request: NextRequest) {
       })
 
       console.log('✅ Factura actualizada con estado:', interpretedStatus.status)
+      DashboardRollupService.syncDocumentInBackground(db, 'invoices', invoiceId)
 
-      // 📧 ENVIAR EMAIL SI LA FACTURA ES APROBADA
+      // 📧 ENCOLAR EMAIL SI LA FACTURA ES APROBADA (una sola vez, aunque el programador también la consulte)
       if (interpretedStatus.isFinal && interpretedStatus.status === 'Aceptado') {
-        console.log('🎉 Factura APROBADA - Enviando email al cliente...')
-        
         try {
-          // Pequeña pausa para asegurar que el updateDoc se haya completado
-          await new Promise(resolve => setTimeout(resolve, 100))
-          
-          // Leer los datos actualizados de la factura después del updateDoc para obtener todos los datos del cliente
-          const updatedInvoiceSnap = await getDoc(invoiceRef)
-          const updatedInvoiceData = updatedInvoiceSnap.exists() ? updatedInvoiceSnap.data() : invoiceData
-          
-          // 🔍 DEBUG CRÍTICO: Verificar qué datos están realmente en la factura
-          console.log('🔍 [CRÍTICO] updatedInvoiceData keys:', Object.keys(updatedInvoiceData || {}))
-          console.log('🔍 [CRÍTICO] tieneExoneracion:', updatedInvoiceData?.tieneExoneracion)
-          console.log('🔍 [CRÍTICO] exoneracion:', updatedInvoiceData?.exoneracion ? 'presente' : 'ausente')
-          
-          console.log('🔍 Debug datos del cliente para email:', {
-            hasCliente: !!updatedInvoiceData?.cliente,
-            clienteKeys: updatedInvoiceData?.cliente ? Object.keys(updatedInvoiceData.cliente) : [],
-            // Campos directos de la factura según Firebase
-            invoiceTieneExoneracion: updatedInvoiceData?.tieneExoneracion,
-            invoiceExoneracion: updatedInvoiceData?.exoneracion ? 'presente' : 'ausente',
-            // Campos del cliente
-            clienteTieneExoneracion: updatedInvoiceData?.cliente?.tieneExoneracion,
-            clienteHasExemption: updatedInvoiceData?.cliente?.hasExemption,
-            // Debug completo de la factura
-            facturaKeys: Object.keys(updatedInvoiceData || {}),
-            facturaTieneExoneracion: updatedInvoiceData?.tieneExoneracion,
-            facturaExoneracionKeys: updatedInvoiceData?.exoneracion ? Object.keys(updatedInvoiceData.exoneracion) : []
-          })
-          
-          // Crear la factura completa con todos los datos actualizados
-          const completeInvoiceData = {
-            ...updatedInvoiceData,
-            id: invoiceId,
-            status: interpretedStatus.status,
-            statusDescription: interpretedStatus.description,
-            isFinalStatus: interpretedStatus.isFinal,
-            haciendaSubmission: statusResult.status,  // ← Incluir la respuesta completa de Hacienda
-            // 🔧 Asegurar que los campos de exoneración estén presentes
-            tieneExoneracion: updatedInvoiceData?.tieneExoneracion,
-            exoneracion: updatedInvoiceData?.exoneracion
-          }
-          
-          console.log('📧 Enviando email con factura completa:', {
-            id: completeInvoiceData.id,
-            consecutivo: completeInvoiceData.consecutivo,
-            hasXmlSigned: !!completeInvoiceData.xmlSigned,
-            hasHaciendaSubmission: !!completeInvoiceData.haciendaSubmission,
-            hasRespuestaXml: !!completeInvoiceData.haciendaSubmission?.['respuesta-xml'],
-            // 🔍 DEBUG: Verificar campos de exoneración antes de enviar email
-            tieneExoneracion: completeInvoiceData.tieneExoneracion,
-            exoneracion: completeInvoiceData.exoneracion ? 'presente' : 'ausente',
-            clienteTieneExoneracion: completeInvoiceData.cliente?.tieneExoneracion,
-            clienteHasExemption: completeInvoiceData.cliente?.hasExemption
-          })
-          
-          const emailResult = await InvoiceEmailService.sendApprovalEmail(completeInvoiceData)
-
-          if (emailResult.success) {
-            console.log('✅ Email de aprobación enviado exitosamente')
-            console.log('📧 Message ID:', emailResult.messageId)
-            
-            // Actualizar factura con información del email enviado
-            await updateDoc(invoiceRef, {
-              emailSent: true,
-              emailSentAt: serverTimestamp(),
-              emailMessageId: emailResult.messageId,
-              emailDeliveredTo: emailResult.deliveredTo
-            })
-          } else {
-            console.error('❌ Error enviando email de aprobación:', emailResult.error)
-            
-            // Marcar que hubo error enviando email
-            await updateDoc(invoiceRef, {
-              emailError: emailResult.error,
-              emailErrorAt: serverTimestamp()
-            })
-          }
+          const { queueApprovalEmail } = await import('@/lib/services/approval-email')
+          const queued = await queueApprovalEmail({ collection: 'invoices', documentId: invoiceId })
+          console.log(queued ? '🎉 Factura APROBADA - Email al cliente encolado' : 'ℹ️ El email de aprobación ya fue enviado o encolado')
         } catch (emailError) {
-          console.error('❌ Error en proceso de email:', emailError)
-          
-          // Marcar error en la factura
+          console.error('❌ Error encolando email de aprobación:', emailError)
           await updateDoc(invoiceRef, {
             emailError: emailError instanceof Error ? emailError.message : 'Error desconocido',
             emailErrorAt: serverTimestamp()
@@ -217,7 +138,7 @@ export async function POST(request: NextRequest) {
  * GET /api/invoices/status?invoiceId=xxx
  * Obtiene información de estado de una factura
  */
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const invoiceId = searchParams.get('invoiceId')
@@ -276,3 +197,6 @@ export async function GET(request: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/invoices/status', handlePost)
+export const GET = withFirestoreMetrics('GET /api/invoices/status', handleGet)
@@ -0,0 +1,55 @@
+/**
+ * API Route de métricas de Firestore (requiere FIRESTORE_METRICS=1)
+ * GET    /api/metrics/firestore            lecturas, escrituras y latencia por ruta y por punto de llamada
+ * GET    /api/metrics/firestore?top=20     solo los puntos de llamada más costosos
+ * DELETE /api/metrics/firestore            reinicia los contadores
+ *
+ * Solo para administradores (encabezado x-tenant-admin-email). En producción además
+ * debe habilitarse con FIRESTORE_METRICS_ENDPOINT=true; si no, responde 404.
+ */
+
+import { NextRequest, NextResponse } from 'next/server'
+import {
+  FIRESTORE_METRICS_ENABLED,
+  getFirestoreMetrics,
+  resetFirestoreMetrics
+} from '@/lib/firestore-metrics'
+import { assertTenantAdminAccess } from '@/lib/server/tenant-admin-guard'
+
+const ENDPOINT_ENABLED =
+  process.env.NODE_ENV !== 'production' || process.env.FIRESTORE_METRICS_ENDPOINT === 'true'
+
+function assertMetricsAccess(req: NextRequest): NextResponse | null {
+  if (!ENDPOINT_ENABLED) {
+    return NextResponse.json({ error: 'No encontrado' }, { status: 404 })
+  }
+  return assertTenantAdminAccess(req)
+}
+
+export async function GET(req: NextRequest) {
+  const denied = assertMetricsAccess(req)
+  if (denied) return denied
+
+  const metrics = getFirestoreMetrics()
+  const top = parseInt(new URL(req.url).searchParams.get('top') || '', 10)
+
+  if (top > 0) {
+    metrics.callSites = metrics.callSites.slice(0, top)
+  }
+
+  return NextResponse.json({
+    success: true,
+    ...metrics,
+    message: FIRESTORE_METRICS_ENABLED
+      ? undefined
+      : 'Instrumentación desactivada: defina FIRESTORE_METRICS=1 y reinicie el servidor'
+  })
+}
+
+export async function DELETE(req: NextRequest) {
+  const denied = assertMetricsAccess(req)
+  if (denied) return denied
+
+  resetFirestoreMetrics()
+  return NextResponse.json({ success: true })
+}
@@ -1,8 +1,9 @@
 import { NextRequest, NextResponse } from "next/server"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
 import { detectEmailProviderAdvanced } from "@/lib/services/nylas-utils"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const companyId = request.nextUrl.searchParams.get("companyId")
     if (!companyId) {
@@ -19,7 +20,7 @@ export async function GET(request: NextRequest) {
   }
 }
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const companyId = String(body?.companyId || "").trim()
@@ -51,3 +52,6 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/config", handleGet)
+export const POST = withFirestoreMetrics("POST /api/nylas/config", handlePost)
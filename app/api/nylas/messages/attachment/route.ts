@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from "next/server"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
 import { NylasService } from "@/lib/services/nylas-service"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
 function resolveContentType(filename: string, fallback: string): string {
   const lower = String(filename || "").toLowerCase()
@@ -9,7 +10,7 @@ function resolveContentType(filename: string, fallback: string): string {
   return fallback || "application/octet-stream"
 }
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const companyId = request.nextUrl.searchParams.get("companyId") || ""
     const messageId = request.nextUrl.searchParams.get("messageId") || ""
@@ -49,3 +50,5 @@ export async function GET(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/messages/attachment", handleGet)
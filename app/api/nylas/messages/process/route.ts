@@ -1,10 +1,11 @@
 import { NextRequest, NextResponse } from "next/server"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
 import { buildUniqueFiscalId, canonicalizeEmail } from "@/lib/services/nylas-utils"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
 const VALID_TYPES = new Set(["FacturaElectronica", "FacturaElectronicaCompra"])
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const companyId = String(body?.companyId || "").trim()
@@ -53,7 +54,7 @@ export async function POST(request: NextRequest) {
         clave: summary.clave,
       })
 
-      const exists = await InvoiceReceptionService.existsProcessed(uniqueId)
+      const exists = await InvoiceReceptionService.isAlreadyProcessed(companyId, { uniqueId, clave: summary.clave })
       if (exists) {
         skipped.push({ messageId, reason: "Documento duplicado por identificador fiscal", uniqueId })
         continue
@@ -103,3 +104,5 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics("POST /api/nylas/messages/process", handlePost)
@@ -1,6 +1,8 @@
 import { NextRequest, NextResponse } from "next/server"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
+import { InvalidCursorError } from "@/lib/services/document-listing"
 import { buildUniqueFiscalId, canonicalizeEmail } from "@/lib/services/nylas-utils"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
 function resolveDateRange(params: URLSearchParams): { fromDate?: string; toDate?: string } {
   const mode = params.get("dateMode") || "currentMonth"
@@ -32,7 +34,7 @@ function resolveDateRange(params: URLSearchParams): { fromDate?: string; toDate?
   }
 }
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const companyId = request.nextUrl.searchParams.get("companyId") || ""
     const receptionEmail = request.nextUrl.searchParams.get("receptionEmail") || ""
@@ -42,19 +44,28 @@ export async function GET(request: NextRequest) {
       return NextResponse.json({ error: "companyId y receptionEmail son requeridos" }, { status: 400 })
     }
 
-    const processed = await InvoiceReceptionService.getProcessed({
+    // Paginación opcional (limit, cursor); sin limit se devuelven hasta 1000 registros
+    const limitParam = request.nextUrl.searchParams.get("limit")
+    const page = await InvoiceReceptionService.getProcessedPage({
       companyId,
       receptionEmail,
       fromDate,
       toDate,
+      pageSize: limitParam ? parseInt(limitParam, 10) : undefined,
+      cursor: request.nextUrl.searchParams.get("cursor"),
     })
 
     return NextResponse.json({
       success: true,
-      count: processed.length,
-      records: processed,
+      count: page.records.length,
+      records: page.records,
+      nextCursor: page.nextCursor,
+      hasMore: page.hasMore,
     })
   } catch (error) {
+    if (error instanceof InvalidCursorError) {
+      return NextResponse.json({ success: false, error: error.message }, { status: 400 })
+    }
     return NextResponse.json(
       { success: false, error: error instanceof Error ? error.message : "Error obteniendo procesados" },
       { status: 500 }
@@ -62,7 +73,7 @@ export async function GET(request: NextRequest) {
   }
 }
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const companyId = String(body?.companyId || "")
@@ -100,3 +111,6 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/messages/processed", handleGet)
+export const POST = withFirestoreMetrics("POST /api/nylas/messages/processed", handlePost)
@@ -1,7 +1,8 @@
 import { NextRequest, NextResponse } from "next/server"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const companyId = request.nextUrl.searchParams.get("companyId") || ""
     const receptionEmail = request.nextUrl.searchParams.get("receptionEmail") || ""
@@ -38,3 +39,5 @@ export async function GET(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/messages/summary", handleGet)
@@ -3,6 +3,7 @@ import { InvoiceReceptionService } from "@/lib/services/invoice-reception-servic
 import { NylasService } from "@/lib/services/nylas-service"
 import { buildCandidateFromMessage } from "@/lib/services/nylas-message-processor"
 import { buildUniqueFiscalId } from "@/lib/services/nylas-utils"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
 const COSTA_RICA_OFFSET_HOURS = 6 // America/Costa_Rica = UTC-6
 
@@ -96,7 +97,7 @@ async function mapWithConcurrency<T, R>(
   return results
 }
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const companyId = request.nextUrl.searchParams.get("companyId")
     if (!companyId) {
@@ -159,7 +160,10 @@ export async function GET(request: NextRequest) {
         clave: candidate.invoiceSummary?.clave,
       })
 
-      const alreadyProcessed = await InvoiceReceptionService.existsProcessed(uniqueValidationId)
+      const alreadyProcessed = await InvoiceReceptionService.isAlreadyProcessed(companyId, {
+        uniqueId: uniqueValidationId,
+        clave: candidate.invoiceSummary?.clave,
+      })
       return { ...candidate, uniqueValidationId, alreadyProcessed }
     })
 
@@ -194,3 +198,5 @@ export async function GET(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/messages/unprocessed", handleGet)
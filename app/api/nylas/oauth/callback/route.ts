@@ -2,8 +2,9 @@ import { NextRequest, NextResponse } from "next/server"
 import { decodeOAuthState } from "@/lib/services/nylas-state"
 import { NylasService } from "@/lib/services/nylas-service"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   const appUrl = process.env.APP_URL || "http://localhost:3000"
   const renderPopupResponse = (status: "success" | "error", message: string) => {
     const safeMessage = JSON.stringify(message)
@@ -63,3 +64,5 @@ export async function GET(request: NextRequest) {
     return renderPopupResponse("error", message)
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/oauth/callback", handleGet)
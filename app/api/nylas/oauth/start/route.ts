@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from "next/server"
 import { InvoiceReceptionService } from "@/lib/services/invoice-reception-service"
 import { encodeOAuthState } from "@/lib/services/nylas-state"
 import { NylasService } from "@/lib/services/nylas-service"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
 async function resolveCompanyId(request: NextRequest): Promise<string> {
   if (request.method === "GET") {
@@ -52,10 +53,13 @@ async function handleStart(request: NextRequest) {
   }
 }
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   return handleStart(request)
 }
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   return handleStart(request)
 }
+
+export const GET = withFirestoreMetrics("GET /api/nylas/oauth/start", handleGet)
+export const POST = withFirestoreMetrics("POST /api/nylas/oauth/start", handlePost)
@@ -1,18 +1,17 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, addDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { collection, serverTimestamp } from 'firebase/firestore'
+import { addDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { EntitySearchService } from '@/lib/services/entity-search'
 import { ProductFormData } from '@/lib/product-types'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * POST /api/products/create
  * Crea un nuevo producto en Firestore
  */
-export async function POST(req: NextRequest) {
+async function handlePost(req: NextRequest) {
   try {
     const body = await req.json()
     const { 
@@ -69,7 +68,10 @@ export async function POST(req: NextRequest) {
     console.log('💾 Creando producto en Firestore:', productData)
 
     // Crear documento en Firestore
-    const docRef = await addDoc(collection(db, 'products'), productData)
+    const docRef = await addDoc(collection(db, 'products'), {
+      ...productData,
+      ...EntitySearchService.searchFields('products', productData)
+    })
 
     console.log('✅ Producto creado exitosamente con ID:', docRef.id)
 
@@ -87,3 +89,5 @@ export async function POST(req: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/products/create', handlePost)
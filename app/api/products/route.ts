@@ -1,17 +1,15 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, collection, query, where, getDocs, orderBy } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { collection, query, where, orderBy } from 'firebase/firestore'
+import { getDocs, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * GET /api/products
  * Obtiene todos los productos de la empresa seleccionada
  */
-export async function GET(req: NextRequest) {
+async function handleGet(req: NextRequest) {
   try {
     const { searchParams } = new URL(req.url)
     const tenantId = searchParams.get('tenantId')
@@ -36,7 +34,8 @@ export async function GET(req: NextRequest) {
     const products = []
 
     snapshot.forEach((doc) => {
-      const data = doc.data()
+      // Los campos del índice de búsqueda no se envían al navegador
+      const { searchTokens, searchSort, ...data } = doc.data()
       products.push({
         id: doc.id,
         ...data,
@@ -69,3 +68,5 @@ export async function GET(req: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/products', handleGet)
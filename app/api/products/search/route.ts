@@ -0,0 +1,52 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { EntitySearchService } from '@/lib/services/entity-search'
+import { InvalidCursorError } from '@/lib/services/document-listing'
+
+const db = getFirestoreDb()
+
+/**
+ * GET /api/products/search?tenantId=...&q=...
+ * Busca productos activos por prefijo del detalle o del código CABYS (sin tildes)
+ * Parámetros opcionales: limit (máx. 100), cursor
+ */
+async function handleGet(req: NextRequest) {
+  try {
+    const { searchParams } = new URL(req.url)
+    const tenantId = searchParams.get('tenantId')
+
+    if (!tenantId) {
+      return NextResponse.json(
+        { error: 'tenantId es requerido' },
+        { status: 400 }
+      )
+    }
+
+    const startedAt = performance.now()
+    const result = await EntitySearchService.search(db, 'products', tenantId, searchParams.get('q') || '', {
+      limit: parseInt(searchParams.get('limit') || '', 10) || undefined,
+      cursor: searchParams.get('cursor')
+    })
+
+    return NextResponse.json({
+      success: true,
+      products: result.results,
+      nextCursor: result.nextCursor,
+      hasMore: result.nextCursor !== null,
+      tookMs: Math.round((performance.now() - startedAt) * 10) / 10
+    })
+
+  } catch (error) {
+    if (error instanceof InvalidCursorError) {
+      return NextResponse.json({ error: error.message }, { status: 400 })
+    }
+    console.error('❌ Error al buscar productos:', error)
+    return NextResponse.json(
+      { error: 'Error interno del servidor' },
+      { status: 500 }
+    )
+  }
+}
+
+export const GET = withFirestoreMetrics('GET /api/products/search', handleGet)
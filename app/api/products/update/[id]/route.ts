@@ -1,17 +1,16 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getFirestore, doc, updateDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { updateDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { EntitySearchService } from '@/lib/services/entity-search'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * PUT /api/products/update/[id]
  * Actualiza un producto existente
  */
-export async function PUT(
+async function handlePut(
   req: NextRequest,
   { params }: { params: Promise<{ id: string }> }
 ) {
@@ -90,6 +89,9 @@ export async function PUT(
       updateData.montoExoneracion = null
     }
 
+    // Campos de búsqueda (detalle y código CABYS vienen siempre en la edición)
+    Object.assign(updateData, EntitySearchService.searchFields('products', updateData))
+
     await updateDoc(productRef, updateData)
 
     console.log(`✅ Producto ${id} actualizado exitosamente`)
@@ -108,3 +110,5 @@ export async function PUT(
     )
   }
 }
+
+export const PUT = withFirestoreMetrics('PUT /api/products/update/[id]', handlePut)
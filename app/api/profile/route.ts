@@ -8,34 +8,23 @@
 
 import { NextRequest, NextResponse } from 'next/server'
 import { 
-  getFirestore, 
   doc, 
-  getDoc,
-  updateDoc,
   Timestamp 
 } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-
-// Configuración de Firebase
-const firebaseConfig = {
-  apiKey: process.env.NEXT_PUBLIC_FIREBASE_API_KEY,
-  authDomain: process.env.NEXT_PUBLIC_FIREBASE_AUTH_DOMAIN,
-  projectId: process.env.NEXT_PUBLIC_FIREBASE_PROJECT_ID,
-  storageBucket: process.env.NEXT_PUBLIC_FIREBASE_STORAGE_BUCKET,
-  messagingSenderId: process.env.NEXT_PUBLIC_FIREBASE_MESSAGING_SENDER_ID,
-  appId: process.env.NEXT_PUBLIC_FIREBASE_APP_ID,
-  measurementId: process.env.NEXT_PUBLIC_FIREBASE_MEASUREMENT_ID,
-}
+import {
+  getDoc,
+  updateDoc,
+  withFirestoreMetrics
+} from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * GET /api/profile
  * Obtiene el perfil del usuario actual
  */
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const userId = searchParams.get('userId')
@@ -91,7 +80,7 @@ export async function GET(request: NextRequest) {
  * PUT /api/profile
  * Actualiza el perfil del usuario actual
  */
-export async function PUT(request: NextRequest) {
+async function handlePut(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const userId = searchParams.get('userId')
@@ -138,3 +127,6 @@ export async function PUT(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/profile', handleGet)
+export const PUT = withFirestoreMetrics('PUT /api/profile', handlePut)
@@ -1,7 +1,7 @@
 import { NextRequest, NextResponse } from "next/server"
-import { getFirestore, collection, addDoc, query, where, getDocs, serverTimestamp } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import { getFirestore, collection, query, where, serverTimestamp } from "firebase/firestore"
+import { addDoc, getDocs, withFirestoreMetrics } from "@/lib/firestore-metrics"
+import { getFirestoreDb } from "@/lib/firebase-app"
 
 type FirestoreDoc = Record<string, unknown>
 
@@ -54,7 +54,7 @@ async function readCollectionByTenantCompany(
   return snapshot.docs.map((docSnap) => mapQuotation(docSnap.id, docSnap.data()))
 }
 
-export async function GET(req: NextRequest) {
+async function handleGet(req: NextRequest) {
   try {
     const { searchParams } = new URL(req.url)
     const tenantId = searchParams.get("tenantId")
@@ -67,8 +67,7 @@ export async function GET(req: NextRequest) {
       )
     }
 
-    const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-    const db = getFirestore(app)
+    const db = getFirestoreDb()
 
     const [quotationsEN, quotationsES] = await Promise.allSettled([
       readCollectionByTenantCompany(db, "quotations", tenantId, companyId),
@@ -101,7 +100,7 @@ export async function GET(req: NextRequest) {
   }
 }
 
-export async function POST(req: NextRequest) {
+async function handlePost(req: NextRequest) {
   try {
     const body = await req.json()
     const tenantId = String(body?.tenantId || "")
@@ -114,8 +113,7 @@ export async function POST(req: NextRequest) {
       )
     }
 
-    const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-    const db = getFirestore(app)
+    const db = getFirestoreDb()
     const quotationsRef = collection(db, "quotations")
 
     const now = new Date()
@@ -154,3 +152,5 @@ export async function POST(req: NextRequest) {
   }
 }
 
+export const GET = withFirestoreMetrics("GET /api/quotations", handleGet)
+export const POST = withFirestoreMetrics("POST /api/quotations", handlePost)
@@ -1,23 +1,23 @@
 import { NextRequest, NextResponse } from "next/server"
 import {
-  getFirestore,
   doc,
-  getDoc,
   collection,
-  getDocs,
   query,
   where,
-  writeBatch,
   serverTimestamp,
   QueryDocumentSnapshot,
   DocumentData
 } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import {
+  getDoc,
+  getDocs,
+  writeBatch,
+  withFirestoreMetrics
+} from "@/lib/firestore-metrics"
+import { getFirestoreDb } from "@/lib/firebase-app"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 type MigrationScope = {
   sourceTenantId: string
@@ -167,7 +167,7 @@ async function buildPreview(scope: MigrationScope): Promise<PreviewResult> {
   }
 }
 
-export async function POST(
+async function handlePost(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -321,3 +321,5 @@ export async function POST(
     )
   }
 }
+
+export const POST = withFirestoreMetrics("POST /api/tenant-admin/companies/[id]/migrate", handlePost)
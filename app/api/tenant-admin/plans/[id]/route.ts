@@ -1,14 +1,13 @@
 import { NextRequest, NextResponse } from "next/server"
-import { getFirestore, doc, updateDoc, getDoc, serverTimestamp, collection, query, where, getDocs } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import { doc, serverTimestamp, collection, query, where } from "firebase/firestore"
+import { updateDoc, getDoc, getDocs, withFirestoreMetrics } from "@/lib/firestore-metrics"
+import { getFirestoreDb } from "@/lib/firebase-app"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 const COLLECTION_NAME = "subscriptionPlans"
 
-export async function PUT(
+async function handlePut(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -66,3 +65,5 @@ export async function PUT(
     return NextResponse.json({ error: "Error interno del servidor" }, { status: 500 })
   }
 }
+
+export const PUT = withFirestoreMetrics("PUT /api/tenant-admin/plans/[id]", handlePut)
@@ -1,11 +1,10 @@
 import { NextRequest, NextResponse } from "next/server"
-import { getFirestore, collection, query, where, getDocs, addDoc, serverTimestamp } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import { collection, query, where, serverTimestamp } from "firebase/firestore"
+import { getDocs, addDoc, withFirestoreMetrics } from "@/lib/firestore-metrics"
+import { getFirestoreDb } from "@/lib/firebase-app"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 const COLLECTION_NAME = "subscriptionPlans"
 
 const SUGGESTED_PLANS = [
@@ -53,7 +52,7 @@ const SUGGESTED_PLANS = [
   }
 ]
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   const unauthorized = assertTenantAdminAccess(request)
   if (unauthorized) return unauthorized
 
@@ -83,3 +82,5 @@ export async function POST(request: NextRequest) {
     return NextResponse.json({ error: "Error interno del servidor" }, { status: 500 })
   }
 }
+
+export const POST = withFirestoreMetrics("POST /api/tenant-admin/plans/seed", handlePost)
@@ -1,11 +1,10 @@
 import { NextRequest, NextResponse } from "next/server"
-import { getFirestore, collection, query, where, getDocs, doc, getDoc } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import { collection, query, where, doc } from "firebase/firestore"
+import { getDocs, getDoc, withFirestoreMetrics } from "@/lib/firestore-metrics"
+import { getFirestoreDb } from "@/lib/firebase-app"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 function toDate(value: any) {
   if (!value) return null
@@ -28,7 +27,7 @@ function isSameMonth(date?: Date | null, now: Date = new Date()) {
   return date.getMonth() === now.getMonth() && date.getFullYear() === now.getFullYear()
 }
 
-export async function GET(
+async function handleGet(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -225,3 +224,5 @@ export async function GET(
     return NextResponse.json({ error: "Error interno del servidor" }, { status: 500 })
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/tenant-admin/tenants/[id]/resources", handleGet)
@@ -1,8 +1,9 @@
 import { NextRequest, NextResponse } from "next/server"
 import { TenantService, UpdateTenantRequest } from "@/lib/services/tenant-service"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
+import { withFirestoreMetrics } from "@/lib/firestore-metrics"
 
-export async function GET(
+async function handleGet(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -27,7 +28,7 @@ export async function GET(
   }
 }
 
-export async function PUT(
+async function handlePut(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -56,3 +57,6 @@ export async function PUT(
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/tenant-admin/tenants/[id]", handleGet)
+export const PUT = withFirestoreMetrics("PUT /api/tenant-admin/tenants/[id]", handlePut)
@@ -1,13 +1,13 @@
 import { NextRequest, NextResponse } from "next/server"
 import { TenantService, CreateTenantRequest } from "@/lib/services/tenant-service"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
-import { getFirestore, collection, query, where, getDocs, doc, setDoc, Timestamp, deleteDoc } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import { collection, query, where, doc, Timestamp } from "firebase/firestore"
+import { getDocs, setDoc, deleteDoc, withFirestoreMetrics } from "@/lib/firestore-metrics"
 import { getAuth, createUserWithEmailAndPassword, updateProfile as updateFirebaseProfile } from "firebase/auth"
+import { getFirebaseApp, getFirestoreDb } from "@/lib/firebase-app"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const app = getFirebaseApp()
+const db = getFirestoreDb()
 const auth = getAuth(app)
 
 function mapCreateTenantError(error: unknown): {
@@ -100,7 +100,7 @@ function generateTemporaryPassword(): string {
   return raw.sort(() => Math.random() - 0.5).join("")
 }
 
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   const unauthorized = assertTenantAdminAccess(request)
   if (unauthorized) return unauthorized
 
@@ -123,7 +123,7 @@ export async function GET(request: NextRequest) {
   }
 }
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   const unauthorized = assertTenantAdminAccess(request)
   if (unauthorized) return unauthorized
 
@@ -226,3 +226,6 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics("GET /api/tenant-admin/tenants", handleGet)
+export const POST = withFirestoreMetrics("POST /api/tenant-admin/tenants", handlePost)
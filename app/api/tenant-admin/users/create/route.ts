@@ -4,14 +4,14 @@ import {
   updateProfile as updateFirebaseProfile,
   getAuth
 } from "firebase/auth"
-import { doc, setDoc, Timestamp, getFirestore, getDoc, collection, query, where, getDocs } from "firebase/firestore"
-import { initializeApp, getApps } from "firebase/app"
-import { firebaseConfig } from "@/lib/firebase-config"
+import { doc, Timestamp, collection, query, where } from "firebase/firestore"
+import { setDoc, getDoc, getDocs, withFirestoreMetrics } from "@/lib/firestore-metrics"
+import { getFirebaseApp, getFirestoreDb } from "@/lib/firebase-app"
 import { assertTenantAdminAccess } from "@/lib/server/tenant-admin-guard"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
+const app = getFirebaseApp()
 const auth = getAuth(app)
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 function getRoleName(roleId: string): string {
   const roleNames: Record<string, string> = {
@@ -31,7 +31,7 @@ function getRolePermissions(roleId: string): string[] {
   return rolePermissions[roleId] || []
 }
 
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   const unauthorized = assertTenantAdminAccess(request)
   if (unauthorized) return unauthorized
 
@@ -107,3 +107,5 @@ export async function POST(request: NextRequest) {
     return NextResponse.json({ error: "Error interno del servidor" }, { status: 500 })
   }
 }
+
+export const POST = withFirestoreMetrics("POST /api/tenant-admin/users/create", handlePost)
@@ -1,10 +1,10 @@
 import { NextRequest, NextResponse } from 'next/server'
-import puppeteer from 'puppeteer'
 
 export async function GET() {
   let browser;
   try {
     console.log('🧪 Probando Puppeteer básico...')
+    const { default: puppeteer } = await import('puppeteer')
     
     // Lanzar Puppeteer con configuración mínima
     browser = await puppeteer.launch({
@@ -0,0 +1,136 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { doc } from 'firebase/firestore'
+import { getDoc, extendFirestoreTrace, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import {
+  TicketBatchIssuanceService,
+  BatchTicketInput,
+  MAX_BATCH_DOCUMENTS
+} from '@/lib/services/ticket-batch-issuance'
+
+const db = getFirestoreDb()
+
+function parseLimit(value: unknown, fallback: number, max: number): number {
+  const parsed = parseInt(String(value ?? ''), 10)
+  return parsed > 0 ? Math.min(parsed, max) : fallback
+}
+
+/**
+ * POST /api/tickets/batch
+ * Emite varios tiquetes electrónicos en una sola solicitud (cierres de caja)
+ *
+ * Body: { companyId, tenantId, createdBy, documents: [{ reference?, clientId?, items, subtotal, total, ... }] }
+ * Opcionales: chunkSize, signConcurrency, submitConcurrency (cupos por empresa, compartidos con
+ * los demás lotes en curso de la misma empresa)
+ *
+ * La respuesta es NDJSON: una línea { type: 'result', index, reference, success, ticketId,
+ * consecutivo, clave, status, error } por tiquete en el orden en que terminan, y al final
+ * { type: 'summary', total, succeeded, failed, durationMs }.
+ *
+ * La emisión sigue después de devolver la respuesta: se registra con extendFirestoreTrace
+ * para que sus lecturas y su duración cuenten en esta ruta.
+ */
+async function handlePost(req: NextRequest) {
+  try {
+    const body = await req.json()
+    const { companyId, tenantId, createdBy, documents } = body
+
+    if (!companyId || !tenantId || !Array.isArray(documents) || documents.length === 0) {
+      return NextResponse.json(
+        { error: 'Faltan datos requeridos (companyId, tenantId, documents)' },
+        { status: 400 }
+      )
+    }
+
+    if (documents.length > MAX_BATCH_DOCUMENTS) {
+      return NextResponse.json(
+        { error: `El lote excede el máximo de ${MAX_BATCH_DOCUMENTS} tiquetes` },
+        { status: 400 }
+      )
+    }
+
+    // La empresa se valida antes de empezar: sin certificado o credenciales no se emite nada
+    const companyDoc = await getDoc(doc(db, 'companies', companyId))
+    if (!companyDoc.exists()) {
+      return NextResponse.json({ error: 'Empresa no encontrada' }, { status: 404 })
+    }
+
+    const companyData = companyDoc.data()
+    if (companyData.tenantId && companyData.tenantId !== tenantId) {
+      return NextResponse.json({ error: 'La empresa no pertenece al tenant' }, { status: 403 })
+    }
+    if (!companyData.certificadoDigital?.fileData || !companyData.certificadoDigital?.password) {
+      return NextResponse.json({ error: 'Certificado digital requerido para firmar los tiquetes' }, { status: 400 })
+    }
+    if (!companyData.atvCredentials) {
+      return NextResponse.json({ error: 'Credenciales ATV requeridas para enviar a Hacienda' }, { status: 400 })
+    }
+
+    const options = {
+      chunkSize: parseLimit(body.chunkSize, 25, 100),
+      signConcurrency: parseLimit(body.signConcurrency, 4, 16),
+      submitConcurrency: parseLimit(body.submitConcurrency, 4, 16)
+    }
+
+    const encoder = new TextEncoder()
+    let controller!: ReadableStreamDefaultController<Uint8Array>
+    const stream = new ReadableStream<Uint8Array>({
+      start(streamController) {
+        controller = streamController
+      }
+    })
+
+    let open = true
+    const send = (line: Record<string, any>) => {
+      if (!open) return
+      try {
+        controller.enqueue(encoder.encode(JSON.stringify(line) + '\n'))
+      } catch {
+        // El cliente se desconectó; la emisión sigue para no dejar consecutivos a medias
+        open = false
+      }
+    }
+
+    const issuing = (async () => {
+      try {
+        const summary = await TicketBatchIssuanceService.issue(
+          db,
+          { companyId, tenantId, createdBy },
+          companyData,
+          documents as BatchTicketInput[],
+          result => send({ type: 'result', ...result }),
+          options
+        )
+        send({ type: 'summary', ...summary })
+      } catch (error) {
+        console.error('❌ Error en emisión por lote:', error)
+        send({ type: 'error', error: error instanceof Error ? error.message : 'Error interno del servidor' })
+      } finally {
+        if (open) {
+          try {
+            controller.close()
+          } catch {
+            // Ya cancelado por el cliente
+          }
+        }
+      }
+    })()
+    extendFirestoreTrace(issuing)
+
+    return new NextResponse(stream, {
+      headers: {
+        'Content-Type': 'application/x-ndjson; charset=utf-8',
+        'Cache-Control': 'no-store'
+      }
+    })
+
+  } catch (error) {
+    console.error('Error al emitir lote de tiquetes:', error)
+    return NextResponse.json(
+      { error: 'Error interno del servidor' },
+      { status: 500 }
+    )
+  }
+}
+
+export const POST = withFirestoreMetrics('POST /api/tickets/batch', handlePost)
@@ -1,47 +1,35 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { initializeApp, getApps } from 'firebase/app'
-import { getFirestore, collection, addDoc, serverTimestamp, doc, getDoc, updateDoc } from 'firebase/firestore'
-import { firebaseConfig } from '@/lib/firebase-config'
-import { XMLGenerator, FacturaData, ExoneracionXML } from '@/lib/services/xml-generator'
+import { collection, serverTimestamp, doc } from 'firebase/firestore'
+import { addDoc, getDoc, updateDoc, withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { XMLGenerator, ExoneracionXML } from '@/lib/services/xml-generator'
 import { DigitalSignatureService } from '@/lib/services/digital-signature'
 import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
 import { HaciendaSubmissionService } from '@/lib/services/hacienda-submission'
 import { HaciendaStatusService } from '@/lib/services/hacienda-status'
+import { haciendaStatusScheduler } from '@/lib/services/hacienda-status-scheduler'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+import { CabysCatalogService } from '@/lib/services/cabys-catalog'
 import { InvoiceConsecutiveService } from '@/lib/services/invoice-consecutive'
 import { HaciendaKeyGenerator } from '@/lib/services/hacienda-key-generator'
-import { InvoiceEmailService } from '@/lib/services/invoice-email-service'
-import { ExchangeRateService } from '@/lib/services/exchange-rate-service'
-
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
-
-/**
- * Obtiene el tipo de cambio para una moneda específica
- */
-async function getExchangeRateForCurrency(currency: string): Promise<number> {
-  if (currency?.toUpperCase() === 'USD') {
-    console.log('💱 [ExchangeRate] Moneda USD detectada, obteniendo tipo de cambio de Hacienda...')
-    const exchangeRate = await ExchangeRateService.getExchangeRate()
-    
-    if (exchangeRate) {
-      console.log(`💱 [ExchangeRate] Tipo de cambio obtenido: ${exchangeRate} CRC por USD`)
-      return exchangeRate
-    } else {
-      console.warn('💱 [ExchangeRate] No se pudo obtener tipo de cambio, usando 1 como fallback')
-      return 1
-    }
-  }
-  
-  console.log(`💱 [ExchangeRate] Moneda ${currency}, usando tipo de cambio 1`)
-  return 1
-}
+import {
+  buildClientExoneracion,
+  buildFailedTicketRecord,
+  buildTicketReceptor,
+  buildTicketRecord,
+  buildTicketXMLData,
+  findInvalidPriceLines,
+  getCostaRicaDateTime,
+  getExchangeRateForCurrency
+} from '@/lib/services/ticket-issuance'
+
+const db = getFirestoreDb()
 
 /**
  * Crea un nuevo tiquete electrónico en Firestore
  * El cliente es OPCIONAL para tiquetes
  */
-export async function POST(req: NextRequest) {
+async function handlePost(req: NextRequest) {
   try {
     const body = await req.json()
 
@@ -76,21 +64,25 @@ export async function POST(req: NextRequest) {
     }
 
     // Validar que todos los precios unitarios sean mayores a 0
-    const itemsConPrecioInvalido = items.filter((item: any) => {
-      const precioUnitario = item.precioUnitario || 0
-      return precioUnitario <= 0
-    })
+    const lineasConPrecioInvalido = findInvalidPriceLines(items)
+
+    if (lineasConPrecioInvalido.length > 0) {
+      return NextResponse.json(
+        { error: `El precio unitario debe ser mayor a cero en todas las líneas. Líneas con precio inválido: ${lineasConPrecioInvalido.join(', ')}` },
+        { status: 400 }
+      )
+    }
 
-    if (itemsConPrecioInvalido.length > 0) {
+    // Validar los códigos CABYS contra el catálogo oficial
+    const cabysValidation = await CabysCatalogService.validateItems(items, { defaultCode: '8399000000000' })
+    if (!cabysValidation.success) {
       return NextResponse.json(
-        { error: `El precio unitario debe ser mayor a cero en todas las líneas. Líneas con precio inválido: ${itemsConPrecioInvalido.map((item: any, idx: number) => idx + 1).join(', ')}` },
+        { error: cabysValidation.error, invalidLines: cabysValidation.invalidLines },
         { status: 400 }
       )
     }
 
-    // Inicializar Firebase si no está inicializado
-    const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-    const db = getFirestore(app)
+    const db = getFirestoreDb()
 
     let docRef: any = null
     let generatedConsecutivo: string | undefined = consecutivo // Se sobrescribirá con el consecutivo generado
@@ -119,71 +111,7 @@ export async function POST(req: NextRequest) {
           console.log('🛡️ Cliente con exoneración:', clientData.tieneExoneracion)
 
           // Mapear datos de exoneración del cliente para el XML
-          if (clientData.tieneExoneracion && clientData.exoneracion) {
-            console.log('🛡️ Cliente con exoneración detectada:', clientData.exoneracion)
-            const fechaCostaRica = new Date().toLocaleString('sv-SE', { timeZone: 'America/Costa_Rica' }).replace(' ', 'T')
-            
-            const formatDateWithTimezone = (dateString: string): string => {
-              if (!dateString) return fechaCostaRica + '-06:00'
-              if (dateString.includes('T') && (dateString.includes('+') || dateString.includes('-'))) {
-                return dateString
-              }
-              if (dateString.includes('T')) {
-                return dateString + '-06:00'
-              }
-              return dateString + 'T00:00:00-06:00'
-            }
-
-            clientExoneracion = {
-              tipoDocumento: clientData.exoneracion.tipoDocumento || '',
-              tipoDocumentoOtro: clientData.exoneracion.tipoDocumentoOtro || undefined,
-              numeroDocumento: clientData.exoneracion.numeroDocumento || '',
-              nombreLey: clientData.exoneracion.nombreLey || undefined,
-              articulo: clientData.exoneracion.articulo ? parseInt(clientData.exoneracion.articulo) : undefined,
-              // Si hay artículo, incluir inciso (usar 0 si no está definido)
-              inciso: clientData.exoneracion.articulo
-                ? (clientData.exoneracion.inciso ? parseInt(clientData.exoneracion.inciso) : 0)
-                : (clientData.exoneracion.inciso ? parseInt(clientData.exoneracion.inciso) : undefined),
-              porcentajeCompra: clientData.exoneracion.porcentajeCompra ? parseFloat(clientData.exoneracion.porcentajeCompra) : undefined,
-              nombreInstitucion: clientData.exoneracion.nombreInstitucion || '',
-              nombreInstitucionOtros: clientData.exoneracion.nombreInstitucionOtros || undefined,
-              fechaEmision: formatDateWithTimezone(clientData.exoneracion.fechaEmision),
-              tarifaExonerada: parseFloat(clientData.exoneracion.tarifaExonerada) || 0,
-              montoExoneracion: 0
-            }
-          } else if (clientData.hasExemption && clientData.exemption) {
-            console.log('🛡️ Cliente con exoneración (formato legacy) detectada:', clientData.exemption)
-            const fechaCostaRica = new Date().toLocaleString('sv-SE', { timeZone: 'America/Costa_Rica' }).replace(' ', 'T')
-            
-            const formatDateWithTimezone = (dateString: string): string => {
-              if (!dateString) return fechaCostaRica + '-06:00'
-              if (dateString.includes('T') && (dateString.includes('+') || dateString.includes('-'))) {
-                return dateString
-              }
-              if (dateString.includes('T')) {
-                return dateString + '-06:00'
-              }
-              return dateString + 'T00:00:00-06:00'
-            }
-
-            clientExoneracion = {
-              tipoDocumento: clientData.exemption.exemptionType || '',
-              tipoDocumentoOtro: clientData.exemption.exemptionTypeOthers || undefined,
-              numeroDocumento: clientData.exemption.documentNumber || '',
-              nombreLey: clientData.exemption.lawName || undefined,
-              articulo: clientData.exemption.article ? parseInt(clientData.exemption.article) : undefined,
-              // Si hay artículo, incluir inciso (usar 0 si no está definido)
-              inciso: clientData.exemption.article
-                ? (clientData.exemption.subsection ? parseInt(clientData.exemption.subsection) : 0)
-                : (clientData.exemption.subsection ? parseInt(clientData.exemption.subsection) : undefined),
-              porcentajeCompra: clientData.exemption.purchasePercentage ? parseFloat(clientData.exemption.purchasePercentage) : undefined,
-              nombreInstitucion: clientData.exemption.institutionName || '',
-              nombreInstitucionOtros: clientData.exemption.institutionNameOthers || undefined,
-              fechaEmision: formatDateWithTimezone(clientData.exemption.documentDate),
-              tarifaExonerada: parseFloat(clientData.exemption.tariffExempted) || 0,
-              montoExoneracion: 0
-            }
-          }
+          clientExoneracion = buildClientExoneracion(clientData)
         } else {
           console.warn('⚠️ Cliente no encontrado, continuando sin cliente')
         }
@@ -192,7 +120,7 @@ export async function POST(req: NextRequest) {
       }
 
       // Usar la misma fecha para la clave y fecha de emisión (zona horaria Costa Rica)
-      const fechaCostaRica = new Date().toLocaleString('sv-SE', { timeZone: 'America/Costa_Rica' }).replace(' ', 'T')
+      const fechaCostaRica = getCostaRicaDateTime()
 
       // SIEMPRE generar consecutivo usando el servicio (ignorar el que viene del frontend si existe)
       // Esto asegura que siempre use consecutiveTK de la empresa
@@ -224,129 +152,16 @@ export async function POST(req: NextRequest) {
 
       // Construir datos XML para el tiquete
       // IMPORTANTE: En tiquetes electrónicos, si no hay cliente, NO se incluye el bloque Receptor
-      const receptorData: ReceptorData | null = clientData ? {
-        nombre: clientData.name,
-        tipoIdentificacion: clientData.identificationType,
-        numeroIdentificacion: clientData.identification,
-        nombreComercial: clientData.commercialName || clientData.name,
-        provincia: clientData.province,
-        canton: clientData.canton,
-        distrito: clientData.district,
-        otrasSenas: clientData.otrasSenas,
-        codigoPais: clientData.phoneCountryCode?.replace('+', '') || '506',
-        numeroTelefono: clientData.phone,
-        correoElectronico: clientData.email
-      } : null // Si no hay cliente, receptor es null (no se incluirá en XML)
-
-      const tiqueteXMLData: FacturaData & { receptor?: ReceptorData | null } = {
+      const receptorData = buildTicketReceptor(clientData)
+      const tiqueteXMLData = buildTicketXMLData({
+        input: body,
+        companyData,
+        clientData,
+        clientExoneracion,
         clave: keyResult.clave || '',
-        proveedorSistemas: companyData.proveedorSistemas || companyData.identification || '3102867860', // Cédula del emisor como ProveedorSistemas
-        codigoActividadEmisor: companyData.economicActivity?.codigo || '924909', // Igual que en facturas: usar .codigo del objeto economicActivity
-        // NO incluir CodigoActividadReceptor en tiquetes
-        numeroConsecutivo: keyResult.clave ? keyResult.clave.substring(21, 41) : '00100001040000000001', // Extraer los 20 dígitos del consecutivo de la clave
         fechaEmision: fechaCostaRica,
-        emisor: {
-          nombre: companyData.name,
-          tipoIdentificacion: companyData.identificationType,
-          numeroIdentificacion: companyData.identification,
-          nombreComercial: companyData.nombreComercial,
-          provincia: companyData.province,
-          canton: companyData.canton,
-          distrito: companyData.district,
-          otrasSenas: companyData.otrasSenas,
-          codigoPais: companyData.phoneCountryCode?.replace('+', '') || '506',
-          numeroTelefono: companyData.phone,
-          correoElectronico: companyData.email
-        },
-        receptor: receptorData || undefined, // Solo incluir receptor si hay cliente
-        condicionVenta: condicionVenta || '01',
-        lineasDetalle: items.map((item: any, index: number) => {
-          // Calcular montos base
-          const montoImpuesto = item.impuesto[0]?.monto || 0
-          const baseImponible = item.baseImponible || item.subTotal || (item.cantidad * item.precioUnitario)
-          const montoTotalOriginal = item.montoTotalLinea || (baseImponible + montoImpuesto)
-
-          // Variables para ajustar montos cuando hay exoneración
-          let impuestoNeto = item.impuestoNeto || montoImpuesto
-          let montoTotalLinea = montoTotalOriginal
-          let montoImpuestoFinal = montoImpuesto
-
-          // Agregar exoneración si el cliente la tiene
-          if (clientExoneracion) {
-            // Cuando hay exoneración en servicios:
-            // - El monto del impuesto debe reflejar el IVA total ANTES de la exoneración (monto teórico)
-            // - El montoExoneracion debe tener el valor teórico del impuesto exonerado
-            // - El impuesto neto debe ser 0 (el cliente no paga IVA)
-            // - El total de línea debe ser SubTotal + ImpuestoNeto (que es SubTotal + 0 = SubTotal)
-            
-            // Calcular el monto teórico del impuesto si no viene en el item
-            const montoTeoricoImpuesto = montoImpuesto > 0 
-              ? montoImpuesto 
-              : baseImponible * ((item.impuesto[0]?.tarifa || 13) / 100)
-            
-            // El monto del impuesto debe ser el teórico (antes de exoneración)
-            montoImpuestoFinal = montoTeoricoImpuesto
-            // El impuesto neto es 0 porque el cliente está exonerado
-            impuestoNeto = 0
-            // MontoTotalLinea = SubTotal + ImpuestoNeto = SubTotal + 0 = SubTotal
-            montoTotalLinea = baseImponible
-            
-            console.log(`🛡️ Agregando exoneración a línea ${index + 1}:`, {
-              montoTeorico: montoTeoricoImpuesto,
-              montoFinal: montoImpuestoFinal,
-              impuestoNeto,
-              montoTotalLinea,
-              baseImponible
-            })
-          }
-
-          // Crear objeto de impuesto con exoneración si el cliente la tiene
-          const impuestoData = {
-            codigo: item.impuesto[0]?.codigo || '01',
-            codigoTarifaIVA: item.impuesto[0]?.codigoTarifaIVA || '08',
-            tarifa: item.impuesto[0]?.tarifa || 13,
-            monto: montoImpuestoFinal, // Monto teórico del impuesto (antes de exoneración) si hay exoneración, valor original si no
-            ...(clientExoneracion ? { exoneracion: {
-              ...clientExoneracion,
-              montoExoneracion: montoImpuestoFinal // El monto teórico del impuesto exonerado (igual al monto)
-            } } : {})
-          }
-
-          return {
-            numeroLinea: index + 1,
-            codigoCABYS: item.codigoCABYS || '8399000000000',
-            cantidad: item.cantidad,
-            unidadMedida: item.unidadMedida || 'Sp',
-            detalle: item.detalle,
-            precioUnitario: item.precioUnitario,
-            montoTotal: item.montoTotal,
-            subTotal: item.subTotal,
-            baseImponible: baseImponible,
-            impuesto: impuestoData,
-            impuestoAsumidoEmisorFabrica: item.impuestoAsumidoEmisorFabrica || 0,
-            impuestoNeto: impuestoNeto,
-            montoTotalLinea: montoTotalLinea,
-            // Propiedad auxiliar para el resumen: Servicio vs Mercancía
-            tipo: item.tipo || 'servicio'
-          }
-        }),
-        codigoMoneda: String(currency || 'CRC'),
-        tipoCambio: await getExchangeRateForCurrency(currency || 'CRC'),
-        totalServGravados: clientExoneracion ? 0 : subtotal,
-        totalGravado: clientExoneracion ? 0 : subtotal,
-        totalVenta: subtotal,
-        totalVentaNeta: subtotal,
-        totalDesgloseImpuesto: clientExoneracion ? undefined : {
-          codigo: '01',
-          codigoTarifaIVA: '08',
-          totalMontoImpuesto: totalImpuesto || 0
-        },
-        totalImpuesto: clientExoneracion ? 0 : (totalImpuesto || 0),
-        tipoMedioPago: String(paymentMethod || '01'),
-        totalMedioPago: clientExoneracion ? subtotal : (total || 0),
-        totalComprobante: clientExoneracion ? subtotal : (total || 0),
-        otros: String(notes || '')
-      }
+        tipoCambio: await getExchangeRateForCurrency(currency || 'CRC')
+      })
 
       // Generar XML del tiquete
       const xml = XMLGenerator.generateTiqueteXML(tiqueteXMLData)
@@ -357,11 +172,7 @@ export async function POST(req: NextRequest) {
       if (companyData.certificadoDigital?.fileData && companyData.certificadoDigital?.password) {
         console.log('🔐 Iniciando firma digital...')
         
-        const signingResult = await DigitalSignatureService.signXMLWithEncryptedPassword(
-          xml,
-          companyData.certificadoDigital.fileData,
-          companyData.certificadoDigital.password
-        )
+        const signingResult = await DigitalSignatureService.signXMLForCompany(xml, companyId, companyData.certificadoDigital)
 
         if (signingResult.success) {
           signedXml = signingResult.signed_xml
@@ -380,7 +191,7 @@ export async function POST(req: NextRequest) {
       if (companyData.atvCredentials) {
         console.log('🏛️ Iniciando autenticación con Hacienda...')
         
-        const authResult = await HaciendaAuthService.authenticateFromCompany(companyData)
+        const authResult = await HaciendaAuthService.getValidToken(companyData)
         
         if (authResult.success) {
           haciendaToken = authResult.accessToken
@@ -396,39 +207,16 @@ export async function POST(req: NextRequest) {
       }
 
       // 5. Preparar datos para Firestore
-      const ticketData: any = {
+      const ticketData = buildTicketRecord({
+        input: body,
+        owner: { companyId, tenantId, createdBy },
         consecutivo: generatedConsecutivo,
         clave: keyResult.clave || '',
-        status: 'draft',
-        documentType: 'tiquetes',
-        clientId: clientId || '',
-        companyId,
-        tenantId,
-        subtotal: subtotal || 0,
-        totalImpuesto: totalImpuesto || 0,
-        totalDescuento: totalDescuento || 0,
-        total: total || 0,
-        exchangeRate: exchangeRate || 1,
-        currency: currency || 'CRC',
-        condicionVenta: condicionVenta || '01',
-        paymentTerm: paymentTerm || '01',
-        paymentMethod: paymentMethod || '01',
-        notes: notes || '',
-        items: items || [],
-        xml: xml,
-        xmlSigned: signedXml,
+        xml,
+        signedXml,
         fecha: fechaCostaRica,
-        createdBy,
-        createdAt: serverTimestamp(),
-        updatedAt: serverTimestamp()
-      }
-
-      // Agregar datos del cliente si existe
-      if (clientData) {
-        ticketData.cliente = clientData
-        ticketData.tieneExoneracion = clientData.tieneExoneracion || clientData.hasExemption || false
-        ticketData.exoneracion = clientData.exoneracion || clientData.exemption || null
-      }
+        clientData
+      })
 
       // 6. CREAR TIQUETE EN FIRESTORE ANTES DE ENVIAR A HACIENDA
       console.log('💾 Creando tiquete en Firestore...')
@@ -496,7 +284,7 @@ export async function POST(req: NextRequest) {
         })
       }
 
-      // 8. CONSULTAR ESTADO REAL DE HACIENDA DESPUÉS DE 10 SEGUNDOS (solo si se envió a Hacienda)
+      // 8. PROGRAMAR CONSULTA DEL ESTADO REAL DE HACIENDA (solo si se envió a Hacienda)
       if (haciendaSubmissionResult && (haciendaSubmissionResult as any).location) {
         const locationUrl = (haciendaSubmissionResult as any).location
         
@@ -512,102 +300,20 @@ export async function POST(req: NextRequest) {
             updatedAt: serverTimestamp()
           })
         } else {
-          console.log('⏰ Esperando 10 segundos para consultar estado real de Hacienda...')
-          
-          // Esperar 10 segundos
-          await new Promise(resolve => setTimeout(resolve, 10000))
-          
-          console.log('🔍 Consultando estado real de Hacienda...')
-          console.log('📍 URL de consulta:', locationUrl)
-          
-          // Usar el servicio de consulta de estado
-          const statusResult = await HaciendaStatusService.checkDocumentStatus(locationUrl, haciendaToken || '')
-          
-          if (statusResult.success) {
-            console.log('✅ Estado real obtenido de Hacienda:', statusResult.status)
-            
-            // Usar el campo "ind-estado" de la respuesta de Hacienda
-            const estadoHacienda = statusResult.status['ind-estado'] || statusResult.status.estado || statusResult.status.state
-            
-            // Interpretar el estado
-            const interpretedStatus = HaciendaStatusService.interpretStatus(statusResult.status)
-            
-            // Actualizar el tiquete con el estado real
-            await updateDoc(docRef, {
-              haciendaSubmission: statusResult.status,
-              status: estadoHacienda || interpretedStatus.status,
-              statusDescription: interpretedStatus.description,
-              isFinalStatus: interpretedStatus.isFinal,
-              updatedAt: serverTimestamp()
-            })
-            
-            console.log('✅ Tiquete actualizado con estado real de Hacienda:', interpretedStatus.status)
-            
-            // 📧 ENVIAR EMAIL SI EL TIQUETE ES APROBADO Y HAY CLIENTE CON CORREO
-            if (interpretedStatus.isFinal && interpretedStatus.status === 'Aceptado' && clientData && clientData.email) {
-              console.log('🎉 Tiquete APROBADO - Enviando email al cliente...')
-              
-              try {
-                // Leer el tiquete actualizado desde Firestore
-                const updatedTicketSnap = await getDoc(docRef)
-                const updatedTicketData = updatedTicketSnap.exists() ? updatedTicketSnap.data() : ticketData
-                
-                // Crear el tiquete completo con todos los datos actualizados
-                // Asegurar que la fecha esté disponible (puede venir como Timestamp de Firestore)
-                let fechaFormateada = fechaCostaRica // Usar la fecha original del tiquete
-                if (updatedTicketData?.fecha) {
-                  // Si la fecha viene como Timestamp de Firestore, convertirla
-                  if (updatedTicketData.fecha && typeof updatedTicketData.fecha === 'object' && 'toDate' in updatedTicketData.fecha) {
-                    fechaFormateada = (updatedTicketData.fecha as any).toDate().toISOString()
-                  } else if (updatedTicketData.fecha && typeof updatedTicketData.fecha === 'object' && 'seconds' in updatedTicketData.fecha) {
-                    fechaFormateada = new Date((updatedTicketData.fecha as any).seconds * 1000).toISOString()
-                  } else if (typeof updatedTicketData.fecha === 'string') {
-                    fechaFormateada = updatedTicketData.fecha
-                  } else if (updatedTicketData.fecha instanceof Date) {
-                    fechaFormateada = updatedTicketData.fecha.toISOString()
-                  }
-                }
-                
-                const completeTicketData = {
-                  ...updatedTicketData,
-                  id: docRef.id,
-                  status: interpretedStatus.status,
-                  statusDescription: interpretedStatus.description,
-                  isFinalStatus: interpretedStatus.isFinal,
-                  haciendaSubmission: statusResult.status,
-                  xmlSigned: signedXml,
-                  tieneExoneracion: updatedTicketData?.tieneExoneracion,
-                  exoneracion: updatedTicketData?.exoneracion,
-                  fecha: fechaFormateada, // Asegurar que la fecha esté en formato string
-                  fechaEmision: fechaFormateada // También incluir como fechaEmision para compatibilidad
-                }
-                
-                // Enviar email al cliente
-                await InvoiceEmailService.sendApprovalEmail(
-                  completeTicketData,
-                  clientData.email,
-                  companyData
-                )
-                
-                console.log('✅ Email enviado exitosamente al cliente')
-              } catch (emailError) {
-                console.error('❌ Error al enviar email:', emailError)
-                // No lanzar error, el tiquete ya está aprobado
-              }
-            }
-          } else {
-            console.error('❌ Error al consultar estado de Hacienda:', statusResult.error)
-            await updateDoc(docRef, {
-              status: 'Error Consulta Estado',
-              haciendaSubmission: {
-                error: statusResult.error
-              },
-              updatedAt: serverTimestamp()
-            })
-          }
+          // La consulta de estado y el correo de aprobación se hacen en segundo plano
+          await haciendaStatusScheduler.enqueue({
+            collection: 'tickets',
+            documentId: docRef.id,
+            companyId,
+            locationUrl
+          })
+          console.log('📬 Consulta de estado de Hacienda programada')
         }
       }
 
+      // Sumar el tiquete a los resúmenes del dashboard
+      DashboardRollupService.syncDocumentInBackground(db, 'tickets', docRef.id)
+
       return NextResponse.json({
         success: true,
         ticketId: docRef.id,
@@ -620,32 +326,17 @@ export async function POST(req: NextRequest) {
       
       // Si hay error, crear documento básico sin XML
       if (!docRef) {
-        const ticketDataBasico = {
+        const ticketDataBasico = buildFailedTicketRecord({
+          input: body,
+          owner: { companyId, tenantId, createdBy },
           consecutivo: generatedConsecutivo || consecutivo,
-          status: 'Error',
-          documentType: 'tiquetes',
-          clientId: clientId || '',
-          companyId,
-          tenantId,
-          subtotal: subtotal || 0,
-          totalImpuesto: totalImpuesto || 0,
-          totalDescuento: totalDescuento || 0,
-          total: total || 0,
-          exchangeRate: exchangeRate || 1,
-          currency: currency || 'CRC',
-          condicionVenta: condicionVenta || '01',
-          paymentTerm: paymentTerm || '01',
-          paymentMethod: paymentMethod || '01',
-          notes: notes || '',
-          items: items || [],
-          createdBy,
-          createdAt: serverTimestamp(),
-          updatedAt: serverTimestamp(),
           error: xmlError instanceof Error ? xmlError.message : 'Error desconocido'
-        }
+        })
 
         docRef = await addDoc(collection(db, 'tickets'), ticketDataBasico)
       }
+
+      DashboardRollupService.syncDocumentInBackground(db, 'tickets', docRef.id)
       
       return NextResponse.json(
         { 
@@ -664,3 +355,5 @@ export async function POST(req: NextRequest) {
     )
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/tickets/create', handlePost)
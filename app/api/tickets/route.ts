@@ -1,12 +1,13 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { initializeApp, getApps } from 'firebase/app'
-import { getFirestore, collection, query, where, getDocs, orderBy } from 'firebase/firestore'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { DocumentListingService, InvalidCursorError } from '@/lib/services/document-listing'
+import { withFirestoreMetrics } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
 /**
- * Obtiene tiquetes electrónicos de Firestore
+ * Obtiene tiquetes electrónicos de Firestore, más recientes primero
+ * Parámetros opcionales: limit, cursor, status, search, from, to, fields
  */
-export async function GET(req: NextRequest) {
+async function handleGet(req: NextRequest) {
   try {
     const { searchParams } = new URL(req.url)
     const tenantId = searchParams.get('tenantId')
@@ -19,46 +20,27 @@ export async function GET(req: NextRequest) {
       )
     }
 
-    // Inicializar Firebase si no está inicializado
-    const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-    const db = getFirestore(app)
+    const db = getFirestoreDb()
 
-    // Consultar tiquetes de la empresa específica
-    const ticketsRef = collection(db, 'tickets')
-    const q = query(
-      ticketsRef,
-      where('tenantId', '==', tenantId),
-      where('companyId', '==', companyId)
-    )
-
-    const querySnapshot = await getDocs(q)
-    const tickets: any[] = []
-
-    querySnapshot.forEach((doc) => {
-      const data = doc.data()
-      tickets.push({
-        id: doc.id,
-        ...data,
-        // Convertir Timestamps a Date si es necesario
-        createdAt: data.createdAt?.toDate?.() || data.createdAt,
-        updatedAt: data.updatedAt?.toDate?.() || data.updatedAt
-      })
-    })
-
-    // Ordenar por fecha de creación (más recientes primero)
-    tickets.sort((a, b) => {
-      const dateA = a.createdAt instanceof Date ? a.createdAt : new Date(a.createdAt)
-      const dateB = b.createdAt instanceof Date ? b.createdAt : new Date(b.createdAt)
-      return dateB.getTime() - dateA.getTime()
+    // Consultar tiquetes ordenados por Firestore, paginados con cursor
+    const page = await DocumentListingService.listDocuments(db, 'tickets', {
+      tenantId,
+      companyId,
+      ...DocumentListingService.parseSearchParams(searchParams)
     })
 
     return NextResponse.json({
       success: true,
-      tickets,
-      count: tickets.length
+      tickets: page.documents,
+      count: page.documents.length,
+      nextCursor: page.nextCursor,
+      hasMore: page.hasMore
     })
 
   } catch (error) {
+    if (error instanceof InvalidCursorError) {
+      return NextResponse.json({ error: error.message }, { status: 400 })
+    }
     console.error('Error al obtener tiquetes:', error)
     return NextResponse.json(
       { error: 'Error interno del servidor' },
@@ -66,3 +48,5 @@ export async function GET(req: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/tickets', handleGet)
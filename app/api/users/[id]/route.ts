@@ -9,29 +9,18 @@
 
 import { NextRequest, NextResponse } from 'next/server'
 import { 
-  getFirestore, 
   doc, 
-  getDoc,
-  updateDoc, 
-  deleteDoc,
   Timestamp 
 } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-
-// Configuración de Firebase
-const firebaseConfig = {
-  apiKey: process.env.NEXT_PUBLIC_FIREBASE_API_KEY,
-  authDomain: process.env.NEXT_PUBLIC_FIREBASE_AUTH_DOMAIN,
-  projectId: process.env.NEXT_PUBLIC_FIREBASE_PROJECT_ID,
-  storageBucket: process.env.NEXT_PUBLIC_FIREBASE_STORAGE_BUCKET,
-  messagingSenderId: process.env.NEXT_PUBLIC_FIREBASE_MESSAGING_SENDER_ID,
-  appId: process.env.NEXT_PUBLIC_FIREBASE_APP_ID,
-  measurementId: process.env.NEXT_PUBLIC_FIREBASE_MEASUREMENT_ID,
-}
+import {
+  getDoc,
+  updateDoc,
+  deleteDoc,
+  withFirestoreMetrics
+} from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Inicializar Firebase
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * generateStaticParams - Requerido para Next.js con output: export
@@ -47,7 +36,7 @@ export async function generateStaticParams() {
  * GET /api/users/[id]
  * Obtiene un usuario específico por ID
  */
-export async function GET(
+async function handleGet(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -105,7 +94,7 @@ export async function GET(
  * PUT /api/users/[id]
  * Actualiza un usuario específico
  */
-export async function PUT(
+async function handlePut(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -159,7 +148,7 @@ export async function PUT(
  * DELETE /api/users/[id]
  * Elimina un usuario específico
  */
-export async function DELETE(
+async function handleDelete(
   request: NextRequest,
   { params }: { params: { id: string } }
 ) {
@@ -195,3 +184,7 @@ export async function DELETE(
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/users/[id]', handleGet)
+export const PUT = withFirestoreMetrics('PUT /api/users/[id]', handlePut)
+export const DELETE = withFirestoreMetrics('DELETE /api/users/[id]', handleDelete)
@@ -13,31 +13,21 @@ import {
 } from 'firebase/auth'
 import { 
   doc, 
-  setDoc, 
   Timestamp,
-  getFirestore,
   collection,
   query,
-  where,
-  getDocs
+  where
 } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
+import {
+  setDoc,
+  getDocs,
+  withFirestoreMetrics
+} from '@/lib/firestore-metrics'
+import { getFirebaseApp, getFirestoreDb } from '@/lib/firebase-app'
 
-// Configuración de Firebase
-const firebaseConfig = {
-  apiKey: process.env.NEXT_PUBLIC_FIREBASE_API_KEY,
-  authDomain: process.env.NEXT_PUBLIC_FIREBASE_AUTH_DOMAIN,
-  projectId: process.env.NEXT_PUBLIC_FIREBASE_PROJECT_ID,
-  storageBucket: process.env.NEXT_PUBLIC_FIREBASE_STORAGE_BUCKET,
-  messagingSenderId: process.env.NEXT_PUBLIC_FIREBASE_MESSAGING_SENDER_ID,
-  appId: process.env.NEXT_PUBLIC_FIREBASE_APP_ID,
-  measurementId: process.env.NEXT_PUBLIC_FIREBASE_MEASUREMENT_ID,
-}
-
-// Inicializar Firebase
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
+const app = getFirebaseApp()
 const auth = getAuth(app)
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * Función para obtener el nombre del rol
@@ -67,7 +57,7 @@ function getRolePermissions(roleId: string): string[] {
  * POST /api/users/create
  * Crea un nuevo usuario con autenticación Firebase
  */
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const { name, email, password, roleId, tenantId, status = 'active', profile } = body
@@ -183,3 +173,5 @@ export async function POST(request: NextRequest) {
     }
   }
 }
+
+export const POST = withFirestoreMetrics('POST /api/users/create', handlePost)
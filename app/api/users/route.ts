@@ -10,42 +10,31 @@
 
 import { NextRequest, NextResponse } from 'next/server'
 import { 
-  getFirestore, 
   collection, 
   doc, 
-  getDocs, 
-  getDoc,
-  addDoc, 
-  updateDoc, 
-  deleteDoc,
   query,
   where,
   orderBy,
   Timestamp 
 } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
+import {
+  getDocs,
+  getDoc,
+  addDoc,
+  updateDoc,
+  deleteDoc,
+  withFirestoreMetrics
+} from '@/lib/firestore-metrics'
 import { getAuth } from 'firebase/auth'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
-// Configuración de Firebase
-const firebaseConfig = {
-  apiKey: process.env.NEXT_PUBLIC_FIREBASE_API_KEY,
-  authDomain: process.env.NEXT_PUBLIC_FIREBASE_AUTH_DOMAIN,
-  projectId: process.env.NEXT_PUBLIC_FIREBASE_PROJECT_ID,
-  storageBucket: process.env.NEXT_PUBLIC_FIREBASE_STORAGE_BUCKET,
-  messagingSenderId: process.env.NEXT_PUBLIC_FIREBASE_MESSAGING_SENDER_ID,
-  appId: process.env.NEXT_PUBLIC_FIREBASE_APP_ID,
-  measurementId: process.env.NEXT_PUBLIC_FIREBASE_MEASUREMENT_ID,
-}
-
-// Inicializar Firebase
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 /**
  * GET /api/users
  * Obtiene todos los usuarios del tenant actual
  */
-export async function GET(request: NextRequest) {
+async function handleGet(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url)
     const tenantId = searchParams.get('tenantId')
@@ -113,7 +102,7 @@ export async function GET(request: NextRequest) {
  * POST /api/users
  * Crea un nuevo usuario
  */
-export async function POST(request: NextRequest) {
+async function handlePost(request: NextRequest) {
   try {
     const body = await request.json()
     const { name, email, roleId, tenantId, status = 'active', profile } = body
@@ -157,3 +146,6 @@ export async function POST(request: NextRequest) {
     )
   }
 }
+
+export const GET = withFirestoreMetrics('GET /api/users', handleGet)
+export const POST = withFirestoreMetrics('POST /api/users', handlePost)
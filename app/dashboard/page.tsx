@@ -20,6 +20,27 @@ type ApiListResponse<T> = {
   products?: T[]
 }
 
+type DocumentKind = "facturas" | "tiquetes" | "notas-credito"
+type RollupStatus = "aceptado" | "pendiente" | "rechazado"
+
+type MonthlyRollup = {
+  month: string
+  counts: Partial<Record<DocumentKind, Partial<Record<RollupStatus, number>>>>
+  impuesto: Partial<Record<DocumentKind, Partial<Record<RollupStatus, Record<string, number>>>>>
+}
+
+type DashboardSummaryResponse = {
+  success?: boolean
+  error?: string
+  currentMonth: string
+  months?: MonthlyRollup[]
+  clientsCount?: number
+  productsCount?: number
+}
+
+const DOCUMENT_KINDS: DocumentKind[] = ["facturas", "tiquetes", "notas-credito"]
+const RECENT_FIELDS = "consecutivo,createdAt,total,totalImpuesto,status,currency,clientId,cliente"
+
 type DocumentBase = {
   id?: string
   consecutivo?: string
@@ -74,76 +95,60 @@ export default function DashboardPage() {
         setLoading(true)
         setError(null)
 
+        // Resúmenes mensuales precalculados + solo los documentos más recientes de cada tipo
+        const recentParams = `tenantId=${tenantId}&companyId=${companyId}&limit=10&fields=${RECENT_FIELDS}`
         const [
+          summaryRes,
           invoicesRes,
           ticketsRes,
-          creditNotesRes,
-          clientsRes,
-          productsRes
+          creditNotesRes
         ] = await Promise.all([
-          fetch(`/api/invoices?tenantId=${tenantId}&companyId=${companyId}`),
-          fetch(`/api/tickets?tenantId=${tenantId}&companyId=${companyId}`),
-          fetch(`/api/credit-notes?tenantId=${tenantId}&companyId=${companyId}`),
-          fetch(`/api/clients?tenantId=${tenantId}&companyId=${companyId}`),
-          fetch(`/api/products?tenantId=${tenantId}`)
+          fetch(`/api/dashboard/summary?tenantId=${tenantId}&companyId=${companyId}`),
+          fetch(`/api/invoices?${recentParams}`),
+          fetch(`/api/tickets?${recentParams}`),
+          fetch(`/api/credit-notes?${recentParams}`)
         ])
 
+        const summary = (await summaryRes.json()) as DashboardSummaryResponse
         const invoicesData = (await invoicesRes.json()) as ApiListResponse<DocumentBase>
         const ticketsData = (await ticketsRes.json()) as ApiListResponse<DocumentBase>
         const creditNotesData = (await creditNotesRes.json()) as ApiListResponse<DocumentBase>
-        const clientsData = (await clientsRes.json()) as ApiListResponse<any>
-        const productsData = (await productsRes.json()) as ApiListResponse<any>
+
+        if (!summaryRes.ok) {
+          throw new Error(summary.error || "Error al obtener resumen")
+        }
 
         const invoices = invoicesData.invoices || []
         const tickets = ticketsData.tickets || []
         const creditNotes = creditNotesData.creditNotes || []
 
-        const now = new Date()
-        const isSameMonth = (date?: Date | null) =>
-          !!date && date.getFullYear() === now.getFullYear() && date.getMonth() === now.getMonth()
-        const isSameYear = (date?: Date | null) => !!date && date.getFullYear() === now.getFullYear()
+        const months = summary.months || []
+        const currentMonth = summary.currentMonth
+        const currentYear = currentMonth.slice(0, 4)
+        const monthRollups = months.filter((rollup) => rollup.month === currentMonth)
+        const yearRollups = months.filter((rollup) => rollup.month.startsWith(currentYear))
+
+        setDocumentsThisMonth(sumCounts(monthRollups, DOCUMENT_KINDS, ["aceptado", "pendiente", "rechazado"]))
+        setClientsCount(summary.clientsCount ?? 0)
+        setProductsCount(summary.productsCount ?? 0)
+
+        // IVA: solo facturas y tiquetes aceptados
+        setIvaMonthlyCRC(sumTax(monthRollups, "CRC"))
+        setIvaMonthlyUSD(sumTax(monthRollups, "USD"))
+        setIvaAnnualCRC(sumTax(yearRollups, "CRC"))
+        setIvaAnnualUSD(sumTax(yearRollups, "USD"))
+
+        setStatusSummary({
+          accepted: sumCounts(months, DOCUMENT_KINDS, ["aceptado"]),
+          pending: sumCounts(months, DOCUMENT_KINDS, ["pendiente"]),
+          rejected: sumCounts(months, DOCUMENT_KINDS, ["rechazado"])
+        })
 
         const parsedInvoices = invoices.map((doc) => normalizeDocument(doc, "Factura Electrónica", "facturas"))
         const parsedTickets = tickets.map((doc) => normalizeDocument(doc, "Tiquete Electrónico", "tiquetes"))
         const parsedCreditNotes = creditNotes.map((doc) => normalizeDocument(doc, "Nota de Crédito", "notas-credito"))
 
         const allDocs = [...parsedInvoices, ...parsedTickets, ...parsedCreditNotes]
-        const ivaDocsRaw = [...parsedInvoices, ...parsedTickets]
-        const ivaDocsAccepted = ivaDocsRaw.filter((doc) => normalizeStatus(doc.status) === "Aceptado")
-        const allDocsThisMonth = allDocs.filter((doc) => isSameMonth(doc.dateRaw))
-
-        setDocumentsThisMonth(allDocsThisMonth.length)
-        setClientsCount(clientsData.total ?? clientsData.clients?.length ?? 0)
-        setProductsCount(productsData.total ?? productsData.products?.length ?? 0)
-
-        const getCode = (currency?: string) => (currency || "CRC").toUpperCase()
-
-        const ivaMonthlyCRCVal = ivaDocsAccepted
-          .filter((doc) => isSameMonth(doc.dateRaw) && getCode(doc.currency) === "CRC")
-          .reduce((sum, doc) => sum + (doc.totalImpuesto || 0), 0)
-
-        const ivaMonthlyUSDVal = ivaDocsAccepted
-          .filter((doc) => isSameMonth(doc.dateRaw) && getCode(doc.currency) === "USD")
-          .reduce((sum, doc) => sum + (doc.totalImpuesto || 0), 0)
-
-        const ivaAnnualCRCVal = ivaDocsAccepted
-          .filter((doc) => isSameYear(doc.dateRaw) && getCode(doc.currency) === "CRC")
-          .reduce((sum, doc) => sum + (doc.totalImpuesto || 0), 0)
-
-        const ivaAnnualUSDVal = ivaDocsAccepted
-          .filter((doc) => isSameYear(doc.dateRaw) && getCode(doc.currency) === "USD")
-          .reduce((sum, doc) => sum + (doc.totalImpuesto || 0), 0)
-
-        setIvaMonthlyCRC(ivaMonthlyCRCVal)
-        setIvaMonthlyUSD(ivaMonthlyUSDVal)
-        setIvaAnnualCRC(ivaAnnualCRCVal)
-        setIvaAnnualUSD(ivaAnnualUSDVal)
-
-        setStatusSummary({
-          accepted: allDocs.filter((doc) => normalizeStatus(doc.status) === "Aceptado").length,
-          pending: allDocs.filter((doc) => normalizeStatus(doc.status) === "Pendiente").length,
-          rejected: allDocs.filter((doc) => normalizeStatus(doc.status) === "Rechazado").length
-        })
 
         const recent = allDocs
           .sort((a, b) => (b.dateRaw?.getTime() || 0) - (a.dateRaw?.getTime() || 0))
@@ -317,6 +322,28 @@ export default function DashboardPage() {
   )
 }
 
+function sumCounts(rollups: MonthlyRollup[], kinds: DocumentKind[], statuses: RollupStatus[]) {
+  return rollups.reduce(
+    (sum, rollup) =>
+      sum + kinds.reduce(
+        (kindSum, kind) => kindSum + statuses.reduce((statusSum, status) => statusSum + (rollup.counts[kind]?.[status] || 0), 0),
+        0
+      ),
+    0
+  )
+}
+
+function sumTax(rollups: MonthlyRollup[], currency: string) {
+  return rollups.reduce(
+    (sum, rollup) =>
+      sum + (["facturas", "tiquetes"] as DocumentKind[]).reduce(
+        (kindSum, kind) => kindSum + (rollup.impuesto[kind]?.aceptado?.[currency] || 0),
+        0
+      ),
+    0
+  )
+}
+
 function normalizeStatus(status?: string) {
   const value = (status || "").toLowerCase()
   if (value.includes("acept")) return "Aceptado"
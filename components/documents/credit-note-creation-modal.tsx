@@ -1,6 +1,6 @@
 'use client'
 
-import { useState } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle } from '@/components/ui/dialog'
 import { Button } from '@/components/ui/button'
 import { Input } from '@/components/ui/input'
@@ -12,6 +12,11 @@ import { Upload, Search, FileText, CheckCircle, XCircle, AlertCircle, Shield } f
 import { useToastNotification } from '@/components/providers/toast-provider'
 import { Invoice } from '@/lib/invoice-types'
 
+// Hacienda guarda "Aceptado"; documentos antiguos usan "aceptado"
+const ACCEPTED_STATUSES = 'Aceptado,aceptado'
+const INVOICE_SEARCH_LIMIT = 50
+const INVOICE_SEARCH_DEBOUNCE_MS = 300
+
 interface ParsedFacturaData {
   clave: string
   consecutivo: string
@@ -386,11 +391,17 @@ export default function CreditNoteCreationModal({
   // Buscar cliente por identificación
   const fetchClientByIdentification = async (identification: string) => {
     try {
-      const response = await fetch(`/api/clients?tenantId=${tenantId}&identification=${identification}`)
+      const digits = identification.replace(/\D/g, '')
+      const params = new URLSearchParams({ tenantId, q: digits, limit: '10' })
+      const response = await fetch(`/api/clients/search?${params}`)
       if (response.ok) {
         const data = await response.json()
-        if (data.clients && data.clients.length > 0) {
-          return data.clients[0] // Retornar el primer cliente encontrado
+        // La búsqueda es por prefijo: quedarse solo con la cédula exacta
+        const match = (data.clients || []).find(
+          (client: any) => String(client.identification || '').replace(/\D/g, '') === digits
+        )
+        if (match) {
+          return match
         }
       }
     } catch (error) {
@@ -399,8 +410,11 @@ export default function CreditNoteCreationModal({
     return null
   }
 
-  // Buscar facturas aceptadas en la BD
-  const handleSearchInvoices = async () => {
+  // Solo la respuesta de la última búsqueda actualiza la lista
+  const searchRequestRef = useRef(0)
+
+  // Buscar facturas aceptadas en la BD (filtradas y limitadas en el servidor)
+  const handleSearchInvoices = async (term: string = '') => {
     
     // Validar que tenemos los datos necesarios
     if (!tenantId || !companyId) {
@@ -409,42 +423,55 @@ export default function CreditNoteCreationModal({
       return
     }
 
+    const requestId = ++searchRequestRef.current
     setIsLoading(true)
     try {
-      const response = await fetch(`/api/invoices?tenantId=${tenantId}&companyId=${companyId}`)
+      const params = new URLSearchParams({
+        tenantId,
+        companyId,
+        status: ACCEPTED_STATUSES,
+        limit: String(INVOICE_SEARCH_LIMIT)
+      })
+      if (term.trim()) {
+        params.set('search', term.trim())
+      }
+
+      const response = await fetch(`/api/invoices?${params.toString()}`)
       if (!response.ok) throw new Error('Error al buscar facturas')
 
       const data = await response.json()
-      
-      console.log('📋 Total facturas obtenidas:', data.invoices?.length || 0)
-      console.log('📋 Ejemplo de estados:', data.invoices?.slice(0, 3).map((inv: Invoice) => ({
-        consecutivo: inv.consecutivo,
-        status: inv.status,
-        hasXmlSigned: !!inv.xmlSigned
-      })))
-      
-      // Filtrar solo facturas aceptadas con XML firmado
-      const acceptedInvoices = data.invoices.filter((inv: Invoice) => {
-        const isAccepted = inv.status?.toLowerCase() === 'aceptado'
-        const hasXml = !!inv.xmlSigned
-        console.log(`📋 Factura ${inv.consecutivo}:`, { status: inv.status, isAccepted, hasXml })
-        return isAccepted && hasXml
-      })
+      if (requestId !== searchRequestRef.current) return
+
+      // Solo facturas con XML firmado (el estado ya lo filtra el servidor)
+      const acceptedInvoices = (data.invoices || []).filter((inv: Invoice) => !!inv.xmlSigned)
 
       console.log('✅ Facturas aceptadas con XML:', acceptedInvoices.length)
 
       setInvoices(acceptedInvoices)
-      if (acceptedInvoices.length === 0) {
+      if (acceptedInvoices.length === 0 && !term.trim()) {
         toast.error('Sin facturas', 'No hay facturas aceptadas disponibles para crear notas de crédito')
       }
     } catch (error) {
       console.error('Error:', error)
       toast.error('Error', 'No se pudieron cargar las facturas')
     } finally {
-      setIsLoading(false)
+      if (requestId === searchRequestRef.current) {
+        setIsLoading(false)
+      }
     }
   }
 
+  // Al elegir "Buscar Factura" o cambiar el término, consultar al servidor (con debounce al escribir)
+  useEffect(() => {
+    if (searchMode !== 'db') return
+    const timer = setTimeout(
+      () => handleSearchInvoices(searchTerm),
+      searchTerm ? INVOICE_SEARCH_DEBOUNCE_MS : 0
+    )
+    return () => clearTimeout(timer)
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [searchTerm, searchMode])
+
   // Manejar subida de XML
   const handleUploadXml = async (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0]
@@ -588,13 +615,6 @@ export default function CreditNoteCreationModal({
     onClose()
   }
 
-  // Filtrar facturas por búsqueda
-  const filteredInvoices = invoices.filter(inv =>
-    inv.consecutivo.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    inv.clave?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    inv.cliente?.nombre?.toLowerCase().includes(searchTerm.toLowerCase())
-  )
-
   return (
     <Dialog open={isOpen} onOpenChange={handleClose}>
       <DialogContent className="max-w-4xl max-h-[90vh] overflow-y-auto">
@@ -636,10 +656,7 @@ export default function CreditNoteCreationModal({
               {/* Buscar en base de datos */}
               <Card 
                 className={`cursor-pointer transition-all hover:shadow-lg ${searchMode === 'db' ? 'ring-2 ring-blue-500' : ''}`}
-                onClick={() => {
-                  setSearchMode('db')
-                  handleSearchInvoices()
-                }}
+                onClick={() => setSearchMode('db')}
               >
                 <CardContent className="flex flex-col items-center justify-center p-8 text-center">
                   <Search className="w-12 h-12 text-blue-600 mb-4" />
@@ -669,7 +686,7 @@ export default function CreditNoteCreationModal({
             {searchMode === 'db' && (
               <div className="space-y-4">
                 <Input
-                  placeholder="Buscar por consecutivo, clave o cliente..."
+                  placeholder="Buscar por consecutivo o clave..."
                   value={searchTerm}
                   onChange={(e) => setSearchTerm(e.target.value)}
                   className="w-full"
@@ -677,11 +694,11 @@ export default function CreditNoteCreationModal({
 
                 {isLoading ? (
                   <div className="text-center py-8 text-gray-500">Cargando facturas...</div>
-                ) : filteredInvoices.length === 0 ? (
+                ) : invoices.length === 0 ? (
                   <div className="text-center py-8 text-gray-500">No hay facturas disponibles</div>
                 ) : (
                   <div className="space-y-2 max-h-96 overflow-y-auto">
-                    {filteredInvoices.map((invoice) => (
+                    {invoices.map((invoice) => (
                       <Card
                         key={invoice.id}
                         className="cursor-pointer hover:bg-gray-50 transition-colors"
@@ -100,7 +100,7 @@ export function DocumentContent({
   showCreateModal,
   onShowCreateModal
 }: DocumentContentProps) {
-  const { documents, loading, error, isReady, fetchDocuments } = useDocuments(documentType)
+  const { documents, totals, loading, error, isReady, hasMore, fetchDocuments, loadMore } = useDocuments(documentType, searchTerm)
   
   // Refrescar documentos cuando cambie el tipo de documento
   useEffect(() => {
@@ -115,13 +115,6 @@ export function DocumentContent({
   const config = documentConfig[documentType]
   const Icon = config.icon
   
-  // Filtrar documentos por búsqueda
-  const filteredDocuments = documents.filter(document =>
-    (document.consecutivo || '').toLowerCase().includes(searchTerm.toLowerCase()) ||
-    (document.clientId || '').toLowerCase().includes(searchTerm.toLowerCase()) ||
-    (document.status || '').toLowerCase().includes(searchTerm.toLowerCase())
-  )
-
   // Función para refrescar documentos
   const handleRefresh = () => {
     fetchDocuments()
@@ -140,50 +133,17 @@ export function DocumentContent({
     setSelectedInvoice(null)
   }
 
-  // Determinar si un documento está aceptado (compatible con facturas, tiquetes y notas de crédito)
-  // Status puede venir como 'aceptado', 'Aceptado', 'accepted' según el tipo de documento
-  const isDocumentAccepted = (doc: any) => {
-    const statusLower = (doc.status || '').toString().toLowerCase()
-    if (statusLower === 'aceptado' || statusLower === 'accepted') return true
-    const hs = doc.haciendaSubmission
-    if (!hs) return false
-    const estado = (hs['ind-estado'] ?? hs.estado ?? hs.state ?? hs.status ?? '').toString().toLowerCase()
-    return estado === 'aceptado' || estado === 'accepted'
-  }
-
-  const acceptedDocuments = filteredDocuments.filter(isDocumentAccepted)
-
-  // Calcular totales separados por moneda (solo documentos aceptados)
-  const getCurrencyCode = (currency?: string) => (currency || 'CRC').toUpperCase()
-  const getIvaAmount = (document: any) => (document.tieneExoneracion === true ? 0 : (document.totalImpuesto || 0))
-
+  // Totales de la empresa calculados en el servidor (solo documentos aceptados para montos e IVA)
   const stats = {
-    totalDocuments: filteredDocuments.length,
-    totalAmountCRC: acceptedDocuments
-      .filter(document => getCurrencyCode(document.currency) === 'CRC')
-      .reduce((sum, document) => {
-        // Si tiene exoneración, usar subtotal; si no, usar total
-        const amount = document.tieneExoneracion === true ? (document.subtotal || 0) : (document.total || 0)
-        return sum + amount
-      }, 0),
-    totalAmountUSD: acceptedDocuments
-      .filter(document => getCurrencyCode(document.currency) === 'USD')
-      .reduce((sum, document) => {
-        // Si tiene exoneración, usar subtotal; si no, usar total
-        const amount = document.tieneExoneracion === true ? (document.subtotal || 0) : (document.total || 0)
-        return sum + amount
-      }, 0),
-    totalIvaCRC: acceptedDocuments
-      .filter(document => getCurrencyCode(document.currency) === 'CRC')
-      .reduce((sum, document) => sum + getIvaAmount(document), 0),
-    totalIvaUSD: acceptedDocuments
-      .filter(document => getCurrencyCode(document.currency) === 'USD')
-      .reduce((sum, document) => sum + getIvaAmount(document), 0),
-    acceptedDocuments: acceptedDocuments.length,
-    pendingDocuments: filteredDocuments.filter(document => document.status === 'pending').length
+    totalDocuments: totals?.total ?? 0,
+    totalAmountCRC: totals?.montos.CRC ?? 0,
+    totalAmountUSD: totals?.montos.USD ?? 0,
+    totalIvaCRC: totals?.iva.CRC ?? 0,
+    totalIvaUSD: totals?.iva.USD ?? 0,
+    acceptedDocuments: totals?.counts.aceptado ?? 0,
+    pendingDocuments: totals?.counts.pendiente ?? 0
   }
 
-
   const formatCurrency = (amount: number, currency: string = 'CRC') => {
     return new Intl.NumberFormat('es-CR', {
       style: 'currency',
@@ -192,7 +152,7 @@ export function DocumentContent({
     }).format(amount)
   }
 
-  if (loading && filteredDocuments.length === 0) {
+  if (loading && documents.length === 0) {
     return (
       <div className="flex items-center justify-center py-12">
         <div className="flex items-center gap-3">
@@ -372,7 +332,7 @@ export function DocumentContent({
 
       {/* Documents List */}
       <AnimatePresence mode="wait">
-        {filteredDocuments.length === 0 && !loading ? (
+        {documents.length === 0 && !loading ? (
           <motion.div
             key="empty"
             initial={{ opacity: 0, y: 20 }}
@@ -405,7 +365,7 @@ export function DocumentContent({
             transition={{ duration: 0.3, delay: 0.3 }}
           >
             <AnimatePresence>
-              {filteredDocuments.map((document, index) => (
+              {documents.map((document, index) => (
                 <motion.div
                   key={document.id}
                   initial={{ opacity: 0, y: 20 }}
@@ -431,6 +391,15 @@ export function DocumentContent({
         )}
       </AnimatePresence>
 
+      {/* Cargar la siguiente página */}
+      {hasMore && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={loadMore} disabled={loading}>
+            {loading ? 'Cargando...' : 'Cargar más'}
+          </Button>
+        </div>
+      )}
+
       {/* Modal de Creación */}
       {showCreateModal && documentType === 'facturas' && (
         <InvoiceCreationModal
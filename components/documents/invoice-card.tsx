@@ -20,6 +20,7 @@ import {
   Shield
 } from "lucide-react"
 import { Invoice } from '@/lib/invoice-types'
+import { buildInvoicePdfData } from '@/lib/services/pdf-data'
 import { useRouter } from 'next/navigation'
 
 interface InvoiceCardProps {
@@ -164,12 +165,8 @@ export function InvoiceCard({ invoice, onEdit, onDelete, onView, onViewHaciendaS
         headers: {
           'Content-Type': 'application/json'
         },
-        body: JSON.stringify({
-          invoice: invoice,
-          company: companyData,
-          client: clientData,
-          haciendaResponse: invoice.haciendaSubmission
-        })
+        // Mismos datos que el correo de aprobación (comparten el PDF en caché)
+        body: JSON.stringify(buildInvoicePdfData(invoice, companyData, clientData))
       })
 
       if (!response.ok) {
@@ -31,8 +31,9 @@ import {
   Mail
 } from "lucide-react"
 import { InvoiceFormData, InvoiceItemFormData, CONDICIONES_VENTA, METODOS_PAGO, TIPOS_IMPUESTO, TARIFAS_IMPUESTO, calculateInvoiceTotals } from '@/lib/invoice-types'
-import { useClients } from '@/hooks/use-clients'
-import { useProducts } from '@/hooks/use-products'
+import { Client } from '@/hooks/use-clients'
+import { useEntitySearch } from '@/hooks/use-entity-search'
+import { Product } from '@/lib/product-types'
 import { useToastNotification } from '@/components/providers/toast-provider'
 
 interface InvoiceCreationModalProps {
@@ -58,8 +59,12 @@ export function InvoiceCreationModal({ onClose, onSubmit }: InvoiceCreationModal
   const [precioInputs, setPrecioInputs] = useState<Record<number, string>>({})
 
   // Hooks para obtener datos
-  const { clients, loading: clientsLoading } = useClients()
-  const { products, loading: productsLoading } = useProducts()
+  const [clientQuery, setClientQuery] = useState('')
+  const [productQuery, setProductQuery] = useState('')
+
+  // Búsqueda en el servidor (por prefijo, sin tildes) en lugar de cargar todo el catálogo
+  const { results: clients, loading: clientsLoading } = useEntitySearch<Client>('clients', clientQuery, { status: 'active' })
+  const { results: products, loading: productsLoading } = useEntitySearch<Product>('products', productQuery)
 
   // Monedas disponibles
   const CURRENCIES = [
@@ -285,7 +290,14 @@ export function InvoiceCreationModal({ onClose, onSubmit }: InvoiceCreationModal
                     <h3 className="font-medium text-sm">Cliente</h3>
                   </div>
 
-                  {clientsLoading ? (
+                  <Input
+                    value={clientQuery}
+                    onChange={(e) => setClientQuery(e.target.value)}
+                    placeholder="Buscar por nombre, cédula o correo..."
+                    className="h-8 text-xs mb-2"
+                  />
+
+                  {clientsLoading && clients.length === 0 ? (
                     <div className="flex items-center justify-center py-3">
                       <div className="flex items-center gap-2">
                         <motion.div
@@ -618,11 +630,20 @@ export function InvoiceCreationModal({ onClose, onSubmit }: InvoiceCreationModal
                     exit={{ opacity: 0, height: 0 }}
                     className="mb-3 p-3 bg-muted rounded-lg"
                   >
+                    <Input
+                      value={productQuery}
+                      onChange={(e) => setProductQuery(e.target.value)}
+                      placeholder="Buscar por descripción o código CABYS..."
+                      className="h-8 text-xs mb-2"
+                      autoFocus
+                    />
                     <div className="max-h-40 overflow-y-auto space-y-1">
-                      {productsLoading ? (
+                      {productsLoading && products.length === 0 ? (
                         <div className="text-center py-2 text-xs text-muted-foreground">Cargando productos...</div>
                       ) : products.length === 0 ? (
-                        <div className="text-center py-2 text-xs text-muted-foreground">No hay productos disponibles</div>
+                        <div className="text-center py-2 text-xs text-muted-foreground">
+                          {productQuery ? 'No se encontraron productos' : 'No hay productos disponibles'}
+                        </div>
                       ) : (
                         products.map((product) => (
                           <Button
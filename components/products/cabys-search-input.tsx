@@ -0,0 +1,136 @@
+"use client"
+
+import { useState, useEffect, useRef } from 'react'
+import { Input } from "@/components/ui/input"
+import { Loader2 } from "lucide-react"
+import { CabysEntry, CabysIndex, loadCabysIndex } from '@/lib/cabys'
+
+interface CabysSearchInputProps {
+  id?: string
+  value: string
+  onChange: (codigo: string) => void
+  onSelect?: (entry: CabysEntry) => void
+  required?: boolean
+}
+
+/**
+ * Campo de código CABYS con búsqueda por prefijo de código o por descripción
+ * sobre el catálogo local (se descarga una vez al enfocar el campo)
+ */
+export function CabysSearchInput({ id, value, onChange, onSelect, required }: CabysSearchInputProps) {
+  const [index, setIndex] = useState<CabysIndex | null>(null)
+  const [loadingIndex, setLoadingIndex] = useState(false)
+  const [queryText, setQueryText] = useState(value)
+  const [results, setResults] = useState<CabysEntry[]>([])
+  const [open, setOpen] = useState(false)
+  const [highlighted, setHighlighted] = useState(0)
+  const containerRef = useRef<HTMLDivElement>(null)
+
+  useEffect(() => {
+    setQueryText(value)
+  }, [value])
+
+  useEffect(() => {
+    if (!index || !open) return
+    setResults(index.search(queryText, 10))
+    setHighlighted(0)
+  }, [index, queryText, open])
+
+  useEffect(() => {
+    const handleClickOutside = (event: MouseEvent) => {
+      if (containerRef.current && !containerRef.current.contains(event.target as Node)) {
+        setOpen(false)
+      }
+    }
+    document.addEventListener('mousedown', handleClickOutside)
+    return () => document.removeEventListener('mousedown', handleClickOutside)
+  }, [])
+
+  const ensureIndex = () => {
+    if (index || loadingIndex) return
+    setLoadingIndex(true)
+    loadCabysIndex()
+      .then(setIndex)
+      .catch(error => console.error('Error cargando catálogo CABYS:', error))
+      .finally(() => setLoadingIndex(false))
+  }
+
+  const selectEntry = (entry: CabysEntry) => {
+    setQueryText(entry.codigo)
+    onChange(entry.codigo)
+    onSelect?.(entry)
+    setOpen(false)
+  }
+
+  const handleKeyDown = (e: React.KeyboardEvent<HTMLInputElement>) => {
+    if (!open || results.length === 0) return
+    if (e.key === 'ArrowDown') {
+      e.preventDefault()
+      setHighlighted(prev => Math.min(prev + 1, results.length - 1))
+    } else if (e.key === 'ArrowUp') {
+      e.preventDefault()
+      setHighlighted(prev => Math.max(prev - 1, 0))
+    } else if (e.key === 'Enter') {
+      e.preventDefault()
+      selectEntry(results[highlighted])
+    } else if (e.key === 'Escape') {
+      setOpen(false)
+    }
+  }
+
+  const selected = index && /^\d{13}$/.test(value) ? index.lookup(value) : null
+
+  return (
+    <div ref={containerRef} className="relative">
+      <div className="relative">
+        <Input
+          id={id}
+          placeholder="Código o descripción (ej: 8399000000000, café)"
+          value={queryText}
+          onFocus={() => {
+            ensureIndex()
+            setOpen(true)
+          }}
+          onChange={(e) => {
+            const text = e.target.value
+            setQueryText(text)
+            setOpen(true)
+            // Solo los dígitos se guardan como código; el texto libre es para buscar
+            if (/^\d*$/.test(text.trim())) {
+              onChange(text.trim())
+            }
+          }}
+          onKeyDown={handleKeyDown}
+          autoComplete="off"
+          required={required}
+        />
+        {loadingIndex && (
+          <Loader2 className="absolute right-3 top-1/2 -translate-y-1/2 h-4 w-4 animate-spin text-muted-foreground" />
+        )}
+      </div>
+
+      {open && results.length > 0 && (
+        <div className="absolute z-50 mt-1 w-full max-h-72 overflow-y-auto rounded-md border bg-popover shadow-md">
+          {results.map((entry, i) => (
+            <button
+              key={entry.codigo}
+              type="button"
+              className={`w-full text-left px-3 py-2 text-sm hover:bg-muted ${i === highlighted ? 'bg-muted' : ''}`}
+              onMouseDown={(e) => e.preventDefault()}
+              onClick={() => selectEntry(entry)}
+            >
+              <div className="font-mono text-xs text-muted-foreground">
+                {entry.codigo}{entry.impuesto !== null ? ` · IVA ${entry.impuesto}%` : ''}
+              </div>
+              <div className="line-clamp-2">{entry.descripcion}</div>
+            </button>
+          ))}
+        </div>
+      )}
+
+      {selected && !open && (
+        <p className="mt-1 text-xs text-muted-foreground line-clamp-2">{selected.descripcion}</p>
+      )}
+    </div>
+  )
+}
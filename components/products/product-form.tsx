@@ -11,6 +11,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Switch } from "@/components/ui/switch"
 import { X, Package, DollarSign, Percent, FileText, Calendar } from "lucide-react"
 import { ProductFormData, Product, UNIDADES_MEDIDA, TIPOS_IMPUESTO, TARIFAS_IMPUESTO } from '@/lib/product-types'
+import { CabysSearchInput } from '@/components/products/cabys-search-input'
 
 interface ProductFormProps {
   onClose: () => void
@@ -157,15 +158,20 @@ export function ProductForm({ onClose, onSubmit, editingProduct }: ProductFormPr
             <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
               <div className="space-y-2">
                 <Label htmlFor="codigoCABYS">Código CABYS *</Label>
-                <Input
+                <CabysSearchInput
                   id="codigoCABYS"
-                  placeholder="Ej: 8399000000000"
                   value={formData.codigoCABYS}
-                  onChange={(e) => handleInputChange('codigoCABYS', e.target.value)}
+                  onChange={(codigo) => handleInputChange('codigoCABYS', codigo)}
+                  onSelect={(entry) => {
+                    // Sugerir la descripción del catálogo si aún no hay detalle
+                    if (!formData.detalle) {
+                      handleInputChange('detalle', entry.descripcion)
+                    }
+                  }}
                   required
                 />
                 <p className="text-xs text-muted-foreground">
-                  Código de clasificación oficial de Hacienda
+                  Código de clasificación oficial de Hacienda (busque por código o descripción)
                 </p>
               </div>
 
@@ -1,6 +1,6 @@
 "use client"
 
-import { useState, useEffect, useCallback } from "react"
+import { useState, useEffect, useCallback, useRef } from "react"
 import { useAuth } from "@/lib/firebase-client"
 import { useCompanySelection } from "@/hooks/use-company-selection"
 import { DocumentType } from "@/components/documents/document-type-tabs"
@@ -25,13 +25,36 @@ interface Document {
   [key: string]: any // Permitir propiedades adicionales
 }
 
-export function useDocuments(documentType: DocumentType) {
+// Totales de la empresa para el tipo de documento (GET /api/documents/totals)
+export interface DocumentTotals {
+  total: number
+  counts: { aceptado: number; pendiente: number; rechazado: number }
+  montos: Record<string, number>
+  iva: Record<string, number>
+}
+
+const PAGE_SIZE = 50
+// Espera después de la última tecla antes de buscar en el servidor
+const SEARCH_DEBOUNCE_MS = 300
+
+export function useDocuments(documentType: DocumentType, searchTerm: string = '') {
   const [documents, setDocuments] = useState<Document[]>([])
+  const [totals, setTotals] = useState<DocumentTotals | null>(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [isReady, setIsReady] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [hasMore, setHasMore] = useState(false)
+  const [search, setSearch] = useState(searchTerm.trim())
+  // Solo la respuesta de la última consulta actualiza la lista
+  const requestIdRef = useRef(0)
   const { user } = useAuth()
 
+  useEffect(() => {
+    const timer = setTimeout(() => setSearch(searchTerm.trim()), SEARCH_DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [searchTerm])
+
   const checkAuthData = useCallback(() => {
     try {
       if (typeof window !== 'undefined') {
@@ -45,7 +68,9 @@ export function useDocuments(documentType: DocumentType) {
     }
   }, [])
 
-  const fetchDocuments = useCallback(async () => {
+  // Carga una página; sin cursor reemplaza la lista, con cursor la extiende
+  const fetchPage = useCallback(async (cursor: string | null) => {
+    const requestId = ++requestIdRef.current
     try {
       setLoading(true)
       setError(null)
@@ -63,39 +88,34 @@ export function useDocuments(documentType: DocumentType) {
         return
       }
 
-      // Determinar qué tabla consultar según el tipo de documento
-      let collectionName = 'invoices' // Por defecto facturas
-      let filterField = 'documentType'
-      let filterValue = documentType
-
-      // Para tiquetes, usar tabla específica
-      if (documentType === 'tiquetes') {
-        collectionName = 'tickets'
-        filterField = 'tenantId' // Los tiquetes no tienen documentType
-        filterValue = user.tenantId
-      }
-
-      // Para notas de crédito
-      if (documentType === 'notas-credito') {
-        collectionName = 'creditNotes'
-        filterField = 'tenantId'
-        filterValue = user.tenantId
-      }
-
       // Para notas de débito, no mostrar nada por ahora
       if (documentType === 'notas-debito') {
         setDocuments([])
+        setNextCursor(null)
+        setHasMore(false)
         setLoading(false)
         return
       }
 
-      // Construir la URL del API
-      let apiUrl = `/api/invoices?tenantId=${user.tenantId}&companyId=${selectedCompanyId}`
+      // Construir la URL del API (los endpoints ordenan por fecha de creación descendente)
+      const params = new URLSearchParams({
+        tenantId: user.tenantId,
+        companyId: selectedCompanyId,
+        limit: String(PAGE_SIZE)
+      })
+      if (cursor) {
+        params.set('cursor', cursor)
+      }
+      if (search) {
+        params.set('search', search)
+      }
+
+      let apiUrl = `/api/invoices?${params.toString()}`
       
       if (documentType === 'tiquetes') {
-        apiUrl = `/api/tickets?tenantId=${user.tenantId}&companyId=${selectedCompanyId}`
+        apiUrl = `/api/tickets?${params.toString()}`
       } else if (documentType === 'notas-credito') {
-        apiUrl = `/api/credit-notes?tenantId=${user.tenantId}&companyId=${selectedCompanyId}`
+        apiUrl = `/api/credit-notes?${params.toString()}`
       }
 
       const response = await fetch(apiUrl)
@@ -105,6 +125,7 @@ export function useDocuments(documentType: DocumentType) {
       }
 
       const data = await response.json()
+      if (requestId !== requestIdRef.current) return
       
       // Para facturas, filtrar por documentType si existe
       let filteredDocuments = data.documents || data.invoices || data.tickets || data.creditNotes || []
@@ -116,29 +137,57 @@ export function useDocuments(documentType: DocumentType) {
         )
       }
 
-      // Ordenar por consecutivo descendente para notas de crédito
-      if (documentType === 'notas-credito') {
-        filteredDocuments.sort((a: any, b: any) => {
-          const consecutivoA = a.consecutivo || ''
-          const consecutivoB = b.consecutivo || ''
-          
-          // Extraer número del consecutivo para comparación numérica
-          const numeroA = parseInt(consecutivoA.replace(/[^\d]/g, '')) || 0
-          const numeroB = parseInt(consecutivoB.replace(/[^\d]/g, '')) || 0
-          
-          return numeroB - numeroA // Descendente: mayor primero
-        })
-      }
-
-      setDocuments(filteredDocuments)
+      setDocuments(prev => cursor ? [...prev, ...filteredDocuments] : filteredDocuments)
+      setNextCursor(data.nextCursor || null)
+      setHasMore(!!data.hasMore)
     } catch (err) {
       console.error('Error al obtener documentos:', err)
       setError(err instanceof Error ? err.message : 'Error desconocido')
     } finally {
-      setLoading(false)
+      if (requestId === requestIdRef.current) {
+        setLoading(false)
+      }
+    }
+  }, [documentType, search, checkAuthData])
+
+  // Totales de la empresa desde los resúmenes del servidor (no dependen de las páginas cargadas)
+  const fetchTotals = useCallback(async () => {
+    try {
+      if (!checkAuthData() || documentType === 'notas-debito') {
+        setTotals(null)
+        return
+      }
+
+      const user = JSON.parse(localStorage.getItem('user') || '{}')
+      const selectedCompanyId = localStorage.getItem('selectedCompanyId')
+      const params = new URLSearchParams({
+        tenantId: user.tenantId,
+        companyId: selectedCompanyId || '',
+        documentType
+      })
+
+      const response = await fetch(`/api/documents/totals?${params.toString()}`)
+      if (!response.ok) {
+        throw new Error('Error al obtener totales')
+      }
+
+      const data = await response.json()
+      setTotals(data.totals || null)
+    } catch (err) {
+      console.error('Error al obtener totales de documentos:', err)
+      setTotals(null)
     }
   }, [documentType, checkAuthData])
 
+  const fetchDocuments = useCallback(async () => {
+    await Promise.all([fetchPage(null), fetchTotals()])
+  }, [fetchPage, fetchTotals])
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loading) return
+    await fetchPage(nextCursor)
+  }, [fetchPage, nextCursor, loading])
+
   // Effect para verificar cuando los datos de autenticación estén disponibles
   useEffect(() => {
     const checkAndFetch = () => {
@@ -164,9 +213,12 @@ export function useDocuments(documentType: DocumentType) {
 
   return {
     documents,
+    totals,
     loading,
     error,
     isReady,
-    fetchDocuments
+    hasMore,
+    fetchDocuments,
+    loadMore
   }
 }
@@ -0,0 +1,100 @@
+import { useState, useEffect, useRef, useCallback } from 'react'
+import { useAuth } from '@/lib/firebase-client'
+
+export type EntitySearchKind = 'clients' | 'products'
+
+interface UseEntitySearchOptions {
+  limit?: number
+  status?: string
+  debounceMs?: number
+}
+
+/**
+ * Búsqueda por prefijo contra /api/{clients|products}/search
+ * Espera a que el usuario deje de escribir y cancela la solicitud anterior
+ */
+export function useEntitySearch<T = any>(
+  kind: EntitySearchKind,
+  query: string,
+  { limit = 20, status, debounceMs = 150 }: UseEntitySearchOptions = {}
+) {
+  const [results, setResults] = useState<T[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<string | null>(null)
+  const abortRef = useRef<AbortController | null>(null)
+  const { user } = useAuth()
+
+  const runSearch = useCallback(async (cursor: string | null) => {
+    if (!user?.tenantId) {
+      setLoading(false)
+      return
+    }
+
+    abortRef.current?.abort()
+    const controller = new AbortController()
+    abortRef.current = controller
+
+    try {
+      setLoading(true)
+      setError(null)
+
+      const params = new URLSearchParams({
+        tenantId: user.tenantId,
+        q: query.trim(),
+        limit: String(limit)
+      })
+
+      const selectedCompanyId = localStorage.getItem('selectedCompanyId')
+      if (kind === 'clients' && selectedCompanyId) {
+        params.append('companyId', selectedCompanyId)
+      }
+      if (status) {
+        params.append('status', status)
+      }
+      if (cursor) {
+        params.append('cursor', cursor)
+      }
+
+      const response = await fetch(`/api/${kind}/search?${params}`, { signal: controller.signal })
+      const result = await response.json()
+
+      if (!response.ok) {
+        throw new Error(result.error || 'Error en la búsqueda')
+      }
+
+      const page: T[] = result[kind] || []
+      setResults(prev => (cursor ? [...prev, ...page] : page))
+      setNextCursor(result.nextCursor || null)
+    } catch (err) {
+      if (err instanceof Error && err.name === 'AbortError') return
+      console.error('Error en la búsqueda:', err)
+      setError(err instanceof Error ? err.message : 'Error desconocido')
+    } finally {
+      if (abortRef.current === controller) {
+        setLoading(false)
+      }
+    }
+  }, [user?.tenantId, kind, query, limit, status])
+
+  useEffect(() => {
+    const timer = setTimeout(() => runSearch(null), debounceMs)
+    return () => clearTimeout(timer)
+  }, [runSearch, debounceMs])
+
+  useEffect(() => () => abortRef.current?.abort(), [])
+
+  const loadMore = () => {
+    if (nextCursor && !loading) {
+      runSearch(nextCursor)
+    }
+  }
+
+  return {
+    results,
+    loading,
+    error,
+    hasMore: nextCursor !== null,
+    loadMore
+  }
+}
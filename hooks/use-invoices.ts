@@ -1,11 +1,15 @@
 import { useState, useEffect, useCallback } from 'react'
 import { Invoice } from '@/lib/invoice-types'
 
+const PAGE_SIZE = 50
+
 interface UseInvoicesReturn {
   invoices: Invoice[]
   loading: boolean
   error: string | null
+  hasMore: boolean
   fetchInvoices: () => Promise<void>
+  loadMore: () => Promise<void>
   createInvoice: (invoiceData: Partial<Invoice>) => Promise<string | null>
   isReady: boolean
 }
@@ -15,6 +19,8 @@ export function useInvoices(): UseInvoicesReturn {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [isReady, setIsReady] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [hasMore, setHasMore] = useState(false)
 
   const checkAuthData = useCallback(() => {
     try {
@@ -27,7 +33,8 @@ export function useInvoices(): UseInvoicesReturn {
     }
   }, [])
 
-  const fetchInvoices = useCallback(async () => {
+  // Carga una página; sin cursor reemplaza la lista, con cursor la extiende
+  const fetchPage = useCallback(async (cursor: string | null) => {
     try {
       setLoading(true)
       setError(null)
@@ -45,14 +52,26 @@ export function useInvoices(): UseInvoicesReturn {
         return
       }
 
-      const response = await fetch(`/api/invoices?tenantId=${user.tenantId}&companyId=${selectedCompanyId}`)
+      const params = new URLSearchParams({
+        tenantId: user.tenantId,
+        companyId: selectedCompanyId,
+        limit: String(PAGE_SIZE)
+      })
+      if (cursor) {
+        params.set('cursor', cursor)
+      }
+
+      const response = await fetch(`/api/invoices?${params.toString()}`)
       
       if (!response.ok) {
         throw new Error('Error al obtener facturas')
       }
 
       const data = await response.json()
-      setInvoices(data.invoices || [])
+      const page: Invoice[] = data.invoices || []
+      setInvoices(prev => cursor ? [...prev, ...page] : page)
+      setNextCursor(data.nextCursor || null)
+      setHasMore(!!data.hasMore)
     } catch (err) {
       console.error('❌ Error al obtener facturas:', err)
       setError(err instanceof Error ? err.message : 'Error desconocido')
@@ -61,6 +80,13 @@ export function useInvoices(): UseInvoicesReturn {
     }
   }, [checkAuthData])
 
+  const fetchInvoices = useCallback(() => fetchPage(null), [fetchPage])
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loading) return
+    await fetchPage(nextCursor)
+  }, [fetchPage, nextCursor, loading])
+
   const createInvoice = useCallback(async (invoiceData: Partial<Invoice>): Promise<string | null> => {
     try {
       setLoading(true)
@@ -121,7 +147,9 @@ export function useInvoices(): UseInvoicesReturn {
     invoices,
     loading,
     error,
+    hasMore,
     fetchInvoices,
+    loadMore,
     createInvoice,
     isReady
   }
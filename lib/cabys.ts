@@ -0,0 +1,174 @@
+/**
+ * Catálogo CABYS local
+ *
+ * Carga el índice generado por scripts/build-cabys-index.js (public/data/cabys/cabys-index.json)
+ * y resuelve búsquedas por prefijo de código o por palabras de la descripción sin
+ * tildes, más la consulta de un código en O(1). Se usa en el navegador (búsqueda en
+ * el formulario de productos) y en el servidor (validación de líneas en las rutas de creación).
+ */
+
+export interface CabysEntry {
+  codigo: string
+  descripcion: string
+  impuesto: number | null
+}
+
+export interface CabysIndexData {
+  version: number
+  generatedAt: string
+  source: string
+  count: number
+  codes: string[]
+  descriptions: string[]
+  taxes: (number | null)[]
+  tokens: Record<string, number[]> // Filas por palabra, codificadas por diferencias
+}
+
+export const CABYS_INDEX_URL = '/data/cabys/cabys-index.json'
+
+// Mantener en sincronía con scripts/build-cabys-index.js
+const STOPWORDS = new Set(['de', 'del', 'la', 'las', 'el', 'los', 'y', 'o', 'en', 'para', 'con', 'por', 'sin', 'al', 'a', 'e', 'u'])
+
+export function normalizeCabysText(text: string): string {
+  return (text || '')
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+}
+
+export function tokenizeCabysText(text: string): string[] {
+  return normalizeCabysText(text)
+    .split(/[^a-z0-9]+/)
+    .filter(token => token.length >= 2 && !STOPWORDS.has(token))
+}
+
+export class CabysIndex {
+  private readonly byCode = new Map<string, number>()
+  private readonly tokenKeys: string[]
+  private readonly postings: Int32Array[]
+
+  constructor(private readonly data: CabysIndexData) {
+    data.codes.forEach((code, index) => this.byCode.set(code, index))
+
+    // Palabras ordenadas para resolver prefijos con búsqueda binaria
+    this.tokenKeys = Object.keys(data.tokens).sort()
+    this.postings = this.tokenKeys.map(token => {
+      const deltas = data.tokens[token]
+      const rows = new Int32Array(deltas.length)
+      let current = 0
+      for (let i = 0; i < deltas.length; i++) {
+        current += deltas[i]
+        rows[i] = current
+      }
+      return rows
+    })
+  }
+
+  get size(): number {
+    return this.data.codes.length
+  }
+
+  has(code: string): boolean {
+    return this.byCode.has((code || '').trim())
+  }
+
+  lookup(code: string): CabysEntry | null {
+    const index = this.byCode.get((code || '').trim())
+    return index === undefined ? null : this.entry(index)
+  }
+
+  /**
+   * Busca por prefijo de código (si la consulta es numérica) o por palabras de la
+   * descripción; cada palabra de la consulta se toma como prefijo y deben cumplirse todas
+   */
+  search(queryText: string, limit: number = 20): CabysEntry[] {
+    const queryValue = (queryText || '').trim()
+    if (!queryValue) return []
+
+    if (/^\d+$/.test(queryValue)) {
+      return this.searchByCodePrefix(queryValue, limit)
+    }
+
+    const terms = Array.from(new Set(tokenizeCabysText(queryValue)))
+    if (terms.length === 0) return []
+
+    const candidateSets = terms.map(term => this.rowsForPrefix(term))
+    candidateSets.sort((a, b) => a.size - b.size)
+
+    const results: CabysEntry[] = []
+    const [smallest, ...rest] = candidateSets
+    const rows = Array.from(smallest).sort((a, b) => a - b)
+    for (const row of rows) {
+      if (rest.every(set => set.has(row))) {
+        results.push(this.entry(row))
+        if (results.length >= limit) break
+      }
+    }
+    return results
+  }
+
+  private searchByCodePrefix(prefix: string, limit: number): CabysEntry[] {
+    const codes = this.data.codes
+    let low = 0
+    let high = codes.length
+    while (low < high) {
+      const mid = (low + high) >> 1
+      if (codes[mid] < prefix) low = mid + 1
+      else high = mid
+    }
+
+    const results: CabysEntry[] = []
+    for (let i = low; i < codes.length && results.length < limit && codes[i].startsWith(prefix); i++) {
+      results.push(this.entry(i))
+    }
+    return results
+  }
+
+  private rowsForPrefix(prefix: string): Set<number> {
+    const keys = this.tokenKeys
+    let low = 0
+    let high = keys.length
+    while (low < high) {
+      const mid = (low + high) >> 1
+      if (keys[mid] < prefix) low = mid + 1
+      else high = mid
+    }
+
+    const rows = new Set<number>()
+    for (let i = low; i < keys.length && keys[i].startsWith(prefix); i++) {
+      this.postings[i].forEach(row => rows.add(row))
+    }
+    return rows
+  }
+
+  private entry(index: number): CabysEntry {
+    return {
+      codigo: this.data.codes[index],
+      descripcion: this.data.descriptions[index],
+      impuesto: this.data.taxes[index] ?? null
+    }
+  }
+}
+
+let clientIndexPromise: Promise<CabysIndex> | null = null
+
+/**
+ * Carga el índice en el navegador (una sola descarga por sesión)
+ */
+export function loadCabysIndex(): Promise<CabysIndex> {
+  if (!clientIndexPromise) {
+    clientIndexPromise = fetch(CABYS_INDEX_URL)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error('No se pudo cargar el catálogo CABYS')
+        }
+        return response.json()
+      })
+      .then((data: CabysIndexData) => new CabysIndex(data))
+      .catch(error => {
+        clientIndexPromise = null
+        throw error
+      })
+  }
+  return clientIndexPromise
+}
@@ -4,7 +4,6 @@
  */
 
 import { CertificateValidationResult } from './company-wizard-types'
-import * as forge from 'node-forge'
 
 export class CertificateValidator {
   /**
@@ -167,6 +166,9 @@ export class CertificateValidator {
       const uint8Array = new Uint8Array(arrayBuffer)
       const base64String = btoa(String.fromCharCode(...uint8Array))
       
+      // node-forge solo se carga al validar un certificado
+      const { default: forge } = await import('node-forge')
+
       try {
         // Intentar parsear el certificado PKCS#12
         const p12Der = forge.util.decode64(base64String)
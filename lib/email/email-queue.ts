@@ -1,18 +1,68 @@
 /**
  * Sistema de cola para manejo inteligente de rebotes intermitentes
  * Especialmente diseñado para Gmail y otros proveedores estrictos
+ *
+ * Cada proveedor (gmail / outlook / icloud / other) tiene su propia cola,
+ * su propio límite de envíos simultáneos y un token bucket que limita los
+ * envíos por segundo, así un proveedor lento o estricto no frena a los demás.
+ *
+ * Por proveedor hay dos montículos: uno por hora de reintento (en espera) y
+ * otro por prioridad (listos). Al despachar solo se mueven los correos que ya
+ * vencieron, sin recorrer la cola completa, y un temporizador por proveedor
+ * despierta la cola en el próximo reintento o cuando haya un token disponible.
+ *
+ * Con un EmailQueueStore los correos pendientes sobreviven a un reinicio. Cada
+ * RESTORE_INTERVAL_MS (al agregar o drenar, y con un temporizador) la instancia
+ * recupera hasta RESTORE_LIMIT pendientes cuyo arriendo venció, así también toma
+ * los de una instancia que murió. Antes de cada intento el correo se arrienda en
+ * el almacenamiento (`claim`) y solo la instancia dueña lo envía.
+ *
+ * Los correos de aprobación de comprobantes no guardan el mensaje armado: la
+ * cola guarda la referencia al documento (`ApprovalEmailJob`) y el PDF y los
+ * XML se vuelven a generar en cada intento con `approvalSender`. Para no perder
+ * el correo entre el reclamo del comprobante y el alta en la cola, se arma con
+ * `buildApprovalEmail`, se guarda con `saveInTransaction` en la misma transacción
+ * del reclamo y se entrega después con `enqueueSaved`.
  */
 
-import { EmailMessage, EmailSendResult } from './types'
+import {
+  Firestore,
+  Transaction,
+  collection,
+  doc,
+  query,
+  where,
+  orderBy,
+  limit,
+  serverTimestamp
+} from 'firebase/firestore'
+import { getDocs, setDoc, runTransaction, writeBatch } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { MinHeap } from '@/lib/min-heap'
+import { EmailAttachment, EmailMessage, EmailSendResult } from './types'
+import { getHybridEmailService } from './hybrid-email-service'
+
+type EmailProvider = 'gmail' | 'icloud' | 'outlook' | 'other'
+type EmailPriority = 'high' | 'normal' | 'low'
 
-interface QueuedEmail {
+/**
+ * Correo de aprobación de un comprobante, por referencia
+ */
+export interface ApprovalEmailJob {
+  collection: 'invoices' | 'tickets' | 'creditNotes'
+  documentId: string
+}
+
+export interface QueuedEmail {
   id: string
-  message: EmailMessage
+  message: EmailMessage // En correos de aprobación solo trae los destinatarios
+  approval?: ApprovalEmailJob
   attempts: number
   lastAttempt: Date
   nextRetry: Date
-  priority: 'high' | 'normal' | 'low'
-  provider: 'gmail' | 'icloud' | 'outlook' | 'other'
+  priority: EmailPriority
+  provider: EmailProvider
+  createdAt: Date
 }
 
 interface QueueStats {
@@ -24,49 +74,253 @@ interface QueueStats {
   byProvider: Record<string, number>
 }
 
+export interface ProviderLimits {
+  concurrency: number // Envíos simultáneos
+  ratePerSecond: number // Reposición del token bucket
+  burst: number // Capacidad del token bucket
+}
+
+export type EmailClaimResult = { claimed: true } | { claimed: false; retryAt?: number }
+
+/**
+ * Almacenamiento persistente de la cola
+ */
+export interface EmailQueueStore {
+  save(email: QueuedEmail): Promise<void>
+  // Solo correos sin adjuntos (los de aprobación), dentro de una transacción del llamador
+  saveInTransaction?(transaction: Transaction, email: QueuedEmail): void
+  complete(id: string, outcome: 'sent' | 'failed'): Promise<void>
+  // Hasta `max` pendientes por hora de reintento, sin los arrendados vigentes de otra instancia
+  loadPending(max: number): Promise<QueuedEmail[]>
+  // Arrienda el correo a `owner` por `leaseMs`; sin retryAt, el correo ya no está pendiente
+  claim(id: string, owner: string, leaseMs: number): Promise<EmailClaimResult>
+}
+
+export interface EmailQueueOptions {
+  sender?: (message: EmailMessage) => Promise<EmailSendResult>
+  approvalSender?: (job: ApprovalEmailJob) => Promise<EmailSendResult>
+  onFailed?: (email: QueuedEmail, error: string) => void
+  store?: EmailQueueStore
+  limits?: Partial<Record<EmailProvider, Partial<ProviderLimits>>>
+}
+
+const PROVIDERS: EmailProvider[] = ['gmail', 'icloud', 'outlook', 'other']
+
+const DEFAULT_LIMITS: Record<EmailProvider, ProviderLimits> = {
+  gmail: { concurrency: 3, ratePerSecond: 2, burst: 10 },
+  icloud: { concurrency: 2, ratePerSecond: 1, burst: 5 },
+  outlook: { concurrency: 4, ratePerSecond: 3, burst: 10 },
+  other: { concurrency: 6, ratePerSecond: 5, burst: 20 }
+}
+
+const PRIORITY_ORDER: Record<EmailPriority, number> = { high: 0, normal: 1, low: 2 }
+
+// Un intento de envío (con el render del PDF en los de aprobación) cabe holgado en este arriendo
+const CLAIM_LEASE_MS = 5 * 60 * 1000
+// Recuperación periódica de pendientes del almacenamiento
+const RESTORE_INTERVAL_MS = 60 * 1000
+const RESTORE_LIMIT = 200
+
+interface ProviderLane {
+  limits: ProviderLimits
+  waiting: MinHeap<QueuedEmail> // Por hora de reintento
+  ready: MinHeap<QueuedEmail> // Por prioridad y antigüedad
+  active: number
+  tokens: number
+  lastRefill: number
+  timer: ReturnType<typeof setTimeout> | null
+  timerAt: number
+}
+
 export class EmailQueue {
   private queue: Map<string, QueuedEmail> = new Map()
   private processing: Set<string> = new Set()
-  private stats: QueueStats = {
-    total: 0,
-    pending: 0,
-    processing: 0,
-    failed: 0,
-    successful: 0,
-    byProvider: {}
+  private lanes: Record<EmailProvider, ProviderLane>
+  private pendingByProvider: Record<string, number> = {}
+  private stats = { failed: 0, successful: 0 }
+  private readonly sender: (message: EmailMessage) => Promise<EmailSendResult>
+  private readonly approvalSender?: (job: ApprovalEmailJob) => Promise<EmailSendResult>
+  private readonly onFailed?: (email: QueuedEmail, error: string) => void
+  private readonly store?: EmailQueueStore
+  private readonly instanceId =
+    `${process.env.HOSTNAME || 'local'}-${process.pid}-${Math.random().toString(36).slice(2, 8)}`
+  private lastErrors = new Map<string, string>()
+  private restoring: Promise<number> | null = null
+  private lastRestoreAt = 0
+
+  constructor(options: EmailQueueOptions = {}) {
+    this.sender = options.sender || (message => this.simulateEmailSend(message))
+    this.approvalSender = options.approvalSender
+    this.onFailed = options.onFailed
+    this.store = options.store
+
+    const lanes = {} as Record<EmailProvider, ProviderLane>
+    for (const provider of PROVIDERS) {
+      const limits = { ...DEFAULT_LIMITS[provider], ...(options.limits?.[provider] || {}) }
+      lanes[provider] = {
+        limits,
+        waiting: new MinHeap<QueuedEmail>((a, b) => a.nextRetry.getTime() - b.nextRetry.getTime()),
+        ready: new MinHeap<QueuedEmail>((a, b) =>
+          PRIORITY_ORDER[a.priority] - PRIORITY_ORDER[b.priority] ||
+          a.nextRetry.getTime() - b.nextRetry.getTime()
+        ),
+        active: 0,
+        tokens: limits.burst,
+        lastRefill: Date.now(),
+        timer: null,
+        timerAt: Infinity
+      }
+    }
+    this.lanes = lanes
   }
-  private isProcessing = false
 
   /**
    * Agrega un correo a la cola
    */
-  addEmail(message: EmailMessage, priority: 'high' | 'normal' | 'low' = 'normal'): string {
-    const id = `email-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`
-    const provider = this.detectProvider(message)
-    
-    const queuedEmail: QueuedEmail = {
-      id,
+  addEmail(message: EmailMessage, priority: EmailPriority = 'normal'): Promise<string> {
+    return this.add(message, priority)
+  }
+
+  /**
+   * Arma (sin guardar ni encolar) el correo de aprobación de un comprobante;
+   * `recipient` solo se usa para elegir el proveedor
+   */
+  buildApprovalEmail(
+    job: ApprovalEmailJob,
+    recipient?: string,
+    priority: EmailPriority = 'high',
+    delayMs: number = 0
+  ): QueuedEmail {
+    const message: EmailMessage = {
+      subject: `Comprobante aprobado ${job.collection}/${job.documentId}`,
+      body: { contentType: 'Text', content: '' },
+      toRecipients: recipient ? [{ emailAddress: recipient }] : []
+    }
+    return this.build(message, priority, job, delayMs)
+  }
+
+  /**
+   * Guarda el correo dentro de la transacción del llamador (sin almacenamiento no hace nada)
+   */
+  saveInTransaction(transaction: Transaction, email: QueuedEmail): void {
+    if (!this.store) return
+    if (!this.store.saveInTransaction) {
+      throw new Error('El almacenamiento de la cola no admite transacciones')
+    }
+    this.store.saveInTransaction(transaction, email)
+  }
+
+  /**
+   * Encola un correo ya guardado (p.ej. con saveInTransaction)
+   */
+  enqueueSaved(email: QueuedEmail): void {
+    this.restoreIfDue()
+    if (this.queue.has(email.id)) return
+    this.enqueue(email)
+    console.log(`📧 Email agregado a la cola: ${email.id} (${email.provider}, ${email.priority})`)
+  }
+
+  private build(message: EmailMessage, priority: EmailPriority, approval?: ApprovalEmailJob, delayMs: number = 0): QueuedEmail {
+    return {
+      id: `email-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`,
       message,
+      ...(approval ? { approval } : {}),
       attempts: 0,
       lastAttempt: new Date(),
-      nextRetry: new Date(), // Inmediato
+      nextRetry: new Date(Date.now() + delayMs),
       priority,
-      provider
+      provider: this.detectProvider(message),
+      createdAt: new Date()
     }
+  }
 
-    this.queue.set(id, queuedEmail)
-    this.updateStats()
-    
-    console.log(`📧 Email agregado a la cola: ${id} (${provider}, ${priority})`)
-    
-    // Iniciar procesamiento si no está activo
-    if (!this.isProcessing) {
-      this.startProcessing()
+  /**
+   * Guarda el correo antes de encolarlo, así no se pierde si la instancia se detiene
+   */
+  private async add(message: EmailMessage, priority: EmailPriority): Promise<string> {
+    this.restoreIfDue()
+    const queuedEmail = this.build(message, priority)
+    const { id, provider } = queuedEmail
+
+    if (this.store) {
+      try {
+        await this.store.save(queuedEmail)
+      } catch (error) {
+        // Se envía igual desde memoria; solo se pierde la recuperación tras un reinicio
+        console.error('❌ Error guardando email en la cola persistente:', error)
+      }
     }
+    // Una recuperación en curso pudo haberlo traído ya del almacenamiento
+    if (!this.queue.has(id)) {
+      this.enqueue(queuedEmail)
+    }
+
+    console.log(`📧 Email agregado a la cola: ${id} (${provider}, ${priority})`)
 
     return id
   }
 
+  /**
+   * Despacha lo pendiente durante un máximo de `maxMs` (para un cron en entornos serverless)
+   */
+  async drain(maxMs: number = 50 * 1000): Promise<QueueStats> {
+    const deadline = Date.now() + maxMs
+    await this.restoreIfDue()
+    while (Date.now() < deadline) {
+      for (const provider of PROVIDERS) {
+        this.dispatch(provider)
+      }
+      const nextRetry = Math.min(...PROVIDERS.map(provider => {
+        const lane = this.lanes[provider]
+        return lane.ready.size > 0 ? 0 : lane.waiting.peek()?.nextRetry.getTime() ?? Infinity
+      }))
+      if (this.processing.size === 0 && nextRetry > Date.now()) break
+      await new Promise(resolve => setTimeout(resolve, 100))
+    }
+    return this.getStats()
+  }
+
+  /**
+   * Recupera los correos pendientes del almacenamiento si pasó RESTORE_INTERVAL_MS desde la última vez
+   */
+  restoreIfDue(): Promise<number> {
+    if (this.restoring) {
+      return this.restoring
+    }
+    if (!this.store || Date.now() - this.lastRestoreAt < RESTORE_INTERVAL_MS) {
+      return Promise.resolve(0)
+    }
+
+    this.lastRestoreAt = Date.now()
+    this.restoring = this.restoreFromStore()
+      .catch(error => {
+        console.error('❌ Error recuperando la cola de correos:', error)
+        return 0
+      })
+      .finally(() => {
+        this.restoring = null
+      })
+    return this.restoring
+  }
+
+  private async restoreFromStore(): Promise<number> {
+    if (!this.store) return 0
+
+    const pending = await this.store.loadPending(RESTORE_LIMIT)
+    let restored = 0
+    for (const email of pending) {
+      if (!this.queue.has(email.id)) {
+        this.enqueue(email)
+        restored++
+      }
+    }
+
+    if (restored > 0) {
+      console.log(`🔄 ${restored} correos pendientes recuperados de la cola persistente`)
+    }
+    return restored
+  }
+
   /**
    * Detecta el proveedor principal del email
    */
@@ -87,127 +341,188 @@ export class EmailQueue {
     return 'other'
   }
 
+  private enqueue(email: QueuedEmail) {
+    this.queue.set(email.id, email)
+    this.pendingByProvider[email.provider] = (this.pendingByProvider[email.provider] || 0) + 1
+    this.lanes[email.provider].waiting.push(email)
+    this.dispatch(email.provider)
+  }
+
   /**
-   * Inicia el procesamiento de la cola
+   * Despacha los correos listos del proveedor respetando su concurrencia y su token bucket
    */
-  private async startProcessing() {
-    if (this.isProcessing) return
-    
-    this.isProcessing = true
-    console.log('🚀 Iniciando procesamiento de cola de correos...')
+  private dispatch(provider: EmailProvider) {
+    const lane = this.lanes[provider]
+    const now = Date.now()
 
-    while (this.queue.size > 0) {
-      try {
-        await this.processNextBatch()
-        
-        // Pequeña pausa entre lotes para no saturar
-        await new Promise(resolve => setTimeout(resolve, 1000))
-      } catch (error) {
-        console.error('Error procesando cola:', error)
-        await new Promise(resolve => setTimeout(resolve, 5000)) // Pausa más larga en caso de error
-      }
+    // Mover a "listos" solo los que ya vencieron
+    while (lane.waiting.size > 0 && lane.waiting.peek()!.nextRetry.getTime() <= now) {
+      lane.ready.push(lane.waiting.pop()!)
     }
 
-    this.isProcessing = false
-    console.log('✅ Procesamiento de cola completado')
-  }
+    this.refillTokens(lane, now)
 
-  /**
-   * Procesa el siguiente lote de correos
-   */
-  private async processNextBatch() {
-    const now = new Date()
-    const readyEmails = Array.from(this.queue.values())
-      .filter(email => email.nextRetry <= now)
-      .sort((a, b) => {
-        // Ordenar por prioridad y luego por tiempo de espera
-        const priorityOrder = { high: 0, normal: 1, low: 2 }
-        if (priorityOrder[a.priority] !== priorityOrder[b.priority]) {
-          return priorityOrder[a.priority] - priorityOrder[b.priority]
-        }
-        return a.nextRetry.getTime() - b.nextRetry.getTime()
-      })
+    while (lane.active < lane.limits.concurrency && lane.tokens >= 1 && lane.ready.size > 0) {
+      const email = lane.ready.pop()!
+      if (this.queue.get(email.id) !== email) continue // Eliminado con cleanup()
 
-    if (readyEmails.length === 0) {
-      // No hay emails listos, esperar un poco
-      await new Promise(resolve => setTimeout(resolve, 5000))
-      return
+      lane.tokens -= 1
+      lane.active++
+      this.processEmail(email).finally(() => {
+        lane.active--
+        this.dispatch(provider)
+      })
     }
 
-    // Procesar hasta 3 emails a la vez (para no saturar)
-    const batchSize = Math.min(3, readyEmails.length)
-    const batch = readyEmails.slice(0, batchSize)
+    this.scheduleWakeUp(provider, now)
+  }
 
-    console.log(`📦 Procesando lote de ${batch.length} correos`)
+  private refillTokens(lane: ProviderLane, now: number) {
+    const elapsed = (now - lane.lastRefill) / 1000
+    lane.tokens = Math.min(lane.limits.burst, lane.tokens + elapsed * lane.limits.ratePerSecond)
+    lane.lastRefill = now
+  }
 
-    // Procesar en paralelo
-    await Promise.allSettled(
-      batch.map(email => this.processEmail(email.id))
-    )
+  /**
+   * Programa el temporizador del proveedor: próximo token si hay correos listos,
+   * o el próximo reintento si todos están en espera
+   */
+  private scheduleWakeUp(provider: EmailProvider, now: number) {
+    const lane = this.lanes[provider]
+    let wakeAt = Infinity
+
+    if (lane.ready.size > 0 && lane.active < lane.limits.concurrency && lane.tokens < 1) {
+      wakeAt = now + ((1 - lane.tokens) / lane.limits.ratePerSecond) * 1000
+    } else if (lane.ready.size === 0 && lane.waiting.size > 0) {
+      wakeAt = lane.waiting.peek()!.nextRetry.getTime()
+    }
+    // Con los envíos simultáneos al máximo, el envío que termine vuelve a despachar
+
+    if (wakeAt === Infinity || (lane.timer && lane.timerAt <= wakeAt)) return
+
+    if (lane.timer) clearTimeout(lane.timer)
+    lane.timerAt = wakeAt
+    lane.timer = setTimeout(() => {
+      lane.timer = null
+      lane.timerAt = Infinity
+      this.dispatch(provider)
+    }, Math.max(0, wakeAt - now))
+    // No mantener vivo el proceso solo por la cola
+    ;(lane.timer as any).unref?.()
   }
 
   /**
    * Procesa un email individual
    */
-  private async processEmail(emailId: string) {
-    const queuedEmail = this.queue.get(emailId)
-    if (!queuedEmail) return
-
+  private async processEmail(queuedEmail: QueuedEmail) {
+    const emailId = queuedEmail.id
     this.processing.add(emailId)
-    this.updateStats()
 
     try {
+      if (this.store) {
+        const claim = await this.store.claim(emailId, this.instanceId, CLAIM_LEASE_MS)
+        if (!claim.claimed) {
+          this.yieldToOwner(queuedEmail, claim.retryAt)
+          return
+        }
+      }
+
       console.log(`📧 Procesando email: ${emailId} (intento ${queuedEmail.attempts + 1})`)
 
-      // Aquí llamarías al servicio de email real
-      // const result = await emailService.sendEmail(queuedEmail.message)
-      
-      // Por ahora, simulamos el envío
-      const result = await this.simulateEmailSend(queuedEmail)
+      const result = queuedEmail.approval
+        ? await this.sendApproval(queuedEmail.approval)
+        : await this.sender(queuedEmail.message)
 
       if (result.success) {
         // Éxito - remover de la cola
-        this.queue.delete(emailId)
+        this.finish(queuedEmail, 'sent')
         this.stats.successful++
         console.log(`✅ Email enviado exitosamente: ${emailId}`)
       } else {
         // Error - programar reintento
-        await this.scheduleRetry(emailId, result.error)
+        this.scheduleRetry(queuedEmail, result.error || 'Error desconocido')
       }
 
     } catch (error) {
       console.error(`❌ Error procesando email ${emailId}:`, error)
-      await this.scheduleRetry(emailId, error instanceof Error ? error.message : 'Error desconocido')
+      this.scheduleRetry(queuedEmail, error instanceof Error ? error.message : 'Error desconocido')
     } finally {
       this.processing.delete(emailId)
-      this.updateStats()
     }
   }
 
+  private sendApproval(job: ApprovalEmailJob): Promise<EmailSendResult> {
+    if (!this.approvalSender) {
+      throw new Error('La cola no tiene approvalSender para correos de aprobación')
+    }
+    return this.approvalSender(job)
+  }
+
   /**
-   * Programa un reintento para un email
+   * Otra instancia tiene el correo arrendado: volver a mirar cuando venza, por si murió.
+   * Si ya no está pendiente (la otra lo envió), se saca de la cola sin tocar el almacenamiento.
    */
-  private async scheduleRetry(emailId: string, error: string) {
-    const queuedEmail = this.queue.get(emailId)
-    if (!queuedEmail) return
+  private yieldToOwner(queuedEmail: QueuedEmail, retryAt?: number) {
+    if (this.queue.get(queuedEmail.id) !== queuedEmail) return
+
+    if (retryAt) {
+      queuedEmail.nextRetry = new Date(retryAt + Math.random() * 5000)
+      this.lanes[queuedEmail.provider].waiting.push(queuedEmail)
+    } else {
+      this.queue.delete(queuedEmail.id)
+      this.pendingByProvider[queuedEmail.provider]--
+    }
+  }
+
+  /**
+   * Programa un reintento para un email (se reinserta en el montículo de espera)
+   */
+  private scheduleRetry(queuedEmail: QueuedEmail, error: string) {
+    if (this.queue.get(queuedEmail.id) !== queuedEmail) return
 
     queuedEmail.attempts++
     queuedEmail.lastAttempt = new Date()
+    this.lastErrors.set(queuedEmail.id, error)
+
+    if (queuedEmail.attempts >= this.getMaxRetries(queuedEmail.provider)) {
+      // Máximo de intentos alcanzado - marcar como fallido
+      this.finish(queuedEmail, 'failed')
+      this.stats.failed++
+      console.log(`💀 Email fallido después de ${queuedEmail.attempts} intentos: ${queuedEmail.id}`)
+      return
+    }
 
     // Calcular próximo intento basado en el proveedor y número de intentos
     const nextRetryDelay = this.calculateRetryDelay(queuedEmail.provider, queuedEmail.attempts, error)
     queuedEmail.nextRetry = new Date(Date.now() + nextRetryDelay)
+    this.lanes[queuedEmail.provider].waiting.push(queuedEmail)
+    this.persist(queuedEmail)
 
-    if (queuedEmail.attempts >= this.getMaxRetries(queuedEmail.provider)) {
-      // Máximo de intentos alcanzado - marcar como fallido
-      this.queue.delete(emailId)
-      this.stats.failed++
-      console.log(`💀 Email fallido después de ${queuedEmail.attempts} intentos: ${emailId}`)
-    } else {
-      console.log(`⏰ Email reprogramado para ${queuedEmail.nextRetry.toLocaleTimeString()}: ${emailId} (intento ${queuedEmail.attempts + 1})`)
+    console.log(`⏰ Email reprogramado para ${queuedEmail.nextRetry.toLocaleTimeString()}: ${queuedEmail.id} (intento ${queuedEmail.attempts + 1})`)
+  }
+
+  private finish(queuedEmail: QueuedEmail, outcome: 'sent' | 'failed') {
+    this.queue.delete(queuedEmail.id)
+    this.pendingByProvider[queuedEmail.provider]--
+    const error = this.lastErrors.get(queuedEmail.id)
+    this.lastErrors.delete(queuedEmail.id)
+
+    if (outcome === 'failed' && this.onFailed) {
+      this.onFailed(queuedEmail, error || 'Correo descartado de la cola')
+    }
+    if (this.store) {
+      this.store.complete(queuedEmail.id, outcome).catch(storeError => {
+        console.error('❌ Error actualizando la cola persistente:', storeError)
+      })
     }
+  }
 
-    this.updateStats()
+  private persist(queuedEmail: QueuedEmail) {
+    if (this.store) {
+      this.store.save(queuedEmail).catch(error => {
+        console.error('❌ Error guardando email en la cola persistente:', error)
+      })
+    }
   }
 
   /**
@@ -227,7 +542,7 @@ export class EmailQueue {
 
     // Agregar jitter aleatorio (10-50% del delay base)
     const jitter = baseDelay * (0.1 + Math.random() * 0.4)
-    
+
     // Si es error 5.7.708 de Gmail, delay más largo
     if (provider === 'gmail' && error.includes('5.7.708')) {
       return baseDelay * 2 + jitter
@@ -250,14 +565,16 @@ export class EmailQueue {
   }
 
   /**
-   * Simula el envío de un email (reemplazar con el servicio real)
+   * Simula el envío de un email (se usa si no se indica un `sender`)
    */
-  private async simulateEmailSend(queuedEmail: QueuedEmail): Promise<EmailSendResult> {
+  private async simulateEmailSend(message: EmailMessage): Promise<EmailSendResult> {
+    const provider = this.detectProvider(message)
+
     // Simular delay de red
     await new Promise(resolve => setTimeout(resolve, 1000 + Math.random() * 2000))
 
-    // Simular éxito/fallo basado en el proveedor y intentos
-    const successRate = this.getSuccessRate(queuedEmail.provider, queuedEmail.attempts)
+    // Simular éxito/fallo basado en el proveedor
+    const successRate = { gmail: 0.7, icloud: 0.6, outlook: 0.9, other: 0.8 }[provider]
     const isSuccess = Math.random() < successRate
 
     if (isSuccess) {
@@ -266,7 +583,7 @@ export class EmailQueue {
         success: true,
         statusCode: 202,
         sentAt: new Date(),
-        deliveredTo: queuedEmail.message.toRecipients.map(r => r.emailAddress),
+        deliveredTo: message.toRecipients.map(r => r.emailAddress),
         failedTo: []
       }
     } else {
@@ -278,7 +595,7 @@ export class EmailQueue {
         other: ['550 5.1.1 User unknown', '550 5.2.1 Mailbox unavailable']
       }
 
-      const providerErrors = errors[queuedEmail.provider]
+      const providerErrors = errors[provider]
       const randomError = providerErrors[Math.floor(Math.random() * providerErrors.length)]
 
       return {
@@ -288,47 +605,27 @@ export class EmailQueue {
         statusCode: 550,
         sentAt: new Date(),
         deliveredTo: [],
-        failedTo: queuedEmail.message.toRecipients.map(r => r.emailAddress)
+        failedTo: message.toRecipients.map(r => r.emailAddress)
       }
     }
   }
 
-  /**
-   * Obtiene la tasa de éxito basada en el proveedor y número de intentos
-   */
-  private getSuccessRate(provider: QueuedEmail['provider'], attempt: number): number {
-    const baseRates = {
-      gmail: [0.7, 0.8, 0.85, 0.9, 0.95], // Mejora con cada intento
-      icloud: [0.6, 0.7, 0.8, 0.9],
-      outlook: [0.9, 0.95, 0.98],
-      other: [0.8, 0.9, 0.95]
-    }
-
-    const rates = baseRates[provider]
-    const rateIndex = Math.min(attempt - 1, rates.length - 1)
-    return rates[rateIndex]
-  }
-
-  /**
-   * Actualiza las estadísticas de la cola
-   */
-  private updateStats() {
-    this.stats.total = this.queue.size + this.processing.size + this.stats.failed + this.stats.successful
-    this.stats.pending = this.queue.size
-    this.stats.processing = this.processing.size
-
-    // Actualizar estadísticas por proveedor
-    this.stats.byProvider = {}
-    for (const email of this.queue.values()) {
-      this.stats.byProvider[email.provider] = (this.stats.byProvider[email.provider] || 0) + 1
-    }
-  }
-
   /**
    * Obtiene estadísticas de la cola
    */
   getStats(): QueueStats {
-    return { ...this.stats }
+    const byProvider: Record<string, number> = {}
+    for (const [provider, count] of Object.entries(this.pendingByProvider)) {
+      if (count > 0) byProvider[provider] = count
+    }
+    return {
+      total: this.queue.size + this.stats.failed + this.stats.successful,
+      pending: this.queue.size,
+      processing: this.processing.size,
+      failed: this.stats.failed,
+      successful: this.stats.successful,
+      byProvider
+    }
   }
 
   /**
@@ -346,15 +643,15 @@ export class EmailQueue {
   }
 
   /**
-   * Limpia emails antiguos de la cola
+   * Limpia emails antiguos de la cola (las entradas en los montículos se descartan al salir)
    */
   cleanup(maxAgeHours: number = 24) {
     const cutoff = new Date(Date.now() - maxAgeHours * 60 * 60 * 1000)
     let cleaned = 0
 
-    for (const [id, email] of this.queue.entries()) {
-      if (email.lastAttempt < cutoff) {
-        this.queue.delete(id)
+    for (const email of Array.from(this.queue.values())) {
+      if (email.lastAttempt < cutoff && !this.processing.has(email.id)) {
+        this.finish(email, 'failed')
         this.stats.failed++
         cleaned++
       }
@@ -362,17 +659,228 @@ export class EmailQueue {
 
     if (cleaned > 0) {
       console.log(`🧹 Limpieza: ${cleaned} emails antiguos removidos`)
-      this.updateStats()
     }
   }
 }
 
+/**
+ * Cola persistente en Firestore (`emailQueue/{id}`); los correos enviados o
+ * fallidos quedan con su estado final en lugar de borrarse.
+ *
+ * El contenido de los adjuntos no va en el documento del correo (un PDF más sus
+ * XML en base64 pasan fácilmente el límite de 1 MiB por documento): se guarda
+ * en partes en `emailQueue/{id}/attachmentChunks` y se borra al terminar.
+ */
+export class FirestoreEmailQueueStore implements EmailQueueStore {
+  private static readonly COLLECTION_NAME = 'emailQueue'
+  private static readonly CHUNK_SIZE = 900 * 1024 // Caracteres base64 por parte
+  private readonly savedAttachments = new Set<string>()
+
+  constructor(private readonly db: Firestore) {}
+
+  async save(email: QueuedEmail): Promise<void> {
+    const attachments = email.message.attachments || []
+
+    if (attachments.length > 0 && !this.savedAttachments.has(email.id)) {
+      await this.saveAttachmentChunks(email.id, attachments)
+      this.savedAttachments.add(email.id)
+    }
+
+    // merge: los campos del arriendo (leaseOwner/leaseUntil) no se pisan en los reintentos
+    await setDoc(this.ref(email.id), this.toDocument(email), { merge: true })
+  }
+
+  saveInTransaction(transaction: Transaction, email: QueuedEmail): void {
+    if (email.message.attachments?.length) {
+      throw new Error('Los correos con adjuntos no se pueden guardar en una transacción')
+    }
+    transaction.set(this.ref(email.id), this.toDocument(email))
+  }
+
+  private ref(id: string) {
+    return doc(this.db, FirestoreEmailQueueStore.COLLECTION_NAME, id)
+  }
+
+  private toDocument(email: QueuedEmail) {
+    const message = {
+      ...email.message,
+      attachments: (email.message.attachments || []).map(({ contentBytes, ...attachment }) => ({
+        ...attachment,
+        chunks: Math.ceil(contentBytes.length / FirestoreEmailQueueStore.CHUNK_SIZE)
+      }))
+    }
+
+    return {
+      ...(email.approval ? { approval: email.approval } : {}),
+      message: JSON.parse(JSON.stringify(message)), // Firestore no acepta campos undefined
+      attempts: email.attempts,
+      lastAttempt: email.lastAttempt,
+      nextRetry: email.nextRetry,
+      priority: email.priority,
+      provider: email.provider,
+      createdAt: email.createdAt,
+      status: 'pending'
+    }
+  }
+
+  async complete(id: string, outcome: 'sent' | 'failed'): Promise<void> {
+    this.savedAttachments.delete(id)
+    await setDoc(this.ref(id), {
+      status: outcome,
+      completedAt: serverTimestamp()
+    }, { merge: true })
+    await this.deleteAttachmentChunks(id)
+  }
+
+  async claim(id: string, owner: string, leaseMs: number): Promise<EmailClaimResult> {
+    const ref = this.ref(id)
+    return runTransaction(this.db, async (transaction): Promise<EmailClaimResult> => {
+      const snap = await transaction.get(ref)
+      if (!snap.exists()) {
+        // Se guardó solo en memoria (falló el alta): lo envía esta instancia
+        return { claimed: true }
+      }
+      const data: any = snap.data()
+      if (data.status !== 'pending') {
+        return { claimed: false }
+      }
+      if (data.leaseOwner && data.leaseOwner !== owner && data.leaseUntil > Date.now()) {
+        return { claimed: false, retryAt: data.leaseUntil }
+      }
+      transaction.update(ref, { leaseOwner: owner, leaseUntil: Date.now() + leaseMs })
+      return { claimed: true }
+    })
+  }
+
+  async loadPending(max: number): Promise<QueuedEmail[]> {
+    const snapshot = await getDocs(query(
+      collection(this.db, FirestoreEmailQueueStore.COLLECTION_NAME),
+      where('status', '==', 'pending'),
+      orderBy('nextRetry'),
+      limit(max)
+    ))
+    // Los arrendados vigentes los está enviando otra instancia: no se cargan (ni sus adjuntos)
+    const now = Date.now()
+    const available = snapshot.docs.filter(snap => !(snap.data().leaseUntil > now))
+
+    const pending = await Promise.all(available.map(async (snap): Promise<QueuedEmail | null> => {
+      const data: any = snap.data()
+      const toDate = (value: any) => value?.toDate ? value.toDate() : new Date(value)
+      const message: EmailMessage = data.message
+
+      if (message.attachments?.length) {
+        try {
+          message.attachments = await this.loadAttachments(snap.id, message.attachments)
+          this.savedAttachments.add(snap.id)
+        } catch (error) {
+          console.error('❌ Correo pendiente sin adjuntos completos, no se recupera:', snap.id, error)
+          return null
+        }
+      }
+
+      return {
+        id: snap.id,
+        message,
+        ...(data.approval ? { approval: data.approval } : {}),
+        attempts: data.attempts || 0,
+        lastAttempt: toDate(data.lastAttempt),
+        nextRetry: toDate(data.nextRetry),
+        priority: data.priority || 'normal',
+        provider: data.provider || 'other',
+        createdAt: toDate(data.createdAt)
+      }
+    }))
+    return pending.filter((email): email is QueuedEmail => email !== null)
+  }
+
+  private chunksRef(id: string) {
+    return collection(this.db, FirestoreEmailQueueStore.COLLECTION_NAME, id, 'attachmentChunks')
+  }
+
+  private async saveAttachmentChunks(id: string, attachments: EmailAttachment[]): Promise<void> {
+    const size = FirestoreEmailQueueStore.CHUNK_SIZE
+    let batch = writeBatch(this.db)
+    let batchBytes = 0
+
+    for (const [index, attachment] of attachments.entries()) {
+      for (let part = 0; part * size < attachment.contentBytes.length; part++) {
+        const data = attachment.contentBytes.slice(part * size, (part + 1) * size)
+        // Un lote de escritura tampoco puede pasar ~10 MiB
+        if (batchBytes + data.length > 8 * 1024 * 1024) {
+          await batch.commit()
+          batch = writeBatch(this.db)
+          batchBytes = 0
+        }
+        batch.set(doc(this.chunksRef(id), `${index}-${part}`), { attachment: index, part, data })
+        batchBytes += data.length
+      }
+    }
+
+    await batch.commit()
+  }
+
+  private async loadAttachments(id: string, attachments: any[]): Promise<EmailAttachment[]> {
+    const snapshot = await getDocs(this.chunksRef(id))
+    const parts = new Map<string, string>()
+    snapshot.forEach(chunk => parts.set(chunk.id, chunk.data().data))
+
+    return attachments.map(({ chunks, ...attachment }, index) => {
+      let contentBytes = ''
+      for (let part = 0; part < (chunks || 0); part++) {
+        const data = parts.get(`${index}-${part}`)
+        if (data === undefined) {
+          throw new Error(`Falta la parte ${part} del adjunto ${attachment.name} del correo ${id}`)
+        }
+        contentBytes += data
+      }
+      return { ...attachment, contentBytes }
+    })
+  }
+
+  private async deleteAttachmentChunks(id: string): Promise<void> {
+    const snapshot = await getDocs(this.chunksRef(id))
+    if (snapshot.empty) return
+    const batch = writeBatch(this.db)
+    snapshot.forEach(chunk => batch.delete(chunk.ref))
+    await batch.commit()
+  }
+}
+
 // Instancia singleton
 let emailQueueInstance: EmailQueue | null = null
 
+/**
+ * Cola del proceso: envía con HybridEmailService y los correos de aprobación con
+ * InvoiceEmailService. Persiste los pendientes en Firestore y los recupera al
+ * iniciar y luego periódicamente, salvo con EMAIL_QUEUE_STORE=memory.
+ */
 export function getEmailQueue(): EmailQueue {
   if (!emailQueueInstance) {
-    emailQueueInstance = new EmailQueue()
+    let store: EmailQueueStore | undefined
+    if (process.env.EMAIL_QUEUE_STORE !== 'memory') {
+      store = new FirestoreEmailQueueStore(getFirestoreDb())
+    }
+
+    emailQueueInstance = new EmailQueue({
+      sender: message => getHybridEmailService().sendEmail(message),
+      // El servicio de aprobación (y el render de PDF) se carga solo si hay correos de aprobación
+      approvalSender: async job => (await import('@/lib/services/approval-email')).sendApprovalEmailJob(job),
+      onFailed: (email, error) => {
+        if (!email.approval) return
+        import('@/lib/services/approval-email')
+          .then(({ markApprovalEmailFailed }) => markApprovalEmailFailed(email.approval!, error))
+          .catch(markError => console.error('❌ Error registrando correo de aprobación fallido:', markError))
+      },
+      store
+    })
+
+    if (store) {
+      const queue = emailQueueInstance
+      queue.restoreIfDue()
+      // Sin tráfico propio también toma los pendientes de instancias que murieron
+      const restoreTimer = setInterval(() => queue.restoreIfDue(), RESTORE_INTERVAL_MS)
+      ;(restoreTimer as any).unref?.()
+    }
   }
   return emailQueueInstance
 }
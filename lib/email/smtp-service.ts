@@ -3,7 +3,7 @@
  * Alternativa robusta a Microsoft Graph para mejor entrega
  */
 
-import nodemailer from 'nodemailer'
+import type { Transporter } from 'nodemailer'
 import { 
   EmailMessage, 
   EmailAttachment, 
@@ -25,7 +25,7 @@ export interface SMTPConfig {
 
 export class SMTPService {
   private config: SMTPConfig
-  private transporter: nodemailer.Transporter | null = null
+  private transporter: Transporter | null = null
 
   constructor(config: SMTPConfig) {
     this.config = config
@@ -34,11 +34,13 @@ export class SMTPService {
   /**
    * Inicializa el transporter SMTP
    */
-  private async getTransporter(): Promise<nodemailer.Transporter> {
+  private async getTransporter(): Promise<Transporter> {
     if (this.transporter) {
       return this.transporter
     }
 
+    // nodemailer se carga con el primer envío
+    const { default: nodemailer } = await import('nodemailer')
     this.transporter = nodemailer.createTransporter({
       host: this.config.host,
       port: this.config.port,
@@ -0,0 +1,31 @@
+/**
+ * Inicialización compartida de Firebase
+ *
+ * Rutas de API, servicios y cliente usan la misma app y la misma instancia de
+ * Firestore, creadas en la primera llamada a getFirebaseApp/getFirestoreDb y
+ * reutilizadas mientras el proceso siga vivo. Importar este módulo no inicializa
+ * nada, pero las rutas de API llaman a getFirestoreDb() al cargarse
+ * (`const db = getFirestoreDb()`), así que en la práctica Firestore se inicializa al
+ * importar la primera ruta; lo que se evita es repetir la inicialización en cada una.
+ */
+
+import { FirebaseApp, initializeApp, getApps } from 'firebase/app'
+import { Firestore, getFirestore } from 'firebase/firestore'
+import { firebaseConfig } from './firebase-config'
+
+let firebaseApp: FirebaseApp | null = null
+let firestoreDb: Firestore | null = null
+
+export function getFirebaseApp(): FirebaseApp {
+  if (!firebaseApp) {
+    firebaseApp = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
+  }
+  return firebaseApp
+}
+
+export function getFirestoreDb(): Firestore {
+  if (!firestoreDb) {
+    firestoreDb = getFirestore(getFirebaseApp())
+  }
+  return firestoreDb
+}
@@ -1,10 +1,6 @@
 "use client"
 
-import { 
-  initializeApp, 
-  getApps,
-  FirebaseApp 
-} from 'firebase/app'
+import { FirebaseApp } from 'firebase/app'
 import { 
   getAuth, 
   signInWithEmailAndPassword, 
@@ -18,18 +14,18 @@ import {
   updatePassword
 } from 'firebase/auth'
 import { 
-  getFirestore, 
   doc, 
   getDoc, 
   updateDoc,
   Timestamp 
 } from 'firebase/firestore'
-import { firebaseConfig, User } from './firebase-config'
+import { User } from './firebase-config'
+import { getFirebaseApp, getFirestoreDb } from './firebase-app'
 
 // Initialize Firebase
-const app: FirebaseApp = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
+const app: FirebaseApp = getFirebaseApp()
 const auth = getAuth(app)
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 // Configure auth persistence
 setPersistence(auth, browserLocalPersistence).catch((error) => {
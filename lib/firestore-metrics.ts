@@ -0,0 +1,493 @@
+/**
+ * Instrumentación de lecturas y escrituras en Firestore
+ *
+ * Reemplaza a las funciones de 'firebase/firestore' que tocan la base de datos
+ * (getDoc, getDocs, getCountFromServer, setDoc, updateDoc, addDoc, deleteDoc,
+ * runTransaction y writeBatch) y, con FIRESTORE_METRICS=1, registra por ruta y por
+ * punto de llamada: documentos leídos y escritos, histograma de latencia y tamaño
+ * del resultado. Las rutas envueltas con `withFirestoreMetrics` devuelven además el
+ * encabezado X-Firestore-Trace con el costo de la solicitud.
+ *
+ * Sin la variable, las funciones exportadas son las originales del SDK y
+ * `withFirestoreMetrics` devuelve el handler sin cambios (sin costo adicional).
+ *
+ * Lecturas facturables: getDoc = 1, getDocs = documentos devueltos (mínimo 1),
+ * getCountFromServer = 1 por cada 1000 documentos contados (mínimo 1).
+ */
+
+import { AsyncLocalStorage } from 'async_hooks'
+import * as firestore from 'firebase/firestore'
+
+export const FIRESTORE_METRICS_ENABLED =
+  process.env.FIRESTORE_METRICS === '1' || process.env.FIRESTORE_METRICS === 'true'
+
+export const FIRESTORE_TRACE_HEADER = 'X-Firestore-Trace'
+
+// Límites superiores de los histogramas (el último cubre el resto)
+const LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, Infinity]
+const RESULT_SIZE_BUCKETS = [0, 1, 10, 50, 100, 500, 1000, Infinity]
+
+// Evita que un punto de llamada dinámico haga crecer el registro sin límite
+const MAX_CALL_SITES = 500
+const NO_ROUTE = '(sin ruta)'
+
+export type FirestoreOperation =
+  | 'getDoc'
+  | 'getDocs'
+  | 'getCountFromServer'
+  | 'setDoc'
+  | 'updateDoc'
+  | 'addDoc'
+  | 'deleteDoc'
+  | 'transaction'
+  | 'batch'
+
+export interface HistogramSnapshot {
+  count: number
+  sum: number
+  max: number
+  buckets: { le: number | '+Inf'; count: number }[]
+}
+
+export interface RouteMetricsSnapshot {
+  route: string
+  requests: number
+  reads: number
+  writes: number
+  calls: number
+  errors: number
+  readsPerRequest: number
+  latencyMs: HistogramSnapshot
+  firestoreMs: HistogramSnapshot
+}
+
+export interface CallSiteMetricsSnapshot {
+  site: string
+  operation: FirestoreOperation
+  calls: number
+  errors: number
+  reads: number
+  writes: number
+  latencyMs: HistogramSnapshot
+  resultSize: HistogramSnapshot
+}
+
+export interface FirestoreMetricsSnapshot {
+  enabled: boolean
+  since: string
+  totals: { reads: number; writes: number; calls: number; errors: number }
+  routes: RouteMetricsSnapshot[]
+  callSites: CallSiteMetricsSnapshot[]
+}
+
+interface RequestTrace {
+  route: string
+  reads: number
+  writes: number
+  calls: number
+  firestoreMs: number
+  pending: Promise<unknown>[] // Trabajo que sigue después de devolver la respuesta
+}
+
+class Histogram {
+  private readonly counts: number[]
+  private count = 0
+  private sum = 0
+  private max = 0
+
+  constructor(private readonly bounds: number[]) {
+    this.counts = new Array(bounds.length).fill(0)
+  }
+
+  observe(value: number): void {
+    let i = 0
+    while (value > this.bounds[i]) i++
+    this.counts[i]++
+    this.count++
+    this.sum += value
+    if (value > this.max) this.max = value
+  }
+
+  snapshot(): HistogramSnapshot {
+    return {
+      count: this.count,
+      sum: Math.round(this.sum * 100) / 100,
+      max: Math.round(this.max * 100) / 100,
+      buckets: this.bounds.map((le, i) => ({
+        le: le === Infinity ? '+Inf' as const : le,
+        count: this.counts[i]
+      }))
+    }
+  }
+}
+
+class RouteMetrics {
+  requests = 0
+  reads = 0
+  writes = 0
+  calls = 0
+  errors = 0
+  readonly latencyMs = new Histogram(LATENCY_BUCKETS_MS)
+  readonly firestoreMs = new Histogram(LATENCY_BUCKETS_MS)
+}
+
+class CallSiteMetrics {
+  calls = 0
+  errors = 0
+  reads = 0
+  writes = 0
+  readonly latencyMs = new Histogram(LATENCY_BUCKETS_MS)
+  readonly resultSize = new Histogram(RESULT_SIZE_BUCKETS)
+
+  constructor(readonly site: string, readonly operation: FirestoreOperation) {}
+}
+
+class FirestoreMetricsRegistry {
+  private routes = new Map<string, RouteMetrics>()
+  private callSites = new Map<string, CallSiteMetrics>()
+  private since = new Date()
+
+  route(name: string): RouteMetrics {
+    let metrics = this.routes.get(name)
+    if (!metrics) {
+      metrics = new RouteMetrics()
+      this.routes.set(name, metrics)
+    }
+    return metrics
+  }
+
+  callSite(site: string, operation: FirestoreOperation): CallSiteMetrics {
+    const key = `${operation} ${site}`
+    let metrics = this.callSites.get(key)
+    if (!metrics) {
+      if (this.callSites.size >= MAX_CALL_SITES) {
+        return this.callSite('(otros)', operation)
+      }
+      metrics = new CallSiteMetrics(site, operation)
+      this.callSites.set(key, metrics)
+    }
+    return metrics
+  }
+
+  reset(): void {
+    this.routes = new Map()
+    this.callSites = new Map()
+    this.since = new Date()
+  }
+
+  snapshot(): FirestoreMetricsSnapshot {
+    const routes = Array.from(this.routes.entries()).map(([route, m]) => ({
+      route,
+      requests: m.requests,
+      reads: m.reads,
+      writes: m.writes,
+      calls: m.calls,
+      errors: m.errors,
+      readsPerRequest: m.requests > 0 ? Math.round((m.reads / m.requests) * 100) / 100 : 0,
+      latencyMs: m.latencyMs.snapshot(),
+      firestoreMs: m.firestoreMs.snapshot()
+    }))
+
+    const callSites = Array.from(this.callSites.values()).map(m => ({
+      site: m.site,
+      operation: m.operation,
+      calls: m.calls,
+      errors: m.errors,
+      reads: m.reads,
+      writes: m.writes,
+      latencyMs: m.latencyMs.snapshot(),
+      resultSize: m.resultSize.snapshot()
+    }))
+
+    // Lo más caro primero
+    const cost = (m: { reads: number; writes: number }) => m.reads + m.writes
+    routes.sort((a, b) => cost(b) - cost(a))
+    callSites.sort((a, b) => cost(b) - cost(a))
+
+    return {
+      enabled: FIRESTORE_METRICS_ENABLED,
+      since: this.since.toISOString(),
+      totals: callSites.reduce(
+        (totals, m) => ({
+          reads: totals.reads + m.reads,
+          writes: totals.writes + m.writes,
+          calls: totals.calls + m.calls,
+          errors: totals.errors + m.errors
+        }),
+        { reads: 0, writes: 0, calls: 0, errors: 0 }
+      ),
+      routes,
+      callSites
+    }
+  }
+}
+
+const registry = new FirestoreMetricsRegistry()
+const requestTraces = new AsyncLocalStorage<RequestTrace>()
+
+/**
+ * Primer marco de la pila fuera de este módulo, p.ej. "CompanyService.getCompany (lib/services/company-service.ts:120)"
+ */
+function captureCallSite(): string {
+  const stack = new Error().stack
+  if (!stack) return '(desconocido)'
+
+  const frames = stack.split('\n')
+  for (let i = 1; i < frames.length; i++) {
+    const frame = frames[i]
+    if (frame.includes('firestore-metrics') || frame.includes('node_modules')) continue
+
+    const match = frame.match(/at (?:(.+?) \()?(.+?):(\d+):\d+\)?$/)
+    if (!match) continue
+
+    const [, fn, file, line] = match
+    const pathMatch = file.match(/(?:^|[\/.])((?:app|lib|scripts)\/.+)$/)
+    const location = `${pathMatch ? pathMatch[1] : file}:${line}`
+    return fn ? `${fn.replace(/^async /, '')} (${location})` : location
+  }
+  return '(desconocido)'
+}
+
+function record(
+  operation: FirestoreOperation,
+  site: string,
+  elapsedMs: number,
+  usage: { reads: number; writes: number; resultSize?: number },
+  failed: boolean
+): void {
+  const callSite = registry.callSite(site, operation)
+  callSite.calls++
+  callSite.reads += usage.reads
+  callSite.writes += usage.writes
+  callSite.latencyMs.observe(elapsedMs)
+  if (usage.resultSize !== undefined) callSite.resultSize.observe(usage.resultSize)
+  if (failed) callSite.errors++
+
+  const trace = requestTraces.getStore()
+  const route = registry.route(trace ? trace.route : NO_ROUTE)
+  route.calls++
+  route.reads += usage.reads
+  route.writes += usage.writes
+  if (failed) route.errors++
+
+  if (trace) {
+    trace.calls++
+    trace.reads += usage.reads
+    trace.writes += usage.writes
+    trace.firestoreMs += elapsedMs
+  }
+}
+
+/**
+ * Ejecuta una operación de Firestore y registra su costo; las operaciones fallidas
+ * cuentan como una llamada con error y sin documentos
+ */
+async function measure<T>(
+  operation: FirestoreOperation,
+  site: string,
+  run: () => Promise<T>,
+  usage: (result: T) => { reads: number; writes: number; resultSize?: number }
+): Promise<T> {
+  const start = performance.now()
+  try {
+    const result = await run()
+    record(operation, site, performance.now() - start, usage(result), false)
+    return result
+  } catch (error) {
+    record(operation, site, performance.now() - start, { reads: 0, writes: 0 }, true)
+    throw error
+  }
+}
+
+const trackedGetDoc = ((reference: any) =>
+  measure('getDoc', captureCallSite(), () => firestore.getDoc(reference), snapshot => ({
+    reads: 1,
+    writes: 0,
+    resultSize: snapshot.exists() ? 1 : 0
+  }))) as typeof firestore.getDoc
+
+const trackedGetDocs = ((queryRef: any) =>
+  measure('getDocs', captureCallSite(), () => firestore.getDocs(queryRef), snapshot => ({
+    reads: Math.max(1, snapshot.size),
+    writes: 0,
+    resultSize: snapshot.size
+  }))) as typeof firestore.getDocs
+
+const trackedGetCountFromServer = ((queryRef: any) =>
+  measure('getCountFromServer', captureCallSite(), () => firestore.getCountFromServer(queryRef), snapshot => ({
+    reads: Math.max(1, Math.ceil(snapshot.data().count / 1000)),
+    writes: 0,
+    resultSize: snapshot.data().count
+  }))) as typeof firestore.getCountFromServer
+
+const trackedSetDoc = ((reference: any, data: any, options?: any) =>
+  measure(
+    'setDoc',
+    captureCallSite(),
+    () => (options === undefined ? firestore.setDoc(reference, data) : firestore.setDoc(reference, data, options)),
+    () => ({ reads: 0, writes: 1 })
+  )) as typeof firestore.setDoc
+
+const trackedUpdateDoc = ((reference: any, ...args: any[]) =>
+  measure(
+    'updateDoc',
+    captureCallSite(),
+    () => (firestore.updateDoc as (...params: any[]) => Promise<void>)(reference, ...args),
+    () => ({ reads: 0, writes: 1 })
+  )) as typeof firestore.updateDoc
+
+const trackedAddDoc = ((reference: any, data: any) =>
+  measure('addDoc', captureCallSite(), () => firestore.addDoc(reference, data), () => ({
+    reads: 0,
+    writes: 1
+  }))) as typeof firestore.addDoc
+
+const trackedDeleteDoc = ((reference: any) =>
+  measure('deleteDoc', captureCallSite(), () => firestore.deleteDoc(reference), () => ({
+    reads: 0,
+    writes: 1
+  }))) as typeof firestore.deleteDoc
+
+/**
+ * Las lecturas y escrituras de la transacción se cuentan en cada intento
+ * (el SDK reintenta la función si hay conflictos y cada intento se factura)
+ */
+const trackedRunTransaction = ((db: firestore.Firestore, updateFunction: (transaction: firestore.Transaction) => Promise<any>, options?: any) => {
+  const usage = { reads: 0, writes: 0 }
+  return measure(
+    'transaction',
+    captureCallSite(),
+    () => firestore.runTransaction(db, transaction => {
+      const tracked: firestore.Transaction = Object.create(transaction)
+      tracked.get = ((reference: any) => {
+        usage.reads++
+        return transaction.get(reference)
+      }) as firestore.Transaction['get']
+      tracked.set = ((...args: any[]) => {
+        usage.writes++
+        ;(transaction.set as (...params: any[]) => unknown)(...args)
+        return tracked
+      }) as firestore.Transaction['set']
+      tracked.update = ((...args: any[]) => {
+        usage.writes++
+        ;(transaction.update as (...params: any[]) => unknown)(...args)
+        return tracked
+      }) as firestore.Transaction['update']
+      tracked.delete = ((reference: any) => {
+        usage.writes++
+        transaction.delete(reference)
+        return tracked
+      }) as firestore.Transaction['delete']
+      return updateFunction(tracked)
+    }, options),
+    () => usage
+  )
+}) as typeof firestore.runTransaction
+
+/**
+ * Las escrituras del lote se registran al confirmarlo (commit)
+ */
+const trackedWriteBatch = ((db: firestore.Firestore) => {
+  const batch = firestore.writeBatch(db)
+  const site = captureCallSite()
+  let operations = 0
+
+  const tracked: firestore.WriteBatch = Object.create(batch)
+  tracked.set = ((...args: any[]) => {
+    operations++
+    ;(batch.set as (...params: any[]) => unknown)(...args)
+    return tracked
+  }) as firestore.WriteBatch['set']
+  tracked.update = ((...args: any[]) => {
+    operations++
+    ;(batch.update as (...params: any[]) => unknown)(...args)
+    return tracked
+  }) as firestore.WriteBatch['update']
+  tracked.delete = ((reference: any) => {
+    operations++
+    batch.delete(reference)
+    return tracked
+  }) as firestore.WriteBatch['delete']
+  tracked.commit = () =>
+    measure('batch', site, () => batch.commit(), () => ({
+      reads: 0,
+      writes: operations,
+      resultSize: operations
+    }))
+  return tracked
+}) as typeof firestore.writeBatch
+
+export const getDoc = FIRESTORE_METRICS_ENABLED ? trackedGetDoc : firestore.getDoc
+export const getDocs = FIRESTORE_METRICS_ENABLED ? trackedGetDocs : firestore.getDocs
+export const getCountFromServer = FIRESTORE_METRICS_ENABLED ? trackedGetCountFromServer : firestore.getCountFromServer
+export const setDoc = FIRESTORE_METRICS_ENABLED ? trackedSetDoc : firestore.setDoc
+export const updateDoc = FIRESTORE_METRICS_ENABLED ? trackedUpdateDoc : firestore.updateDoc
+export const addDoc = FIRESTORE_METRICS_ENABLED ? trackedAddDoc : firestore.addDoc
+export const deleteDoc = FIRESTORE_METRICS_ENABLED ? trackedDeleteDoc : firestore.deleteDoc
+export const runTransaction = FIRESTORE_METRICS_ENABLED ? trackedRunTransaction : firestore.runTransaction
+export const writeBatch = FIRESTORE_METRICS_ENABLED ? trackedWriteBatch : firestore.writeBatch
+
+/**
+ * Envuelve un handler de ruta: atribuye sus llamadas a Firestore a `route` y agrega
+ * el encabezado X-Firestore-Trace (reads, writes, calls, firestore ms, total ms).
+ *
+ * El trabajo que el handler deja corriendo (p.ej. una respuesta transmitida) hereda la
+ * ruta; si se registra con `extendFirestoreTrace`, la latencia y el costo por solicitud
+ * se observan cuando termina. El encabezado, que sale antes, solo cubre lo hecho hasta
+ * devolver la respuesta y lo indica con `streaming`.
+ */
+export function withFirestoreMetrics<Args extends any[], R extends Response>(
+  route: string,
+  handler: (...args: Args) => Promise<R>
+): (...args: Args) => Promise<R> {
+  if (!FIRESTORE_METRICS_ENABLED) {
+    return handler
+  }
+
+  return async (...args: Args) => {
+    const trace: RequestTrace = { route, reads: 0, writes: 0, calls: 0, firestoreMs: 0, pending: [] }
+    const start = performance.now()
+    const response = await requestTraces.run(trace, () => handler(...args))
+    const elapsedMs = performance.now() - start
+
+    const observe = () => {
+      const metrics = registry.route(route)
+      metrics.requests++
+      metrics.latencyMs.observe(performance.now() - start)
+      metrics.firestoreMs.observe(trace.firestoreMs)
+    }
+    if (trace.pending.length > 0) {
+      Promise.allSettled(trace.pending).then(observe)
+    } else {
+      observe()
+    }
+
+    try {
+      response.headers.set(
+        FIRESTORE_TRACE_HEADER,
+        `reads=${trace.reads}; writes=${trace.writes}; calls=${trace.calls}; ` +
+          `firestore=${trace.firestoreMs.toFixed(1)}ms; total=${elapsedMs.toFixed(1)}ms` +
+          (trace.pending.length > 0 ? '; streaming' : '')
+      )
+    } catch {
+      // Respuestas con encabezados inmutables (p.ej. reenviadas de un fetch)
+    }
+    return response
+  }
+}
+
+/**
+ * Registra trabajo de la solicitud actual que termina después de devolver la respuesta
+ * (sin instrumentación o fuera de una ruta envuelta no hace nada)
+ */
+export function extendFirestoreTrace(work: Promise<unknown>): void {
+  requestTraces.getStore()?.pending.push(work)
+}
+
+export function getFirestoreMetrics(): FirestoreMetricsSnapshot {
+  return registry.snapshot()
+}
+
+export function resetFirestoreMetrics(): void {
+  registry.reset()
+}
@@ -0,0 +1,65 @@
+/**
+ * Montículo binario mínimo genérico
+ *
+ * Lo usan las colas con prioridad del servidor (consultas de estado a Hacienda,
+ * cola de correos). push/pop son O(log n) y peek es O(1).
+ */
+
+export class MinHeap<T> {
+  private readonly items: T[] = []
+
+  constructor(private readonly compare: (a: T, b: T) => number) {}
+
+  get size(): number {
+    return this.items.length
+  }
+
+  peek(): T | undefined {
+    return this.items[0]
+  }
+
+  push(item: T): void {
+    const items = this.items
+    items.push(item)
+    let index = items.length - 1
+    while (index > 0) {
+      const parent = (index - 1) >> 1
+      if (this.compare(items[index], items[parent]) >= 0) break
+      ;[items[index], items[parent]] = [items[parent], items[index]]
+      index = parent
+    }
+  }
+
+  pop(): T | undefined {
+    const items = this.items
+    if (items.length === 0) return undefined
+    const top = items[0]
+    const last = items.pop()!
+    if (items.length > 0) {
+      items[0] = last
+      let index = 0
+      while (true) {
+        const left = index * 2 + 1
+        const right = left + 1
+        let smallest = index
+        if (left < items.length && this.compare(items[left], items[smallest]) < 0) smallest = left
+        if (right < items.length && this.compare(items[right], items[smallest]) < 0) smallest = right
+        if (smallest === index) break
+        ;[items[index], items[smallest]] = [items[smallest], items[index]]
+        index = smallest
+      }
+    }
+    return top
+  }
+
+  /**
+   * Elementos en orden arbitrario (para persistir o inspeccionar la cola)
+   */
+  toArray(): T[] {
+    return [...this.items]
+  }
+
+  clear(): void {
+    this.items.length = 0
+  }
+}
@@ -0,0 +1,146 @@
+/**
+ * Correo de aprobación de comprobantes (facturas, tiquetes y notas de crédito)
+ *
+ * El correo se reclama con `emailSent` y se guarda en la cola persistente dentro
+ * de la misma transacción (si la transacción falla no queda ni reclamado ni
+ * encolado). La cola lo tiene por referencia: el PDF y los XML se generan al
+ * enviar, desde el documento vigente, en cada intento.
+ *
+ * Si la cola agota los reintentos se vuelve a encolar tras APPROVAL_RETRY_DELAY_MS,
+ * hasta MAX_APPROVAL_EMAIL_ROUNDS rondas; después el comprobante queda con
+ * `emailNeedsResend` para reenviarlo a mano.
+ */
+
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { getDoc, updateDoc, runTransaction } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { ApprovalEmailJob, QueuedEmail, getEmailQueue } from '@/lib/email/email-queue'
+import { EmailSendResult } from '@/lib/email/types'
+
+const db = getFirestoreDb()
+
+const MAX_APPROVAL_EMAIL_ROUNDS = 3
+const APPROVAL_RETRY_DELAY_MS = 60 * 60 * 1000
+
+function recipientOf(data: any): string | undefined {
+  return data.cliente?.email || data.cliente?.correoElectronico || undefined
+}
+
+/**
+ * Reclama el correo de aprobación del documento y lo encola. Devuelve false si ya
+ * se envió (o lo está enviando otra instancia) o si el tiquete no tiene correo.
+ */
+export async function queueApprovalEmail(job: ApprovalEmailJob): Promise<boolean> {
+  const ref = doc(db, job.collection, job.documentId)
+  const queue = getEmailQueue()
+
+  const queued = await runTransaction(db, async (transaction): Promise<QueuedEmail | null> => {
+    const snap = await transaction.get(ref)
+    if (!snap.exists()) return null
+    const data: any = snap.data()
+    if (data.emailSent) return null
+    if (job.collection === 'tickets' && !data.cliente?.email) return null
+
+    const email = queue.buildApprovalEmail(job, recipientOf(data))
+    queue.saveInTransaction(transaction, email)
+    transaction.update(ref, {
+      emailSent: true,
+      emailQueuedAt: serverTimestamp(),
+      emailQueueId: email.id,
+      emailRounds: 0,
+      emailNeedsResend: false
+    })
+    return email
+  })
+
+  if (!queued) return false
+
+  queue.enqueueSaved(queued)
+  console.log('📬 Correo de aprobación encolado:', `${job.collection}/${job.documentId}`)
+  return true
+}
+
+/**
+ * Envía el correo de aprobación (lo llama la cola en cada intento)
+ */
+export async function sendApprovalEmailJob(job: ApprovalEmailJob): Promise<EmailSendResult> {
+  const ref = doc(db, job.collection, job.documentId)
+  const snap = await getDoc(ref)
+  if (!snap.exists()) {
+    return { messageId: '', success: false, error: 'Documento no encontrado', sentAt: new Date(), deliveredTo: [], failedTo: [] }
+  }
+
+  const data: any = snap.data()
+  // La fecha puede venir como Timestamp de Firestore
+  const fecha = data.fecha?.toDate ? data.fecha.toDate().toISOString() : data.fecha
+
+  const { InvoiceEmailService } = await import('@/lib/services/invoice-email-service')
+  const result = await InvoiceEmailService.sendApprovalEmail({
+    ...data,
+    fecha,
+    fechaEmision: data.fechaEmision || fecha,
+    id: job.documentId,
+    ...(job.collection === 'creditNotes' ? { tipo: 'nota-credito' } : {})
+  } as any)
+
+  if (result.success) {
+    await updateDoc(ref, {
+      emailSentAt: serverTimestamp(),
+      emailMessageId: result.messageId,
+      emailDeliveredTo: result.deliveredTo
+    })
+  }
+
+  return {
+    messageId: result.messageId || '',
+    success: result.success,
+    error: result.error,
+    sentAt: new Date(),
+    deliveredTo: result.deliveredTo || [],
+    failedTo: []
+  }
+}
+
+/**
+ * La cola agotó los reintentos: se vuelve a encolar más tarde o, agotadas las rondas,
+ * se libera el reclamo y se marca el comprobante para reenvío manual
+ */
+export async function markApprovalEmailFailed(job: ApprovalEmailJob, error: string): Promise<void> {
+  const ref = doc(db, job.collection, job.documentId)
+  const queue = getEmailQueue()
+
+  const retry = await runTransaction(db, async (transaction): Promise<QueuedEmail | null> => {
+    const snap = await transaction.get(ref)
+    if (!snap.exists()) return null
+    const data: any = snap.data()
+    const rounds = (data.emailRounds || 0) + 1
+
+    if (rounds < MAX_APPROVAL_EMAIL_ROUNDS) {
+      const email = queue.buildApprovalEmail(job, recipientOf(data), 'normal', APPROVAL_RETRY_DELAY_MS)
+      queue.saveInTransaction(transaction, email)
+      transaction.update(ref, {
+        emailQueueId: email.id,
+        emailRounds: rounds,
+        emailError: error,
+        emailErrorAt: serverTimestamp()
+      })
+      return email
+    }
+
+    transaction.update(ref, {
+      emailSent: false,
+      emailNeedsResend: true,
+      emailRounds: rounds,
+      emailError: error,
+      emailErrorAt: serverTimestamp()
+    })
+    return null
+  })
+
+  if (retry) {
+    queue.enqueueSaved(retry)
+    console.log('🔄 Correo de aprobación reencolado:', `${job.collection}/${job.documentId}`)
+  } else {
+    console.warn('⚠️ Correo de aprobación sin enviar, requiere reenvío manual:', `${job.collection}/${job.documentId}`, error)
+  }
+}
@@ -0,0 +1,98 @@
+/**
+ * Catálogo CABYS en memoria del servidor
+ *
+ * Lee una vez el índice generado en el build (public/data/cabys/cabys-index.json) y
+ * valida los códigos CABYS de las líneas de un comprobante con consultas O(1).
+ * Si el índice está vacío o falta (catálogo no incluido en el build) la validación se
+ * omite con una advertencia, salvo con CABYS_REQUIRED=true: entonces se rechazan
+ * los comprobantes en lugar de emitirlos sin validar.
+ */
+
+import { promises as fs } from 'fs'
+import path from 'path'
+import { CabysIndex, CabysIndexData } from '@/lib/cabys'
+
+export interface CabysValidationResult {
+  success: boolean
+  error?: string
+  invalidLines?: number[]
+}
+
+export class CabysCatalogService {
+  private static indexPromise: Promise<CabysIndex> | null = null
+  private static warnedUnavailable = false
+
+  /**
+   * Índice del catálogo (cargado una vez por proceso)
+   */
+  static getIndex(): Promise<CabysIndex> {
+    if (!this.indexPromise) {
+      const indexPath = path.join(process.cwd(), 'public', 'data', 'cabys', 'cabys-index.json')
+      this.indexPromise = fs.readFile(indexPath, 'utf8')
+        .then(content => new CabysIndex(JSON.parse(content) as CabysIndexData))
+        .catch(error => {
+          this.indexPromise = null
+          throw error
+        })
+    }
+    return this.indexPromise
+  }
+
+  /**
+   * Verifica que cada línea tenga un código CABYS del catálogo oficial
+   */
+  static async validateItems(
+    items: any[],
+    options: { codeField?: string; defaultCode?: string } = {}
+  ): Promise<CabysValidationResult> {
+    const { codeField = 'codigoCABYS', defaultCode = '' } = options
+
+    let index: CabysIndex
+    try {
+      index = await this.getIndex()
+    } catch (error) {
+      return this.unavailable(error instanceof Error ? error.message : String(error))
+    }
+
+    if (index.size === 0) {
+      return this.unavailable('el índice está vacío (data/cabys/cabys.csv no estaba en el build)')
+    }
+
+    const invalidLines: number[] = []
+    items.forEach((item, i) => {
+      if (!index.has(String(item?.[codeField] || defaultCode))) {
+        invalidLines.push(item?.numeroLinea || i + 1)
+      }
+    })
+
+    if (invalidLines.length > 0) {
+      return {
+        success: false,
+        error: `Código CABYS inválido o inexistente en el catálogo de Hacienda. Líneas: ${invalidLines.join(', ')}`,
+        invalidLines
+      }
+    }
+
+    return { success: true }
+  }
+
+  /**
+   * Sin catálogo: se rechaza con CABYS_REQUIRED=true; si no, se omite la validación
+   * avisando una vez por proceso
+   */
+  private static unavailable(reason: string): CabysValidationResult {
+    if (process.env.CABYS_REQUIRED === 'true') {
+      console.error('❌ Catálogo CABYS no disponible:', reason)
+      return {
+        success: false,
+        error: 'Catálogo CABYS no disponible en el servidor; no se pueden validar los códigos CABYS'
+      }
+    }
+
+    if (!this.warnedUnavailable) {
+      this.warnedUnavailable = true
+      console.error(`⚠️ Catálogo CABYS no disponible (${reason}): los códigos CABYS NO se están validando`)
+    }
+    return { success: true }
+  }
+}
@@ -4,28 +4,28 @@
  */
 
 import { 
-  getFirestore, 
   collection, 
-  addDoc, 
-  updateDoc, 
   doc, 
-  getDoc, 
-  getDocs, 
   query, 
   where, 
   Timestamp,
   DocumentData,
   QueryDocumentSnapshot
 } from 'firebase/firestore'
+import {
+  addDoc,
+  updateDoc,
+  getDoc,
+  getDocs
+} from '@/lib/firestore-metrics'
 import { getAuth } from 'firebase/auth'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig, Tenant } from '@/lib/firebase-config'
+import { getFirebaseApp, getFirestoreDb } from '@/lib/firebase-app'
+import { Tenant } from '@/lib/firebase-config'
 import { CompanyWizardData } from '@/lib/company-wizard-types'
 import { EncryptionService } from '@/lib/encryption'
 
-// Initialize Firebase
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const app = getFirebaseApp()
+const db = getFirestoreDb()
 const auth = getAuth(app)
 
 export interface CreateCompanyRequest {
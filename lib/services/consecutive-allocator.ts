@@ -0,0 +1,425 @@
+/**
+ * Asignador de consecutivos por bloques arrendados (leases)
+ *
+ * En lugar de leer y actualizar `companies/{id}` por cada documento, cada
+ * instancia del servidor reserva de forma transaccional un bloque de números
+ * (por defecto 50) para una serie empresa / tipo / sucursal / terminal y los
+ * entrega desde memoria. Así el documento de la empresa recibe una escritura
+ * por bloque y no una por comprobante.
+ *
+ * Cada bloque queda registrado en `companies/{id}/consecutiveLeases` con su
+ * rango, la instancia que lo tomó, cuántos números entregó (`usedCount`, se
+ * actualiza antes de devolver cada número) y su estado:
+ *   - active:    en uso por una instancia hasta `expiresAt`
+ *   - exhausted: todos los números fueron entregados
+ *   - returned:  los números sobrantes se devolvieron al contador (no hay hueco)
+ *   - released:  sobraron números que no se pudieron devolver (unusedStart-unusedEnd)
+ *   - reclaimed: los números sobrantes pasaron a otro bloque (reclaimedBy)
+ *
+ * Hacienda no admite huecos en la numeración: antes de avanzar el contador se
+ * reutilizan los sobrantes de bloques `released` y de bloques `active` vencidos
+ * (una instancia que se reinició o murió sin liberar los suyos).
+ *
+ * La serie por defecto (001 / 00001) usa los campos históricos de la empresa
+ * (consecutive, consecutiveTK, consecutiveNT); otras sucursales o terminales
+ * usan `consecutiveSeries.{sucursal}-{terminal}.{campo}`.
+ */
+
+import {
+  Firestore,
+  doc,
+  collection,
+  query,
+  where,
+  limit,
+  increment,
+  serverTimestamp,
+  DocumentReference,
+  Transaction
+} from 'firebase/firestore'
+import {
+  getDocs,
+  runTransaction,
+  updateDoc
+} from '../firestore-metrics'
+
+export type ConsecutiveDocumentType = 'facturas' | 'tiquetes' | 'notas-credito'
+
+export const CONSECUTIVE_FIELDS: Record<ConsecutiveDocumentType, { field: string; prefix: string }> = {
+  'facturas': { field: 'consecutive', prefix: 'FE' },
+  'tiquetes': { field: 'consecutiveTK', prefix: 'TE' },
+  'notas-credito': { field: 'consecutiveNT', prefix: 'NC' }
+}
+
+export const DEFAULT_SUCURSAL = '001'
+export const DEFAULT_TERMINAL = '00001'
+
+const RECLAIM_SCAN_LIMIT = 50
+
+export interface ConsecutiveAllocatorOptions {
+  blockSize?: number // Números por bloque arrendado
+  maxLeaseAgeMs?: number // Antigüedad máxima de un bloque antes de devolverlo y pedir otro
+  leaseGraceMs?: number // Margen antes de que otra instancia pueda reclamar un bloque vencido
+  instanceId?: string // Identificador de la instancia (para auditoría)
+}
+
+interface Lease {
+  ref: DocumentReference
+  next: number
+  end: number
+  usableUntil: number
+  // Escrituras de usedCount en orden: si una falla, las siguientes no se hacen y ningún
+  // número posterior se entrega, así usedCount nunca queda por debajo de lo emitido
+  recording: Promise<void>
+  queued: { count: number; promise: Promise<void> } | null
+}
+
+interface SeriesKey {
+  companyId: string
+  documentType: ConsecutiveDocumentType
+  sucursal: string
+  terminal: string
+}
+
+function counterFieldPath(documentType: ConsecutiveDocumentType, sucursal: string, terminal: string): string {
+  const { field } = CONSECUTIVE_FIELDS[documentType]
+  if (sucursal === DEFAULT_SUCURSAL && terminal === DEFAULT_TERMINAL) {
+    return field
+  }
+  return `consecutiveSeries.${sucursal}-${terminal}.${field}`
+}
+
+function readCounter(data: any, fieldPath: string): number {
+  const value = fieldPath.split('.').reduce((current, part) => current?.[part], data)
+  return typeof value === 'number' ? value : 0
+}
+
+/**
+ * Rango de un bloque que se puede reutilizar, o null si sigue en uso o no tiene sobrantes.
+ * Los bloques activos sin expiresAt/usedCount (anteriores al vencimiento) no se tocan:
+ * no hay forma de saber cuáles de sus números se emitieron
+ */
+function reclaimableRange(data: any, now: number): { start: number; end: number } | null {
+  if (data.status === 'released' && typeof data.unusedStart === 'number' && typeof data.unusedEnd === 'number') {
+    return data.unusedStart <= data.unusedEnd ? { start: data.unusedStart, end: data.unusedEnd } : null
+  }
+  if (data.status === 'active' && typeof data.expiresAt === 'number' && data.expiresAt < now &&
+    typeof data.usedCount === 'number') {
+    const start = data.start + data.usedCount
+    return start <= data.end ? { start, end: data.end } : null
+  }
+  return null
+}
+
+export class ConsecutiveAllocator {
+  private readonly blockSize: number
+  private readonly maxLeaseAgeMs: number
+  private readonly leaseGraceMs: number
+  private readonly instanceId: string
+  private readonly leases = new Map<string, Lease>()
+  private readonly pendingLeases = new Map<string, Promise<void>>()
+
+  constructor(private readonly db: Firestore, options: ConsecutiveAllocatorOptions = {}) {
+    this.blockSize = Math.max(1, options.blockSize ?? 50)
+    this.maxLeaseAgeMs = options.maxLeaseAgeMs ?? 10 * 60 * 1000
+    // Entre que la instancia deja de usar un bloque y su vencimiento en Firestore, para que
+    // una escritura de usedCount en vuelo llegue antes de que otra instancia lo reclame
+    this.leaseGraceMs = options.leaseGraceMs ?? 2 * 60 * 1000
+    this.instanceId = options.instanceId ||
+      `${process.env.HOSTNAME || 'local'}-${process.pid}-${Math.random().toString(36).slice(2, 8)}`
+  }
+
+  /**
+   * Entrega el siguiente consecutivo de la serie
+   */
+  async allocate(
+    companyId: string,
+    documentType: ConsecutiveDocumentType,
+    sucursal: string = DEFAULT_SUCURSAL,
+    terminal: string = DEFAULT_TERMINAL
+  ): Promise<number> {
+    const [number] = await this.allocateMany(companyId, documentType, 1, sucursal, terminal)
+    return number
+  }
+
+  /**
+   * Entrega `count` consecutivos de la serie; si el bloque actual no alcanza
+   * se arrienda uno nuevo del tamaño necesario en una sola transacción
+   */
+  async allocateMany(
+    companyId: string,
+    documentType: ConsecutiveDocumentType,
+    count: number,
+    sucursal: string = DEFAULT_SUCURSAL,
+    terminal: string = DEFAULT_TERMINAL
+  ): Promise<number[]> {
+    const series: SeriesKey = { companyId, documentType, sucursal, terminal }
+    const key = `${companyId}|${documentType}|${sucursal}|${terminal}`
+    const numbers: number[] = []
+
+    while (numbers.length < count) {
+      const lease = this.leases.get(key)
+      if (lease && lease.next <= lease.end && !this.isExpired(lease)) {
+        const take = Math.min(count - numbers.length, lease.end - lease.next + 1)
+        const taken: number[] = []
+        for (let i = 0; i < take; i++) {
+          taken.push(lease.next++)
+        }
+        try {
+          // Un número solo se entrega después de quedar contado en el bloque; si la instancia
+          // muere, quien reclame el bloque sabe exactamente desde dónde seguir
+          await this.recordUsage(lease, take)
+        } catch (error) {
+          // No se sabe si el incremento llegó: se abandona el bloque y se pide otro
+          if (this.leases.get(key) === lease) this.leases.delete(key)
+          throw error
+        }
+        numbers.push(...taken)
+        continue
+      }
+      await this.refreshLease(key, series, count - numbers.length)
+    }
+
+    return numbers
+  }
+
+  /**
+   * Devuelve o registra los números sin usar de todos los bloques de esta instancia
+   */
+  async releaseAll(): Promise<void> {
+    const entries = Array.from(this.leases.entries())
+    this.leases.clear()
+    await Promise.all(entries.map(([key, lease]) => this.releaseLease(this.parseKey(key), lease)))
+  }
+
+  private parseKey(key: string): SeriesKey {
+    const [companyId, documentType, sucursal, terminal] = key.split('|')
+    return { companyId, documentType: documentType as ConsecutiveDocumentType, sucursal, terminal }
+  }
+
+  /**
+   * Suma `count` a usedCount; las llamadas que llegan mientras otra escritura está en vuelo
+   * se agrupan en la siguiente
+   */
+  private recordUsage(lease: Lease, count: number): Promise<void> {
+    if (!lease.queued) {
+      const queued = { count: 0, promise: Promise.resolve() }
+      queued.promise = lease.recording.then(async () => {
+        lease.queued = null
+        await updateDoc(lease.ref, { usedCount: increment(queued.count) })
+      })
+      lease.queued = queued
+      lease.recording = queued.promise
+    }
+    lease.queued.count += count
+    return lease.queued.promise
+  }
+
+  private newLease(ref: DocumentReference, start: number, end: number, usableUntil: number): Lease {
+    return { ref, next: start, end, usableUntil, recording: Promise.resolve(), queued: null }
+  }
+
+  private isExpired(lease: Lease): boolean {
+    return Date.now() > lease.usableUntil
+  }
+
+  /**
+   * Reemplaza el bloque de la serie; las llamadas concurrentes comparten la misma transacción
+   */
+  private refreshLease(key: string, series: SeriesKey, needed: number): Promise<void> {
+    let pending = this.pendingLeases.get(key)
+    if (!pending) {
+      pending = (async () => {
+        let previous = this.leases.get(key)
+        this.leases.delete(key)
+        if (previous && previous.next <= previous.end) {
+          // Bloque vencido con números sobrantes
+          await this.releaseLease(series, previous)
+          previous = undefined
+        } else if (previous && !(await previous.recording.then(() => true, () => false))) {
+          // Agotado pero sin confirmar usedCount: queda "active" hasta que venza
+          previous = undefined
+        }
+        const lease = await this.leaseBlock(series, Math.max(this.blockSize, needed), previous)
+        this.leases.set(key, lease)
+      })().finally(() => {
+        this.pendingLeases.delete(key)
+      })
+      this.pendingLeases.set(key, pending)
+    }
+    return pending
+  }
+
+  private async leaseBlock(series: SeriesKey, size: number, previous?: Lease): Promise<Lease> {
+    const reclaimed = await this.reclaimUnusedRange(series, previous)
+    if (reclaimed) {
+      return reclaimed
+    }
+
+    const { companyId, documentType, sucursal, terminal } = series
+    const companyRef = doc(this.db, 'companies', companyId)
+    const leaseRef = doc(collection(companyRef, 'consecutiveLeases'))
+    const fieldPath = counterFieldPath(documentType, sucursal, terminal)
+    // Se toma antes de la transacción: la instancia deja de usar el bloque antes de su vencimiento
+    const usableUntil = Date.now() + this.maxLeaseAgeMs
+
+    const range = await runTransaction(this.db, async (transaction) => {
+      const companySnap = await transaction.get(companyRef)
+      if (!companySnap.exists()) {
+        throw new Error('Empresa no encontrada')
+      }
+
+      const current = readCounter(companySnap.data(), fieldPath)
+      const start = current + 1
+      const end = current + size
+
+      transaction.update(companyRef, {
+        [fieldPath]: end,
+        updatedAt: serverTimestamp()
+      })
+      transaction.set(leaseRef, this.leaseRecord(series, start, end, usableUntil))
+      this.markExhausted(transaction, previous)
+
+      return { start, end }
+    })
+
+    console.log(`🔢 [Consecutivos] Bloque ${range.start}-${range.end} arrendado para ${companyId} (${documentType} ${sucursal}/${terminal})`)
+
+    return this.newLease(leaseRef, range.start, range.end, usableUntil)
+  }
+
+  /**
+   * Toma los números sobrantes de un bloque liberado o vencido de la serie, sin avanzar el contador
+   */
+  private async reclaimUnusedRange(series: SeriesKey, previous?: Lease): Promise<Lease | null> {
+    const { companyId, documentType, sucursal, terminal } = series
+    const companyRef = doc(this.db, 'companies', companyId)
+    const leasesRef = collection(companyRef, 'consecutiveLeases')
+
+    // Las transacciones del SDK cliente no admiten consultas: se buscan candidatos fuera
+    // y cada uno se vuelve a leer dentro de la transacción antes de reclamarlo
+    const candidates = await getDocs(query(
+      leasesRef,
+      where('documentType', '==', documentType),
+      where('sucursal', '==', sucursal),
+      where('terminal', '==', terminal),
+      where('status', 'in', ['active', 'released']),
+      limit(RECLAIM_SCAN_LIMIT)
+    ))
+
+    const now = Date.now()
+    const sorted = candidates.docs
+      .filter(candidate => reclaimableRange(candidate.data(), now))
+      .sort((a, b) => reclaimableRange(a.data(), now)!.start - reclaimableRange(b.data(), now)!.start)
+
+    for (const candidate of sorted) {
+      const leaseRef = doc(leasesRef)
+      const usableUntil = Date.now() + this.maxLeaseAgeMs
+
+      const range = await runTransaction(this.db, async (transaction) => {
+        const snap = await transaction.get(candidate.ref)
+        const unused = snap.exists() ? reclaimableRange(snap.data(), Date.now()) : null
+        if (!unused) {
+          // Otra instancia lo reclamó primero
+          return null
+        }
+
+        transaction.update(candidate.ref, {
+          status: 'reclaimed',
+          usedUntil: unused.start - 1,
+          reclaimedBy: leaseRef.id,
+          releasedAt: serverTimestamp()
+        })
+        transaction.set(leaseRef, {
+          ...this.leaseRecord(series, unused.start, unused.end, usableUntil),
+          reclaimedFrom: candidate.ref.id
+        })
+        this.markExhausted(transaction, previous)
+
+        return unused
+      })
+
+      if (range) {
+        console.log(`♻️ [Consecutivos] Bloque ${range.start}-${range.end} reutilizado para ${companyId} (${documentType} ${sucursal}/${terminal})`)
+        return this.newLease(leaseRef, range.start, range.end, usableUntil)
+      }
+    }
+
+    return null
+  }
+
+  private leaseRecord(series: SeriesKey, start: number, end: number, usableUntil: number) {
+    return {
+      ...series,
+      start,
+      end,
+      usedCount: 0,
+      instanceId: this.instanceId,
+      status: 'active',
+      expiresAt: usableUntil + this.leaseGraceMs,
+      leasedAt: serverTimestamp()
+    }
+  }
+
+  private markExhausted(transaction: Transaction, previous?: Lease): void {
+    if (previous && previous.next > previous.end) {
+      transaction.update(previous.ref, {
+        status: 'exhausted',
+        usedUntil: previous.end,
+        releasedAt: serverTimestamp()
+      })
+    }
+  }
+
+  /**
+   * Si nadie arrendó después de este bloque, el contador vuelve al último número usado
+   * y no queda hueco; si no, el rango sobrante queda registrado para auditoría
+   */
+  private async releaseLease(series: SeriesKey, lease: Lease): Promise<void> {
+    const { companyId, documentType, sucursal, terminal } = series
+
+    try {
+      await lease.recording
+    } catch {
+      // No se sabe qué números quedaron contados: el bloque sigue "active" y se reclama
+      // por usedCount cuando venza
+      return
+    }
+
+    const usedUntil = lease.next - 1
+    if (lease.next > lease.end) {
+      await updateDoc(lease.ref, { status: 'exhausted', usedUntil, releasedAt: serverTimestamp() })
+      return
+    }
+
+    const companyRef = doc(this.db, 'companies', companyId)
+    const fieldPath = counterFieldPath(documentType, sucursal, terminal)
+
+    try {
+      const status = await runTransaction(this.db, async (transaction) => {
+        const companySnap = await transaction.get(companyRef)
+        const current = companySnap.exists() ? readCounter(companySnap.data(), fieldPath) : -1
+
+        if (current === lease.end) {
+          transaction.update(companyRef, { [fieldPath]: usedUntil, updatedAt: serverTimestamp() })
+          transaction.update(lease.ref, { status: 'returned', usedUntil, releasedAt: serverTimestamp() })
+          return 'returned'
+        }
+
+        transaction.update(lease.ref, {
+          status: 'released',
+          usedUntil,
+          unusedStart: lease.next,
+          unusedEnd: lease.end,
+          releasedAt: serverTimestamp()
+        })
+        return 'released'
+      })
+
+      console.log(`🔢 [Consecutivos] Bloque ${lease.next}-${lease.end} sin usar ${status === 'returned' ? 'devuelto al contador' : 'registrado como liberado'}`)
+    } catch (error) {
+      // El bloque queda "active" y se reutiliza cuando venza
+      console.error('❌ [Consecutivos] Error liberando bloque:', error)
+    }
+  }
+}
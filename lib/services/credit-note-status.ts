@@ -1,11 +1,10 @@
-import { getFirestore, doc, getDoc, updateDoc, serverTimestamp, collection, query, where, getDocs } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc, serverTimestamp, collection, query, where } from 'firebase/firestore'
+import { getDoc, updateDoc, getDocs } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 import { HaciendaStatusService } from '@/lib/services/hacienda-status'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 export interface StatusResult {
   success: boolean
@@ -81,6 +80,7 @@ export async function checkCreditNoteStatus(creditNoteId: string, locationUrl: s
       })
 
       console.log('✅ Nota de crédito actualizada con estado:', interpretedStatus.status)
+      DashboardRollupService.syncDocumentInBackground(db, 'creditNotes', creditNoteId)
 
       // 🚨 LÓGICA DE ANULACIÓN: Si es de tipo "Anulación" y fue aceptada
       console.log('🔍 Verificando condiciones para anulación:', {
@@ -98,131 +98,10 @@ export async function checkCreditNoteStatus(creditNoteId: string, locationUrl: s
       console.log('🎯 ¿Cumple condiciones para anulación?', cumpleCondiciones)
       
       if (cumpleCondiciones) {
-        console.log('🚨 Nota de crédito de ANULACIÓN aceptada - Buscando factura original para anular...')
-        
-        try {
-          // Extraer consecutivo de la clave de la factura de referencia
-          const facturaClave = creditNoteData.referenciaFactura?.clave
-          
-          console.log('📋 Datos de referencia de la NC:', {
-            facturaClave: facturaClave,
-            tenantId: creditNoteData.tenantId,
-            companyId: creditNoteData.companyId
-          })
-          
-          if (!facturaClave) {
-            console.log('⚠️ No se encontró clave de factura de referencia en la nota de crédito')
-            return {
-              success: true,
-              message: 'Nota de crédito actualizada, pero no se pudo anular la factura original (clave no encontrada)',
-              status: interpretedStatus.status
-            }
-          }
-
-          // Extraer consecutivo de la clave (posiciones 32-41 de la clave de 50 dígitos)
-          // Ejemplo: 50621102500310286786000100001010000000060191797745
-          //          ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
-          //          Posiciones 32-41: 0000000060
-          const consecutivoFactura = facturaClave.substring(31, 41)
-          const consecutivoFormateado = `FE-${consecutivoFactura}`
-          
-          console.log('🔍 Extracción de consecutivo:', {
-            facturaClave: facturaClave,
-            consecutivoExtraido: consecutivoFactura,
-            consecutivoFormateado: consecutivoFormateado
-          })
-
-          // Buscar la factura original en Firestore
-          const invoicesRef = collection(db, 'invoices')
-          const q = query(
-            invoicesRef,
-            where('consecutivo', '==', consecutivoFormateado),
-            where('tenantId', '==', creditNoteData.tenantId),
-            where('companyId', '==', creditNoteData.companyId)
-          )
-          
-          const querySnapshot = await getDocs(q)
-          
-          if (querySnapshot.empty) {
-            console.log('⚠️ No se encontró la factura original para anular')
-            console.log('🔍 Parámetros de búsqueda:', {
-              consecutivo: consecutivoFormateado,
-              tenantId: creditNoteData.tenantId,
-              companyId: creditNoteData.companyId
-            })
-            
-            // Log de facturas disponibles para debugging
-            const allInvoicesRef = collection(db, 'invoices')
-            const allQuery = query(
-              allInvoicesRef,
-              where('tenantId', '==', creditNoteData.tenantId),
-              where('companyId', '==', creditNoteData.companyId)
-            )
-            const allQuerySnapshot = await getDocs(allQuery)
-            
-            if (!allQuerySnapshot.empty) {
-              const firstInvoice = allQuerySnapshot.docs[0].data()
-              console.log('📋 Facturas disponibles en la empresa:', {
-                total: allQuerySnapshot.size,
-                primeraFactura: {
-                  consecutivo: firstInvoice.consecutivo,
-                  tenantId: firstInvoice.tenantId,
-                  companyId: firstInvoice.companyId
-                }
-              })
-            }
-            
-            return {
-              success: true,
-              message: 'Nota de crédito actualizada, pero no se encontró la factura original para anular',
-              status: interpretedStatus.status
-            }
-          }
-
-          // Actualizar la factura original a "Anulada Completamente"
-          const facturaDoc = querySnapshot.docs[0]
-          const facturaRef = doc(db, 'invoices', facturaDoc.id)
-          
-          await updateDoc(facturaRef, {
-            status: 'Anulada Completamente',
-            anulacionData: {
-              anuladaPor: 'Nota de Crédito',
-              notaCreditoId: creditNoteId,
-              notaCreditoConsecutivo: creditNoteData.consecutivo,
-              fechaAnulacion: serverTimestamp(),
-              motivo: 'Anulación Total vía Nota de Crédito'
-            },
-            updatedAt: serverTimestamp()
-          })
-
-          console.log('✅ Factura anulada exitosamente:', facturaDoc.id)
-          console.log('📋 Datos de anulación:', {
-            facturaId: facturaDoc.id,
-            facturaConsecutivo: consecutivoFormateado,
-            notaCreditoId: creditNoteId,
-            notaCreditoConsecutivo: creditNoteData.consecutivo
-          })
-
-          return {
-            success: true,
-            message: 'Nota de crédito aceptada y factura original anulada exitosamente',
-            status: interpretedStatus.status,
-            facturaAnulada: {
-              id: facturaDoc.id,
-              consecutivo: consecutivoFormateado,
-              nuevoEstado: 'Anulada Completamente'
-            }
-          }
-
-        } catch (anulacionError) {
-          console.error('❌ Error al anular la factura original:', anulacionError)
-          
-          return {
-            success: true,
-            message: 'Nota de crédito actualizada, pero hubo un error al anular la factura original',
-            status: interpretedStatus.status,
-            error: anulacionError instanceof Error ? anulacionError.message : 'Error desconocido'
-          }
+        const anulacion = await annulReferencedInvoice(creditNoteId, creditNoteData)
+        return {
+          ...anulacion,
+          status: interpretedStatus.status
         }
       }
 
@@ -249,3 +128,133 @@ export async function checkCreditNoteStatus(creditNoteId: string, locationUrl: s
     }
   }
 }
+
+/**
+ * Anula la factura referenciada por una nota de crédito de anulación (tipo 01) aceptada.
+ * La usan la consulta directa y el programador de consultas de estado en segundo plano.
+ */
+export async function annulReferencedInvoice(creditNoteId: string, creditNoteData: any): Promise<StatusResult> {
+  console.log('🚨 Nota de crédito de ANULACIÓN aceptada - Buscando factura original para anular...')
+  
+  try {
+    // Extraer consecutivo de la clave de la factura de referencia
+    const facturaClave = creditNoteData.referenciaFactura?.clave
+    
+    console.log('📋 Datos de referencia de la NC:', {
+      facturaClave: facturaClave,
+      tenantId: creditNoteData.tenantId,
+      companyId: creditNoteData.companyId
+    })
+    
+    if (!facturaClave) {
+      console.log('⚠️ No se encontró clave de factura de referencia en la nota de crédito')
+      return {
+        success: true,
+        message: 'Nota de crédito actualizada, pero no se pudo anular la factura original (clave no encontrada)'
+      }
+    }
+
+    // Extraer consecutivo de la clave (posiciones 32-41 de la clave de 50 dígitos)
+    // Ejemplo: 50621102500310286786000100001010000000060191797745
+    //          ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    //          Posiciones 32-41: 0000000060
+    const consecutivoFactura = facturaClave.substring(31, 41)
+    const consecutivoFormateado = `FE-${consecutivoFactura}`
+    
+    console.log('🔍 Extracción de consecutivo:', {
+      facturaClave: facturaClave,
+      consecutivoExtraido: consecutivoFactura,
+      consecutivoFormateado: consecutivoFormateado
+    })
+
+    // Buscar la factura original en Firestore
+    const invoicesRef = collection(db, 'invoices')
+    const q = query(
+      invoicesRef,
+      where('consecutivo', '==', consecutivoFormateado),
+      where('tenantId', '==', creditNoteData.tenantId),
+      where('companyId', '==', creditNoteData.companyId)
+    )
+    
+    const querySnapshot = await getDocs(q)
+    
+    if (querySnapshot.empty) {
+      console.log('⚠️ No se encontró la factura original para anular')
+      console.log('🔍 Parámetros de búsqueda:', {
+        consecutivo: consecutivoFormateado,
+        tenantId: creditNoteData.tenantId,
+        companyId: creditNoteData.companyId
+      })
+      
+      // Log de facturas disponibles para debugging
+      const allInvoicesRef = collection(db, 'invoices')
+      const allQuery = query(
+        allInvoicesRef,
+        where('tenantId', '==', creditNoteData.tenantId),
+        where('companyId', '==', creditNoteData.companyId)
+      )
+      const allQuerySnapshot = await getDocs(allQuery)
+      
+      if (!allQuerySnapshot.empty) {
+        const firstInvoice = allQuerySnapshot.docs[0].data()
+        console.log('📋 Facturas disponibles en la empresa:', {
+          total: allQuerySnapshot.size,
+          primeraFactura: {
+            consecutivo: firstInvoice.consecutivo,
+            tenantId: firstInvoice.tenantId,
+            companyId: firstInvoice.companyId
+          }
+        })
+      }
+      
+      return {
+        success: true,
+        message: 'Nota de crédito actualizada, pero no se encontró la factura original para anular'
+      }
+    }
+
+    // Actualizar la factura original a "Anulada Completamente"
+    const facturaDoc = querySnapshot.docs[0]
+    const facturaRef = doc(db, 'invoices', facturaDoc.id)
+    
+    await updateDoc(facturaRef, {
+      status: 'Anulada Completamente',
+      anulacionData: {
+        anuladaPor: 'Nota de Crédito',
+        notaCreditoId: creditNoteId,
+        notaCreditoConsecutivo: creditNoteData.consecutivo,
+        fechaAnulacion: serverTimestamp(),
+        motivo: 'Anulación Total vía Nota de Crédito'
+      },
+      updatedAt: serverTimestamp()
+    })
+
+    console.log('✅ Factura anulada exitosamente:', facturaDoc.id)
+    DashboardRollupService.syncDocumentInBackground(db, 'invoices', facturaDoc.id)
+    console.log('📋 Datos de anulación:', {
+      facturaId: facturaDoc.id,
+      facturaConsecutivo: consecutivoFormateado,
+      notaCreditoId: creditNoteId,
+      notaCreditoConsecutivo: creditNoteData.consecutivo
+    })
+
+    return {
+      success: true,
+      message: 'Nota de crédito aceptada y factura original anulada exitosamente',
+      facturaAnulada: {
+        id: facturaDoc.id,
+        consecutivo: consecutivoFormateado,
+        nuevoEstado: 'Anulada Completamente'
+      }
+    }
+
+  } catch (anulacionError) {
+    console.error('❌ Error al anular la factura original:', anulacionError)
+    
+    return {
+      success: true,
+      message: 'Nota de crédito actualizada, pero hubo un error al anular la factura original',
+      error: anulacionError instanceof Error ? anulacionError.message : 'Error desconocido'
+    }
+  }
+}
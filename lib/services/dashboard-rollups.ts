@@ -0,0 +1,337 @@
+/**
+ * Resúmenes mensuales del dashboard por empresa
+ *
+ * Cada empresa tiene un documento por mes en `companies/{companyId}/dashboardRollups/{YYYY-MM}`
+ * con el conteo de documentos y la suma de `totalImpuesto` por tipo de documento,
+ * estado (aceptado / pendiente / rechazado) y moneda, además del monto (`subtotal` si
+ * el documento tiene exoneración, `total` si no) y el IVA cobrado (cero con exoneración)
+ * que muestran los totales de la lista de documentos. Se actualizan con incrementos al
+ * crear un documento o al cambiar su estado en Hacienda, así el dashboard lee un documento
+ * pequeño por mes con actividad en lugar de descargar todos los documentos de la empresa.
+ *
+ * Cada documento guarda en `rollup` lo que aportó al resumen; `syncDocument` compara
+ * contra ese registro dentro de una transacción, por lo que llamarlo varias veces
+ * (o desde varios flujos) no duplica los conteos.
+ */
+
+import {
+  Firestore,
+  doc,
+  collection,
+  query,
+  where,
+  increment,
+  serverTimestamp,
+  Timestamp,
+  DocumentData
+} from 'firebase/firestore'
+import {
+  getDoc,
+  getDocs,
+  runTransaction,
+  writeBatch
+} from '../firestore-metrics'
+
+export type RollupDocumentKind = 'facturas' | 'tiquetes' | 'notas-credito'
+export type RollupStatus = 'aceptado' | 'pendiente' | 'rechazado'
+
+export const ROLLUP_COLLECTIONS: Record<RollupDocumentKind, string> = {
+  facturas: 'invoices',
+  tiquetes: 'tickets',
+  'notas-credito': 'creditNotes'
+}
+
+const KIND_BY_COLLECTION: Record<string, RollupDocumentKind> = {
+  invoices: 'facturas',
+  tickets: 'tiquetes',
+  creditNotes: 'notas-credito'
+}
+
+// Costa Rica no tiene horario de verano: UTC-6 todo el año
+const COSTA_RICA_OFFSET_MS = -6 * 60 * 60 * 1000
+const MAX_WRITES_PER_BATCH = 400
+
+/**
+ * Lo que un documento aportó a los resúmenes (se guarda en el documento como `rollup`)
+ */
+interface RollupContribution {
+  month: string
+  kind: RollupDocumentKind
+  status: RollupStatus
+  currency: string
+  totalImpuesto: number
+  monto: number
+  iva: number
+}
+
+export interface MonthlyRollup {
+  month: string
+  year: number
+  counts: Partial<Record<RollupDocumentKind, Partial<Record<RollupStatus, number>>>>
+  impuesto: Partial<Record<RollupDocumentKind, Partial<Record<RollupStatus, Record<string, number>>>>>
+  montos: Partial<Record<RollupDocumentKind, Partial<Record<RollupStatus, Record<string, number>>>>>
+  iva: Partial<Record<RollupDocumentKind, Partial<Record<RollupStatus, Record<string, number>>>>>
+}
+
+/**
+ * Totales de un tipo de documento sumando todos los meses de la empresa
+ */
+export interface DocumentTotals {
+  total: number
+  counts: Record<RollupStatus, number>
+  montos: Record<string, number> // Solo aceptados, por moneda
+  iva: Record<string, number> // Solo aceptados, por moneda
+}
+
+export class DashboardRollupService {
+  /**
+   * Misma clasificación de estados que usa el dashboard
+   */
+  static normalizeStatus(status?: string): RollupStatus {
+    const value = (status || '').toLowerCase()
+    if (value.includes('acept')) return 'aceptado'
+    if (value.includes('rechaz')) return 'rechazado'
+    return 'pendiente'
+  }
+
+  /**
+   * Mes (YYYY-MM) en hora de Costa Rica
+   */
+  static monthKey(date: Date): string {
+    const local = new Date(date.getTime() + COSTA_RICA_OFFSET_MS)
+    return `${local.getUTCFullYear()}-${String(local.getUTCMonth() + 1).padStart(2, '0')}`
+  }
+
+  /**
+   * Sincroniza el aporte de un documento a los resúmenes con su estado actual
+   */
+  static async syncDocument(db: Firestore, collectionName: string, documentId: string): Promise<void> {
+    const kind = KIND_BY_COLLECTION[collectionName]
+    if (!kind) return
+
+    const documentRef = doc(db, collectionName, documentId)
+
+    await runTransaction(db, async transaction => {
+      const snap = await transaction.get(documentRef)
+      if (!snap.exists()) return
+
+      const data = snap.data()
+      if (!data.companyId) return
+
+      const previous: RollupContribution | undefined = data.rollup
+      const next = this.contributionOf(kind, data)
+
+      if (previous && this.sameContribution(previous, next)) return
+
+      if (previous) {
+        transaction.set(this.rollupRef(db, data.companyId, previous.month), this.delta(previous, -1), { merge: true })
+      }
+      transaction.set(
+        this.rollupRef(db, data.companyId, next.month),
+        { ...this.delta(next, 1), companyId: data.companyId, tenantId: data.tenantId || '' },
+        { merge: true }
+      )
+      transaction.update(documentRef, { rollup: next })
+    })
+  }
+
+  /**
+   * Igual que syncDocument pero sin interrumpir el flujo que lo llama
+   */
+  static syncDocumentInBackground(db: Firestore, collectionName: string, documentId: string): void {
+    this.syncDocument(db, collectionName, documentId).catch(error => {
+      console.error(`❌ Error actualizando resumen del dashboard (${collectionName}/${documentId}):`, error)
+    })
+  }
+
+  /**
+   * Todos los resúmenes mensuales de una empresa (uno por mes con actividad)
+   */
+  static async getMonths(db: Firestore, companyId: string): Promise<MonthlyRollup[]> {
+    const snapshot = await getDocs(collection(db, 'companies', companyId, 'dashboardRollups'))
+
+    return snapshot.docs.map(snap => {
+      const data = snap.data()
+      return {
+        month: snap.id,
+        year: data.year,
+        counts: data.counts || {},
+        impuesto: data.impuesto || {},
+        montos: data.montos || {},
+        iva: data.iva || {}
+      }
+    })
+  }
+
+  /**
+   * Totales de un tipo de documento de la empresa (conteos por estado y montos
+   * e IVA de los aceptados), para las tarjetas de la lista de documentos
+   */
+  static async getDocumentTotals(db: Firestore, companyId: string, kind: RollupDocumentKind): Promise<DocumentTotals> {
+    const months = await this.getMonths(db, companyId)
+    const totals: DocumentTotals = {
+      total: 0,
+      counts: { aceptado: 0, pendiente: 0, rechazado: 0 },
+      montos: {},
+      iva: {}
+    }
+
+    for (const rollup of months) {
+      for (const status of Object.keys(totals.counts) as RollupStatus[]) {
+        const count = rollup.counts[kind]?.[status] || 0
+        totals.counts[status] += count
+        totals.total += count
+      }
+      for (const [currency, amount] of Object.entries(rollup.montos[kind]?.aceptado || {})) {
+        totals.montos[currency] = (totals.montos[currency] || 0) + amount
+      }
+      for (const [currency, amount] of Object.entries(rollup.iva[kind]?.aceptado || {})) {
+        totals.iva[currency] = (totals.iva[currency] || 0) + amount
+      }
+    }
+
+    return totals
+  }
+
+  /**
+   * Verifica que la empresa exista y pertenezca al tenant (los resúmenes cuelgan de la empresa)
+   */
+  static async checkCompanyTenant(db: Firestore, companyId: string, tenantId: string): Promise<'ok' | 'not-found' | 'forbidden'> {
+    const snap = await getDoc(doc(db, 'companies', companyId))
+    if (!snap.exists()) return 'not-found'
+    return snap.data().tenantId === tenantId ? 'ok' : 'forbidden'
+  }
+
+  /**
+   * Reconstruye los resúmenes de una empresa a partir de sus documentos
+   * (carga inicial o corrección); también reescribe el `rollup` de cada documento.
+   *
+   * Es una tarea de mantenimiento para correr sin emisión en curso: las escrituras van
+   * en lotes, no en la transacción de syncDocument. Al terminar se vuelven a leer los
+   * documentos y los que cambiaron durante la reconstrucción se sincronizan contra el
+   * `rollup` recién escrito; un documento creado durante la reconstrucción puede
+   * quedar fuera y requerir otra pasada.
+   */
+  static async rebuildCompany(db: Firestore, companyId: string): Promise<{ documents: number; months: number; resynced: number }> {
+    const rollups = new Map<string, DocumentData>()
+    const markers: { ref: ReturnType<typeof doc>; rollup: RollupContribution }[] = []
+    let tenantId = ''
+
+    for (const [kind, collectionName] of Object.entries(ROLLUP_COLLECTIONS) as [RollupDocumentKind, string][]) {
+      const snapshot = await getDocs(query(collection(db, collectionName), where('companyId', '==', companyId)))
+
+      snapshot.docs.forEach(snap => {
+        const data = snap.data()
+        tenantId = tenantId || data.tenantId || ''
+        const contribution = this.contributionOf(kind, data)
+        const rollup = rollups.get(contribution.month) || { counts: {}, impuesto: {}, montos: {}, iva: {} }
+
+        const counts = rollup.counts[kind] = rollup.counts[kind] || {}
+        counts[contribution.status] = (counts[contribution.status] || 0) + 1
+        const taxes = rollup.impuesto[kind] = rollup.impuesto[kind] || {}
+        const byCurrency = taxes[contribution.status] = taxes[contribution.status] || {}
+        byCurrency[contribution.currency] = (byCurrency[contribution.currency] || 0) + contribution.totalImpuesto
+        const amounts = rollup.montos[kind] = rollup.montos[kind] || {}
+        const amountsByCurrency = amounts[contribution.status] = amounts[contribution.status] || {}
+        amountsByCurrency[contribution.currency] = (amountsByCurrency[contribution.currency] || 0) + contribution.monto
+        const iva = rollup.iva[kind] = rollup.iva[kind] || {}
+        const ivaByCurrency = iva[contribution.status] = iva[contribution.status] || {}
+        ivaByCurrency[contribution.currency] = (ivaByCurrency[contribution.currency] || 0) + contribution.iva
+
+        rollups.set(contribution.month, rollup)
+        markers.push({ ref: snap.ref, rollup: contribution })
+      })
+    }
+
+    // Meses que ya no tienen documentos
+    const existing = await getDocs(collection(db, 'companies', companyId, 'dashboardRollups'))
+
+    const writes: ((batch: ReturnType<typeof writeBatch>) => void)[] = []
+    existing.docs
+      .filter(snap => !rollups.has(snap.id))
+      .forEach(snap => writes.push(batch => batch.delete(snap.ref)))
+    rollups.forEach((rollup, month) => {
+      writes.push(batch => batch.set(this.rollupRef(db, companyId, month), {
+        ...rollup,
+        companyId,
+        tenantId,
+        month,
+        year: parseInt(month.slice(0, 4), 10),
+        updatedAt: serverTimestamp()
+      }))
+    })
+    markers.forEach(({ ref, rollup }) => writes.push(batch => batch.update(ref, { rollup })))
+
+    for (let i = 0; i < writes.length; i += MAX_WRITES_PER_BATCH) {
+      const batch = writeBatch(db)
+      writes.slice(i, i + MAX_WRITES_PER_BATCH).forEach(write => write(batch))
+      await batch.commit()
+    }
+
+    // Documentos que cambiaron entre la lectura y la escritura: syncDocument aplica la
+    // diferencia contra el `rollup` que se acaba de escribir
+    const written = new Map(markers.map(({ ref, rollup }) => [ref.path, rollup]))
+    let resynced = 0
+    for (const [kind, collectionName] of Object.entries(ROLLUP_COLLECTIONS) as [RollupDocumentKind, string][]) {
+      const snapshot = await getDocs(query(collection(db, collectionName), where('companyId', '==', companyId)))
+      for (const snap of snapshot.docs) {
+        const marker = written.get(snap.ref.path)
+        if (marker && !this.sameContribution(marker, this.contributionOf(kind, snap.data()))) {
+          await this.syncDocument(db, collectionName, snap.id)
+          resynced++
+        }
+      }
+    }
+
+    return { documents: markers.length, months: rollups.size, resynced }
+  }
+
+  private static contributionOf(kind: RollupDocumentKind, data: DocumentData): RollupContribution {
+    const createdAt = data.createdAt instanceof Timestamp
+      ? data.createdAt.toDate()
+      : data.createdAt ? new Date(data.createdAt) : new Date()
+
+    // Con exoneración el monto es el subtotal y no se cobra IVA
+    const exonerated = data.tieneExoneracion === true
+
+    return {
+      month: this.monthKey(isNaN(createdAt.getTime()) ? new Date() : createdAt),
+      kind,
+      status: this.normalizeStatus(data.status),
+      currency: (data.currency || 'CRC').toUpperCase(),
+      totalImpuesto: Number(data.totalImpuesto || 0),
+      monto: Number((exonerated ? data.subtotal : data.total) || 0),
+      iva: exonerated ? 0 : Number(data.totalImpuesto || 0)
+    }
+  }
+
+  private static sameContribution(a: RollupContribution, b: RollupContribution): boolean {
+    return a.month === b.month &&
+      a.kind === b.kind &&
+      a.status === b.status &&
+      a.currency === b.currency &&
+      a.totalImpuesto === b.totalImpuesto &&
+      a.monto === b.monto &&
+      a.iva === b.iva
+  }
+
+  private static delta(contribution: RollupContribution, sign: 1 | -1): DocumentData {
+    const { month, kind, status, currency, totalImpuesto } = contribution
+    // Los `rollup` guardados antes de los montos no los traen: aportaron cero
+    const monto = contribution.monto || 0
+    const iva = contribution.iva || 0
+    return {
+      month,
+      year: parseInt(month.slice(0, 4), 10),
+      counts: { [kind]: { [status]: increment(sign) } },
+      impuesto: { [kind]: { [status]: { [currency]: increment(sign * totalImpuesto) } } },
+      montos: { [kind]: { [status]: { [currency]: increment(sign * monto) } } },
+      iva: { [kind]: { [status]: { [currency]: increment(sign * iva) } } },
+      updatedAt: serverTimestamp()
+    }
+  }
+
+  private static rollupRef(db: Firestore, companyId: string, month: string) {
+    return doc(db, 'companies', companyId, 'dashboardRollups', month)
+  }
+}
@@ -2,6 +2,7 @@
  * Servicio para firmar documentos XML digitalmente
  */
 
+import { createHash } from 'crypto'
 import { EncryptionService } from '@/lib/encryption'
 
 export interface SigningRequest {
@@ -18,6 +19,67 @@ export interface SigningResponse {
   message?: string
 }
 
+export interface BatchSigningOptions {
+  concurrency?: number // Solicitudes simultáneas al servicio de firma
+}
+
+/**
+ * `certificadoDigital` de la empresa tal como lo leyó el llamador
+ */
+export interface CompanyCertificate {
+  fileData?: string
+  password?: string
+}
+
+interface CachedCertificate {
+  certificateBase64: string
+  password: string // Encriptado con la clave maestra, como se guarda en la empresa
+  fingerprint: string
+  loadedAt: number
+}
+
+// Material de firma por empresa, acotado en tamaño y con vencimiento
+const CERTIFICATE_CACHE_TTL_MS = 10 * 60 * 1000
+const CERTIFICATE_CACHE_MAX_ENTRIES = 100
+const certificateCache = new Map<string, CachedCertificate>()
+const certificateLoads = new Map<string, Promise<CachedCertificate | null>>()
+// Se incrementa al invalidar: una carga que empezó antes no vuelve a guardar el certificado viejo
+const certificateGenerations = new Map<string, number>()
+
+function certificateFingerprint(fileData: string, password: string): string {
+  return createHash('sha256').update(fileData).update('\0').update(password).digest('hex')
+}
+
+function cacheCertificate(companyId: string, entry: CachedCertificate): void {
+  certificateCache.delete(companyId)
+  certificateCache.set(companyId, entry)
+  while (certificateCache.size > CERTIFICATE_CACHE_MAX_ENTRIES) {
+    certificateCache.delete(certificateCache.keys().next().value as string)
+  }
+}
+
+async function mapWithConcurrency<T, R>(
+  items: T[],
+  concurrency: number,
+  mapper: (item: T, index: number) => Promise<R>
+): Promise<R[]> {
+  if (items.length === 0) return []
+  const workers = Math.max(1, Math.min(concurrency, items.length))
+  const results = new Array<R>(items.length)
+  let nextIndex = 0
+
+  async function runWorker() {
+    while (nextIndex < items.length) {
+      const currentIndex = nextIndex
+      nextIndex += 1
+      results[currentIndex] = await mapper(items[currentIndex], currentIndex)
+    }
+  }
+
+  await Promise.all(Array.from({ length: workers }, () => runWorker()))
+  return results
+}
+
 export class DigitalSignatureService {
   // Permite configurar por variables de entorno; fallback a valores por defecto
   private static get SIGNING_API_URL(): string {
@@ -202,28 +264,143 @@ export class DigitalSignatureService {
   }
 
   /**
-   * Obtiene información del certificado desde la empresa
+   * Obtiene el certificado de la empresa desde el caché en memoria o Firestore.
+   * Las cargas concurrentes de la misma empresa comparten una sola lectura.
+   *
+   * Con `current` (el `certificadoDigital` que el llamador ya leyó de la empresa) se
+   * usa ese y el caché se compara por huella: si el certificado cambió en otra
+   * instancia, la entrada vieja se reemplaza en vez de esperar al vencimiento.
    */
-  static async getCertificateFromCompany(companyId: string): Promise<{
+  static async getCertificateFromCompany(companyId: string, current?: CompanyCertificate | null): Promise<{
     certificateBase64: string
     password: string
   } | null> {
     try {
-      // Aquí deberías obtener los datos del certificado desde la base de datos
-      // Por ahora retorno null para indicar que no hay certificado configurado
-      console.log('🔍 Buscando certificado para empresa:', companyId)
-      
-      // TODO: Implementar consulta a la base de datos para obtener:
-      // - certificadoDigital.p12FileData (base64)
-      // - certificadoDigital.password
-      
-      return null
+      if (current?.fileData && current?.password) {
+        const fingerprint = certificateFingerprint(current.fileData, current.password)
+        if (certificateCache.get(companyId)?.fingerprint !== fingerprint) {
+          this.invalidateCertificate(companyId)
+          cacheCertificate(companyId, {
+            certificateBase64: current.fileData,
+            password: current.password,
+            fingerprint,
+            loadedAt: Date.now()
+          })
+        }
+        return { certificateBase64: current.fileData, password: current.password }
+      }
+
+      let certificate: CachedCertificate | null = null
+
+      // Si el certificado se invalida mientras se carga, se vuelve a leer una vez
+      for (let attempt = 0; attempt < 2; attempt++) {
+        const cached = certificateCache.get(companyId)
+        if (cached && Date.now() - cached.loadedAt < CERTIFICATE_CACHE_TTL_MS) {
+          return { certificateBase64: cached.certificateBase64, password: cached.password }
+        }
+
+        const generation = certificateGenerations.get(companyId) ?? 0
+        let pending = certificateLoads.get(companyId)
+        if (!pending) {
+          const load: Promise<CachedCertificate | null> = this.loadCertificate(companyId, generation).finally(() => {
+            if (certificateLoads.get(companyId) === load) certificateLoads.delete(companyId)
+          })
+          pending = load
+          certificateLoads.set(companyId, pending)
+        }
+
+        certificate = await pending
+        if ((certificateGenerations.get(companyId) ?? 0) === generation) break
+      }
+
+      return certificate
+        ? { certificateBase64: certificate.certificateBase64, password: certificate.password }
+        : null
     } catch (error) {
       console.error('❌ Error al obtener certificado:', error)
       return null
     }
   }
 
+  /**
+   * Descarta el certificado en caché de la empresa (al cambiar su certificado digital)
+   */
+  static invalidateCertificate(companyId: string): void {
+    certificateGenerations.set(companyId, (certificateGenerations.get(companyId) ?? 0) + 1)
+    certificateCache.delete(companyId)
+    certificateLoads.delete(companyId)
+  }
+
+  private static async loadCertificate(companyId: string, generation: number): Promise<CachedCertificate | null> {
+    console.log('🔍 Cargando certificado para empresa:', companyId)
+
+    // Firestore se carga solo al firmar con el certificado guardado de la empresa;
+    // /api/documents/sign recibe el certificado en la solicitud y no lo necesita
+    const [{ doc }, { getDoc }, { getFirestoreDb }] = await Promise.all([
+      import('firebase/firestore'),
+      import('@/lib/firestore-metrics'),
+      import('@/lib/firebase-app')
+    ])
+    const companySnap = await getDoc(doc(getFirestoreDb(), 'companies', companyId))
+    const certificado = companySnap.exists() ? companySnap.data().certificadoDigital : null
+    if (!certificado?.fileData || !certificado?.password) {
+      return null
+    }
+
+    const entry: CachedCertificate = {
+      certificateBase64: certificado.fileData,
+      password: certificado.password,
+      fingerprint: certificateFingerprint(certificado.fileData, certificado.password),
+      loadedAt: Date.now()
+    }
+
+    if ((certificateGenerations.get(companyId) ?? 0) !== generation) {
+      // Se invalidó durante la lectura: este certificado puede ser el anterior
+      return entry
+    }
+
+    cacheCertificate(companyId, entry)
+    return entry
+  }
+
+  /**
+   * Firma un XML con el certificado guardado de la empresa (ver getCertificateFromCompany)
+   */
+  static async signXMLForCompany(
+    xml: string,
+    companyId: string,
+    certificado?: CompanyCertificate | null
+  ): Promise<SigningResponse> {
+    const certificateData = await this.getCertificateFromCompany(companyId, certificado)
+    if (!certificateData) {
+      return {
+        success: false,
+        error: 'No se encontró certificado digital configurado para esta empresa'
+      }
+    }
+
+    return this.signXMLWithEncryptedPassword(xml, certificateData.certificateBase64, certificateData.password)
+  }
+
+  /**
+   * Firma varios XML con el mismo certificado (password encriptado), una solicitud
+   * por XML y a lo sumo `concurrency` a la vez. El resultado conserva el orden de `xmls`.
+   */
+  static async signXMLBatch(
+    xmls: string[],
+    certificateBase64: string,
+    encryptedPassword: string,
+    options: BatchSigningOptions = {}
+  ): Promise<SigningResponse[]> {
+    const concurrency = options.concurrency ?? 4
+
+    console.log(`🔐 Firmando ${xmls.length} XML (concurrencia ${concurrency})...`)
+
+    return mapWithConcurrency(xmls, concurrency, xml =>
+      this.signXMLWithEncryptedPassword(xml, certificateBase64, encryptedPassword)
+    )
+  }
+
   /**
    * Procesa la firma completa de una factura
    */
@@ -264,8 +441,8 @@ export class DigitalSignatureService {
         }
       }
 
-      // 4. Firmar XML
-      const signingResult = await this.signXML(
+      // 4. Firmar XML (el password se guarda encriptado en la empresa)
+      const signingResult = await this.signXMLWithEncryptedPassword(
         invoiceData.xml,
         certificateData.certificateBase64,
         certificateData.password
@@ -292,4 +469,50 @@ export class DigitalSignatureService {
       }
     }
   }
+
+  /**
+   * Firma varios XML de una empresa cargando su certificado una sola vez
+   */
+  static async processBatchSigning(
+    xmls: string[],
+    companyId: string,
+    options: BatchSigningOptions = {},
+    certificado?: CompanyCertificate | null
+  ): Promise<{
+    success: boolean
+    results?: SigningResponse[]
+    error?: string
+  }> {
+    try {
+      const certificateData = await this.getCertificateFromCompany(companyId, certificado)
+      if (!certificateData) {
+        return {
+          success: false,
+          error: 'No se encontró certificado digital configurado para esta empresa'
+        }
+      }
+
+      const results = await this.signXMLBatch(
+        xmls,
+        certificateData.certificateBase64,
+        certificateData.password,
+        options
+      )
+
+      const signed = results.filter(result => result.success).length
+      console.log(`✅ Firma por lotes completada: ${signed}/${xmls.length} XML firmados`)
+
+      return {
+        success: true,
+        results
+      }
+
+    } catch (error) {
+      console.error('❌ Error en firma por lotes:', error)
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Error desconocido'
+      }
+    }
+  }
 }
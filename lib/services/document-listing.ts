@@ -0,0 +1,202 @@
+/**
+ * Listado paginado de documentos electrónicos (facturas, tiquetes, notas de crédito)
+ *
+ * Ordena en Firestore por `createdAt` descendente (desempate por ID) y pagina con
+ * un cursor opaco, así cada página cuesta `limit` lecturas en lugar de leer la
+ * colección completa de la empresa. Sin `limit` se devuelve la primera página de
+ * DEFAULT_PAGE_SIZE (nunca la colección completa). Requiere los índices compuestos descritos
+ * en FIRESTORE_INDEXES.md.
+ *
+ * La búsqueda (`search`) también se resuelve en Firestore con igualdad sobre un campo
+ * según la forma del término: número o consecutivo (`123`, `FE-123`) → `consecutivo`,
+ * clave de 50 dígitos → `clave`, cualquier otro texto → `clientId`.
+ */
+
+import {
+  Firestore,
+  collection,
+  query,
+  where,
+  orderBy,
+  limit as limitTo,
+  startAfter,
+  documentId,
+  Timestamp,
+  QueryConstraint,
+  DocumentData
+} from 'firebase/firestore'
+import {
+  getDocs
+} from '@/lib/firestore-metrics'
+import { CONSECUTIVE_FIELDS } from '@/lib/services/consecutive-allocator'
+
+export const DEFAULT_PAGE_SIZE = 50
+export const MAX_PAGE_SIZE = 500
+
+// Prefijo del consecutivo de cada colección, para buscar solo por el número
+const CONSECUTIVE_PREFIX_BY_COLLECTION: Record<string, string> = {
+  invoices: CONSECUTIVE_FIELDS.facturas.prefix,
+  tickets: CONSECUTIVE_FIELDS.tiquetes.prefix,
+  creditNotes: CONSECUTIVE_FIELDS['notas-credito'].prefix
+}
+
+export interface DocumentListOptions {
+  tenantId: string
+  companyId: string
+  pageSize?: number
+  cursor?: string | null
+  status?: string | null // Uno o varios estados separados por coma (p.ej. "Aceptado,aceptado")
+  search?: string | null // Consecutivo, clave o clientId
+  from?: Date | null // createdAt >= from
+  to?: Date | null // createdAt <= to
+  fields?: string[] | null // Proyección de campos en la respuesta
+}
+
+export interface DocumentListPage {
+  documents: DocumentData[]
+  nextCursor: string | null
+  hasMore: boolean
+}
+
+interface CursorPosition {
+  s: number // segundos de createdAt
+  n: number // nanosegundos de createdAt
+  id: string
+}
+
+export class DocumentListingService {
+  /**
+   * Lee los parámetros de paginación y filtros del query string
+   * (`limit`, `cursor`, `status`, `search`, `from`, `to`, `fields`)
+   */
+  static parseSearchParams(searchParams: URLSearchParams): Omit<DocumentListOptions, 'tenantId' | 'companyId'> {
+    const limitParam = searchParams.get('limit')
+    const cursor = searchParams.get('cursor')
+    const from = searchParams.get('from')
+    const to = searchParams.get('to')
+    const fields = searchParams.get('fields')
+
+    return {
+      pageSize: limitParam ? parseInt(limitParam, 10) : undefined,
+      cursor,
+      status: searchParams.get('status'),
+      search: searchParams.get('search'),
+      from: from ? new Date(from) : null,
+      to: to ? new Date(to) : null,
+      fields: fields ? fields.split(',').map(field => field.trim()).filter(Boolean) : null
+    }
+  }
+
+  /**
+   * Obtiene una página de la colección indicada (una sola consulta)
+   */
+  static async listDocuments(
+    db: Firestore,
+    collectionName: string,
+    options: DocumentListOptions
+  ): Promise<DocumentListPage> {
+    const pageSize = Math.min(Math.max(options.pageSize || DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+
+    const filters: QueryConstraint[] = [
+      where('tenantId', '==', options.tenantId),
+      where('companyId', '==', options.companyId)
+    ]
+    const statuses = (options.status || '').split(',').map(status => status.trim()).filter(Boolean)
+    if (statuses.length === 1) {
+      filters.push(where('status', '==', statuses[0]))
+    } else if (statuses.length > 1) {
+      // Firestore admite hasta 30 valores en un filtro `in`
+      filters.push(where('status', 'in', statuses.slice(0, 30)))
+    }
+    if (options.search && options.search.trim()) {
+      filters.push(this.searchFilter(collectionName, options.search.trim()))
+    }
+    if (options.from && !isNaN(options.from.getTime())) {
+      filters.push(where('createdAt', '>=', Timestamp.fromDate(options.from)))
+    }
+    if (options.to && !isNaN(options.to.getTime())) {
+      filters.push(where('createdAt', '<=', Timestamp.fromDate(options.to)))
+    }
+    filters.push(orderBy('createdAt', 'desc'), orderBy(documentId(), 'desc'))
+
+    const constraints = [...filters]
+    if (options.cursor) {
+      const position = this.decodeCursor(options.cursor)
+      constraints.push(startAfter(new Timestamp(position.s, position.n), position.id))
+    }
+    // Se pide un documento extra para saber si hay otra página sin una consulta adicional
+    constraints.push(limitTo(pageSize + 1))
+
+    const snapshot = await getDocs(query(collection(db, collectionName), ...constraints))
+    const page = snapshot.docs.slice(0, pageSize)
+    const hasMore = snapshot.docs.length > pageSize
+    const documents = page.map(snap => this.toResponse(snap.id, snap.data(), options.fields))
+
+    const last = page[page.length - 1]
+    const lastCreatedAt = last?.get('createdAt')
+    const cursor: CursorPosition | null = last && lastCreatedAt instanceof Timestamp
+      ? { s: lastCreatedAt.seconds, n: lastCreatedAt.nanoseconds, id: last.id }
+      : null
+
+    return {
+      documents,
+      nextCursor: hasMore && cursor ? this.encodeCursor(cursor) : null,
+      hasMore: hasMore && !!cursor
+    }
+  }
+
+  /**
+   * Filtro de igualdad para el término de búsqueda
+   */
+  private static searchFilter(collectionName: string, term: string): QueryConstraint {
+    if (/^\d{50}$/.test(term)) {
+      return where('clave', '==', term)
+    }
+
+    const consecutive = term.toUpperCase().match(/^(?:([A-Z]{2,3})-?)?(\d{1,10})$/)
+    if (consecutive) {
+      const prefix = consecutive[1] || CONSECUTIVE_PREFIX_BY_COLLECTION[collectionName] || 'FE'
+      return where('consecutivo', '==', `${prefix}-${consecutive[2].padStart(10, '0')}`)
+    }
+
+    return where('clientId', '==', term)
+  }
+
+  /**
+   * Convierte Timestamps a fechas y aplica la proyección de campos
+   */
+  private static toResponse(id: string, data: DocumentData, fields?: string[] | null): DocumentData {
+    const result: DocumentData = { id }
+    const keys = fields && fields.length > 0 ? fields : Object.keys(data)
+
+    for (const key of keys) {
+      if (!(key in data)) continue
+      const value = data[key]
+      result[key] = value instanceof Timestamp ? value.toDate() : value
+    }
+    return result
+  }
+
+  private static encodeCursor(position: CursorPosition): string {
+    return Buffer.from(JSON.stringify(position)).toString('base64url')
+  }
+
+  private static decodeCursor(cursor: string): CursorPosition {
+    try {
+      const position = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'))
+      if (typeof position.s === 'number' && typeof position.n === 'number' && typeof position.id === 'string') {
+        return position
+      }
+    } catch {
+      // Se reporta abajo
+    }
+    throw new InvalidCursorError()
+  }
+}
+
+export class InvalidCursorError extends Error {
+  constructor() {
+    super('Cursor de paginación inválido')
+    this.name = 'InvalidCursorError'
+  }
+}
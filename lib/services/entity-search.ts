@@ -0,0 +1,217 @@
+/**
+ * Búsqueda por prefijo de clientes y productos
+ *
+ * El índice vive en los propios documentos de Firestore, no en memoria:
+ *   - `searchTokens`: todos los prefijos (sin tildes, hasta MAX_PREFIX_LENGTH letras)
+ *     de cada palabra de los campos buscables
+ *   - `searchSort`: nombre sin tildes ni mayúsculas, para ordenar y paginar
+ *
+ * Las rutas de creación y edición escriben ambos campos junto con el documento
+ * (`searchFields`), así que cualquier instancia ve los cambios de inmediato y
+ * ninguna tiene que leer la colección completa del tenant. Cada búsqueda es una
+ * consulta con `array-contains` sobre la palabra más larga, ordenada por
+ * `searchSort` y limitada; las demás palabras y los filtros propios de la ruta
+ * (empresa, estado) se comprueban sobre esa página. Los documentos anteriores a
+ * estos campos se completan con scripts/backfill-search-tokens.ts.
+ *
+ * Campos indexados:
+ *   - clientes: nombre, nombre comercial, cédula (también solo dígitos) y correo
+ *   - productos: detalle y código CABYS
+ */
+
+import {
+  Firestore,
+  collection,
+  query,
+  where,
+  orderBy,
+  limit as limitTo,
+  startAfter,
+  documentId,
+  Timestamp,
+  FieldValue,
+  DocumentData,
+  QueryConstraint
+} from 'firebase/firestore'
+import { getDocs } from '@/lib/firestore-metrics'
+import { InvalidCursorError } from '@/lib/services/document-listing'
+
+export type SearchEntityKind = 'clients' | 'products'
+
+export const DEFAULT_SEARCH_LIMIT = 20
+export const MAX_SEARCH_LIMIT = 100
+
+// Prefijos más largos no aportan: una consulta más larga se recorta a este largo
+const MAX_PREFIX_LENGTH = 20
+// Documentos leídos por consulta a Firestore y consultas como máximo por búsqueda
+// (cuando las demás palabras o los filtros de la ruta descartan resultados)
+const SCAN_PAGE_FACTOR = 2
+const MAX_SCAN_PAGES = 5
+
+interface EntityConfig {
+  collectionName: string
+  baseFilters: (tenantId: string) => QueryConstraint[]
+  searchText: (data: DocumentData) => string[]
+  sortKey: (data: DocumentData) => string
+}
+
+const ENTITY_CONFIG: Record<SearchEntityKind, EntityConfig> = {
+  clients: {
+    collectionName: 'clients',
+    baseFilters: tenantId => [where('tenantId', '==', tenantId)],
+    searchText: data => [
+      data.name,
+      data.commercialName,
+      data.identification,
+      String(data.identification || '').replace(/\D/g, ''),
+      data.email
+    ],
+    sortKey: data => foldSearchText(data.name || '')
+  },
+  products: {
+    collectionName: 'products',
+    baseFilters: tenantId => [where('tenantId', '==', tenantId), where('activo', '==', true)],
+    searchText: data => [data.detalle, data.codigoCABYS],
+    sortKey: data => foldSearchText(data.detalle || '')
+  }
+}
+
+export function foldSearchText(text: string): string {
+  return String(text || '')
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+}
+
+export function tokenizeSearchText(text: string): string[] {
+  return foldSearchText(text).split(/[^a-z0-9]+/).filter(Boolean)
+}
+
+export interface EntitySearchOptions {
+  limit?: number
+  cursor?: string | null
+  filter?: (data: DocumentData) => boolean
+}
+
+export interface EntitySearchResult {
+  results: DocumentData[]
+  nextCursor: string | null
+}
+
+interface CursorPosition {
+  s: string
+  id: string
+}
+
+/**
+ * Documento listo para la respuesta (Timestamps como fechas, sin los campos de búsqueda)
+ */
+function toSearchDocument(id: string, data: DocumentData): DocumentData {
+  const result: DocumentData = { id }
+  for (const [key, value] of Object.entries(data)) {
+    if (key === 'searchTokens' || key === 'searchSort') continue
+    if (value instanceof Timestamp) result[key] = value.toDate()
+    else if (value instanceof FieldValue) result[key] = new Date()
+    else result[key] = value
+  }
+  return result
+}
+
+export class EntitySearchService {
+  /**
+   * Campos de búsqueda a guardar junto con el documento (al crearlo o editar sus campos buscables)
+   */
+  static searchFields(kind: SearchEntityKind, data: DocumentData): { searchTokens: string[]; searchSort: string } {
+    const config = ENTITY_CONFIG[kind]
+    const prefixes = new Set<string>()
+    for (const text of config.searchText(data)) {
+      for (const token of tokenizeSearchText(text)) {
+        const word = token.slice(0, MAX_PREFIX_LENGTH)
+        for (let length = 1; length <= word.length; length++) {
+          prefixes.add(word.slice(0, length))
+        }
+      }
+    }
+    return { searchTokens: Array.from(prefixes), searchSort: config.sortKey(data) }
+  }
+
+  /**
+   * Cada palabra de la consulta es un prefijo y deben cumplirse todas; resultados por nombre
+   */
+  static async search(
+    db: Firestore,
+    kind: SearchEntityKind,
+    tenantId: string,
+    queryText: string,
+    options: EntitySearchOptions = {}
+  ): Promise<EntitySearchResult> {
+    const config = ENTITY_CONFIG[kind]
+    const pageSize = Math.min(Math.max(options.limit || DEFAULT_SEARCH_LIMIT, 1), MAX_SEARCH_LIMIT)
+    const terms = Array.from(new Set(tokenizeSearchText(queryText).map(term => term.slice(0, MAX_PREFIX_LENGTH))))
+    // La palabra más larga es la más selectiva: esa va a Firestore, las demás se comprueban aquí
+    terms.sort((a, b) => b.length - a.length)
+    const [indexed, ...others] = terms
+
+    const filters: QueryConstraint[] = [...config.baseFilters(tenantId)]
+    if (indexed) {
+      filters.push(where('searchTokens', 'array-contains', indexed))
+    }
+    filters.push(orderBy('searchSort'), orderBy(documentId()))
+
+    let position: CursorPosition | null = options.cursor ? this.decodeCursor(options.cursor) : null
+    const results: DocumentData[] = []
+    let exhausted = false
+
+    // Sin nada que descartar basta con leer exactamente la página
+    const batchSize = others.length === 0 && !options.filter ? pageSize : pageSize * SCAN_PAGE_FACTOR
+
+    for (let scanned = 0; scanned < MAX_SCAN_PAGES && results.length < pageSize && !exhausted; scanned++) {
+      const constraints = [...filters]
+      if (position) {
+        constraints.push(startAfter(position.s, position.id))
+      }
+      constraints.push(limitTo(batchSize))
+
+      const snapshot = await getDocs(query(collection(db, config.collectionName), ...constraints))
+      exhausted = snapshot.docs.length < batchSize
+
+      for (const snap of snapshot.docs) {
+        const data = snap.data()
+        position = { s: String(data.searchSort ?? ''), id: snap.id }
+
+        const tokens: string[] = Array.isArray(data.searchTokens) ? data.searchTokens : []
+        if (!others.every(term => tokens.includes(term))) continue
+        const document = toSearchDocument(snap.id, data)
+        if (options.filter && !options.filter(document)) continue
+
+        results.push(document)
+        if (results.length === pageSize) {
+          // La página se completó antes del final de lo leído: continuar justo después de este
+          exhausted = exhausted && snap === snapshot.docs[snapshot.docs.length - 1]
+          break
+        }
+      }
+    }
+
+    return {
+      results,
+      nextCursor: !exhausted && position ? this.encodeCursor(position) : null
+    }
+  }
+
+  private static encodeCursor(position: CursorPosition): string {
+    return Buffer.from(JSON.stringify(position)).toString('base64url')
+  }
+
+  private static decodeCursor(cursor: string): CursorPosition {
+    try {
+      const position = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'))
+      if (typeof position.s === 'string' && typeof position.id === 'string') {
+        return position
+      }
+    } catch {
+      // Se reporta abajo
+    }
+    throw new InvalidCursorError()
+  }
+}
@@ -4,6 +4,8 @@
  */
 
 import { EncryptionService } from '@/lib/encryption'
+import { HaciendaTokenCache, FirestoreHaciendaTokenStore } from '@/lib/services/hacienda-token-cache'
+import { getFirestoreDb } from '@/lib/firebase-app'
 
 export interface HaciendaCredentials {
   authUrl: string
@@ -31,79 +33,99 @@ export interface HaciendaAuthResult {
   tokenResponse?: HaciendaTokenResponse
 }
 
+let tokenCache: HaciendaTokenCache | null = null
+
+/**
+ * Caché de tokens del proceso. Con HACIENDA_TOKEN_STORE=firestore los tokens se
+ * comparten entre instancias para no saturar el IDP.
+ */
+function getTokenCache(): HaciendaTokenCache {
+  if (!tokenCache) {
+    let store: FirestoreHaciendaTokenStore | undefined
+    if (process.env.HACIENDA_TOKEN_STORE === 'firestore') {
+      store = new FirestoreHaciendaTokenStore(getFirestoreDb())
+    }
+    tokenCache = new HaciendaTokenCache(
+      (credentials, refreshToken) => HaciendaAuthService.requestToken(credentials, refreshToken),
+      { store }
+    )
+  }
+  return tokenCache
+}
+
 export class HaciendaAuthService {
   /**
-   * Autentica con la API de Hacienda usando las credenciales de la empresa
+   * Solicita un token al IDP de Hacienda: password grant, o refresh grant si se indica refreshToken.
+   * Lanza un Error con el mensaje del IDP si la solicitud es rechazada.
    */
-  static async authenticateWithHacienda(credentials: HaciendaCredentials): Promise<HaciendaAuthResult> {
-    try {
-      console.log('🔐 Iniciando autenticación con API de Hacienda...')
-      console.log('🌐 URL de autenticación:', credentials.authUrl)
-      console.log('👤 Username:', credentials.username)
-      console.log('🔑 Client ID:', credentials.clientId)
-      console.log('🔒 Password encriptado disponible:', !!credentials.password)
+  static async requestToken(credentials: HaciendaCredentials, refreshToken?: string): Promise<HaciendaTokenResponse> {
+    const formData = new URLSearchParams()
+    formData.append('client_id', credentials.clientId)
 
+    if (refreshToken) {
+      formData.append('grant_type', 'refresh_token')
+      formData.append('refresh_token', refreshToken)
+    } else {
       // Desencriptar el password antes de enviarlo
       let decryptedPassword: string
       try {
         const masterPassword = EncryptionService.getMasterPassword()
         decryptedPassword = await EncryptionService.decrypt(credentials.password, masterPassword)
-        console.log('✅ Password desencriptado exitosamente')
       } catch (decryptError) {
         console.error('❌ Error al desencriptar password:', decryptError)
-        return {
-          success: false,
-          error: 'Error al desencriptar las credenciales de ATV'
-        }
+        throw new Error('Error al desencriptar las credenciales de ATV')
       }
 
-      // Preparar datos para el request
-      const formData = new URLSearchParams()
       formData.append('grant_type', 'password')
-      formData.append('client_id', credentials.clientId)
       formData.append('username', credentials.username)
       formData.append('password', decryptedPassword)
+    }
 
-      console.log('📡 Enviando solicitud de autenticación...')
+    console.log(`📡 Enviando solicitud de autenticación (${refreshToken ? 'refresh_token' : 'password'})...`)
 
-      // Realizar request de autenticación
-      const response = await fetch(credentials.authUrl, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/x-www-form-urlencoded'
-        },
-        body: formData.toString()
-      })
+    const response = await fetch(credentials.authUrl, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/x-www-form-urlencoded'
+      },
+      body: formData.toString()
+    })
 
-      console.log('📊 Status de respuesta:', response.status)
-      console.log('📊 Status text:', response.statusText)
-
-      if (!response.ok) {
-        const errorText = await response.text()
-        console.error('❌ Error en respuesta de autenticación:', response.status, errorText)
-        
-        let errorMessage = `Error de autenticación: ${response.status}`
-        try {
-          const errorData = JSON.parse(errorText)
-          errorMessage = errorData.error_description || errorData.error || errorMessage
-        } catch {
-          errorMessage = errorText || errorMessage
-        }
+    console.log('📊 Status de respuesta:', response.status)
 
-        return {
-          success: false,
-          error: errorMessage
-        }
+    if (!response.ok) {
+      const errorText = await response.text()
+      console.error('❌ Error en respuesta de autenticación:', response.status, errorText)
+
+      let errorMessage = `Error de autenticación: ${response.status}`
+      try {
+        const errorData = JSON.parse(errorText)
+        errorMessage = errorData.error_description || errorData.error || errorMessage
+      } catch {
+        errorMessage = errorText || errorMessage
       }
 
-      const tokenResponse: HaciendaTokenResponse = await response.json()
-      console.log('✅ Autenticación exitosa')
-      console.log('🎫 Token obtenido:', tokenResponse.access_token.substring(0, 50) + '...')
-      console.log('⏰ Expira en:', tokenResponse.expires_in, 'segundos')
-      console.log('🔍 Token completo:', tokenResponse.access_token)
-      console.log('🔍 Token type:', tokenResponse.token_type)
-      console.log('🔍 Scope:', tokenResponse.scope)
-      console.log('🔍 Session state:', tokenResponse.session_state)
+      throw new Error(errorMessage)
+    }
+
+    const tokenResponse: HaciendaTokenResponse = await response.json()
+    console.log('✅ Autenticación exitosa')
+    console.log('⏰ Expira en:', tokenResponse.expires_in, 'segundos')
+
+    return tokenResponse
+  }
+
+  /**
+   * Autentica con la API de Hacienda usando las credenciales de la empresa (siempre pide un token nuevo)
+   */
+  static async authenticateWithHacienda(credentials: HaciendaCredentials): Promise<HaciendaAuthResult> {
+    try {
+      console.log('🔐 Iniciando autenticación con API de Hacienda...')
+      console.log('🌐 URL de autenticación:', credentials.authUrl)
+      console.log('👤 Username:', credentials.username)
+      console.log('🔑 Client ID:', credentials.clientId)
+
+      const tokenResponse = await this.requestToken(credentials)
 
       return {
         success: true,
@@ -213,23 +235,29 @@ export class HaciendaAuthService {
   }
 
   /**
-   * Obtiene un token válido (con lógica de refresh si es necesario)
-   * Esta función se puede expandir para manejar refresh tokens
+   * Obtiene un token válido desde el caché por cuenta ATV; lo renueva con el
+   * refresh token poco antes de vencer y solo cae al password grant si hace falta
    */
   static async getValidToken(companyData: any): Promise<HaciendaAuthResult> {
     try {
-      console.log('🔍 Obteniendo token válido para la empresa...')
-      
-      // Por ahora, siempre obtenemos un nuevo token
-      // En el futuro se puede implementar caché y refresh
-      const authResult = await this.authenticateFromCompany(companyData)
-      
-      if (authResult.success && authResult.expiresIn) {
-        const timeRemaining = this.getTokenTimeRemaining(authResult.expiresIn)
-        console.log(`⏰ Token válido por ${timeRemaining} minutos`)
+      const credentials = this.extractAtvCredentials(companyData)
+      if (!credentials) {
+        return {
+          success: false,
+          error: 'No se pudieron extraer las credenciales ATV de la empresa'
+        }
       }
 
-      return authResult
+      const token = await getTokenCache().getToken(credentials)
+      const expiresIn = Math.max(0, Math.floor((token.expiresAt - Date.now()) / 1000))
+      console.log(`⏰ Token válido por ${this.getTokenTimeRemaining(expiresIn)} minutos`)
+
+      return {
+        success: true,
+        accessToken: token.accessToken,
+        expiresIn,
+        tokenResponse: token.tokenResponse
+      }
 
     } catch (error) {
       console.error('❌ Error al obtener token válido:', error)
@@ -240,4 +268,16 @@ export class HaciendaAuthService {
     }
   }
 
+  /**
+   * Descarta el token en caché de la empresa (por ejemplo, si Hacienda lo rechazó con 401)
+   */
+  static async invalidateToken(companyData: any): Promise<void> {
+    const credentials = this.extractAtvCredentials(companyData)
+    if (credentials) {
+      await getTokenCache().invalidate(credentials).catch(error => {
+        console.warn('⚠️ Error invalidando token de Hacienda:', error)
+      })
+    }
+  }
+
 }
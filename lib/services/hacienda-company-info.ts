@@ -0,0 +1,234 @@
+/**
+ * Consulta de contribuyentes en Hacienda (api.hacienda.go.cr/fe/ae) con caché
+ *
+ * Las respuestas encontradas se guardan `positiveTtlMs` y las cédulas inexistentes
+ * (404) `negativeTtlMs`; los errores (429, 5xx, red) no se guardan para reintentar
+ * en la próxima consulta. La caché es LRU con `maxEntries` y las consultas
+ * concurrentes de la misma cédula comparten una sola solicitud a Hacienda.
+ * `prefetch` precarga una lista de cédulas con concurrencia limitada.
+ */
+
+import type { HaciendaCompanyInfo } from '../company-wizard-types'
+
+export type CompanyInfoLookupStatus = 'found' | 'not_found' | 'error'
+
+export interface CompanyInfoLookup {
+  status: CompanyInfoLookupStatus
+  data?: HaciendaCompanyInfo
+  httpStatus: number
+  message?: string
+  cached?: boolean
+}
+
+/**
+ * Consulta a Hacienda; debe resolver siempre (los errores se devuelven con status 'error')
+ */
+export type CompanyInfoFetcher = (identificacion: string) => Promise<CompanyInfoLookup>
+
+export interface CompanyInfoCacheOptions {
+  positiveTtlMs?: number
+  negativeTtlMs?: number
+  maxEntries?: number
+}
+
+export interface CompanyInfoCacheStats {
+  hits: number
+  misses: number
+  coalesced: number
+  fetches: number
+  errors: number
+  size: number
+}
+
+export interface CompanyInfoPrefetchResult {
+  requested: number
+  alreadyCached: number
+  found: number
+  notFound: number
+  errors: number
+}
+
+interface CacheEntry {
+  lookup: CompanyInfoLookup
+  expiresAt: number
+}
+
+const DEFAULT_BASE_URL = 'https://api.hacienda.go.cr/fe/ae'
+
+/**
+ * Limpia la cédula (sin guiones ni espacios); null si no tiene 9 o 10 dígitos
+ */
+export function normalizeIdentificacion(identificacion: string): string | null {
+  const cleanId = (identificacion || '').replace(/[-\s]/g, '')
+  return /^\d{9,10}$/.test(cleanId) ? cleanId : null
+}
+
+/**
+ * Consulta real a la API pública de Hacienda (HACIENDA_COMPANY_INFO_URL permite apuntar a otro servidor)
+ */
+export function createHaciendaCompanyInfoFetcher(
+  baseUrl: string = process.env.HACIENDA_COMPANY_INFO_URL || DEFAULT_BASE_URL
+): CompanyInfoFetcher {
+  return async (identificacion: string) => {
+    try {
+      const response = await fetch(`${baseUrl}?identificacion=${identificacion}`, {
+        method: 'GET',
+        headers: {
+          'Accept': 'application/json',
+          'User-Agent': 'InvoSell/1.0'
+        }
+      })
+
+      if (!response.ok) {
+        if (response.status === 404) {
+          return {
+            status: 'not_found',
+            httpStatus: 404,
+            message: 'No se encontró información para esta identificación en Hacienda'
+          }
+        }
+        return {
+          status: 'error',
+          httpStatus: response.status,
+          message: 'Error al consultar información en Hacienda'
+        }
+      }
+
+      const data: HaciendaCompanyInfo = await response.json()
+
+      // Validar que la respuesta tiene la estructura esperada
+      if (!data.nombre || !data.actividades || !Array.isArray(data.actividades)) {
+        return { status: 'error', httpStatus: 500, message: 'Respuesta inválida de la API de Hacienda' }
+      }
+
+      return { status: 'found', httpStatus: 200, data }
+
+    } catch (error) {
+      console.error('Error fetching company info from Hacienda:', error)
+      return { status: 'error', httpStatus: 503, message: 'Error de conexión con Hacienda. Intente nuevamente.' }
+    }
+  }
+}
+
+export class HaciendaCompanyInfoCache {
+  private readonly entries = new Map<string, CacheEntry>() // En orden de uso (LRU)
+  private readonly inFlight = new Map<string, Promise<CompanyInfoLookup>>()
+  private readonly positiveTtlMs: number
+  private readonly negativeTtlMs: number
+  private readonly maxEntries: number
+  private readonly counters = { hits: 0, misses: 0, coalesced: 0, fetches: 0, errors: 0 }
+
+  constructor(private readonly fetcher: CompanyInfoFetcher, options: CompanyInfoCacheOptions = {}) {
+    this.positiveTtlMs = options.positiveTtlMs ?? 24 * 60 * 60 * 1000
+    this.negativeTtlMs = options.negativeTtlMs ?? 60 * 60 * 1000
+    this.maxEntries = options.maxEntries ?? 5000
+  }
+
+  /**
+   * Consulta una cédula ya normalizada
+   */
+  async lookup(identificacion: string): Promise<CompanyInfoLookup> {
+    const cached = this.getFresh(identificacion)
+    if (cached) {
+      this.counters.hits++
+      return { ...cached.lookup, cached: true }
+    }
+
+    const pending = this.inFlight.get(identificacion)
+    if (pending) {
+      this.counters.coalesced++
+      return pending
+    }
+
+    this.counters.misses++
+    const request = this.fetchAndStore(identificacion).finally(() => {
+      this.inFlight.delete(identificacion)
+    })
+    this.inFlight.set(identificacion, request)
+    return request
+  }
+
+  /**
+   * Precarga varias cédulas (omite las que ya están en caché)
+   */
+  async prefetch(identificaciones: string[], concurrency: number = 4): Promise<CompanyInfoPrefetchResult> {
+    const unique = Array.from(new Set(identificaciones.map(normalizeIdentificacion).filter((id): id is string => !!id)))
+    const result: CompanyInfoPrefetchResult = { requested: unique.length, alreadyCached: 0, found: 0, notFound: 0, errors: 0 }
+
+    const pending = unique.filter(id => {
+      if (this.getFresh(id)) {
+        result.alreadyCached++
+        return false
+      }
+      return true
+    })
+
+    let next = 0
+    await Promise.all(Array.from({ length: Math.min(concurrency, pending.length) }, async () => {
+      while (next < pending.length) {
+        const lookup = await this.lookup(pending[next++])
+        if (lookup.status === 'found') result.found++
+        else if (lookup.status === 'not_found') result.notFound++
+        else result.errors++
+      }
+    }))
+
+    return result
+  }
+
+  invalidate(identificacion: string): void {
+    this.entries.delete(identificacion)
+  }
+
+  clear(): void {
+    this.entries.clear()
+  }
+
+  getStats(): CompanyInfoCacheStats {
+    return { ...this.counters, size: this.entries.size }
+  }
+
+  private getFresh(identificacion: string): CacheEntry | null {
+    const entry = this.entries.get(identificacion)
+    if (!entry) return null
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(identificacion)
+      return null
+    }
+    // Mover al final (usado más recientemente)
+    this.entries.delete(identificacion)
+    this.entries.set(identificacion, entry)
+    return entry
+  }
+
+  private async fetchAndStore(identificacion: string): Promise<CompanyInfoLookup> {
+    this.counters.fetches++
+    const lookup = await this.fetcher(identificacion)
+
+    if (lookup.status === 'error') {
+      this.counters.errors++
+      return lookup
+    }
+
+    const ttl = lookup.status === 'found' ? this.positiveTtlMs : this.negativeTtlMs
+    this.entries.delete(identificacion)
+    this.entries.set(identificacion, { lookup, expiresAt: Date.now() + ttl })
+
+    while (this.entries.size > this.maxEntries) {
+      const oldest = this.entries.keys().next().value as string
+      this.entries.delete(oldest)
+    }
+
+    return lookup
+  }
+}
+
+// Instancia singleton
+let companyInfoCacheInstance: HaciendaCompanyInfoCache | null = null
+
+export function getCompanyInfoCache(): HaciendaCompanyInfoCache {
+  if (!companyInfoCacheInstance) {
+    companyInfoCacheInstance = new HaciendaCompanyInfoCache(createHaciendaCompanyInfoFetcher())
+  }
+  return companyInfoCacheInstance
+}
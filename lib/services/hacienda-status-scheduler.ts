@@ -0,0 +1,546 @@
+/**
+ * Programador de consultas de estado en Hacienda (en segundo plano)
+ *
+ * Las rutas de creación ya no esperan ni consultan el estado dentro de la
+ * solicitud: registran la clave aquí y responden de inmediato. El programador
+ * mantiene todos los documentos pendientes en una cola con prioridad por hora
+ * de la próxima consulta y:
+ *   - consulta con retroceso exponencial por documento y jitter
+ *   - limita las consultas simultáneas a Hacienda de todo el proceso
+ *   - usa el token en caché de cada empresa (HaciendaAuthService.getValidToken)
+ *   - escribe los estados finales en lotes (writeBatch) y luego ejecuta las
+ *     acciones posteriores (correo de aprobación, anulación por nota de crédito)
+ *
+ * Cada documento pendiente queda marcado con `statusPolling.pending = true`,
+ * así que la cola se reconstruye desde Firestore. Cada consulta exige antes un
+ * arriendo del documento (`statusPolling.leaseOwner` / `leaseUntil`, tomado en
+ * una transacción): solo la instancia dueña consulta y escribe el estado final,
+ * y el correo de aprobación se reclama aparte con `emailSent` dentro de otra
+ * transacción antes de pasarlo a la cola de correos.
+ *
+ * La recuperación se repite cada RECOVERY_INTERVAL_MS (al encolar o al drenar) y
+ * solo trae, paginando, los pendientes cuyo arriendo venció: los de una instancia
+ * que murió o se congeló. `statusPolling.queuedAt` conserva la hora del primer
+ * envío, así el límite de MAX_POLLING_AGE_MS no se reinicia con cada recuperación.
+ */
+
+import {
+  Firestore,
+  doc,
+  collection,
+  query,
+  where,
+  orderBy,
+  limit,
+  startAfter,
+  serverTimestamp,
+  DocumentReference,
+  QueryConstraint,
+  QueryDocumentSnapshot,
+  Timestamp
+} from 'firebase/firestore'
+import {
+  getDoc,
+  getDocs,
+  updateDoc,
+  runTransaction,
+  writeBatch
+} from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import { MinHeap } from '@/lib/min-heap'
+import { HaciendaStatusService } from '@/lib/services/hacienda-status'
+import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
+import { annulReferencedInvoice } from '@/lib/services/credit-note-status'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+
+const db = getFirestoreDb()
+
+export type PolledCollection = 'invoices' | 'tickets' | 'creditNotes'
+
+export interface StatusPollRequest {
+  collection: PolledCollection
+  documentId: string
+  companyId: string
+  locationUrl: string
+}
+
+export interface StatusSchedulerStats {
+  queued: number
+  active: number
+  pendingWrites: number
+  polls: number
+  finals: number
+  retries: number
+  abandoned: number
+  batchesWritten: number
+}
+
+interface PollEntry extends StatusPollRequest {
+  key: string
+  dueAt: number
+  attempts: number
+  firstQueuedAt: number
+  leaseUntil: number // Hasta cuándo esta instancia tiene arrendado el documento
+}
+
+interface PendingWrite {
+  ref: DocumentReference
+  data: Record<string, any>
+  followUp?: () => Promise<void>
+}
+
+const POLLED_COLLECTIONS: PolledCollection[] = ['invoices', 'tickets', 'creditNotes']
+
+// Hacienda suele tardar unos segundos en procesar: primera consulta a los 10 s
+const INITIAL_DELAY_MS = 10 * 1000
+const BASE_BACKOFF_MS = 5 * 1000
+const MAX_BACKOFF_MS = 10 * 60 * 1000
+// Después de este tiempo se deja de consultar (el documento queda para revisión manual)
+const MAX_POLLING_AGE_MS = 72 * 60 * 60 * 1000
+const FLUSH_INTERVAL_MS = 1000
+const MAX_WRITES_PER_BATCH = 400
+const COMPANY_CACHE_TTL_MS = 5 * 60 * 1000
+// Recuperación de pendientes con arriendo vencido: cada cuánto y de a cuántos por consulta
+const RECOVERY_INTERVAL_MS = 60 * 1000
+const RECOVERY_PAGE_SIZE = 500
+// Arriendo de un documento por consulta; se renueva si vence en menos de LEASE_RENEW_MARGIN_MS
+const LEASE_MS = 5 * 60 * 1000
+const LEASE_RENEW_MARGIN_MS = 60 * 1000
+
+type ClaimResult = { claimed: true } | { claimed: false; retryAt?: number }
+
+export class HaciendaStatusScheduler {
+  private readonly heap = new MinHeap<PollEntry>((a, b) => a.dueAt - b.dueAt)
+  private readonly entries = new Map<string, PollEntry>()
+  private readonly companies = new Map<string, { data: any; loadedAt: number }>()
+  private pendingWrites: PendingWrite[] = []
+  private active = 0
+  private timer: ReturnType<typeof setTimeout> | null = null
+  private timerDueAt = Infinity
+  private flushTimer: ReturnType<typeof setTimeout> | null = null
+  private flushing: Promise<void> | null = null
+  private recovering: Promise<void> | null = null
+  private lastRecoveryAt = 0
+  private readonly counters = { polls: 0, finals: 0, retries: 0, abandoned: 0, batchesWritten: 0 }
+  private readonly instanceId =
+    `${process.env.HOSTNAME || 'local'}-${process.pid}-${Math.random().toString(36).slice(2, 8)}`
+
+  constructor(
+    private readonly db: Firestore,
+    private readonly concurrency: number = 8
+  ) {}
+
+  /**
+   * Registra un documento enviado a Hacienda para consultar su estado en segundo plano.
+   * La marca de pendiente se escribe de inmediato (no en el lote): si la instancia se
+   * congela después de responder, otra lo recupera desde Firestore.
+   */
+  async enqueue(request: StatusPollRequest, delayMs: number = INITIAL_DELAY_MS): Promise<void> {
+    this.start()
+    const leaseUntil = Date.now() + LEASE_MS
+    if (!this.addEntry(request, Date.now() + delayMs, leaseUntil)) {
+      return
+    }
+
+    try {
+      await updateDoc(doc(this.db, request.collection, request.documentId), {
+        statusPolling: {
+          pending: true,
+          locationUrl: request.locationUrl,
+          leaseOwner: this.instanceId,
+          leaseUntil,
+          queuedAt: serverTimestamp()
+        }
+      })
+    } catch (error) {
+      // La consulta sigue en memoria; solo se pierde la recuperación tras un reinicio
+      console.error('❌ [Estado Hacienda] Error marcando documento pendiente:', request.documentId, error)
+    }
+  }
+
+  /**
+   * Arranca el programador y, si pasó RECOVERY_INTERVAL_MS desde la última vez, recupera
+   * los documentos pendientes cuyo arriendo venció
+   */
+  start(): Promise<void> {
+    if (this.recovering) {
+      return this.recovering
+    }
+    if (Date.now() - this.lastRecoveryAt < RECOVERY_INTERVAL_MS) {
+      return Promise.resolve()
+    }
+
+    this.lastRecoveryAt = Date.now()
+    this.recovering = this.recover()
+      .catch(error => {
+        console.error('❌ [Estado Hacienda] Error recuperando documentos pendientes:', error)
+      })
+      .finally(() => {
+        this.recovering = null
+      })
+    return this.recovering
+  }
+
+  /**
+   * Procesa lo que esté vencido hasta vaciar la cola de vencidos o agotar `maxMs`.
+   * Pensado para entornos serverless, donde un cron mantiene vivo el programador.
+   */
+  async drain(maxMs: number = 50 * 1000): Promise<StatusSchedulerStats> {
+    await this.start()
+    const deadline = Date.now() + maxMs
+    while (Date.now() < deadline) {
+      this.pump()
+      const next = this.heap.peek()
+      const nothingDue = !next || next.dueAt > Date.now()
+      if (this.active === 0 && nothingDue) break
+      await new Promise(resolve => setTimeout(resolve, 100))
+    }
+    await this.flush()
+    return this.getStats()
+  }
+
+  getStats(): StatusSchedulerStats {
+    return {
+      queued: this.entries.size,
+      active: this.active,
+      pendingWrites: this.pendingWrites.length,
+      ...this.counters
+    }
+  }
+
+  private addEntry(
+    request: StatusPollRequest,
+    dueAt: number,
+    leaseUntil: number = 0,
+    firstQueuedAt: number = Date.now()
+  ): boolean {
+    const key = `${request.collection}/${request.documentId}`
+    if (this.entries.has(key)) {
+      return false
+    }
+    const entry: PollEntry = { ...request, key, dueAt, attempts: 0, firstQueuedAt, leaseUntil }
+    this.entries.set(key, entry)
+    this.heap.push(entry)
+    this.schedule()
+    return true
+  }
+
+  /**
+   * Trae por páginas los pendientes con arriendo vencido (los vigentes los consulta su dueña)
+   */
+  private async recover(): Promise<void> {
+    let recovered = 0
+    const now = Date.now()
+    for (const collectionName of POLLED_COLLECTIONS) {
+      let lastSnap: QueryDocumentSnapshot | null = null
+      while (true) {
+        const constraints: QueryConstraint[] = [
+          where('statusPolling.pending', '==', true),
+          where('statusPolling.leaseUntil', '<', now),
+          orderBy('statusPolling.leaseUntil'),
+          ...(lastSnap ? [startAfter(lastSnap)] : []),
+          limit(RECOVERY_PAGE_SIZE)
+        ]
+        const snapshot = await getDocs(query(collection(this.db, collectionName), ...constraints))
+
+        snapshot.forEach(snap => {
+          const data = snap.data()
+          const locationUrl = data.statusPolling?.locationUrl
+          if (!locationUrl || !data.companyId) return
+          const queuedAt = data.statusPolling?.queuedAt
+          const firstQueuedAt = queuedAt instanceof Timestamp ? queuedAt.toMillis() : now
+          // Repartir las consultas recuperadas para no golpear a Hacienda todas a la vez
+          const dueAt = now + Math.random() * INITIAL_DELAY_MS
+          const request = { collection: collectionName, documentId: snap.id, companyId: data.companyId, locationUrl }
+          if (this.addEntry(request, dueAt, 0, firstQueuedAt)) {
+            recovered++
+          }
+        })
+
+        if (snapshot.docs.length < RECOVERY_PAGE_SIZE) break
+        lastSnap = snapshot.docs[snapshot.docs.length - 1]
+      }
+    }
+    if (recovered > 0) {
+      console.log(`🔄 [Estado Hacienda] ${recovered} documentos pendientes recuperados`)
+    }
+  }
+
+  /**
+   * Programa el temporizador para la próxima consulta vencida
+   */
+  private schedule(): void {
+    const next = this.heap.peek()
+    if (!next) return
+    // Sin espacios libres: la consulta que termine volverá a llamar a pump()
+    if (this.active >= this.concurrency && next.dueAt <= Date.now()) return
+    if (this.timer && this.timerDueAt <= next.dueAt) return
+
+    if (this.timer) clearTimeout(this.timer)
+    this.timerDueAt = next.dueAt
+    this.timer = setTimeout(() => {
+      this.timer = null
+      this.timerDueAt = Infinity
+      this.pump()
+    }, Math.max(0, next.dueAt - Date.now()))
+    // No mantener vivo el proceso solo por el programador
+    ;(this.timer as any).unref?.()
+  }
+
+  private pump(): void {
+    const now = Date.now()
+    while (this.active < this.concurrency) {
+      const next = this.heap.peek()
+      if (!next || next.dueAt > now) break
+      const entry = this.heap.pop()!
+      if (this.entries.get(entry.key) !== entry) continue
+
+      this.active++
+      this.poll(entry)
+        .catch(error => {
+          console.error('❌ [Estado Hacienda] Error consultando', entry.key, error)
+          this.retry(entry)
+        })
+        .finally(() => {
+          this.active--
+          this.pump()
+        })
+    }
+    this.schedule()
+
+    // Sin consultas en curso los estados finales se escriben ya y no quedan en el búfer
+    // (una instancia serverless puede congelarse en cuanto el ciclo se detiene)
+    if (this.active === 0 && this.pendingWrites.length > 0) {
+      this.flush()
+    }
+  }
+
+  /**
+   * Toma o renueva el arriendo del documento; si otra instancia lo tiene vigente no se consulta
+   */
+  private async claim(entry: PollEntry): Promise<ClaimResult> {
+    if (entry.leaseUntil - Date.now() > LEASE_RENEW_MARGIN_MS) {
+      return { claimed: true }
+    }
+
+    const ref = doc(this.db, entry.collection, entry.documentId)
+    const leaseUntil = Date.now() + LEASE_MS
+    const result = await runTransaction(this.db, async (transaction): Promise<ClaimResult> => {
+      const snap = await transaction.get(ref)
+      const polling = snap.exists() ? snap.data().statusPolling : null
+      if (!polling?.pending) {
+        // Ya tiene estado final (lo escribió otra instancia) o se borró
+        return { claimed: false }
+      }
+      if (polling.leaseOwner && polling.leaseOwner !== this.instanceId && polling.leaseUntil > Date.now()) {
+        return { claimed: false, retryAt: polling.leaseUntil }
+      }
+
+      transaction.update(ref, {
+        'statusPolling.leaseOwner': this.instanceId,
+        'statusPolling.leaseUntil': leaseUntil
+      })
+      return { claimed: true }
+    })
+
+    if (result.claimed) {
+      entry.leaseUntil = leaseUntil
+    }
+    return result
+  }
+
+  private async poll(entry: PollEntry): Promise<void> {
+    const claim = await this.claim(entry)
+    if (!claim.claimed) {
+      if (this.entries.get(entry.key) !== entry) return
+      if (claim.retryAt) {
+        // Volver a mirar cuando venza el arriendo de la otra instancia, por si murió
+        entry.dueAt = claim.retryAt + Math.random() * INITIAL_DELAY_MS
+        this.heap.push(entry)
+        this.schedule()
+      } else {
+        this.entries.delete(entry.key)
+      }
+      return
+    }
+
+    this.counters.polls++
+
+    const companyData = await this.getCompany(entry.companyId)
+    if (!companyData?.atvCredentials) {
+      this.retry(entry)
+      return
+    }
+
+    const auth = await HaciendaAuthService.getValidToken(companyData)
+    if (!auth.success || !auth.accessToken) {
+      this.retry(entry)
+      return
+    }
+
+    const result = await HaciendaStatusService.checkDocumentStatus(entry.locationUrl, auth.accessToken)
+    if (!result.success) {
+      if (result.httpStatus === 401) {
+        await HaciendaAuthService.invalidateToken(companyData)
+      }
+      this.retry(entry)
+      return
+    }
+
+    const interpreted = HaciendaStatusService.interpretStatus(result.status)
+    if (!interpreted.isFinal) {
+      this.retry(entry)
+      return
+    }
+
+    this.entries.delete(entry.key)
+    this.counters.finals++
+    this.queueFinal(entry, result.status, interpreted)
+  }
+
+  /**
+   * Reprograma con retroceso exponencial y jitter ("equal jitter": entre la mitad y el total del retroceso)
+   */
+  private retry(entry: PollEntry): void {
+    if (this.entries.get(entry.key) !== entry) return
+
+    entry.attempts++
+    if (Date.now() - entry.firstQueuedAt > MAX_POLLING_AGE_MS) {
+      this.entries.delete(entry.key)
+      this.counters.abandoned++
+      this.queueWrite({
+        ref: doc(this.db, entry.collection, entry.documentId),
+        data: {
+          'statusPolling.pending': false,
+          statusDescription: 'Hacienda no devolvió un estado final; consultar manualmente',
+          updatedAt: serverTimestamp()
+        }
+      })
+      return
+    }
+
+    const backoff = Math.min(MAX_BACKOFF_MS, BASE_BACKOFF_MS * Math.pow(2, entry.attempts - 1))
+    entry.dueAt = Date.now() + backoff / 2 + Math.random() * (backoff / 2)
+    this.counters.retries++
+    this.heap.push(entry)
+    this.schedule()
+  }
+
+  private queueFinal(
+    entry: PollEntry,
+    status: any,
+    interpreted: { status: string; description: string; isFinal: boolean }
+  ): void {
+    const ref = doc(this.db, entry.collection, entry.documentId)
+    const estadoHacienda = status['ind-estado'] || status.estado || status.state
+
+    const data: Record<string, any> = {
+      haciendaSubmission: status,
+      // Las notas de crédito guardan el estado interpretado; facturas y tiquetes el ind-estado
+      status: entry.collection === 'creditNotes' ? interpreted.status : (estadoHacienda || interpreted.status),
+      statusDescription: interpreted.description,
+      isFinalStatus: interpreted.isFinal,
+      'statusPolling.pending': false,
+      lastStatusCheck: serverTimestamp(),
+      updatedAt: serverTimestamp()
+    }
+
+    // Tras escribir el estado: actualizar el resumen del dashboard y, si fue aceptado, anular/enviar correo
+    const followUp = async () => {
+      DashboardRollupService.syncDocumentInBackground(this.db, entry.collection, entry.documentId)
+      if (interpreted.status === 'Aceptado') {
+        await this.afterAccepted(entry, ref)
+      }
+    }
+
+    this.queueWrite({ ref, data, followUp })
+  }
+
+  private queueWrite(write: PendingWrite): void {
+    this.pendingWrites.push(write)
+    if (this.pendingWrites.length >= MAX_WRITES_PER_BATCH) {
+      this.flush()
+    } else if (!this.flushTimer) {
+      this.flushTimer = setTimeout(() => {
+        this.flushTimer = null
+        this.flush()
+      }, FLUSH_INTERVAL_MS)
+      ;(this.flushTimer as any).unref?.()
+    }
+  }
+
+  private flush(): Promise<void> {
+    if (this.flushing) {
+      return this.flushing.then(() => (this.pendingWrites.length > 0 ? this.flush() : undefined))
+    }
+    if (this.pendingWrites.length === 0) {
+      return Promise.resolve()
+    }
+
+    this.flushing = (async () => {
+      while (this.pendingWrites.length > 0) {
+        const writes = this.pendingWrites.splice(0, MAX_WRITES_PER_BATCH)
+        const batch = writeBatch(this.db)
+        writes.forEach(write => batch.update(write.ref, write.data))
+
+        try {
+          await batch.commit()
+          this.counters.batchesWritten++
+        } catch (error) {
+          // Un documento borrado hace fallar el lote completo: escribir uno por uno
+          console.warn('⚠️ [Estado Hacienda] Falló el lote, escribiendo individualmente:', error)
+          await Promise.all(writes.map(write => updateDoc(write.ref, write.data).catch(writeError => {
+            console.error('❌ [Estado Hacienda] Error escribiendo', write.ref.path, writeError)
+          })))
+        }
+
+        for (const write of writes) {
+          if (write.followUp) {
+            write.followUp().catch(error => {
+              console.error('❌ [Estado Hacienda] Error en acción posterior de', write.ref.path, error)
+            })
+          }
+        }
+      }
+    })().finally(() => {
+      this.flushing = null
+    })
+
+    return this.flushing
+  }
+
+  private async getCompany(companyId: string): Promise<any> {
+    const cached = this.companies.get(companyId)
+    if (cached && Date.now() - cached.loadedAt < COMPANY_CACHE_TTL_MS) {
+      return cached.data
+    }
+    const snap = await getDoc(doc(this.db, 'companies', companyId))
+    const data = snap.exists() ? snap.data() : null
+    this.companies.set(companyId, { data, loadedAt: Date.now() })
+    return data
+  }
+
+  /**
+   * Acciones que antes hacía la ruta de creación al recibir "Aceptado"
+   */
+  private async afterAccepted(entry: PollEntry, ref: DocumentReference): Promise<void> {
+    const snap = await getDoc(ref)
+    if (!snap.exists()) return
+
+    if (entry.collection === 'creditNotes' && snap.data().tipoNotaCredito === '01') {
+      const anulacion = await annulReferencedInvoice(entry.documentId, snap.data())
+      console.log('🚨 [Estado Hacienda]', anulacion.message)
+    }
+
+    // El correo se reclama con emailSent en una transacción y se entrega a la cola de
+    // correos: si dos instancias llegan aquí con el mismo documento, solo una lo encola.
+    // La cola de correos se carga solo cuando hay un comprobante aceptado
+    const { queueApprovalEmail } = await import('@/lib/services/approval-email')
+    await queueApprovalEmail({ collection: entry.collection, documentId: entry.documentId })
+  }
+}
+
+export const haciendaStatusScheduler = new HaciendaStatusScheduler(
+  db,
+  parseInt(process.env.HACIENDA_STATUS_CONCURRENCY || '8', 10)
+)
@@ -6,6 +6,7 @@ export interface HaciendaStatusResult {
   success: boolean
   status?: any
   error?: string
+  httpStatus?: number
 }
 
 export class HaciendaStatusService {
@@ -51,7 +52,8 @@ export class HaciendaStatusService {
 
         return {
           success: false,
-          error: errorMessage
+          error: errorMessage,
+          httpStatus: response.status
         }
       }
 
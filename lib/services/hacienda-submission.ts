@@ -4,6 +4,7 @@
  */
 
 import { HaciendaKeyGenerator } from '@/lib/services/hacienda-key-generator'
+import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
 
 export interface HaciendaSubmissionRequest {
   clave: string
@@ -152,6 +153,11 @@ export class HaciendaSubmissionService {
       if (!response.ok) {
         const errorText = await response.text()
         console.error('❌ Error en respuesta de Hacienda:', response.status, errorText)
+
+        if (response.status === 401) {
+          // Token revocado o vencido antes de lo esperado: el próximo envío pedirá uno nuevo
+          await HaciendaAuthService.invalidateToken(companyData)
+        }
         
         let errorMessage = `Error de envío a Hacienda: ${response.status}`
         try {
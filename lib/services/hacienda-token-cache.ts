@@ -0,0 +1,278 @@
+/**
+ * Caché de tokens de Hacienda por cuenta ATV
+ *
+ * Reutiliza el access token mientras sea válido y, poco antes de que venza,
+ * lo renueva con el refresh token (si el refresh falla o ya venció, vuelve al
+ * password grant). Las renovaciones concurrentes de la misma cuenta comparten
+ * una sola solicitud al IDP (single-flight).
+ *
+ * Opcionalmente usa un almacén compartido entre instancias (HaciendaTokenStore)
+ * para que un token obtenido por una instancia lo usen las demás; el almacén
+ * puede ofrecer un candado de renovación para que solo una instancia llame al
+ * IDP mientras las otras esperan el token nuevo.
+ */
+
+import { createHash } from 'crypto'
+import { Firestore, doc } from 'firebase/firestore'
+import { getDoc, setDoc, deleteDoc, runTransaction } from '../firestore-metrics'
+import { EncryptionService } from '../encryption'
+import type { HaciendaCredentials, HaciendaTokenResponse } from './hacienda-auth'
+
+export interface CachedHaciendaToken {
+  accessToken: string
+  refreshToken?: string
+  expiresAt: number // epoch ms
+  refreshExpiresAt: number // epoch ms
+  tokenResponse: HaciendaTokenResponse
+}
+
+export interface HaciendaTokenStore {
+  get(key: string): Promise<CachedHaciendaToken | null>
+  set(key: string, token: CachedHaciendaToken): Promise<void>
+  delete(key: string): Promise<void>
+  // true si esta instancia debe renovar; false si otra ya lo está haciendo
+  acquireRefreshLock?(key: string, ttlMs: number): Promise<boolean>
+}
+
+/**
+ * Solicita un token al IDP: password grant sin refreshToken, refresh grant con él.
+ * Debe lanzar un Error si el IDP rechaza la solicitud.
+ */
+export type HaciendaTokenGrant = (
+  credentials: HaciendaCredentials,
+  refreshToken?: string
+) => Promise<HaciendaTokenResponse>
+
+export interface HaciendaTokenCacheOptions {
+  store?: HaciendaTokenStore
+  refreshSkewMs?: number // Margen antes del vencimiento para renovar
+  lockTtlMs?: number // Tiempo máximo de espera por la renovación de otra instancia
+  maxEntries?: number
+}
+
+export interface HaciendaTokenCacheStats {
+  hits: number
+  storeHits: number
+  refreshGrants: number
+  passwordGrants: number
+}
+
+export class HaciendaTokenCache {
+  private readonly tokens = new Map<string, CachedHaciendaToken>()
+  private readonly inFlight = new Map<string, Promise<CachedHaciendaToken>>()
+  private readonly store?: HaciendaTokenStore
+  private readonly refreshSkewMs: number
+  private readonly lockTtlMs: number
+  private readonly maxEntries: number
+  readonly stats: HaciendaTokenCacheStats = { hits: 0, storeHits: 0, refreshGrants: 0, passwordGrants: 0 }
+
+  constructor(private readonly grant: HaciendaTokenGrant, options: HaciendaTokenCacheOptions = {}) {
+    this.store = options.store
+    this.refreshSkewMs = options.refreshSkewMs ?? 30 * 1000
+    this.lockTtlMs = options.lockTtlMs ?? 10 * 1000
+    this.maxEntries = options.maxEntries ?? 1000
+  }
+
+  /**
+   * Clave de la cuenta ATV. Incluye el password encriptado, así un cambio de
+   * credenciales no reutiliza tokens de la cuenta anterior.
+   */
+  static keyFor(credentials: HaciendaCredentials): string {
+    return createHash('sha256')
+      .update([credentials.authUrl, credentials.clientId, credentials.username, credentials.password].join('\n'))
+      .digest('hex')
+  }
+
+  /**
+   * Devuelve un access token válido, renovándolo si hace falta
+   */
+  async getToken(credentials: HaciendaCredentials): Promise<CachedHaciendaToken> {
+    const key = HaciendaTokenCache.keyFor(credentials)
+
+    const cached = this.tokens.get(key)
+    if (cached && this.isFresh(cached)) {
+      this.stats.hits++
+      return cached
+    }
+
+    const pending = this.inFlight.get(key)
+    if (pending) {
+      return pending
+    }
+
+    const promise = this.renew(key, credentials, cached).finally(() => {
+      this.inFlight.delete(key)
+    })
+    this.inFlight.set(key, promise)
+    return promise
+  }
+
+  /**
+   * Descarta el token de la cuenta (por ejemplo, si Hacienda respondió 401)
+   */
+  async invalidate(credentials: HaciendaCredentials): Promise<void> {
+    const key = HaciendaTokenCache.keyFor(credentials)
+    this.tokens.delete(key)
+    if (this.store) {
+      await this.store.delete(key)
+    }
+  }
+
+  clear(): void {
+    this.tokens.clear()
+  }
+
+  private isFresh(token: CachedHaciendaToken): boolean {
+    return Date.now() < token.expiresAt - this.refreshSkewMs
+  }
+
+  private async renew(
+    key: string,
+    credentials: HaciendaCredentials,
+    previous?: CachedHaciendaToken
+  ): Promise<CachedHaciendaToken> {
+    let base = previous
+
+    if (this.store) {
+      const stored = await this.readStore(key)
+      if (stored && this.isFresh(stored)) {
+        this.stats.storeHits++
+        this.remember(key, stored)
+        return stored
+      }
+      if (stored && (!base || stored.expiresAt > base.expiresAt)) {
+        base = stored
+      }
+
+      if (this.store.acquireRefreshLock) {
+        const acquired = await this.store.acquireRefreshLock(key, this.lockTtlMs).catch(() => true)
+        if (!acquired) {
+          const renewed = await this.waitForStore(key)
+          if (renewed) {
+            this.stats.storeHits++
+            this.remember(key, renewed)
+            return renewed
+          }
+          // La otra instancia no terminó a tiempo: renovar de todas formas
+        }
+      }
+    }
+
+    const token = await this.requestToken(credentials, base)
+    this.remember(key, token)
+
+    if (this.store) {
+      await this.store.set(key, token).catch(error => {
+        console.warn('⚠️ [Hacienda] No se pudo guardar el token en el almacén compartido:', error)
+      })
+    }
+
+    return token
+  }
+
+  private async requestToken(credentials: HaciendaCredentials, base?: CachedHaciendaToken): Promise<CachedHaciendaToken> {
+    if (base?.refreshToken && Date.now() < base.refreshExpiresAt - this.refreshSkewMs) {
+      try {
+        this.stats.refreshGrants++
+        return this.toCached(await this.grant(credentials, base.refreshToken))
+      } catch (error) {
+        console.warn('⚠️ [Hacienda] Refresh token rechazado, autenticando con password:', error)
+      }
+    }
+
+    this.stats.passwordGrants++
+    return this.toCached(await this.grant(credentials))
+  }
+
+  private toCached(tokenResponse: HaciendaTokenResponse): CachedHaciendaToken {
+    const now = Date.now()
+    return {
+      accessToken: tokenResponse.access_token,
+      refreshToken: tokenResponse.refresh_token || undefined,
+      expiresAt: now + (tokenResponse.expires_in || 0) * 1000,
+      refreshExpiresAt: now + (tokenResponse.refresh_expires_in || 0) * 1000,
+      tokenResponse
+    }
+  }
+
+  private remember(key: string, token: CachedHaciendaToken): void {
+    this.tokens.delete(key)
+    this.tokens.set(key, token)
+    while (this.tokens.size > this.maxEntries) {
+      this.tokens.delete(this.tokens.keys().next().value as string)
+    }
+  }
+
+  private async readStore(key: string): Promise<CachedHaciendaToken | null> {
+    try {
+      return await this.store!.get(key)
+    } catch (error) {
+      console.warn('⚠️ [Hacienda] Error leyendo el almacén compartido de tokens:', error)
+      return null
+    }
+  }
+
+  private async waitForStore(key: string): Promise<CachedHaciendaToken | null> {
+    const deadline = Date.now() + this.lockTtlMs
+    let delay = 100
+    while (Date.now() < deadline) {
+      await new Promise(resolve => setTimeout(resolve, delay))
+      const stored = await this.readStore(key)
+      if (stored && this.isFresh(stored)) {
+        return stored
+      }
+      delay = Math.min(delay * 2, 1000)
+    }
+    return null
+  }
+}
+
+/**
+ * Almacén compartido en Firestore (`haciendaTokens/{clave}`). Los tokens se
+ * guardan encriptados con la clave maestra, igual que las credenciales ATV.
+ */
+export class FirestoreHaciendaTokenStore implements HaciendaTokenStore {
+  private static readonly COLLECTION_NAME = 'haciendaTokens'
+
+  constructor(private readonly db: Firestore) {}
+
+  async get(key: string): Promise<CachedHaciendaToken | null> {
+    const snap = await getDoc(doc(this.db, FirestoreHaciendaTokenStore.COLLECTION_NAME, key))
+    if (!snap.exists()) {
+      return null
+    }
+    const data = snap.data()
+    if (!data.token || !data.expiresAt || data.expiresAt <= Date.now()) {
+      return null
+    }
+    const json = await EncryptionService.decrypt(data.token, EncryptionService.getMasterPassword())
+    return JSON.parse(json) as CachedHaciendaToken
+  }
+
+  async set(key: string, token: CachedHaciendaToken): Promise<void> {
+    const encrypted = await EncryptionService.encrypt(JSON.stringify(token), EncryptionService.getMasterPassword())
+    await setDoc(doc(this.db, FirestoreHaciendaTokenStore.COLLECTION_NAME, key), {
+      token: encrypted,
+      expiresAt: token.expiresAt,
+      refreshLockUntil: 0,
+      updatedAt: Date.now()
+    })
+  }
+
+  async delete(key: string): Promise<void> {
+    await deleteDoc(doc(this.db, FirestoreHaciendaTokenStore.COLLECTION_NAME, key))
+  }
+
+  async acquireRefreshLock(key: string, ttlMs: number): Promise<boolean> {
+    const ref = doc(this.db, FirestoreHaciendaTokenStore.COLLECTION_NAME, key)
+    return runTransaction(this.db, async (transaction) => {
+      const snap = await transaction.get(ref)
+      const now = Date.now()
+      if (snap.exists() && (snap.data().refreshLockUntil || 0) > now) {
+        return false
+      }
+      transaction.set(ref, { refreshLockUntil: now + ttlMs }, { merge: true })
+      return true
+    })
+  }
+}
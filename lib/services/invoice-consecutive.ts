@@ -3,13 +3,23 @@
  * Genera y actualiza consecutivos en formato FAC-XXXXXXXXXX
  */
 
-import { getFirestore, doc, getDoc, updateDoc, serverTimestamp } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
-
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { getDoc, updateDoc } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+import {
+  ConsecutiveAllocator,
+  ConsecutiveDocumentType,
+  CONSECUTIVE_FIELDS,
+  DEFAULT_SUCURSAL,
+  DEFAULT_TERMINAL
+} from './consecutive-allocator'
+
+const db = getFirestoreDb()
+
+// Un asignador por instancia: cada una arrienda sus propios bloques de consecutivos
+const allocator = new ConsecutiveAllocator(db, {
+  blockSize: parseInt(process.env.CONSECUTIVE_LEASE_SIZE || '50', 10)
+})
 
 export interface ConsecutiveResult {
   success: boolean
@@ -156,35 +166,56 @@ export class InvoiceConsecutiveService {
   }
 
   /**
-   * Proceso completo: obtener consecutivo y actualizar empresa
+   * Proceso completo: asigna el siguiente consecutivo desde el bloque arrendado por esta instancia
    * @param companyId ID de la empresa
    * @param documentType Tipo de documento: 'facturas' (consecutive), 'tiquetes' (consecutiveTK), 'notas-credito' (consecutiveNT)
+   * @param sucursal Sucursal de la serie (por defecto 001)
+   * @param terminal Terminal de la serie (por defecto 00001)
    */
-  static async getAndUpdateConsecutive(companyId: string, documentType?: 'facturas' | 'tiquetes' | 'notas-credito'): Promise<ConsecutiveResult> {
+  static async getAndUpdateConsecutive(
+    companyId: string,
+    documentType: ConsecutiveDocumentType = 'facturas',
+    sucursal: string = DEFAULT_SUCURSAL,
+    terminal: string = DEFAULT_TERMINAL
+  ): Promise<ConsecutiveResult> {
     try {
-      console.log('🚀 Proceso completo de consecutivo para empresa:', companyId, 'tipo:', documentType || 'facturas')
+      const number = await allocator.allocate(companyId, documentType, sucursal, terminal)
+      const consecutiveFormatted = this.formatDocumentConsecutive(documentType, number)
 
-      // 1. Obtener el siguiente consecutivo
-      const getResult = await this.getNextConsecutive(companyId, documentType)
-      if (!getResult.success) {
-        return getResult
-      }
+      console.log('✅ Consecutivo asignado:', consecutiveFormatted, `(${documentType} ${sucursal}/${terminal})`)
 
-      // 2. Actualizar el consecutivo en la empresa
-      const updateResult = await this.updateCompanyConsecutive(companyId, documentType)
-      if (!updateResult.success) {
-        return updateResult
+      return {
+        success: true,
+        consecutive: consecutiveFormatted
       }
 
-      console.log('✅ Proceso de consecutivo completado:', updateResult.consecutive)
+    } catch (error) {
+      console.error('❌ Error en proceso de consecutivo:', error)
+      return {
+        success: false,
+        error: error instanceof Error ? error.message : 'Error desconocido'
+      }
+    }
+  }
 
+  /**
+   * Asigna varios consecutivos consecutivos de una sola vez (emisión por lotes)
+   */
+  static async allocateConsecutives(
+    companyId: string,
+    documentType: ConsecutiveDocumentType,
+    count: number,
+    sucursal: string = DEFAULT_SUCURSAL,
+    terminal: string = DEFAULT_TERMINAL
+  ): Promise<{ success: boolean; consecutives?: string[]; error?: string }> {
+    try {
+      const numbers = await allocator.allocateMany(companyId, documentType, count, sucursal, terminal)
       return {
         success: true,
-        consecutive: updateResult.consecutive
+        consecutives: numbers.map(number => this.formatDocumentConsecutive(documentType, number))
       }
-
     } catch (error) {
-      console.error('❌ Error en proceso de consecutivo:', error)
+      console.error('❌ Error asignando consecutivos:', error)
       return {
         success: false,
         error: error instanceof Error ? error.message : 'Error desconocido'
@@ -192,6 +223,21 @@ export class InvoiceConsecutiveService {
     }
   }
 
+  /**
+   * Devuelve los números no usados de los bloques de esta instancia. Es opcional: si la
+   * instancia se detiene sin llamarlo, sus bloques se reutilizan al vencer (expiresAt)
+   */
+  static async releaseLeases(): Promise<void> {
+    await allocator.releaseAll()
+  }
+
+  /**
+   * Formatea un número como consecutivo del tipo de documento (FE-, TE-, NC-)
+   */
+  static formatDocumentConsecutive(documentType: ConsecutiveDocumentType, number: number): string {
+    return `${CONSECUTIVE_FIELDS[documentType].prefix}-${number.toString().padStart(10, '0')}`
+  }
+
   /**
    * Formatea un número como consecutivo FAC-XXXXXXXXXX
    */
@@ -267,6 +313,7 @@ export class InvoiceConsecutiveService {
       }
 
       const companyData = companySnap.data()
+      // Con bloques arrendados este valor es el último número reservado, no necesariamente emitido
       const currentConsecutive = companyData.consecutive || 0
       const formatted = this.formatConsecutive(currentConsecutive)
 
@@ -1,12 +1,12 @@
 import { Invoice } from '@/lib/invoice-types'
-import { getFirestore, doc, getDoc } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
+import { doc } from 'firebase/firestore'
+import { getDoc } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
 import { PDFGeneratorService } from '@/lib/services/pdf-generator'
+import { getPdfRenderCache, isAcceptedStatus } from '@/lib/services/pdf-render-cache'
+import { buildInvoicePdfData } from '@/lib/services/pdf-data'
 
-// Inicializar Firebase si no está ya inicializado
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 
 export interface InvoiceEmailData {
   to: string
@@ -225,7 +225,7 @@ export class InvoiceEmailService {
           const companyRef = doc(db, 'companies', invoice.companyId)
           const companySnap = await getDoc(companyRef)
           if (companySnap.exists()) {
-            companyData = companySnap.data()
+            companyData = { id: companySnap.id, ...companySnap.data() }
             console.log('✅ Datos de empresa obtenidos para PDF')
           }
         } catch (error) {
@@ -240,7 +240,7 @@ export class InvoiceEmailService {
           const clientRef = doc(db, 'clients', invoice.clientId)
           const clientSnap = await getDoc(clientRef)
           if (clientSnap.exists()) {
-            clientData = clientSnap.data()
+            clientData = { id: clientSnap.id, ...clientSnap.data() }
             console.log('✅ Datos de cliente obtenidos para PDF:', clientData?.name || clientData?.nombre)
             console.log('📞 Debug client fields from Firestore:', {
               keys: Object.keys(clientData || {}),
@@ -254,16 +254,8 @@ export class InvoiceEmailService {
         }
       }
       
-      // Preparar datos para el PDF optimizado
-      const pdfData = {
-        invoice: invoice,
-        company: companyData,
-        client: clientData,
-        haciendaResponse: invoice.haciendaSubmission,
-        // Asegurar que los campos de exoneración estén disponibles directamente
-        tieneExoneracion: invoice.tieneExoneracion,
-        exoneracion: invoice.exoneracion
-      }
+      // Mismos datos que la descarga desde la lista (comparten el PDF en caché)
+      const pdfData = buildInvoicePdfData(invoice, companyData, clientData)
       
       console.log('📄 Datos para PDF:', {
         hasCompany: !!companyData,
@@ -276,28 +268,11 @@ export class InvoiceEmailService {
         hasExoneracion: !!invoice.exoneracion
       })
       
-      // Generar PDF en base64 usando el endpoint optimizado
-      const { getBaseUrl } = await import('../utils')
-      const response = await fetch(`${getBaseUrl()}/api/generate-pdf-optimized`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify(pdfData)
-      })
-      
-      if (!response.ok) {
-        throw new Error(`Error en endpoint de PDF optimizado: ${response.status}`)
-      }
-      
-      const result = await response.json()
-      
-      if (!result.success) {
-        throw new Error(result.error || 'Error generando PDF optimizado')
-      }
-      
-      pdf_base64 = result.pdf_base64
-      console.log('✅ PDF generado en base64:', pdf_base64.length, 'caracteres')
+      // Generar PDF en el mismo proceso (los reenvíos reutilizan el PDF en caché);
+      // el comprobante viene de Firestore, su estado decide si el PDF va a disco
+      const { pdf, source } = await getPdfRenderCache().render(pdfData, { accepted: isAcceptedStatus(invoice.status) })
+      pdf_base64 = pdf.toString('base64')
+      console.log(`✅ PDF en base64 (${source === 'render' ? 'generado' : `caché ${source}`}):`, pdf_base64.length, 'caracteres')
       
       // Validar formato del PDF antes de usarlo
       if (pdf_base64) {
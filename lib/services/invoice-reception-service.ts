@@ -1,21 +1,32 @@
-import { initializeApp, getApps } from "firebase/app"
 import {
   doc,
-  getDoc,
-  getFirestore,
-  setDoc,
-  updateDoc,
   collection,
   query,
   where,
-  getDocs,
+  orderBy,
+  limit as limitTo,
+  startAfter,
+  documentId,
+  QueryConstraint
 } from "firebase/firestore"
-import { firebaseConfig } from "@/lib/firebase-config"
+import {
+  getDoc,
+  setDoc,
+  updateDoc,
+  getDocs,
+  writeBatch
+} from "@/lib/firestore-metrics"
+import { getFirestoreDb } from "@/lib/firebase-app"
+import { InvalidCursorError } from "@/lib/services/document-listing"
 import { DetectedProvider, canonicalizeEmail, sanitizeUndefined } from "@/lib/services/nylas-utils"
 
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+const db = getFirestoreDb()
 const COSTA_RICA_OFFSET_HOURS = 6 // America/Costa_Rica = UTC-6
+const RECEPTIONS_COLLECTION = "invoice-email-receptions"
+const MAX_PROCESSED_RESULTS = 1000
+// Subir cuando cambien los campos indexados; las empresas con una versión menor se reindexan una vez
+const RECEPTION_INDEX_VERSION = 1
+const BATCH_LIMIT = 400
 
 function parseYmd(value?: string): { year: number; month: number; day: number } | null {
   const raw = String(value || "").trim()
@@ -50,7 +61,59 @@ export type InvoiceReceptionConfig = {
 
 type ProcessedDoc = Record<string, any>
 
+export type ProcessedPage = {
+  records: ProcessedDoc[]
+  nextCursor: string | null
+  hasMore: boolean
+}
+
+type ProcessedCursor = {
+  t: number // issuedAtMs
+  id: string
+}
+
+/**
+ * Fecha de emisión en milisegundos (misma prioridad que el filtro original):
+ * FechaEmision del XML, fecha del correo (segundos en Nylas) o fecha de procesamiento
+ */
+function resolveIssuedAtMs(data: ProcessedDoc): number {
+  const candidates = [data?.invoiceSummary?.fechaEmision, data?.date, data?.processedAt]
+  for (const value of candidates) {
+    if (value === undefined || value === null || value === "" || value === 0) continue
+    const millis = typeof value === "number" ? (value < 1e12 ? value * 1000 : value) : new Date(value).getTime()
+    if (!Number.isNaN(millis)) return millis
+  }
+  return Date.now()
+}
+
+/**
+ * Clave numérica de 50 dígitos del comprobante, o null si no es válida
+ */
+function normalizeClave(clave?: string): string | null {
+  const digits = String(clave || "").replace(/\D/g, "")
+  return digits.length === 50 ? digits : null
+}
+
+function encodeCursor(cursor: ProcessedCursor): string {
+  return Buffer.from(JSON.stringify(cursor)).toString("base64url")
+}
+
+function decodeCursor(cursor: string): ProcessedCursor {
+  try {
+    const position = JSON.parse(Buffer.from(cursor, "base64url").toString("utf8"))
+    if (typeof position.t === "number" && typeof position.id === "string") {
+      return position
+    }
+  } catch {
+    // Se reporta abajo
+  }
+  throw new InvalidCursorError()
+}
+
 export class InvoiceReceptionService {
+  // Empresas ya verificadas en este proceso (ensureIndexed)
+  private static indexedCompanies = new Set<string>()
+
   static async getConfig(companyId: string): Promise<InvoiceReceptionConfig | null> {
     const ref = doc(db, "company-configurations", companyId)
     const snapshot = await getDoc(ref)
@@ -122,57 +185,181 @@ export class InvoiceReceptionService {
     )
   }
 
+  /**
+   * Guarda un comprobante procesado con los campos indexados (correo canónico y fecha de
+   * emisión) y su entrada en el índice de claves de la empresa
+   */
   static async saveProcessed(uniqueId: string, data: ProcessedDoc): Promise<void> {
-    const ref = doc(db, "invoice-email-receptions", uniqueId)
+    const ref = doc(db, RECEPTIONS_COLLECTION, uniqueId)
+    const processedAt = data.processedAt || new Date().toISOString()
     const payload = sanitizeUndefined({
       ...data,
       uniqueId,
-      processedAt: data.processedAt || new Date().toISOString(),
+      processedAt,
+      ...InvoiceReceptionService.indexFields({ ...data, processedAt }),
     })
-    await setDoc(ref, payload, { merge: true })
+
+    const batch = writeBatch(db)
+    batch.set(ref, payload, { merge: true })
+
+    const clave = normalizeClave(data?.invoiceSummary?.clave)
+    if (data.companyId && clave) {
+      batch.set(InvoiceReceptionService.claveRef(data.companyId, clave), {
+        uniqueId,
+        messageId: data.messageId || null,
+        processedAt,
+      })
+    }
+
+    await batch.commit()
   }
 
   static async existsProcessed(uniqueId: string): Promise<boolean> {
-    const ref = doc(db, "invoice-email-receptions", uniqueId)
+    const ref = doc(db, RECEPTIONS_COLLECTION, uniqueId)
     const snapshot = await getDoc(ref)
     return snapshot.exists()
   }
 
+  /**
+   * Detecta un comprobante ya procesado con una sola lectura: por clave en el índice de
+   * la empresa o, si el comprobante no trae clave, por su identificador fiscal
+   */
+  static async isAlreadyProcessed(companyId: string, params: { uniqueId: string; clave?: string }): Promise<boolean> {
+    const clave = normalizeClave(params.clave)
+    if (!clave) {
+      return InvoiceReceptionService.existsProcessed(params.uniqueId)
+    }
+
+    await InvoiceReceptionService.ensureIndexed(companyId)
+    const snapshot = await getDoc(InvoiceReceptionService.claveRef(companyId, clave))
+    return snapshot.exists()
+  }
+
+  /**
+   * Comprobantes procesados de un buzón, por fecha de emisión descendente (hasta 1000)
+   */
   static async getProcessed(params: {
     companyId: string
     receptionEmail: string
     fromDate?: string
     toDate?: string
   }): Promise<ProcessedDoc[]> {
-    const canonical = canonicalizeEmail(params.receptionEmail)
-    // Evita dependencia de índice compuesto en entornos donde aún no fue creado.
-    const byCompanyQuery = query(collection(db, "invoice-email-receptions"), where("companyId", "==", params.companyId))
+    const page = await InvoiceReceptionService.getProcessedPage({ ...params, pageSize: MAX_PROCESSED_RESULTS })
+    return page.records
+  }
 
-    const snapshot = await getDocs(byCompanyQuery)
-    const rows = snapshot.docs
-      .map((docItem) => ({ id: docItem.id, ...docItem.data() }))
-      .filter((row) => canonicalizeEmail(String(row?.receptionEmail || row?.receptionEmailCanonical || "")) === canonical)
+  /**
+   * Una página de comprobantes procesados; el rango de fechas (días de Costa Rica) se
+   * resuelve en Firestore con el índice companyId + receptionEmailCanonical + issuedAtMs
+   */
+  static async getProcessedPage(params: {
+    companyId: string
+    receptionEmail: string
+    fromDate?: string
+    toDate?: string
+    pageSize?: number
+    cursor?: string | null
+  }): Promise<ProcessedPage> {
+    await InvoiceReceptionService.ensureIndexed(params.companyId)
 
+    const pageSize = Math.min(Math.max(params.pageSize || MAX_PROCESSED_RESULTS, 1), MAX_PROCESSED_RESULTS)
     const fromParts = parseYmd(params.fromDate)
     const toParts = parseYmd(params.toDate)
-    const fromMs = fromParts ? costaRicaDayStartUtcMillis(fromParts.year, fromParts.month, fromParts.day) : null
-    const toMs = toParts ? costaRicaDayEndUtcMillis(toParts.year, toParts.month, toParts.day) : null
-
-    return rows
-      .filter((row) => {
-      const datePriority =
-        row?.invoiceSummary?.fechaEmision || row?.date || row?.processedAt || new Date().toISOString()
-      const current = new Date(datePriority).getTime()
-      if (Number.isNaN(current)) return true
-      if (fromMs !== null && current < fromMs) return false
-      if (toMs !== null && current > toMs) return false
-      return true
-    })
-      .sort((a, b) => {
-        const aDate = new Date(a?.processedAt || 0).getTime()
-        const bDate = new Date(b?.processedAt || 0).getTime()
-        return bDate - aDate
-      })
-      .slice(0, 1000)
+
+    const constraints: QueryConstraint[] = [
+      where("companyId", "==", params.companyId),
+      where("receptionEmailCanonical", "==", canonicalizeEmail(params.receptionEmail)),
+    ]
+    if (fromParts) {
+      constraints.push(where("issuedAtMs", ">=", costaRicaDayStartUtcMillis(fromParts.year, fromParts.month, fromParts.day)))
+    }
+    if (toParts) {
+      constraints.push(where("issuedAtMs", "<=", costaRicaDayEndUtcMillis(toParts.year, toParts.month, toParts.day)))
+    }
+    constraints.push(orderBy("issuedAtMs", "desc"), orderBy(documentId(), "desc"))
+    if (params.cursor) {
+      const cursor = decodeCursor(params.cursor)
+      constraints.push(startAfter(cursor.t, cursor.id))
+    }
+    // Un documento extra indica si hay otra página
+    constraints.push(limitTo(pageSize + 1))
+
+    const snapshot = await getDocs(query(collection(db, RECEPTIONS_COLLECTION), ...constraints))
+    const page = snapshot.docs.slice(0, pageSize)
+    const hasMore = snapshot.docs.length > pageSize
+    const last = page[page.length - 1]
+
+    return {
+      records: page.map((docItem) => ({ id: docItem.id, ...docItem.data() })),
+      nextCursor: hasMore && last ? encodeCursor({ t: last.get("issuedAtMs"), id: last.id }) : null,
+      hasMore,
+    }
+  }
+
+  /**
+   * Completa los campos indexados y el índice de claves de los comprobantes guardados
+   * antes de existir (una sola vez por empresa y versión de índice)
+   */
+  static async ensureIndexed(companyId: string): Promise<void> {
+    if (InvoiceReceptionService.indexedCompanies.has(companyId)) return
+
+    const configRef = doc(db, "company-configurations", companyId)
+    const snapshot = await getDoc(configRef)
+    if ((snapshot.data()?.receptionIndexVersion || 0) < RECEPTION_INDEX_VERSION) {
+      const updated = await InvoiceReceptionService.backfillIndexes(companyId)
+      await setDoc(configRef, { receptionIndexVersion: RECEPTION_INDEX_VERSION }, { merge: true })
+      console.log(`✅ Comprobantes recibidos reindexados para ${companyId}: ${updated}`)
+    }
+    InvoiceReceptionService.indexedCompanies.add(companyId)
+  }
+
+  static async backfillIndexes(companyId: string): Promise<number> {
+    const snapshot = await getDocs(query(collection(db, RECEPTIONS_COLLECTION), where("companyId", "==", companyId)))
+
+    let batch = writeBatch(db)
+    let operations = 0
+    let updated = 0
+
+    for (const docItem of snapshot.docs) {
+      const data = docItem.data()
+      const fields = InvoiceReceptionService.indexFields(data)
+      if (data.receptionEmailCanonical !== fields.receptionEmailCanonical || data.issuedAtMs !== fields.issuedAtMs) {
+        batch.update(docItem.ref, fields)
+        operations++
+        updated++
+      }
+
+      const clave = normalizeClave(data?.invoiceSummary?.clave)
+      if (clave) {
+        batch.set(InvoiceReceptionService.claveRef(companyId, clave), {
+          uniqueId: docItem.id,
+          messageId: data.messageId || null,
+          processedAt: data.processedAt || null,
+        })
+        operations++
+      }
+
+      if (operations >= BATCH_LIMIT) {
+        await batch.commit()
+        batch = writeBatch(db)
+        operations = 0
+      }
+    }
+
+    if (operations > 0) {
+      await batch.commit()
+    }
+    return updated
+  }
+
+  private static indexFields(data: ProcessedDoc): { receptionEmailCanonical: string; issuedAtMs: number } {
+    return {
+      receptionEmailCanonical: canonicalizeEmail(String(data?.receptionEmail || data?.receptionEmailCanonical || "")),
+      issuedAtMs: resolveIssuedAtMs(data),
+    }
+  }
+
+  private static claveRef(companyId: string, clave: string) {
+    return doc(db, "company-configurations", companyId, "receptionClaves", clave)
   }
 }
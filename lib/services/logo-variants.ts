@@ -0,0 +1,267 @@
+/**
+ * Servicio de variantes precalculadas del logo de la empresa
+ *
+ * El logo se procesa con Sharp una sola vez (al subirlo o cambiarlo) y la
+ * variante lista para PDF se guarda en su propio documento,
+ * `logoVariants/{hash}_pdf`, donde el hash es el SHA-256 del contenido. El
+ * base64 va partido en `logoVariants/{hash}_pdf/chunks/{n}` para no chocar con
+ * el límite de 1 MiB por documento; el documento de la variante se escribe al
+ * final, así que solo existe con todas sus partes. Delante hay un caché LRU en
+ * memoria acotado por bytes, así que generar un PDF solo paga el hash del logo.
+ */
+
+import { createHash } from 'crypto'
+import { doc, serverTimestamp } from 'firebase/firestore'
+import { getDoc, setDoc, updateDoc } from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+
+const db = getFirestoreDb()
+
+export interface LogoVariants {
+  hash: string
+  pdf: string // PNG base64 puro, máximo 500x500
+  originalBytes: number
+  pdfBytes: number
+}
+
+const COLLECTION_NAME = 'logoVariants'
+const PDF_VARIANT = 'pdf'
+
+// Mismos parámetros que usaba optimizeLogoForPDF para no cambiar el resultado visual
+const PDF_MAX_SIZE = 500
+
+// Caracteres de base64 por documento de Firestore (el límite es 1 MiB por documento)
+const CHUNK_CHARS = 900 * 1024
+
+// Límite del caché en memoria (suma de las variantes en base64)
+const CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+const cache = new Map<string, LogoVariants>()
+let cacheBytes = 0
+const inFlight = new Map<string, Promise<LogoVariants>>()
+// Hashes cuya variante está guardada en Firestore (leída o escrita por esta instancia)
+const storedHashes = new Set<string>()
+
+function variantSize(variants: LogoVariants): number {
+  return variants.pdf.length
+}
+
+function cacheGet(hash: string): LogoVariants | undefined {
+  const variants = cache.get(hash)
+  if (variants) {
+    // Reinsertar para marcarlo como el más reciente
+    cache.delete(hash)
+    cache.set(hash, variants)
+  }
+  return variants
+}
+
+function cacheSet(variants: LogoVariants): void {
+  const existing = cache.get(variants.hash)
+  if (existing) {
+    cacheBytes -= variantSize(existing)
+    cache.delete(variants.hash)
+  }
+  cache.set(variants.hash, variants)
+  cacheBytes += variantSize(variants)
+
+  // Expulsar los menos usados hasta volver al límite
+  while (cacheBytes > CACHE_MAX_BYTES && cache.size > 1) {
+    const oldestHash = cache.keys().next().value as string
+    cacheBytes -= variantSize(cache.get(oldestHash)!)
+    cache.delete(oldestHash)
+  }
+}
+
+/**
+ * Extrae el base64 puro del logo desde las distintas estructuras guardadas en Firestore
+ */
+export function extractLogoData(logo: any): string {
+  if (!logo) return ''
+  let data = ''
+  if (typeof logo === 'string') {
+    data = logo
+  } else if (logo.fileData) {
+    data = logo.fileData
+  } else if (logo.filedata) {
+    data = logo.filedata
+  }
+  return data.replace(/^data:image\/[a-z+]+;base64,/, '')
+}
+
+export class LogoVariantService {
+  /**
+   * Hash del contenido del logo (clave del caché y del documento en Firestore)
+   */
+  static hashLogo(logoData: string): string {
+    return createHash('sha256').update(logoData).digest('hex')
+  }
+
+  /**
+   * Procesa el logo con Sharp y genera la variante para PDF
+   */
+  static async renderVariants(logoData: string, hash: string = this.hashLogo(logoData)): Promise<LogoVariants> {
+    // Sharp (binario nativo) se carga al procesar el primer logo, no al importar el módulo
+    const { default: sharp } = await import('sharp')
+    const imageBuffer = Buffer.from(logoData, 'base64')
+    const pdfBuffer = await sharp(imageBuffer)
+      .resize(PDF_MAX_SIZE, PDF_MAX_SIZE, { fit: 'inside', withoutEnlargement: true })
+      .png({ quality: 90, compressionLevel: 6 })
+      .toBuffer()
+
+    return {
+      hash,
+      pdf: pdfBuffer.toString('base64'),
+      originalBytes: imageBuffer.length,
+      pdfBytes: pdfBuffer.length
+    }
+  }
+
+  /**
+   * Obtiene las variantes del logo: caché en memoria → Firestore → procesamiento con Sharp.
+   * Las llamadas concurrentes para el mismo logo comparten un único procesamiento.
+   */
+  static async getVariants(logoData: string): Promise<LogoVariants> {
+    const hash = this.hashLogo(logoData)
+
+    const cached = cacheGet(hash)
+    if (cached) {
+      return cached
+    }
+
+    const pending = inFlight.get(hash)
+    if (pending) {
+      return pending
+    }
+
+    const promise = (async () => {
+      try {
+        const stored = await this.loadVariants(hash)
+        if (stored) {
+          cacheSet(stored)
+          return stored
+        }
+
+        console.log('🖼️ [Logo] Variantes no encontradas, procesando logo:', hash.substring(0, 12))
+        const variants = await this.renderVariants(logoData, hash)
+        cacheSet(variants)
+        if (!await this.storeVariants(variants)) {
+          // Queda solo en memoria: otra instancia volverá a procesar el logo
+          console.error('❌ [Logo] Variante sin guardar en Firestore:', hash.substring(0, 12))
+        }
+        return variants
+      } finally {
+        inFlight.delete(hash)
+      }
+    })()
+
+    inFlight.set(hash, promise)
+    return promise
+  }
+
+  /**
+   * Precalcula la variante al subir o cambiar el logo y la enlaza con la empresa
+   */
+  static async precomputeForCompany(companyId: string, logo: any): Promise<LogoVariants | null> {
+    const logoData = extractLogoData(logo)
+    if (!logoData) {
+      return null
+    }
+
+    try {
+      const variants = await this.getVariants(logoData)
+      if (!storedHashes.has(variants.hash) && !await this.storeVariants(variants)) {
+        // Sin variante guardada no se enlaza: los PDFs la procesarán bajo demanda
+        console.error('❌ [Logo] Variante sin guardar en Firestore para empresa', companyId)
+        return null
+      }
+
+      await updateDoc(doc(db, 'companies', companyId), {
+        'logo.variantHash': variants.hash
+      })
+
+      console.log(`✅ [Logo] Variante lista para empresa ${companyId}: PDF ${Math.round(variants.pdfBytes / 1024)}KB`)
+      return variants
+    } catch (error) {
+      // No bloquear la creación/actualización de la empresa: el PDF lo procesará bajo demanda
+      console.error('❌ [Logo] No se pudo precalcular la variante del logo:', error)
+      return null
+    }
+  }
+
+  private static variantId(hash: string): string {
+    return `${hash}_${PDF_VARIANT}`
+  }
+
+  private static async loadVariants(hash: string): Promise<LogoVariants | null> {
+    try {
+      const variantId = this.variantId(hash)
+      const snap = await getDoc(doc(db, COLLECTION_NAME, variantId))
+      if (!snap.exists()) {
+        return null
+      }
+      const data = snap.data()
+      const chunks = await Promise.all(
+        Array.from({ length: data.chunks || 0 }, (_, index) =>
+          getDoc(doc(db, COLLECTION_NAME, variantId, 'chunks', String(index)))
+        )
+      )
+      if (chunks.some(chunk => !chunk.exists())) {
+        console.warn('⚠️ [Logo] Variante incompleta en Firestore:', variantId)
+        return null
+      }
+      storedHashes.add(hash)
+      return {
+        hash,
+        pdf: chunks.map(chunk => chunk.data()!.data).join(''),
+        originalBytes: data.originalBytes || 0,
+        pdfBytes: data.bytes || 0
+      }
+    } catch (error) {
+      console.warn('⚠️ [Logo] Error leyendo la variante desde Firestore:', error)
+      return null
+    }
+  }
+
+  /**
+   * Guarda la variante (partes primero, documento de la variante al final); false si falla
+   */
+  private static async storeVariants(variants: LogoVariants): Promise<boolean> {
+    const variantId = this.variantId(variants.hash)
+    const chunkCount = Math.max(1, Math.ceil(variants.pdf.length / CHUNK_CHARS))
+
+    for (let attempt = 1; attempt <= 2; attempt++) {
+      try {
+        await Promise.all(
+          Array.from({ length: chunkCount }, (_, index) =>
+            setDoc(doc(db, COLLECTION_NAME, variantId, 'chunks', String(index)), {
+              data: variants.pdf.slice(index * CHUNK_CHARS, (index + 1) * CHUNK_CHARS)
+            })
+          )
+        )
+        await setDoc(doc(db, COLLECTION_NAME, variantId), {
+          hash: variants.hash,
+          variant: PDF_VARIANT,
+          chunks: chunkCount,
+          originalBytes: variants.originalBytes,
+          bytes: variants.pdfBytes,
+          createdAt: serverTimestamp()
+        })
+        storedHashes.add(variants.hash)
+        return true
+      } catch (error) {
+        console.warn(`⚠️ [Logo] Error guardando la variante en Firestore (intento ${attempt}):`, error)
+      }
+    }
+    return false
+  }
+
+  /**
+   * Limpia el caché en memoria (útil para benchmarks)
+   */
+  static clearCache(): void {
+    cache.clear()
+    cacheBytes = 0
+    storedHashes.clear()
+  }
+}
@@ -0,0 +1,34 @@
+/**
+ * Datos del PDF de un comprobante (factura, tiquete o nota de crédito)
+ *
+ * El correo de aprobación (servidor) y la descarga desde la lista (navegador) arman
+ * los datos con esta función, así un mismo comprobante produce la misma clave en la
+ * caché de PDFs (pdf-render-cache.ts) sin importar quién lo pida.
+ */
+
+export interface InvoicePdfData {
+  invoice: any
+  company: any
+  client: any
+  haciendaResponse: any
+  tieneExoneracion?: boolean
+  exoneracion?: any
+}
+
+export function buildInvoicePdfData(invoice: any, company: any, client: any): InvoicePdfData {
+  const consecutivo = String(invoice?.consecutivo || '')
+
+  return {
+    invoice: {
+      ...invoice,
+      fechaEmision: invoice?.fechaEmision || invoice?.fecha,
+      tipo: invoice?.tipo || (consecutivo.startsWith('NC-') ? 'nota-credito' : undefined)
+    },
+    company: company || null,
+    client: client || null,
+    haciendaResponse: invoice?.haciendaSubmission,
+    // Campos de exoneración disponibles directamente para el generador
+    tieneExoneracion: invoice?.tieneExoneracion,
+    exoneracion: invoice?.exoneracion
+  }
+}
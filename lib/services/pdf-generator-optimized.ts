@@ -1,51 +1,17 @@
 import jsPDF from 'jspdf'
-import sharp from 'sharp'
+import { LogoVariantService, extractLogoData } from '@/lib/services/logo-variants'
 
-// Función para optimizar logo desde Firebase (base64 puro) usando Sharp
-function optimizeLogoForPDF(logoData: string): Promise<string> {
-  return new Promise(async (resolve) => {
-    try {
-      console.log('🖼️ [PDF] Optimizando logo para el PDF...')
-      
-      // El logo desde Firebase viene como base64 puro (sin data:image/ prefix)
-      const originalSize = Buffer.byteLength(logoData, 'utf8')
-      const originalSizeKB = originalSize / 1024
-      
-      console.log(`🖼️ [PDF] Logo original: ${originalSizeKB.toFixed(0)}KB`)
-      
-      // Convertir base64 a buffer
-      const imageBuffer = Buffer.from(logoData, 'base64')
-      
-      // Redimensionar a máximo 500x500 píxeles para alta calidad
-      const maxSize = 500
-      
-      // Usar Sharp para optimizar la imagen
-      const optimizedBuffer = await sharp(imageBuffer)
-        .resize(maxSize, maxSize, {
-          fit: 'inside',
-          withoutEnlargement: true
-        })
-        .png({
-          quality: 90, // Alta calidad pero comprimido
-          compressionLevel: 6 // Balance entre tamaño y calidad
-        })
-        .toBuffer()
-      
-      // Convertir de vuelta a base64
-      const optimizedBase64 = optimizedBuffer.toString('base64')
-      const optimizedSizeKB = Buffer.byteLength(optimizedBase64, 'utf8') / 1024
-      
-      console.log(`✅ [PDF] Logo optimizado de ${originalSizeKB.toFixed(0)}KB a ${optimizedSizeKB.toFixed(0)}KB`)
-      console.log(`📊 [PDF] Reducción: ${((originalSizeKB - optimizedSizeKB) / originalSizeKB * 100).toFixed(1)}%`)
-      
-      resolve(optimizedBase64)
-      
-    } catch (error) {
-      console.warn('🖼️ [PDF] Error optimizando logo:', error)
-      // En caso de error, retornar el logo original
-      resolve(logoData)
-    }
-  })
+// Obtiene la variante del logo lista para PDF (precalculada al subir el logo; ver logo-variants.ts)
+async function optimizeLogoForPDF(logoData: string): Promise<string> {
+  try {
+    const variants = await LogoVariantService.getVariants(extractLogoData(logoData))
+    console.log(`🖼️ [PDF] Logo listo para PDF: ${Math.round(variants.pdfBytes / 1024)}KB (original ${Math.round(variants.originalBytes / 1024)}KB)`)
+    return variants.pdf
+  } catch (error) {
+    console.warn('🖼️ [PDF] Error optimizando logo:', error)
+    // En caso de error, retornar el logo original
+    return logoData
+  }
 }
 
 // Función para convertir colores oklch a hex basado en el CSS de V0
@@ -0,0 +1,444 @@
+/**
+ * Render de PDFs de comprobantes en el mismo proceso, con caché por contenido
+ *
+ * La clave es el SHA-256 de los datos del PDF (factura, empresa, cliente y respuesta
+ * de Hacienda, serializados con las llaves ordenadas y sin los campos que cambian
+ * después de emitir, como el estado, la consulta a Hacienda o el envío del correo)
+ * más PDF_TEMPLATE_VERSION. De la respuesta de Hacienda solo cuentan los campos que
+ * se dibujan (clave y fecha) y las fechas se comparan como ISO, vengan como Timestamp
+ * de Firestore o ya serializadas. Con los datos armados por buildInvoicePdfData
+ * (pdf-data.ts) el correo, los reenvíos y las descargas reutilizan el mismo PDF.
+ *
+ * - Memoria: LRU acotada por bytes (`maxBytes`)
+ * - Disco (opcional, `diskDir`): solo comprobantes aceptados por Hacienda, que ya no cambian.
+ *   La aceptación se decide con el documento guardado en Firestore, no con los datos
+ *   recibidos (`isAccepted`), y la carpeta se acota por bytes (`maxDiskBytes`)
+ *   descartando los PDFs usados hace más tiempo (mtime)
+ * - Renders concurrentes del mismo comprobante comparten una sola generación
+ */
+
+import { createHash } from 'crypto'
+import { promises as fs } from 'fs'
+import path from 'path'
+
+// Incrementar al cambiar el diseño en pdf-generator-optimized.ts (invalida la caché)
+export const PDF_TEMPLATE_VERSION = '1'
+
+// Campos que se actualizan después de emitir el comprobante y no afectan el PDF
+const VOLATILE_FIELDS = new Set([
+  'updatedAt',
+  // Estado y consulta en Hacienda (el PDF no dibuja el estado)
+  'status',
+  'statusDescription',
+  'isFinalStatus',
+  'lastStatusCheck',
+  'statusPolling',
+  'haciendaSubmission', // Lo que se dibuja va en haciendaResponse (ver HACIENDA_PDF_FIELDS)
+  'haciendaToken',
+  'leaseOwner',
+  'leaseUntil',
+  // Correo de aprobación
+  'emailSent',
+  'emailQueuedAt',
+  'emailSentAt',
+  'emailMessageId',
+  'emailDeliveredTo',
+  'emailError',
+  'emailErrorAt',
+  'emailQueueId',
+  'emailRounds',
+  'emailNeedsResend',
+  // Anulación por nota de crédito
+  'anuladaPor',
+  'anulacionData',
+  'notaCreditoId',
+  'notaCreditoConsecutivo',
+  'fechaAnulacion',
+  // Resumen del dashboard
+  'rollup'
+])
+
+// Campos de la respuesta de Hacienda que aparecen en el PDF
+const HACIENDA_PDF_FIELDS = ['clave', 'fecha']
+
+/**
+ * Genera el PDF; debe devolver los bytes del documento (empieza con %PDF)
+ */
+export type PdfRenderer = (pdfData: any) => Promise<Buffer>
+
+export type PdfRenderSource = 'memory' | 'disk' | 'render'
+
+export interface PdfRenderResult {
+  pdf: Buffer
+  key: string
+  source: PdfRenderSource
+}
+
+/**
+ * Indica si el comprobante está aceptado por Hacienda según su documento guardado
+ */
+export type PdfAcceptanceCheck = (pdfData: any) => Promise<boolean>
+
+export interface PdfRenderCacheOptions {
+  maxBytes?: number
+  diskDir?: string | null
+  maxDiskBytes?: number
+  isAccepted?: PdfAcceptanceCheck
+  templateVersion?: string
+}
+
+export interface PdfRenderCacheStats {
+  hits: number
+  diskHits: number
+  misses: number
+  coalesced: number
+  renders: number
+  evictions: number
+  diskEvictions: number
+  entries: number
+  bytes: number
+  diskFiles: number
+  diskBytes: number
+}
+
+/**
+ * Fecha ISO de un Timestamp de Firestore, también serializado ({seconds, nanoseconds}
+ * o {_seconds, _nanoseconds}); null si el valor no es un Timestamp
+ */
+function timestampISO(value: any): string | null {
+  if (typeof value.toDate === 'function') {
+    return value.toDate().toISOString()
+  }
+  const seconds = value.seconds ?? value._seconds
+  const nanoseconds = value.nanoseconds ?? value._nanoseconds
+  if (typeof seconds === 'number' && typeof nanoseconds === 'number' && Object.keys(value).length <= 3) {
+    return new Date(seconds * 1000 + Math.floor(nanoseconds / 1e6)).toISOString()
+  }
+  return null
+}
+
+/**
+ * JSON con llaves ordenadas (Timestamps como fecha ISO, Dates vía toJSON), sin undefined
+ * ni campos volátiles
+ */
+function canonicalJSON(value: any): string {
+  if (value === null || typeof value !== 'object') {
+    return value === undefined ? 'null' : JSON.stringify(value)
+  }
+  const timestamp = timestampISO(value)
+  if (timestamp !== null) {
+    return JSON.stringify(timestamp)
+  }
+  if (typeof value.toJSON === 'function') {
+    return canonicalJSON(value.toJSON())
+  }
+  if (Array.isArray(value)) {
+    return `[${value.map(canonicalJSON).join(',')}]`
+  }
+
+  const parts: string[] = []
+  for (const key of Object.keys(value).sort()) {
+    if (value[key] === undefined || typeof value[key] === 'function' || VOLATILE_FIELDS.has(key)) continue
+    parts.push(`${JSON.stringify(key)}:${canonicalJSON(value[key])}`)
+  }
+  return `{${parts.join(',')}}`
+}
+
+/**
+ * Un comprobante aceptado por Hacienda ya no cambia: su PDF puede guardarse en disco
+ */
+export function isAcceptedStatus(status: any): boolean {
+  return String(status || '').toLowerCase() === 'aceptado'
+}
+
+/**
+ * Colección del comprobante según el tipo y el consecutivo de los datos del PDF
+ */
+function pdfDataCollection(invoice: any): 'invoices' | 'tickets' | 'creditNotes' {
+  const consecutivo = String(invoice?.consecutivo || '')
+  if (invoice?.tipo === 'nota-credito' || consecutivo.startsWith('NC-')) return 'creditNotes'
+  if (invoice?.tipo === 'tiquete' || invoice?.documentType === 'tiquetes' || consecutivo.startsWith('TE-')) return 'tickets'
+  return 'invoices'
+}
+
+/**
+ * Aceptación según el documento guardado en Firestore (`invoice.id`); los datos del PDF
+ * vienen del navegador y su estado no es confiable
+ */
+export const isStoredDocumentAccepted: PdfAcceptanceCheck = async (pdfData: any) => {
+  const invoice = pdfData?.invoice
+  if (!invoice?.id || typeof invoice.id !== 'string') return false
+
+  const [{ getFirestoreDb }, { getDoc }, { doc }] = await Promise.all([
+    import('@/lib/firebase-app'),
+    import('@/lib/firestore-metrics'),
+    import('firebase/firestore')
+  ])
+  const snap = await getDoc(doc(getFirestoreDb(), pdfDataCollection(invoice), invoice.id))
+  if (!snap.exists()) return false
+
+  const stored = snap.data()
+  // El documento debe ser el mismo comprobante que se pide dibujar
+  if (invoice.consecutivo && stored.consecutivo && stored.consecutivo !== invoice.consecutivo) return false
+  return isAcceptedStatus(stored.status)
+}
+
+/**
+ * Render con la implementación optimizada de jsPDF (cargada al primer uso)
+ */
+export const renderInvoicePDF: PdfRenderer = async (pdfData: any) => {
+  const { generateInvoicePDFOptimized } = await import('./pdf-generator-optimized')
+  const doc = await generateInvoicePDFOptimized(pdfData)
+  if (!doc) {
+    throw new Error('Error: El documento PDF no se generó correctamente')
+  }
+
+  const pdf = Buffer.from(doc.output('arraybuffer'))
+  if (pdf.subarray(0, 4).toString('latin1') !== '%PDF') {
+    throw new Error('El PDF generado no tiene el formato correcto (debe empezar con %PDF)')
+  }
+  return pdf
+}
+
+export class PdfRenderCache {
+  private readonly entries = new Map<string, Buffer>() // En orden de uso (LRU)
+  private readonly inFlight = new Map<string, Promise<PdfRenderResult>>()
+  private readonly maxBytes: number
+  private readonly diskDir: string | null
+  private readonly maxDiskBytes: number
+  private readonly isAccepted: PdfAcceptanceCheck
+  private readonly templateVersion: string
+  private bytes = 0
+  // Archivos en disco (clave → bytes) en orden de uso; se arma al primer acceso leyendo la carpeta
+  private diskIndex: Map<string, number> | null = null
+  private diskIndexLoading: Promise<Map<string, number>> | null = null
+  private diskBytes = 0
+  private readonly counters = { hits: 0, diskHits: 0, misses: 0, coalesced: 0, renders: 0, evictions: 0, diskEvictions: 0 }
+
+  constructor(private readonly renderer: PdfRenderer, options: PdfRenderCacheOptions = {}) {
+    this.maxBytes = options.maxBytes ?? 64 * 1024 * 1024
+    this.diskDir = options.diskDir || null
+    this.maxDiskBytes = options.maxDiskBytes ?? 512 * 1024 * 1024
+    this.isAccepted = options.isAccepted ?? isStoredDocumentAccepted
+    this.templateVersion = options.templateVersion ?? PDF_TEMPLATE_VERSION
+  }
+
+  keyFor(pdfData: any): string {
+    const haciendaResponse = pdfData?.haciendaResponse
+      ? Object.fromEntries(HACIENDA_PDF_FIELDS.map(field => [field, pdfData.haciendaResponse[field]]))
+      : undefined
+
+    return createHash('sha256')
+      .update(`${this.templateVersion}\n`)
+      .update(canonicalJSON({ ...pdfData, haciendaResponse }))
+      .digest('hex')
+  }
+
+  /**
+   * PDF del comprobante; `bypass` genera siempre sin leer ni escribir la caché.
+   * `accepted` lo indica quien ya leyó el documento guardado (evita consultarlo otra vez)
+   */
+  async render(pdfData: any, options: { bypass?: boolean; accepted?: boolean } = {}): Promise<PdfRenderResult> {
+    const key = this.keyFor(pdfData)
+
+    if (options.bypass) {
+      this.counters.renders++
+      return { pdf: await this.renderer(pdfData), key, source: 'render' }
+    }
+
+    const cached = this.entries.get(key)
+    if (cached) {
+      this.counters.hits++
+      this.entries.delete(key)
+      this.entries.set(key, cached)
+      return { pdf: cached, key, source: 'memory' }
+    }
+
+    const pending = this.inFlight.get(key)
+    if (pending) {
+      this.counters.coalesced++
+      return pending
+    }
+
+    this.counters.misses++
+    const request = this.load(key, pdfData, options.accepted).finally(() => {
+      this.inFlight.delete(key)
+    })
+    this.inFlight.set(key, request)
+    return request
+  }
+
+  clear(): void {
+    this.entries.clear()
+    this.bytes = 0
+  }
+
+  getStats(): PdfRenderCacheStats {
+    return {
+      ...this.counters,
+      entries: this.entries.size,
+      bytes: this.bytes,
+      diskFiles: this.diskIndex?.size ?? 0,
+      diskBytes: this.diskBytes
+    }
+  }
+
+  private async load(key: string, pdfData: any, accepted?: boolean): Promise<PdfRenderResult> {
+    const persist = !!this.diskDir && await this.checkAccepted(pdfData, accepted)
+
+    if (persist) {
+      const fromDisk = await this.readFromDisk(key)
+      if (fromDisk) {
+        this.counters.diskHits++
+        this.store(key, fromDisk)
+        return { pdf: fromDisk, key, source: 'disk' }
+      }
+    }
+
+    this.counters.renders++
+    const pdf = await this.renderer(pdfData)
+    this.store(key, pdf)
+
+    if (persist) {
+      await this.writeToDisk(key, pdf)
+    }
+
+    return { pdf, key, source: 'render' }
+  }
+
+  private store(key: string, pdf: Buffer): void {
+    if (pdf.length > this.maxBytes) return
+
+    this.entries.set(key, pdf)
+    this.bytes += pdf.length
+
+    while (this.bytes > this.maxBytes) {
+      const [oldestKey, oldest] = this.entries.entries().next().value as [string, Buffer]
+      this.entries.delete(oldestKey)
+      this.bytes -= oldest.length
+      this.counters.evictions++
+    }
+  }
+
+  private async checkAccepted(pdfData: any, accepted?: boolean): Promise<boolean> {
+    if (accepted !== undefined) return accepted
+    try {
+      return await this.isAccepted(pdfData)
+    } catch (error) {
+      // Sin confirmar la aceptación el PDF solo queda en memoria
+      console.warn('⚠️ No se pudo verificar el estado del comprobante para la caché de disco:', error instanceof Error ? error.message : error)
+      return false
+    }
+  }
+
+  private diskPath(key: string): string {
+    // Dos niveles de carpetas para no acumular miles de archivos en un solo directorio
+    return path.join(this.diskDir as string, key.slice(0, 2), `${key}.pdf`)
+  }
+
+  /**
+   * Índice de la carpeta de disco, ordenado por mtime (los más antiguos primero)
+   */
+  private async loadDiskIndex(): Promise<Map<string, number>> {
+    if (this.diskIndex) return this.diskIndex
+    if (!this.diskIndexLoading) {
+      this.diskIndexLoading = this.scanDisk().then(index => {
+        this.diskIndex = index
+        this.diskBytes = Array.from(index.values()).reduce((sum, size) => sum + size, 0)
+        return index
+      })
+    }
+    return this.diskIndexLoading
+  }
+
+  private async scanDisk(): Promise<Map<string, number>> {
+    const files: { key: string; size: number; mtimeMs: number }[] = []
+    const root = this.diskDir as string
+    const folders = await fs.readdir(root).catch(() => [] as string[])
+
+    for (const folder of folders) {
+      const names = await fs.readdir(path.join(root, folder)).catch(() => [] as string[])
+      for (const name of names) {
+        if (!name.endsWith('.pdf')) continue
+        const stat = await fs.stat(path.join(root, folder, name)).catch(() => null)
+        if (stat?.isFile()) {
+          files.push({ key: name.slice(0, -'.pdf'.length), size: stat.size, mtimeMs: stat.mtimeMs })
+        }
+      }
+    }
+
+    files.sort((a, b) => a.mtimeMs - b.mtimeMs)
+    return new Map(files.map(file => [file.key, file.size]))
+  }
+
+  private async readFromDisk(key: string): Promise<Buffer | null> {
+    const index = await this.loadDiskIndex()
+    const size = index.get(key)
+    if (size === undefined) return null
+
+    try {
+      const filePath = this.diskPath(key)
+      const pdf = await fs.readFile(filePath)
+      if (pdf.subarray(0, 4).toString('latin1') !== '%PDF') return null
+
+      // Marca de uso: el mtime ordena el índice al reiniciar
+      index.delete(key)
+      index.set(key, size)
+      const now = new Date()
+      await fs.utimes(filePath, now, now).catch(() => {})
+      return pdf
+    } catch {
+      // Borrado por otra instancia que comparte la carpeta
+      index.delete(key)
+      this.diskBytes -= size
+      return null
+    }
+  }
+
+  private async writeToDisk(key: string, pdf: Buffer): Promise<void> {
+    const filePath = this.diskPath(key)
+    const tempPath = `${filePath}.${process.pid}.tmp`
+    try {
+      await fs.mkdir(path.dirname(filePath), { recursive: true })
+      await fs.writeFile(tempPath, pdf)
+      await fs.rename(tempPath, filePath)
+    } catch (error) {
+      console.warn('⚠️ No se pudo guardar el PDF en la caché de disco:', error instanceof Error ? error.message : error)
+      await fs.unlink(tempPath).catch(() => {})
+      return
+    }
+
+    const index = await this.loadDiskIndex()
+    this.diskBytes -= index.get(key) ?? 0
+    index.delete(key)
+    index.set(key, pdf.length)
+    this.diskBytes += pdf.length
+    await this.evictFromDisk(index)
+  }
+
+  private async evictFromDisk(index: Map<string, number>): Promise<void> {
+    while (this.diskBytes > this.maxDiskBytes && index.size > 0) {
+      const [oldestKey, size] = index.entries().next().value as [string, number]
+      index.delete(oldestKey)
+      this.diskBytes -= size
+      this.counters.diskEvictions++
+      await fs.unlink(this.diskPath(oldestKey)).catch(() => {})
+    }
+  }
+}
+
+// Instancia singleton
+let pdfRenderCacheInstance: PdfRenderCache | null = null
+
+export function getPdfRenderCache(): PdfRenderCache {
+  if (!pdfRenderCacheInstance) {
+    const maxMb = parseInt(process.env.PDF_CACHE_MAX_MB || '', 10)
+    const maxDiskMb = parseInt(process.env.PDF_CACHE_DISK_MAX_MB || '', 10)
+    pdfRenderCacheInstance = new PdfRenderCache(renderInvoicePDF, {
+      maxBytes: (maxMb > 0 ? maxMb : 64) * 1024 * 1024,
+      diskDir: process.env.PDF_CACHE_DIR || null,
+      maxDiskBytes: (maxDiskMb > 0 ? maxDiskMb : 512) * 1024 * 1024
+    })
+  }
+  return pdfRenderCacheInstance
+}
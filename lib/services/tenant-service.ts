@@ -4,13 +4,8 @@
  */
 
 import { 
-  getFirestore, 
   collection, 
-  addDoc, 
-  updateDoc, 
   doc, 
-  getDoc, 
-  getDocs, 
   query, 
   where, 
   orderBy,
@@ -18,12 +13,15 @@ import {
   serverTimestamp,
   DocumentData
 } from 'firebase/firestore'
-import { initializeApp, getApps } from 'firebase/app'
-import { firebaseConfig } from '@/lib/firebase-config'
-
-// Initialize Firebase
-const app = getApps().length === 0 ? initializeApp(firebaseConfig) : getApps()[0]
-const db = getFirestore(app)
+import {
+  addDoc,
+  updateDoc,
+  getDoc,
+  getDocs
+} from '@/lib/firestore-metrics'
+import { getFirestoreDb } from '@/lib/firebase-app'
+
+const db = getFirestoreDb()
 
 /**
  * Interfaz para Tenant (Licencia)
@@ -0,0 +1,613 @@
+/**
+ * Emisión de tiquetes por lotes (cierres de caja)
+ *
+ * En lugar de una solicitud por tiquete con todos los pasos en secuencia, el lote
+ * avanza como un pipeline:
+ *
+ *   1. Validación de todos los documentos (precios, CABYS) y carga única de clientes
+ *      y tipos de cambio
+ *   2. Consecutivos asignados en bloque (`allocateConsecutives`)
+ *   3. Por bloques de `chunkSize`: clave + XML de cada tiquete, firma del bloque
+ *      (certificado de la empresa ya leída) y alta de los registros en Firestore con
+ *      un solo writeBatch
+ *   4. Envío a Hacienda con a lo sumo `submitConcurrency` envíos simultáneos por
+ *      empresa, mientras el bloque siguiente ya se está firmando
+ *
+ * Los límites de firma y de envío son por empresa y del proceso, no por lote: dos
+ * cierres de caja simultáneos de la misma empresa comparten los cupos (el primer
+ * lote que crea el limitador fija su tamaño hasta que queda libre).
+ *
+ * Cada tiquete se reporta por `onResult` apenas termina (éxito o error), así la ruta
+ * puede ir transmitiendo los resultados al punto de venta. Desde que se asignan los
+ * consecutivos, todo tiquete queda registrado en Firestore: si un bloque falla
+ * completo (firma, tipo de cambio o preparación), sus tiquetes se guardan con status
+ * Error para no dejar huecos en la numeración. Si el writeBatch del bloque falla se
+ * reintenta una vez y después se guarda registro por registro.
+ */
+
+import { Firestore, DocumentReference, collection, doc, serverTimestamp } from 'firebase/firestore'
+import { getDoc, setDoc, updateDoc, writeBatch } from '@/lib/firestore-metrics'
+import { XMLGenerator } from '@/lib/services/xml-generator'
+import { DigitalSignatureService, SigningResponse } from '@/lib/services/digital-signature'
+import { HaciendaAuthService } from '@/lib/services/hacienda-auth'
+import { HaciendaSubmissionService } from '@/lib/services/hacienda-submission'
+import { HaciendaStatusService } from '@/lib/services/hacienda-status'
+import { haciendaStatusScheduler } from '@/lib/services/hacienda-status-scheduler'
+import { DashboardRollupService } from '@/lib/services/dashboard-rollups'
+import { CabysCatalogService } from '@/lib/services/cabys-catalog'
+import { InvoiceConsecutiveService } from '@/lib/services/invoice-consecutive'
+import { HaciendaKeyGenerator } from '@/lib/services/hacienda-key-generator'
+import {
+  TicketInput,
+  TicketOwner,
+  buildClientExoneracion,
+  buildFailedTicketRecord,
+  buildTicketReceptor,
+  buildTicketRecord,
+  buildTicketXMLData,
+  findInvalidPriceLines,
+  getCostaRicaDateTime,
+  getExchangeRateForCurrency
+} from '@/lib/services/ticket-issuance'
+
+export const MAX_BATCH_DOCUMENTS = 1000
+
+export interface BatchTicketInput extends TicketInput {
+  reference?: string // Identificador de la venta en el punto de venta (se devuelve tal cual)
+}
+
+export interface BatchTicketResult {
+  index: number
+  reference?: string
+  success: boolean
+  ticketId?: string
+  consecutivo?: string
+  clave?: string
+  status?: string
+  error?: string
+}
+
+export interface BatchIssuanceSummary {
+  total: number
+  succeeded: number
+  failed: number
+  durationMs: number
+}
+
+export interface BatchIssuanceOptions {
+  chunkSize?: number // Tiquetes por bloque de firma y escritura
+  signConcurrency?: number // Solicitudes simultáneas al servicio de firma
+  submitConcurrency?: number // Envíos simultáneos a Hacienda
+}
+
+interface PendingTicket {
+  index: number
+  input: BatchTicketInput
+  clientData: any
+  consecutivo: string
+}
+
+interface PreparedTicket {
+  ticket: PendingTicket
+  clave: string
+  xml: string
+  fecha: string
+}
+
+interface FailedTicket {
+  ticket: PendingTicket
+  error: string
+}
+
+interface SignedTicket extends PendingTicket {
+  id: string
+  ticketData: any
+  signedXml: string
+}
+
+interface TicketRecordWrite {
+  ref: DocumentReference
+  data: any
+}
+
+const DEFAULT_CHUNK_SIZE = 25
+const DEFAULT_SIGN_CONCURRENCY = 4
+const DEFAULT_SUBMIT_CONCURRENCY = 4
+const CLIENT_LOAD_CONCURRENCY = 8
+
+/**
+ * Limita cuántas tareas corren a la vez; las demás esperan su turno en orden
+ */
+class ConcurrencyLimiter {
+  private active = 0
+  private readonly waiting: Array<() => void> = []
+
+  constructor(private readonly limit: number) {}
+
+  get backlog(): number {
+    return this.active + this.waiting.length
+  }
+
+  async run<T>(task: () => Promise<T>): Promise<T> {
+    if (this.active < this.limit) {
+      this.active++
+    } else {
+      // El cupo lo cede directamente la tarea que termina
+      await new Promise<void>(resolve => this.waiting.push(resolve))
+    }
+
+    try {
+      return await task()
+    } finally {
+      const next = this.waiting.shift()
+      if (next) {
+        next()
+      } else {
+        this.active--
+      }
+    }
+  }
+}
+
+// Cupos de firma y de envío a Hacienda por empresa, compartidos por todos los lotes del proceso
+const signLimiters = new Map<string, ConcurrencyLimiter>()
+const submitLimiters = new Map<string, ConcurrencyLimiter>()
+
+function limiterFor(limiters: Map<string, ConcurrencyLimiter>, companyId: string, limit: number): ConcurrencyLimiter {
+  let limiter = limiters.get(companyId)
+  if (!limiter) {
+    limiter = new ConcurrencyLimiter(limit)
+    limiters.set(companyId, limiter)
+  }
+  return limiter
+}
+
+/**
+ * Corre la tarea con el cupo de la empresa y descarta el limitador cuando queda libre
+ */
+async function runForCompany<T>(
+  limiters: Map<string, ConcurrencyLimiter>,
+  companyId: string,
+  limit: number,
+  task: () => Promise<T>
+): Promise<T> {
+  const limiter = limiterFor(limiters, companyId, limit)
+  try {
+    return await limiter.run(task)
+  } finally {
+    if (limiter.backlog === 0 && limiters.get(companyId) === limiter) {
+      limiters.delete(companyId)
+    }
+  }
+}
+
+function errorMessage(error: unknown, fallback: string): string {
+  return error instanceof Error ? error.message : fallback
+}
+
+export class TicketBatchIssuanceService {
+  /**
+   * Emite los tiquetes del lote; `companyData` debe tener certificado y credenciales ATV
+   */
+  static async issue(
+    db: Firestore,
+    owner: TicketOwner,
+    companyData: any,
+    documents: BatchTicketInput[],
+    onResult: (result: BatchTicketResult) => void,
+    options: BatchIssuanceOptions = {}
+  ): Promise<BatchIssuanceSummary> {
+    const startedAt = Date.now()
+    const chunkSize = Math.max(1, options.chunkSize ?? DEFAULT_CHUNK_SIZE)
+    const signConcurrency = Math.max(1, options.signConcurrency ?? DEFAULT_SIGN_CONCURRENCY)
+    const submitConcurrency = Math.max(1, options.submitConcurrency ?? DEFAULT_SUBMIT_CONCURRENCY)
+
+    let succeeded = 0
+    let failed = 0
+    const report = (result: BatchTicketResult) => {
+      if (result.success) succeeded++
+      else failed++
+      onResult(result)
+    }
+
+    console.log(`📦 Emitiendo lote de ${documents.length} tiquetes para empresa ${owner.companyId}`)
+
+    // 1. Validación (sin consumir consecutivos para los documentos inválidos)
+    const valid: Array<{ index: number; input: BatchTicketInput }> = []
+    for (const [index, input] of documents.entries()) {
+      const error = await this.validate(input)
+      if (error) {
+        report({ index, reference: input?.reference, success: false, error })
+      } else {
+        valid.push({ index, input })
+      }
+    }
+
+    if (valid.length === 0) {
+      return { total: documents.length, succeeded, failed, durationMs: Date.now() - startedAt }
+    }
+
+    // Clientes y tipos de cambio se cargan una sola vez para todo el lote
+    const clients = await this.loadClients(db, valid.map(({ input }) => input.clientId))
+    const exchangeRates = new Map<string, Promise<number>>()
+    const exchangeRateFor = (currency: string) => {
+      if (!exchangeRates.has(currency)) {
+        // Un fallo no queda en caché: el bloque siguiente vuelve a intentarlo
+        const rate = getExchangeRateForCurrency(currency)
+        rate.catch(() => exchangeRates.delete(currency))
+        exchangeRates.set(currency, rate)
+      }
+      return exchangeRates.get(currency) as Promise<number>
+    }
+
+    // 2. Consecutivos en bloque
+    const allocation = await InvoiceConsecutiveService.allocateConsecutives(owner.companyId, 'tiquetes', valid.length)
+    if (!allocation.success || !allocation.consecutives) {
+      for (const { index, input } of valid) {
+        report({ index, reference: input.reference, success: false, error: `Error al generar consecutivo: ${allocation.error}` })
+      }
+      return { total: documents.length, succeeded, failed, durationMs: Date.now() - startedAt }
+    }
+
+    const consecutives = allocation.consecutives
+    const pending: PendingTicket[] = valid.map(({ index, input }, position) => ({
+      index,
+      input,
+      clientData: input.clientId ? clients.get(input.clientId) || null : null,
+      consecutivo: consecutives[position]
+    }))
+
+    // 3 y 4. Firma por bloques; el envío del bloque anterior corre mientras se firma el siguiente
+    const inFlight = new Set<Promise<void>>()
+    for (let i = 0; i < pending.length; i += chunkSize) {
+      // No adelantar más de dos bloques firmados sin enviar
+      while (inFlight.size > chunkSize * 2) {
+        await Promise.race(inFlight)
+      }
+
+      const chunk = pending.slice(i, i + chunkSize)
+      let signed: SignedTicket[]
+      try {
+        signed = await this.signChunk(db, owner, companyData, chunk, exchangeRateFor, signConcurrency, report)
+      } catch (error) {
+        // Falló el bloque completo antes de guardarse: sus consecutivos quedan registrados con status Error
+        console.error('❌ Error preparando bloque del lote:', error)
+        const message = errorMessage(error, 'Error al preparar el bloque')
+        await this.recordFailures(db, owner, chunk.map(ticket => ({ ticket, error: message })), report)
+        continue
+      }
+      if (signed.length === 0) continue
+
+      for (const ticket of signed) {
+        const submission: Promise<void> = runForCompany(submitLimiters, owner.companyId, submitConcurrency, () =>
+          this.submit(db, owner, companyData, ticket, report)
+        ).finally(() => inFlight.delete(submission))
+        inFlight.add(submission)
+      }
+    }
+    await Promise.all(inFlight)
+
+    const durationMs = Date.now() - startedAt
+    console.log(`✅ Lote terminado: ${succeeded} emitidos, ${failed} con error en ${(durationMs / 1000).toFixed(1)}s`)
+    return { total: documents.length, succeeded, failed, durationMs }
+  }
+
+  private static async validate(input: BatchTicketInput): Promise<string | null> {
+    if (!input || !Array.isArray(input.items) || input.items.length === 0) {
+      return 'El tiquete no tiene líneas de detalle'
+    }
+
+    const lineasConPrecioInvalido = findInvalidPriceLines(input.items)
+    if (lineasConPrecioInvalido.length > 0) {
+      return `El precio unitario debe ser mayor a cero en todas las líneas. Líneas con precio inválido: ${lineasConPrecioInvalido.join(', ')}`
+    }
+
+    const cabysValidation = await CabysCatalogService.validateItems(input.items, { defaultCode: '8399000000000' })
+    if (!cabysValidation.success) {
+      return cabysValidation.error || 'Código CABYS inválido'
+    }
+
+    return null
+  }
+
+  /**
+   * Carga los clientes distintos del lote; los que no existen quedan en null (tiquete sin receptor)
+   */
+  private static async loadClients(db: Firestore, clientIds: Array<string | undefined>): Promise<Map<string, any>> {
+    const ids = Array.from(new Set(clientIds.filter((id): id is string => !!id)))
+    const clients = new Map<string, any>()
+    const loads = new ConcurrencyLimiter(CLIENT_LOAD_CONCURRENCY)
+
+    await Promise.all(ids.map(id => loads.run(async () => {
+      const clientDoc = await getDoc(doc(db, 'clients', id))
+      if (clientDoc.exists()) {
+        clients.set(id, clientDoc.data())
+      } else {
+        console.warn('⚠️ Cliente no encontrado, se emite sin receptor:', id)
+      }
+    })))
+
+    return clients
+  }
+
+  /**
+   * Genera y firma el XML de un bloque y da de alta sus registros en Firestore.
+   * Devuelve los tiquetes listos para enviar; los fallidos se guardan con status Error y se reportan.
+   * Si lanza, no guardó nada del bloque (issue registra entonces todo el bloque como fallido).
+   */
+  private static async signChunk(
+    db: Firestore,
+    owner: TicketOwner,
+    companyData: any,
+    chunk: PendingTicket[],
+    exchangeRateFor: (currency: string) => Promise<number>,
+    signConcurrency: number,
+    report: (result: BatchTicketResult) => void
+  ): Promise<SignedTicket[]> {
+    const failures: FailedTicket[] = []
+    const prepared: PreparedTicket[] = []
+
+    for (const ticket of chunk) {
+      try {
+        const tipoCambio = await exchangeRateFor(ticket.input.currency || 'CRC')
+        const fecha = getCostaRicaDateTime()
+        const keyResult = HaciendaKeyGenerator.generateKey({
+          fecha: new Date(fecha),
+          cedulaEmisor: companyData.identification || '',
+          consecutivo: ticket.consecutivo,
+          pais: companyData.countryCode || '506',
+          situacion: '1', // Normal
+          tipoComprobante: '04' // 04 = Tiquete Electrónico
+        })
+        if (!keyResult.success || !keyResult.clave) {
+          throw new Error(`Error al generar clave: ${keyResult.error}`)
+        }
+
+        const xml = XMLGenerator.generateTiqueteXML(buildTicketXMLData({
+          input: ticket.input,
+          companyData,
+          clientData: ticket.clientData,
+          clientExoneracion: buildClientExoneracion(ticket.clientData),
+          clave: keyResult.clave,
+          fechaEmision: fecha,
+          tipoCambio
+        }))
+        prepared.push({ ticket, clave: keyResult.clave, xml, fecha })
+      } catch (error) {
+        failures.push({ ticket, error: errorMessage(error, 'Error al generar XML') })
+      }
+    }
+
+    // Certificado de la empresa ya leída; cada firma toma un cupo de firma de la empresa
+    const certificate = prepared.length > 0
+      ? await DigitalSignatureService.getCertificateFromCompany(owner.companyId, companyData.certificadoDigital)
+      : null
+    const signatures: SigningResponse[] = certificate
+      ? await Promise.all(prepared.map(({ xml }) =>
+          runForCompany(signLimiters, owner.companyId, signConcurrency, () =>
+            DigitalSignatureService.signXMLWithEncryptedPassword(xml, certificate.certificateBase64, certificate.password)
+          ).catch(error => ({ success: false, error: errorMessage(error, 'Error al firmar') }))
+        ))
+      : []
+    const noCertificate = 'No se encontró certificado digital configurado para esta empresa'
+
+    const records: TicketRecordWrite[] = []
+    const signed: SignedTicket[] = []
+
+    for (const [position, { ticket, clave, xml, fecha }] of prepared.entries()) {
+      const signature = signatures[position]
+      if (!signature?.success || !signature.signed_xml) {
+        failures.push({ ticket, error: `Error al firmar XML: ${signature?.error || (certificate ? 'sin respuesta' : noCertificate)}` })
+        continue
+      }
+
+      const ref = doc(collection(db, 'tickets'))
+      const ticketData = buildTicketRecord({
+        input: ticket.input,
+        owner,
+        consecutivo: ticket.consecutivo,
+        clave,
+        xml,
+        signedXml: signature.signed_xml,
+        fecha,
+        clientData: ticket.clientData
+      })
+      records.push({ ref, data: ticketData })
+      signed.push({ ...ticket, id: ref.id, ticketData, signedXml: signature.signed_xml })
+    }
+
+    // Los consecutivos ya asignados quedan registrados aunque el tiquete falle
+    const failedIds = this.addFailedRecords(db, owner, records, failures)
+    const unsaved = await this.saveRecords(db, records)
+
+    // Un tiquete firmado que no se pudo guardar no se envía: sin registro no hay cómo seguir su estado
+    const ready: SignedTicket[] = []
+    for (const ticket of signed) {
+      const error = unsaved.get(ticket.id)
+      if (error) {
+        report({ index: ticket.index, reference: ticket.input.reference, success: false, consecutivo: ticket.consecutivo, error })
+      } else {
+        ready.push(ticket)
+      }
+    }
+
+    this.reportFailures(db, failures, failedIds, unsaved, report)
+    return ready
+  }
+
+  /**
+   * Guarda con status Error los tiquetes de un bloque que falló completo y los reporta
+   */
+  private static async recordFailures(
+    db: Firestore,
+    owner: TicketOwner,
+    failures: FailedTicket[],
+    report: (result: BatchTicketResult) => void
+  ): Promise<void> {
+    const records: TicketRecordWrite[] = []
+    const failedIds = this.addFailedRecords(db, owner, records, failures)
+    const unsaved = await this.saveRecords(db, records)
+    this.reportFailures(db, failures, failedIds, unsaved, report)
+  }
+
+  private static addFailedRecords(
+    db: Firestore,
+    owner: TicketOwner,
+    records: TicketRecordWrite[],
+    failures: FailedTicket[]
+  ): Map<PendingTicket, string> {
+    const failedIds = new Map<PendingTicket, string>()
+    for (const { ticket, error } of failures) {
+      const ref = doc(collection(db, 'tickets'))
+      records.push({ ref, data: buildFailedTicketRecord({ input: ticket.input, owner, consecutivo: ticket.consecutivo, error }) })
+      failedIds.set(ticket, ref.id)
+    }
+    return failedIds
+  }
+
+  /**
+   * Guarda los registros del bloque en un writeBatch; si falla se reintenta una vez y
+   * luego se guardan uno por uno, así un registro problemático no deja sin registro (ni
+   * consecutivo explicable) al resto del bloque. Devuelve el error de los no guardados por ID.
+   */
+  private static async saveRecords(db: Firestore, records: TicketRecordWrite[]): Promise<Map<string, string>> {
+    const unsaved = new Map<string, string>()
+    if (records.length === 0) return unsaved
+
+    for (let attempt = 0; attempt < 2; attempt++) {
+      const batch = writeBatch(db)
+      records.forEach(({ ref, data }) => batch.set(ref, data))
+      try {
+        await batch.commit()
+        return unsaved
+      } catch (error) {
+        console.warn(`⚠️ Falló el guardado del bloque (intento ${attempt + 1}):`, errorMessage(error, 'Error desconocido'))
+      }
+    }
+
+    await Promise.all(records.map(async ({ ref, data }) => {
+      try {
+        await setDoc(ref, data)
+      } catch (error) {
+        console.error(`❌ Consecutivo ${data.consecutivo} sin registro en Firestore:`, error)
+        unsaved.set(ref.id, `Error al guardar tiquete: ${errorMessage(error, 'Error desconocido')}`)
+      }
+    }))
+    return unsaved
+  }
+
+  private static reportFailures(
+    db: Firestore,
+    failures: FailedTicket[],
+    failedIds: Map<PendingTicket, string>,
+    unsaved: Map<string, string>,
+    report: (result: BatchTicketResult) => void
+  ): void {
+    for (const { ticket, error } of failures) {
+      const ticketId = failedIds.get(ticket) as string
+      const saveError = unsaved.get(ticketId)
+      if (saveError) {
+        report({ index: ticket.index, reference: ticket.input.reference, success: false, consecutivo: ticket.consecutivo, error: `${error}; ${saveError}` })
+        continue
+      }
+      DashboardRollupService.syncDocumentInBackground(db, 'tickets', ticketId)
+      report({ index: ticket.index, reference: ticket.input.reference, success: false, ticketId, consecutivo: ticket.consecutivo, status: 'Error', error })
+    }
+  }
+
+  /**
+   * Envía un tiquete firmado a Hacienda y programa la consulta de su estado
+   */
+  private static async submit(
+    db: Firestore,
+    owner: TicketOwner,
+    companyData: any,
+    ticket: SignedTicket,
+    report: (result: BatchTicketResult) => void
+  ): Promise<void> {
+    const ref = doc(db, 'tickets', ticket.id)
+    const base = {
+      index: ticket.index,
+      reference: ticket.input.reference,
+      ticketId: ticket.id,
+      consecutivo: ticket.consecutivo,
+      clave: ticket.ticketData.clave
+    }
+
+    try {
+      if (!companyData.atvCredentials?.receptionUrl) {
+        await updateDoc(ref, { status: 'Pendiente Envío Hacienda', updatedAt: serverTimestamp() })
+        report({ ...base, success: true, status: 'Pendiente Envío Hacienda' })
+        return
+      }
+
+      // El token está en caché; se pide por envío para renovarlo si vence durante el lote
+      const authResult = await HaciendaAuthService.getValidToken(companyData)
+      if (!authResult.success || !authResult.accessToken) {
+        throw new Error(`Error en autenticación con Hacienda: ${authResult.error}`)
+      }
+
+      const submissionResult = await HaciendaSubmissionService.submitInvoiceToHacienda(
+        {
+          ...ticket.ticketData,
+          id: ticket.id,
+          client: ticket.clientData,
+          receptor: buildTicketReceptor(ticket.clientData)
+        },
+        ticket.signedXml,
+        authResult.accessToken,
+        companyData
+      )
+
+      if (!submissionResult.success) {
+        await updateDoc(ref, {
+          status: 'Error Envío Hacienda',
+          haciendaSubmission: { error: submissionResult.error },
+          updatedAt: serverTimestamp()
+        })
+        report({ ...base, success: false, status: 'Error Envío Hacienda', error: submissionResult.error })
+        return
+      }
+
+      let status = 'draft'
+      const response = submissionResult.response as any
+      if (response?.status === 202) {
+        status = 'Enviando Hacienda'
+        await updateDoc(ref, {
+          status: 'Enviando Hacienda',
+          haciendaSubmission: response,
+          haciendaToken: authResult.accessToken,
+          updatedAt: serverTimestamp()
+        })
+      }
+
+      if (response?.location) {
+        if (!HaciendaStatusService.validateLocationUrl(response.location)) {
+          await updateDoc(ref, {
+            status: 'Error URL Inválida',
+            haciendaSubmission: { error: 'URL de location inválida', locationUrl: response.location },
+            updatedAt: serverTimestamp()
+          })
+          report({ ...base, success: false, status: 'Error URL Inválida', error: 'URL de location inválida' })
+          return
+        } else {
+          await haciendaStatusScheduler.enqueue({
+            collection: 'tickets',
+            documentId: ticket.id,
+            companyId: owner.companyId,
+            locationUrl: response.location
+          })
+        }
+      }
+
+      report({ ...base, success: true, status })
+    } catch (error) {
+      const message = errorMessage(error, 'Error al enviar tiquete a Hacienda')
+      console.error(`❌ Error enviando tiquete ${ticket.consecutivo}:`, message)
+      await updateDoc(ref, { status: 'Error', error: message, updatedAt: serverTimestamp() }).catch(() => {})
+      report({ ...base, success: false, status: 'Error', error: message })
+    } finally {
+      DashboardRollupService.syncDocumentInBackground(db, 'tickets', ticket.id)
+    }
+  }
+}
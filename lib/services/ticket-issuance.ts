@@ -0,0 +1,359 @@
+/**
+ * Armado de tiquetes electrónicos
+ *
+ * Construye los datos del XML y el registro de Firestore de un tiquete a partir de la
+ * venta, la empresa y el cliente (opcional). Lo comparten /api/tickets/create (un
+ * tiquete por solicitud) y /api/tickets/batch (cierres de caja).
+ */
+
+import { serverTimestamp } from 'firebase/firestore'
+import { FacturaData, ReceptorData, ExoneracionXML } from '@/lib/services/xml-generator'
+import { ExchangeRateService } from '@/lib/services/exchange-rate-service'
+
+// Datos de la venta tal como llegan del punto de venta
+export interface TicketInput {
+  clientId?: string
+  subtotal?: number
+  totalImpuesto?: number
+  totalDescuento?: number
+  total?: number
+  exchangeRate?: number
+  currency?: string
+  condicionVenta?: string
+  paymentTerm?: string
+  paymentMethod?: string
+  notes?: string
+  items: any[]
+}
+
+export interface TicketOwner {
+  companyId: string
+  tenantId: string
+  createdBy?: string
+}
+
+export type TicketXMLData = FacturaData & { receptor?: ReceptorData | null }
+
+/**
+ * Fecha y hora actual en Costa Rica (YYYY-MM-DDTHH:mm:ss), usada para la clave y la emisión
+ */
+export function getCostaRicaDateTime(): string {
+  return new Date().toLocaleString('sv-SE', { timeZone: 'America/Costa_Rica' }).replace(' ', 'T')
+}
+
+/**
+ * Obtiene el tipo de cambio para una moneda específica
+ */
+export async function getExchangeRateForCurrency(currency: string): Promise<number> {
+  if (currency?.toUpperCase() === 'USD') {
+    console.log('💱 [ExchangeRate] Moneda USD detectada, obteniendo tipo de cambio de Hacienda...')
+    const exchangeRate = await ExchangeRateService.getExchangeRate()
+
+    if (exchangeRate) {
+      console.log(`💱 [ExchangeRate] Tipo de cambio obtenido: ${exchangeRate} CRC por USD`)
+      return exchangeRate
+    } else {
+      console.warn('💱 [ExchangeRate] No se pudo obtener tipo de cambio, usando 1 como fallback')
+      return 1
+    }
+  }
+
+  console.log(`💱 [ExchangeRate] Moneda ${currency}, usando tipo de cambio 1`)
+  return 1
+}
+
+/**
+ * Devuelve el número de línea (1..n) de los items con precio unitario inválido
+ */
+export function findInvalidPriceLines(items: any[]): number[] {
+  return items
+    .map((item: any, idx: number) => ((item.precioUnitario || 0) <= 0 ? idx + 1 : 0))
+    .filter(line => line > 0)
+}
+
+/**
+ * Mapea la exoneración del cliente (formato nuevo o legacy) al formato del XML
+ */
+export function buildClientExoneracion(clientData: any): ExoneracionXML | undefined {
+  if (!clientData) return undefined
+
+  const fechaCostaRica = getCostaRicaDateTime()
+  const formatDateWithTimezone = (dateString: string): string => {
+    if (!dateString) return fechaCostaRica + '-06:00'
+    if (dateString.includes('T') && (dateString.includes('+') || dateString.includes('-'))) {
+      return dateString
+    }
+    if (dateString.includes('T')) {
+      return dateString + '-06:00'
+    }
+    return dateString + 'T00:00:00-06:00'
+  }
+
+  if (clientData.tieneExoneracion && clientData.exoneracion) {
+    console.log('🛡️ Cliente con exoneración detectada:', clientData.exoneracion)
+    return {
+      tipoDocumento: clientData.exoneracion.tipoDocumento || '',
+      tipoDocumentoOtro: clientData.exoneracion.tipoDocumentoOtro || undefined,
+      numeroDocumento: clientData.exoneracion.numeroDocumento || '',
+      nombreLey: clientData.exoneracion.nombreLey || undefined,
+      articulo: clientData.exoneracion.articulo ? parseInt(clientData.exoneracion.articulo) : undefined,
+      // Si hay artículo, incluir inciso (usar 0 si no está definido)
+      inciso: clientData.exoneracion.articulo
+        ? (clientData.exoneracion.inciso ? parseInt(clientData.exoneracion.inciso) : 0)
+        : (clientData.exoneracion.inciso ? parseInt(clientData.exoneracion.inciso) : undefined),
+      porcentajeCompra: clientData.exoneracion.porcentajeCompra ? parseFloat(clientData.exoneracion.porcentajeCompra) : undefined,
+      nombreInstitucion: clientData.exoneracion.nombreInstitucion || '',
+      nombreInstitucionOtros: clientData.exoneracion.nombreInstitucionOtros || undefined,
+      fechaEmision: formatDateWithTimezone(clientData.exoneracion.fechaEmision),
+      tarifaExonerada: parseFloat(clientData.exoneracion.tarifaExonerada) || 0,
+      montoExoneracion: 0
+    }
+  }
+
+  if (clientData.hasExemption && clientData.exemption) {
+    console.log('🛡️ Cliente con exoneración (formato legacy) detectada:', clientData.exemption)
+    return {
+      tipoDocumento: clientData.exemption.exemptionType || '',
+      tipoDocumentoOtro: clientData.exemption.exemptionTypeOthers || undefined,
+      numeroDocumento: clientData.exemption.documentNumber || '',
+      nombreLey: clientData.exemption.lawName || undefined,
+      articulo: clientData.exemption.article ? parseInt(clientData.exemption.article) : undefined,
+      // Si hay artículo, incluir inciso (usar 0 si no está definido)
+      inciso: clientData.exemption.article
+        ? (clientData.exemption.subsection ? parseInt(clientData.exemption.subsection) : 0)
+        : (clientData.exemption.subsection ? parseInt(clientData.exemption.subsection) : undefined),
+      porcentajeCompra: clientData.exemption.purchasePercentage ? parseFloat(clientData.exemption.purchasePercentage) : undefined,
+      nombreInstitucion: clientData.exemption.institutionName || '',
+      nombreInstitucionOtros: clientData.exemption.institutionNameOthers || undefined,
+      fechaEmision: formatDateWithTimezone(clientData.exemption.documentDate),
+      tarifaExonerada: parseFloat(clientData.exemption.tariffExempted) || 0,
+      montoExoneracion: 0
+    }
+  }
+
+  return undefined
+}
+
+/**
+ * Receptor del tiquete; sin cliente es null y el XML no incluye el bloque Receptor
+ */
+export function buildTicketReceptor(clientData: any): ReceptorData | null {
+  if (!clientData) return null
+  return {
+    nombre: clientData.name,
+    tipoIdentificacion: clientData.identificationType,
+    numeroIdentificacion: clientData.identification,
+    nombreComercial: clientData.commercialName || clientData.name,
+    provincia: clientData.province,
+    canton: clientData.canton,
+    distrito: clientData.district,
+    otrasSenas: clientData.otrasSenas,
+    codigoPais: clientData.phoneCountryCode?.replace('+', '') || '506',
+    numeroTelefono: clientData.phone,
+    correoElectronico: clientData.email
+  }
+}
+
+/**
+ * Datos para XMLGenerator.generateTiqueteXML
+ */
+export function buildTicketXMLData(params: {
+  input: TicketInput
+  companyData: any
+  clientData: any
+  clientExoneracion?: ExoneracionXML
+  clave: string
+  fechaEmision: string
+  tipoCambio: number
+}): TicketXMLData {
+  const { input, companyData, clientData, clientExoneracion, clave, fechaEmision, tipoCambio } = params
+  const { subtotal, totalImpuesto, total, currency, condicionVenta, paymentMethod, notes, items } = input
+  const receptorData = buildTicketReceptor(clientData)
+
+  return {
+    clave: clave || '',
+    proveedorSistemas: companyData.proveedorSistemas || companyData.identification || '3102867860', // Cédula del emisor como ProveedorSistemas
+    codigoActividadEmisor: companyData.economicActivity?.codigo || '924909', // Igual que en facturas: usar .codigo del objeto economicActivity
+    // NO incluir CodigoActividadReceptor en tiquetes
+    numeroConsecutivo: clave ? clave.substring(21, 41) : '00100001040000000001', // Extraer los 20 dígitos del consecutivo de la clave
+    fechaEmision,
+    emisor: {
+      nombre: companyData.name,
+      tipoIdentificacion: companyData.identificationType,
+      numeroIdentificacion: companyData.identification,
+      nombreComercial: companyData.nombreComercial,
+      provincia: companyData.province,
+      canton: companyData.canton,
+      distrito: companyData.district,
+      otrasSenas: companyData.otrasSenas,
+      codigoPais: companyData.phoneCountryCode?.replace('+', '') || '506',
+      numeroTelefono: companyData.phone,
+      correoElectronico: companyData.email
+    },
+    receptor: receptorData || undefined, // Solo incluir receptor si hay cliente
+    condicionVenta: condicionVenta || '01',
+    lineasDetalle: items.map((item: any, index: number) => {
+      // Calcular montos base
+      const montoImpuesto = item.impuesto[0]?.monto || 0
+      const baseImponible = item.baseImponible || item.subTotal || (item.cantidad * item.precioUnitario)
+      const montoTotalOriginal = item.montoTotalLinea || (baseImponible + montoImpuesto)
+
+      // Variables para ajustar montos cuando hay exoneración
+      let impuestoNeto = item.impuestoNeto || montoImpuesto
+      let montoTotalLinea = montoTotalOriginal
+      let montoImpuestoFinal = montoImpuesto
+
+      // Agregar exoneración si el cliente la tiene
+      if (clientExoneracion) {
+        // Cuando hay exoneración en servicios:
+        // - El monto del impuesto debe reflejar el IVA total ANTES de la exoneración (monto teórico)
+        // - El montoExoneracion debe tener el valor teórico del impuesto exonerado
+        // - El impuesto neto debe ser 0 (el cliente no paga IVA)
+        // - El total de línea debe ser SubTotal + ImpuestoNeto (que es SubTotal + 0 = SubTotal)
+
+        // Calcular el monto teórico del impuesto si no viene en el item
+        const montoTeoricoImpuesto = montoImpuesto > 0
+          ? montoImpuesto
+          : baseImponible * ((item.impuesto[0]?.tarifa || 13) / 100)
+
+        // El monto del impuesto debe ser el teórico (antes de exoneración)
+        montoImpuestoFinal = montoTeoricoImpuesto
+        // El impuesto neto es 0 porque el cliente está exonerado
+        impuestoNeto = 0
+        // MontoTotalLinea = SubTotal + ImpuestoNeto = SubTotal + 0 = SubTotal
+        montoTotalLinea = baseImponible
+
+        console.log(`🛡️ Agregando exoneración a línea ${index + 1}:`, {
+          montoTeorico: montoTeoricoImpuesto,
+          montoFinal: montoImpuestoFinal,
+          impuestoNeto,
+          montoTotalLinea,
+          baseImponible
+        })
+      }
+
+      // Crear objeto de impuesto con exoneración si el cliente la tiene
+      const impuestoData = {
+        codigo: item.impuesto[0]?.codigo || '01',
+        codigoTarifaIVA: item.impuesto[0]?.codigoTarifaIVA || '08',
+        tarifa: item.impuesto[0]?.tarifa || 13,
+        monto: montoImpuestoFinal, // Monto teórico del impuesto (antes de exoneración) si hay exoneración, valor original si no
+        ...(clientExoneracion ? { exoneracion: {
+          ...clientExoneracion,
+          montoExoneracion: montoImpuestoFinal // El monto teórico del impuesto exonerado (igual al monto)
+        } } : {})
+      }
+
+      return {
+        numeroLinea: index + 1,
+        codigoCABYS: item.codigoCABYS || '8399000000000',
+        cantidad: item.cantidad,
+        unidadMedida: item.unidadMedida || 'Sp',
+        detalle: item.detalle,
+        precioUnitario: item.precioUnitario,
+        montoTotal: item.montoTotal,
+        subTotal: item.subTotal,
+        baseImponible: baseImponible,
+        impuesto: impuestoData,
+        impuestoAsumidoEmisorFabrica: item.impuestoAsumidoEmisorFabrica || 0,
+        impuestoNeto: impuestoNeto,
+        montoTotalLinea: montoTotalLinea,
+        // Propiedad auxiliar para el resumen: Servicio vs Mercancía
+        tipo: item.tipo || 'servicio'
+      }
+    }),
+    codigoMoneda: String(currency || 'CRC'),
+    tipoCambio,
+    totalServGravados: clientExoneracion ? 0 : subtotal,
+    totalGravado: clientExoneracion ? 0 : subtotal,
+    totalVenta: subtotal,
+    totalVentaNeta: subtotal,
+    totalDesgloseImpuesto: clientExoneracion ? undefined : {
+      codigo: '01',
+      codigoTarifaIVA: '08',
+      totalMontoImpuesto: totalImpuesto || 0
+    },
+    totalImpuesto: clientExoneracion ? 0 : (totalImpuesto || 0),
+    tipoMedioPago: String(paymentMethod || '01'),
+    totalMedioPago: clientExoneracion ? subtotal : (total || 0),
+    totalComprobante: clientExoneracion ? subtotal : (total || 0),
+    otros: String(notes || '')
+  } as TicketXMLData
+}
+
+/**
+ * Campos comunes del documento del tiquete en Firestore
+ */
+function baseTicketRecord(input: TicketInput, owner: TicketOwner) {
+  return {
+    documentType: 'tiquetes',
+    clientId: input.clientId || '',
+    companyId: owner.companyId,
+    tenantId: owner.tenantId,
+    subtotal: input.subtotal || 0,
+    totalImpuesto: input.totalImpuesto || 0,
+    totalDescuento: input.totalDescuento || 0,
+    total: input.total || 0,
+    exchangeRate: input.exchangeRate || 1,
+    currency: input.currency || 'CRC',
+    condicionVenta: input.condicionVenta || '01',
+    paymentTerm: input.paymentTerm || '01',
+    paymentMethod: input.paymentMethod || '01',
+    notes: input.notes || '',
+    items: input.items || [],
+    createdBy: owner.createdBy,
+    createdAt: serverTimestamp(),
+    updatedAt: serverTimestamp()
+  }
+}
+
+/**
+ * Documento del tiquete firmado, listo para enviar a Hacienda (status draft)
+ */
+export function buildTicketRecord(params: {
+  input: TicketInput
+  owner: TicketOwner
+  consecutivo: string
+  clave: string
+  xml: string
+  signedXml: string | null
+  fecha: string
+  clientData: any
+}): any {
+  const { input, owner, consecutivo, clave, xml, signedXml, fecha, clientData } = params
+  const ticketData: any = {
+    ...baseTicketRecord(input, owner),
+    consecutivo,
+    clave: clave || '',
+    status: 'draft',
+    xml: xml,
+    xmlSigned: signedXml,
+    fecha
+  }
+
+  // Agregar datos del cliente si existe
+  if (clientData) {
+    ticketData.cliente = clientData
+    ticketData.tieneExoneracion = clientData.tieneExoneracion || clientData.hasExemption || false
+    ticketData.exoneracion = clientData.exoneracion || clientData.exemption || null
+  }
+
+  return ticketData
+}
+
+/**
+ * Documento básico (sin XML) de un tiquete que no se pudo generar, firmar o enviar
+ */
+export function buildFailedTicketRecord(params: {
+  input: TicketInput
+  owner: TicketOwner
+  consecutivo?: string
+  error: string
+}): any {
+  return {
+    ...baseTicketRecord(params.input, params.owner),
+    consecutivo: params.consecutivo,
+    status: 'Error',
+    error: params.error
+  }
+}
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Auditoría masiva de claves y consecutivos sobre exportaciones de documentos
+
+Recorre una exportación de facturas (invoices), tiquetes (tickets) y notas de
+crédito (creditNotes) y reporta, por empresa / sucursal / terminal / tipo de
+comprobante:
+
+  - Huecos en la numeración (consecutivos que nunca llegaron a un documento)
+  - Consecutivos duplicados (misma clave guardada dos veces o número reutilizado)
+  - Inconsistencias entre la clave de 50 dígitos y el consecutivo del documento
+
+Formato de entrada: archivos JSON Lines (un documento por línea) o un arreglo
+JSON, opcionalmente comprimidos con gzip. Cada documento debe traer su `id`;
+la colección se toma de `--collection`, del campo `_collection` o del nombre
+del archivo (invoices / tickets / creditNotes).
+
+Con `--leases` se carga además la exportación de `companies/{id}/consecutiveLeases`
+(bloques arrendados por ConsecutiveAllocator). Los huecos que caen dentro de
+un rango liberado que aún no se reutilizó, o de la parte que un bloque activo
+todavía no entregó (según `usedCount`), se reportan aparte como
+`huecosArrendados`. Cualquier otro hueco, incluso dentro de un bloque, es un
+problema real.
+
+Cada documento se lee una sola vez. Por serie solo se guarda un arreglo
+compacto de enteros de 64 bits (número << 29 | fila) que se ordena al final,
+por lo que el costo total es O(n log n) y la memoria ~30 bytes por documento.
+
+Uso:
+    python3 scripts/audit-consecutives.py export/invoices.jsonl export/tickets.jsonl.gz
+    python3 scripts/audit-consecutives.py --collection invoices facturas.json --json reporte.json
+    python3 scripts/audit-consecutives.py export/tickets.jsonl --leases export/consecutiveLeases.jsonl
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from array import array
+from collections import Counter, defaultdict
+
+# Tipo de comprobante esperado en la clave por colección
+TIPO_POR_COLECCION = {
+    'invoices': '01',
+    'creditNotes': '03',
+    'tickets': '04',
+}
+
+# Prefijos de consecutivo aceptados por colección (FAC/TIQ son formatos legacy)
+PREFIJOS_POR_COLECCION = {
+    'invoices': ('FE', 'FAC'),
+    'creditNotes': ('NC',),
+    'tickets': ('TE', 'TIQ'),
+}
+
+# Tipo de documento de ConsecutiveAllocator -> tipo de comprobante
+TIPO_POR_DOCUMENT_TYPE = {
+    'facturas': '01',
+    'notas-credito': '03',
+    'tiquetes': '04',
+}
+
+NOMBRE_TIPO = {
+    '01': 'Factura',
+    '03': 'Nota Crédito',
+    '04': 'Tiquete',
+}
+
+# Empaquetado: número de comprobante (10 dígitos < 2^34) en los bits altos y
+# la fila global en los 29 bits bajos
+BITS_FILA = 29
+MASCARA_FILA = (1 << BITS_FILA) - 1
+MAX_FILAS = 1 << BITS_FILA
+
+CLAVE_XML_RE = re.compile(r'<Clave>\s*(\d{50})\s*</Clave>')
+CONSECUTIVO_RE = re.compile(r'^([A-Z]+)-(\d+)$')
+
+
+def abrir(ruta):
+    if ruta == '-':
+        return sys.stdin
+    if ruta.endswith('.gz'):
+        return gzip.open(ruta, 'rt', encoding='utf-8')
+    return open(ruta, 'r', encoding='utf-8')
+
+
+def leer_documentos(ruta):
+    """Genera los documentos de un archivo JSONL o de un arreglo JSON"""
+    with abrir(ruta) as f:
+        primero = f.read(1)
+        while primero and primero.isspace():
+            primero = f.read(1)
+        if primero == '[':
+            # Arreglo JSON: no se puede leer por líneas, se carga completo
+            for documento in json.loads(primero + f.read()):
+                yield documento
+            return
+        primera_linea = primero + f.readline()
+        if primera_linea.strip():
+            yield json.loads(primera_linea)
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                yield json.loads(linea)
+
+
+def coleccion_desde_archivo(ruta):
+    nombre = os.path.basename(ruta).lower()
+    if 'creditnote' in nombre or 'credit-note' in nombre or 'notas-credito' in nombre:
+        return 'creditNotes'
+    if 'ticket' in nombre or 'tiquete' in nombre:
+        return 'tickets'
+    if 'invoice' in nombre or 'factura' in nombre:
+        return 'invoices'
+    return None
+
+
+def extraer_clave(documento):
+    """La clave vive en `clave`, en la respuesta de Hacienda o dentro del XML"""
+    clave = documento.get('clave')
+    if clave:
+        return str(clave)
+    submission = documento.get('haciendaSubmission')
+    if isinstance(submission, dict) and submission.get('clave'):
+        return str(submission['clave'])
+    for campo in ('xmlSigned', 'xml'):
+        xml = documento.get(campo)
+        if isinstance(xml, str):
+            match = CLAVE_XML_RE.search(xml)
+            if match:
+                return match.group(1)
+    return None
+
+
+def hash_clave(clave):
+    return int.from_bytes(hashlib.blake2b(clave.encode('ascii'), digest_size=8).digest(), 'big')
+
+
+def comprimir_rangos(numeros):
+    """[(inicio, fin), ...] de huecos entre números únicos ya ordenados"""
+    huecos = []
+    anterior = None
+    for numero in numeros:
+        if anterior is not None and numero > anterior + 1:
+            huecos.append((anterior + 1, numero - 1))
+        anterior = numero
+    return huecos
+
+
+def restar_rangos(huecos, cubiertos):
+    """Divide los huecos en (no cubiertos, cubiertos) por los rangos ordenados `cubiertos`"""
+    libres = []
+    arrendados = []
+    for inicio, fin in huecos:
+        actual = inicio
+        for desde, hasta in cubiertos:
+            if hasta < actual:
+                continue
+            if desde > fin:
+                break
+            if desde > actual:
+                libres.append((actual, desde - 1))
+            arrendados.append((max(actual, desde), min(fin, hasta)))
+            actual = hasta + 1
+            if actual > fin:
+                break
+        if actual <= fin:
+            libres.append((actual, fin))
+    return libres, arrendados
+
+
+def leer_bloques_no_usados(rutas):
+    """(companyId, sucursal, terminal, tipo) -> rangos ordenados de números arrendados sin usar"""
+    bloques = defaultdict(list)
+    for ruta in rutas:
+        for lease in leer_documentos(ruta):
+            tipo = TIPO_POR_DOCUMENT_TYPE.get(lease.get('documentType'))
+            if not tipo or not lease.get('companyId'):
+                continue
+            estado = lease.get('status')
+            if estado == 'released':
+                # Sobrante pendiente de reutilizar por el siguiente bloque de la serie
+                desde, hasta = lease.get('unusedStart'), lease.get('unusedEnd')
+            elif estado == 'active' and lease.get('usedCount') is not None:
+                # Solo lo que el bloque aún no entregó; lo ya contado en usedCount debe existir
+                desde, hasta = int(lease['start']) + int(lease['usedCount']), lease.get('end')
+            else:
+                # exhausted/returned/reclaimed no dejan números pendientes, y un bloque activo sin
+                # usedCount no permite saber qué se emitió: sus huecos se reportan como tales
+                continue
+            if desde is None or hasta is None or int(desde) > int(hasta):
+                continue
+            clave = (lease['companyId'], lease.get('sucursal') or '001', lease.get('terminal') or '00001', tipo)
+            bloques[clave].append((int(desde), int(hasta)))
+    return {clave: sorted(rangos) for clave, rangos in bloques.items()}
+
+
+class Auditoria:
+    def __init__(self, inicio_esperado=None, max_detalle=50, bloques_no_usados=None):
+        self.inicio_esperado = inicio_esperado
+        self.bloques_no_usados = bloques_no_usados or {}
+        self.max_detalle = max_detalle
+        # serie -> array('Q') de (número << BITS_FILA | fila)
+        self.series = defaultdict(lambda: array('Q'))
+        # Por fila: hash de la clave (0 si no hay) y el id del documento
+        self.hashes = array('Q')
+        self.ids = bytearray()
+        self.offsets_ids = array('Q', [0])
+        self.inconsistencias = Counter()
+        self.ejemplos = defaultdict(list)
+        self.total = 0
+
+    def id_fila(self, fila):
+        return self.ids[self.offsets_ids[fila]:self.offsets_ids[fila + 1]].decode('utf-8')
+
+    def registrar_inconsistencia(self, motivo, documento_id, detalle):
+        self.inconsistencias[motivo] += 1
+        if len(self.ejemplos[motivo]) < self.max_detalle:
+            self.ejemplos[motivo].append({'id': documento_id, 'detalle': detalle})
+
+    def agregar(self, documento, coleccion):
+        fila = self.total
+        if fila >= MAX_FILAS:
+            raise OverflowError(f'Se excedió el máximo de {MAX_FILAS} documentos por auditoría')
+        self.total += 1
+
+        documento_id = str(documento.get('id') or documento.get('_id') or f'fila-{fila}')
+        self.ids += documento_id.encode('utf-8')
+        self.offsets_ids.append(len(self.ids))
+
+        company_id = documento.get('companyId') or 'sin-empresa'
+        tipo_esperado = TIPO_POR_COLECCION.get(coleccion)
+
+        # Consecutivo corto del documento (FE-0000000001, TE-..., NC-...)
+        numero_documento = None
+        consecutivo = str(documento.get('consecutivo') or '')
+        match = CONSECUTIVO_RE.match(consecutivo)
+        if match:
+            numero_documento = int(match.group(2))
+            prefijos = PREFIJOS_POR_COLECCION.get(coleccion)
+            if prefijos and match.group(1) not in prefijos:
+                self.registrar_inconsistencia(
+                    'prefijo_incorrecto', documento_id,
+                    f'{consecutivo} en colección {coleccion}')
+        elif consecutivo.isdigit():
+            numero_documento = int(consecutivo[-10:])
+        elif consecutivo:
+            self.registrar_inconsistencia('consecutivo_invalido', documento_id, consecutivo)
+        else:
+            self.registrar_inconsistencia('sin_consecutivo', documento_id, '')
+
+        clave = extraer_clave(documento)
+        if clave is None:
+            self.hashes.append(0)
+            self.registrar_inconsistencia('sin_clave', documento_id, consecutivo)
+            if numero_documento is None:
+                return
+            # Sin clave se asume la serie por defecto del generador (001 / 00001)
+            serie = (company_id, '', '001', '00001', tipo_esperado or '??')
+            self.series[serie].append((numero_documento << BITS_FILA) | fila)
+            return
+
+        if len(clave) != 50 or not clave.isdigit():
+            self.hashes.append(0)
+            self.registrar_inconsistencia('clave_invalida', documento_id, clave)
+            return
+
+        self.hashes.append(hash_clave(clave))
+
+        cedula = clave[9:21]
+        sucursal = clave[21:24]
+        terminal = clave[24:29]
+        tipo = clave[29:31]
+        numero_clave = int(clave[31:41])
+
+        if tipo_esperado and tipo != tipo_esperado:
+            self.registrar_inconsistencia(
+                'tipo_no_coincide', documento_id,
+                f'clave tipo {tipo}, colección {coleccion} espera {tipo_esperado}')
+
+        if numero_documento is not None and numero_documento != numero_clave:
+            self.registrar_inconsistencia(
+                'numero_no_coincide', documento_id,
+                f'{consecutivo} vs clave {numero_clave:010d}')
+
+        consecutivo20 = documento.get('consecutivo20Digitos')
+        if consecutivo20 and str(consecutivo20) != clave[21:41]:
+            self.registrar_inconsistencia(
+                'consecutivo20_no_coincide', documento_id,
+                f'{consecutivo20} vs clave {clave[21:41]}')
+
+        serie = (company_id, cedula, sucursal, terminal, tipo)
+        self.series[serie].append((numero_clave << BITS_FILA) | fila)
+
+    def analizar_serie(self, serie, valores):
+        valores = array('Q', sorted(valores))
+        numeros_unicos = []
+        duplicados = []
+        total_huecos = 0
+
+        i = 0
+        n = len(valores)
+        while i < n:
+            numero = valores[i] >> BITS_FILA
+            j = i + 1
+            while j < n and (valores[j] >> BITS_FILA) == numero:
+                j += 1
+            numeros_unicos.append(numero)
+            if j - i > 1:
+                filas = [valores[k] & MASCARA_FILA for k in range(i, j)]
+                hashes = {self.hashes[fila] for fila in filas}
+                misma_clave = len(hashes) == 1 and 0 not in hashes
+                duplicados.append({
+                    'numero': numero,
+                    'documentos': [self.id_fila(fila) for fila in filas],
+                    'motivo': 'misma_clave' if misma_clave else 'numero_reutilizado',
+                })
+            i = j
+
+        huecos = comprimir_rangos(numeros_unicos)
+        if self.inicio_esperado is not None and numeros_unicos and numeros_unicos[0] > self.inicio_esperado:
+            huecos.insert(0, (self.inicio_esperado, numeros_unicos[0] - 1))
+
+        company_id, cedula, sucursal, terminal, tipo = serie
+        huecos, arrendados = restar_rangos(huecos, self.bloques_no_usados.get((company_id, sucursal, terminal, tipo), []))
+        for inicio, fin in huecos:
+            total_huecos += fin - inicio + 1
+
+        return {
+            'companyId': company_id,
+            'cedula': cedula.lstrip('0'),
+            'sucursal': sucursal,
+            'terminal': terminal,
+            'tipo': tipo,
+            'documentos': n,
+            'minimo': numeros_unicos[0] if numeros_unicos else None,
+            'maximo': numeros_unicos[-1] if numeros_unicos else None,
+            'consecutivosFaltantes': total_huecos,
+            'huecos': [{'desde': a, 'hasta': b} for a, b in huecos[:self.max_detalle]],
+            'rangosDeHuecos': len(huecos),
+            'huecosArrendados': sum(fin - inicio + 1 for inicio, fin in arrendados),
+            'duplicados': duplicados[:self.max_detalle],
+            'totalDuplicados': len(duplicados),
+        }
+
+    def resultado(self):
+        series = [self.analizar_serie(serie, valores) for serie, valores in sorted(self.series.items())]
+        return {
+            'documentos': self.total,
+            'series': series,
+            'inconsistencias': dict(self.inconsistencias),
+            'ejemplosInconsistencias': dict(self.ejemplos),
+        }
+
+
+def imprimir_reporte(reporte):
+    print(f"📊 Documentos auditados: {reporte['documentos']}")
+    print(f"📚 Series: {len(reporte['series'])}")
+    for serie in reporte['series']:
+        nombre = NOMBRE_TIPO.get(serie['tipo'], serie['tipo'])
+        print(f"\n🏢 {serie['companyId']} (cédula {serie['cedula'] or '?'}) "
+              f"- {nombre} {serie['sucursal']}/{serie['terminal']}")
+        print(f"   Documentos: {serie['documentos']}  Rango: {serie['minimo']} - {serie['maximo']}")
+        if serie['consecutivosFaltantes']:
+            print(f"   ⚠️ Huecos: {serie['consecutivosFaltantes']} consecutivos en {serie['rangosDeHuecos']} rangos")
+            for hueco in serie['huecos']:
+                if hueco['desde'] == hueco['hasta']:
+                    print(f"      - {hueco['desde']}")
+                else:
+                    print(f"      - {hueco['desde']} a {hueco['hasta']}")
+        if serie['huecosArrendados']:
+            print(f"   ℹ️ {serie['huecosArrendados']} consecutivos arrendados sin usar (bloques liberados)")
+        if serie['totalDuplicados']:
+            print(f"   ❌ Duplicados: {serie['totalDuplicados']}")
+            for duplicado in serie['duplicados']:
+                print(f"      - {duplicado['numero']} ({duplicado['motivo']}): {', '.join(duplicado['documentos'])}")
+        if not serie['consecutivosFaltantes'] and not serie['totalDuplicados']:
+            print('   ✅ Sin huecos ni duplicados')
+
+    if reporte['inconsistencias']:
+        print('\n❌ Inconsistencias clave/consecutivo:')
+        for motivo, cantidad in sorted(reporte['inconsistencias'].items()):
+            print(f'   - {motivo}: {cantidad}')
+            for ejemplo in reporte['ejemplosInconsistencias'].get(motivo, [])[:5]:
+                print(f"      {ejemplo['id']}: {ejemplo['detalle']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audita huecos, duplicados e inconsistencias de claves y consecutivos')
+    parser.add_argument('archivos', nargs='+', help='Exportaciones JSONL/JSON (.gz opcional); "-" para stdin')
+    parser.add_argument('--collection', choices=sorted(TIPO_POR_COLECCION), help='Colección de todos los archivos')
+    parser.add_argument('--inicio', type=int, default=None,
+                        help='Primer consecutivo esperado por serie (p. ej. 1); por defecto se usa el mínimo exportado')
+    parser.add_argument('--max-detalle', type=int, default=50, help='Máximo de huecos/duplicados/ejemplos listados')
+    parser.add_argument('--leases', nargs='+', default=[],
+                        help='Exportación de consecutiveLeases para no contar como huecos los bloques liberados')
+    parser.add_argument('--json', dest='salida_json', help='Escribe el reporte completo en este archivo JSON')
+    args = parser.parse_args()
+
+    auditoria = Auditoria(inicio_esperado=args.inicio, max_detalle=args.max_detalle,
+                          bloques_no_usados=leer_bloques_no_usados(args.leases))
+
+    for ruta in args.archivos:
+        coleccion_archivo = args.collection or coleccion_desde_archivo(ruta)
+        for documento in leer_documentos(ruta):
+            coleccion = documento.get('_collection') or coleccion_archivo
+            auditoria.agregar(documento, coleccion)
+        print(f'📄 {ruta}: {auditoria.total} documentos acumulados', file=sys.stderr)
+
+    reporte = auditoria.resultado()
+    imprimir_reporte(reporte)
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f'\n💾 Reporte guardado en {args.salida_json}')
+
+    hay_problemas = reporte['inconsistencias'] or any(
+        serie['consecutivosFaltantes'] or serie['totalDuplicados'] for serie in reporte['series'])
+    sys.exit(1 if hay_problemas else 0)
+
+
+if __name__ == '__main__':
+    main()
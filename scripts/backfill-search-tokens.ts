@@ -0,0 +1,78 @@
+/**
+ * Completa los campos de búsqueda (`searchTokens`, `searchSort`) de clientes y productos
+ *
+ * Las rutas de creación y edición ya los escriben; este script es para los documentos
+ * creados antes de la búsqueda en Firestore o cargados por fuera de la API
+ * (generate-dataset.py). Recorre la colección por páginas y solo reescribe los
+ * documentos cuyos campos cambian, así que se puede repetir sin costo.
+ *
+ * Ejecutar con:
+ *   npx ts-node scripts/backfill-search-tokens.ts [clients|products ...]
+ */
+
+import { initializeApp } from 'firebase/app'
+import {
+  getFirestore,
+  getDocs,
+  collection,
+  query,
+  orderBy,
+  limit,
+  startAfter,
+  documentId,
+  writeBatch,
+  QueryDocumentSnapshot
+} from 'firebase/firestore'
+import { firebaseConfig } from '../lib/firebase-config'
+import { EntitySearchService, SearchEntityKind } from '../lib/services/entity-search'
+
+const PAGE_SIZE = 400
+
+async function backfillSearchTokens() {
+  const db = getFirestore(initializeApp(firebaseConfig))
+  const kinds = (process.argv.slice(2).length > 0 ? process.argv.slice(2) : ['clients', 'products']) as SearchEntityKind[]
+
+  for (const kind of kinds) {
+    const start = performance.now()
+    let scanned = 0
+    let updated = 0
+    let lastSnap: QueryDocumentSnapshot | null = null
+
+    while (true) {
+      const snapshot = await getDocs(query(
+        collection(db, kind),
+        orderBy(documentId()),
+        ...(lastSnap ? [startAfter(lastSnap)] : []),
+        limit(PAGE_SIZE)
+      ))
+      if (snapshot.empty) break
+
+      const batch = writeBatch(db)
+      let writes = 0
+      snapshot.docs.forEach(snap => {
+        const data = snap.data()
+        const fields = EntitySearchService.searchFields(kind, data)
+        const current = Array.isArray(data.searchTokens) ? data.searchTokens : []
+        if (data.searchSort === fields.searchSort && current.join(' ') === fields.searchTokens.join(' ')) return
+        batch.update(snap.ref, fields)
+        writes++
+      })
+      if (writes > 0) await batch.commit()
+
+      scanned += snapshot.docs.length
+      updated += writes
+      lastSnap = snapshot.docs[snapshot.docs.length - 1]
+      if (snapshot.docs.length < PAGE_SIZE) break
+    }
+
+    console.log(`   ${kind}: ${updated} de ${scanned} documentos actualizados (${((performance.now() - start) / 1000).toFixed(1)}s)`)
+  }
+
+  console.log('✅ Campos de búsqueda completos')
+  process.exit(0)
+}
+
+backfillSearchTokens().catch(error => {
+  console.error('❌ Error completando los campos de búsqueda:', error)
+  process.exit(1)
+})
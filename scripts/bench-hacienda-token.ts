@@ -0,0 +1,167 @@
+/**
+ * Benchmark: autenticación con Hacienda por documento vs caché de tokens
+ *
+ * Levanta un IDP local que imita al de Hacienda (password grant y refresh
+ * grant con latencia configurable y tokens de vida corta) y emite documentos
+ * concurrentes para varias empresas en tres escenarios:
+ *   - Por documento: un password grant por cada documento (comportamiento anterior)
+ *   - Caché:         HaciendaTokenCache en una sola instancia
+ *   - Compartido:    varias instancias con un almacén compartido en memoria y candado
+ *
+ * Ejecutar con:
+ *   npx ts-node scripts/bench-hacienda-token.ts [documentos] [empresas] [instancias]
+ */
+
+import http from 'http'
+import { AddressInfo } from 'net'
+import { HaciendaTokenCache, HaciendaTokenStore, CachedHaciendaToken } from '../lib/services/hacienda-token-cache'
+import type { HaciendaCredentials, HaciendaTokenResponse } from '../lib/services/hacienda-auth'
+
+const DOCUMENTS = parseInt(process.argv[2] || '2000', 10)
+const COMPANIES = parseInt(process.argv[3] || '20', 10)
+const INSTANCES = parseInt(process.argv[4] || '4', 10)
+const CONCURRENCY = 50
+const PASSWORD_LATENCY_MS = 150
+const REFRESH_LATENCY_MS = 50
+const EXPIRES_IN = 3 // segundos; corto para que el benchmark ejercite la renovación
+const DOCUMENT_WORK_MS = 20 // tiempo simulado de generar y enviar cada documento
+
+const idpRequests = { password: 0, refresh_token: 0 }
+
+function startIdp(): Promise<http.Server> {
+  let counter = 0
+  const server = http.createServer((req, res) => {
+    let body = ''
+    req.on('data', chunk => { body += chunk })
+    req.on('end', () => {
+      const params = new URLSearchParams(body)
+      const grantType = params.get('grant_type') as 'password' | 'refresh_token'
+      idpRequests[grantType]++
+      const latency = grantType === 'password' ? PASSWORD_LATENCY_MS : REFRESH_LATENCY_MS
+      setTimeout(() => {
+        counter++
+        res.writeHead(200, { 'Content-Type': 'application/json' })
+        res.end(JSON.stringify({
+          access_token: `access-${counter}`,
+          expires_in: EXPIRES_IN,
+          refresh_expires_in: 600,
+          refresh_token: `refresh-${counter}`,
+          token_type: 'bearer',
+          not_before_policy: 0,
+          session_state: `session-${counter}`,
+          scope: 'profile'
+        }))
+      }, latency)
+    })
+  })
+  return new Promise(resolve => server.listen(0, '127.0.0.1', () => resolve(server)))
+}
+
+// Misma solicitud que HaciendaAuthService.requestToken, sin desencriptar el password
+async function grant(credentials: HaciendaCredentials, refreshToken?: string): Promise<HaciendaTokenResponse> {
+  const formData = new URLSearchParams()
+  formData.append('client_id', credentials.clientId)
+  if (refreshToken) {
+    formData.append('grant_type', 'refresh_token')
+    formData.append('refresh_token', refreshToken)
+  } else {
+    formData.append('grant_type', 'password')
+    formData.append('username', credentials.username)
+    formData.append('password', credentials.password)
+  }
+  const response = await fetch(credentials.authUrl, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+    body: formData.toString()
+  })
+  if (!response.ok) {
+    throw new Error(`Error de autenticación: ${response.status}`)
+  }
+  return response.json()
+}
+
+class MemoryTokenStore implements HaciendaTokenStore {
+  private tokens = new Map<string, CachedHaciendaToken>()
+  private locks = new Map<string, number>()
+
+  async get(key: string) { return this.tokens.get(key) || null }
+  async set(key: string, token: CachedHaciendaToken) { this.tokens.set(key, token); this.locks.delete(key) }
+  async delete(key: string) { this.tokens.delete(key) }
+  async acquireRefreshLock(key: string, ttlMs: number) {
+    if ((this.locks.get(key) || 0) > Date.now()) return false
+    this.locks.set(key, Date.now() + ttlMs)
+    return true
+  }
+}
+
+function percentile(values: number[], p: number): number {
+  const sorted = [...values].sort((a, b) => a - b)
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))]
+}
+
+async function runScenario(
+  name: string,
+  authUrl: string,
+  getToken: (credentials: HaciendaCredentials, documentIndex: number) => Promise<string>
+) {
+  idpRequests.password = 0
+  idpRequests.refresh_token = 0
+  const credentials: HaciendaCredentials[] = Array.from({ length: COMPANIES }, (_, i) => ({
+    authUrl,
+    clientId: 'api-stag',
+    username: `cpj-3-101-${String(i).padStart(6, '0')}@stag.comprobanteselectronicos.go.cr`,
+    password: `password-${i}`
+  }))
+
+  const authLatencies: number[] = []
+  let next = 0
+  const start = performance.now()
+  await Promise.all(Array.from({ length: CONCURRENCY }, async () => {
+    while (next < DOCUMENTS) {
+      const index = next++
+      const authStart = performance.now()
+      await getToken(credentials[index % COMPANIES], index)
+      authLatencies.push(performance.now() - authStart)
+      await new Promise(resolve => setTimeout(resolve, DOCUMENT_WORK_MS))
+    }
+  }))
+  const elapsed = performance.now() - start
+
+  console.log(`\n🔐 ${name}`)
+  console.log(`   Documentos/s: ${(DOCUMENTS / (elapsed / 1000)).toFixed(0)}  Tiempo total: ${(elapsed / 1000).toFixed(1)}s`)
+  console.log(`   Latencia de autenticación: p50 ${percentile(authLatencies, 0.5).toFixed(1)}ms, p95 ${percentile(authLatencies, 0.95).toFixed(1)}ms`)
+  console.log(`   Solicitudes al IDP: ${idpRequests.password} password, ${idpRequests.refresh_token} refresh`)
+}
+
+async function benchHaciendaToken() {
+  const server = await startIdp()
+  const authUrl = `http://127.0.0.1:${(server.address() as AddressInfo).port}/token`
+
+  console.log('🏛️ Benchmark de tokens de Hacienda')
+  console.log(`   Documentos: ${DOCUMENTS}  Empresas: ${COMPANIES}  Concurrencia: ${CONCURRENCY}`)
+  console.log(`   IDP: password ${PASSWORD_LATENCY_MS}ms, refresh ${REFRESH_LATENCY_MS}ms, tokens de ${EXPIRES_IN}s`)
+
+  await runScenario('Por documento (password grant cada vez)', authUrl, async (credentials) => {
+    return (await grant(credentials)).access_token
+  })
+
+  const cache = new HaciendaTokenCache(grant, { refreshSkewMs: 500 })
+  await runScenario('Caché en una instancia', authUrl, async (credentials) => {
+    return (await cache.getToken(credentials)).accessToken
+  })
+
+  const store = new MemoryTokenStore()
+  const instances = Array.from({ length: INSTANCES }, () =>
+    new HaciendaTokenCache(grant, { store, refreshSkewMs: 500 })
+  )
+  await runScenario(`Caché compartido entre ${INSTANCES} instancias`, authUrl, async (credentials, index) => {
+    return (await instances[index % INSTANCES].getToken(credentials)).accessToken
+  })
+
+  server.close()
+}
+
+benchHaciendaToken().catch(error => {
+  console.error('❌ Error en benchmark:', error)
+  process.exit(1)
+})
@@ -0,0 +1,106 @@
+#!/usr/bin/env node
+
+/**
+ * Benchmark: costo por PDF del logo procesado con Sharp vs variantes precalculadas
+ *
+ * Compara, para logos de distintos tamaños, el CPU por PDF de:
+ *   - Antes: decodificar el base64 y re-encodearlo con Sharp en cada PDF
+ *     (lo que hacía optimizeLogoForPDF)
+ *   - Ahora: SHA-256 del contenido + lectura del caché en memoria
+ *     (LogoVariantService.getVariants con el logo ya precalculado)
+ *
+ * Uso:
+ *   node scripts/bench-logo-variants.js [--iterations 50]
+ */
+
+const { createHash } = require('crypto');
+const sharp = require('sharp');
+
+// Colores para la consola
+const colors = {
+  green: '\x1b[32m',
+  red: '\x1b[31m',
+  yellow: '\x1b[33m',
+  blue: '\x1b[34m',
+  cyan: '\x1b[36m',
+  reset: '\x1b[0m',
+  bold: '\x1b[1m'
+};
+
+function log(message, color = 'reset') {
+  console.log(`${colors[color]}${message}${colors.reset}`);
+}
+
+function cpuMs(start) {
+  const usage = process.cpuUsage(start);
+  return (usage.user + usage.system) / 1000;
+}
+
+// Misma transformación que hacía optimizeLogoForPDF en cada PDF
+async function processWithSharp(logoData) {
+  const buffer = await sharp(Buffer.from(logoData, 'base64'))
+    .resize(500, 500, { fit: 'inside', withoutEnlargement: true })
+    .png({ quality: 90, compressionLevel: 6 })
+    .toBuffer();
+  return buffer.toString('base64');
+}
+
+async function buildLogo(size, format) {
+  const image = sharp({
+    create: { width: size, height: size, channels: 3, noise: { type: 'gaussian', mean: 128, sigma: 40 } }
+  });
+  const buffer = format === 'jpeg' ? await image.jpeg({ quality: 90 }).toBuffer() : await image.png().toBuffer();
+  return buffer.toString('base64');
+}
+
+async function benchLogoVariants() {
+  const iterationsIndex = process.argv.indexOf('--iterations');
+  const iterations = iterationsIndex > 0 ? parseInt(process.argv[iterationsIndex + 1], 10) : 50;
+
+  log('\n🖼️ Benchmark de Variantes de Logo', 'bold');
+  log('='.repeat(60), 'blue');
+  log(`Iteraciones por caso: ${iterations}`, 'cyan');
+
+  const cases = [
+    ['PNG 300x300', 300, 'png'],
+    ['PNG 1200x1200', 1200, 'png'],
+    ['JPEG 2400x2400', 2400, 'jpeg']
+  ];
+
+  for (const [name, size, format] of cases) {
+    const logoData = await buildLogo(size, format);
+
+    // Antes: Sharp en cada PDF
+    await processWithSharp(logoData); // calentamiento
+    let start = process.cpuUsage();
+    const wallStart = performance.now();
+    for (let i = 0; i < iterations; i++) {
+      await processWithSharp(logoData);
+    }
+    const sharpCpu = cpuMs(start) / iterations;
+    const sharpWall = (performance.now() - wallStart) / iterations;
+
+    // Ahora: precalculado una vez, luego hash + caché por PDF
+    const cache = new Map();
+    const hashOf = (data) => createHash('sha256').update(data).digest('hex');
+    cache.set(hashOf(logoData), await processWithSharp(logoData));
+    start = process.cpuUsage();
+    const cachedWallStart = performance.now();
+    for (let i = 0; i < iterations; i++) {
+      if (!cache.get(hashOf(logoData))) throw new Error('Caché vacío');
+    }
+    const cachedCpu = cpuMs(start) / iterations;
+    const cachedWall = (performance.now() - cachedWallStart) / iterations;
+
+    log(`\n📸 ${name} (${Math.round(logoData.length / 1024)}KB base64)`, 'bold');
+    log(`   Sharp por PDF:        ${sharpCpu.toFixed(2)}ms CPU, ${sharpWall.toFixed(2)}ms reloj`, 'yellow');
+    log(`   Precalculado por PDF: ${cachedCpu.toFixed(3)}ms CPU, ${cachedWall.toFixed(3)}ms reloj`, 'green');
+    log(`   Ahorro por PDF: ${(sharpCpu - cachedCpu).toFixed(2)}ms CPU (${(sharpCpu / Math.max(cachedCpu, 0.001)).toFixed(0)}x)`, 'cyan');
+    log(`   Para 5.000 PDFs/día: ${((sharpCpu - cachedCpu) * 5000 / 1000).toFixed(1)}s de CPU ahorrados`, 'cyan');
+  }
+}
+
+benchLogoVariants().catch(error => {
+  log(`❌ Error en benchmark: ${error.message}`, 'red');
+  process.exit(1);
+});
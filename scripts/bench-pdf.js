@@ -0,0 +1,379 @@
+#!/usr/bin/env node
+
+/**
+ * Benchmark de generación de PDF (/api/generate-pdf-optimized) con detección de regresiones
+ *
+ * Genera un corpus determinístico de facturas que varía:
+ *   - Cantidad de líneas (1 a 500)
+ *   - Logo (sin logo, PNG pequeño, PNG grande, JPEG grande)
+ *   - Largo de la descripción de cada línea
+ *   - Moneda (CRC / USD)
+ *
+ * Para cada caso llama al endpoint contra un servidor local y registra tiempo de
+ * render (header X-PDF-Render-Ms), latencia total, memoria ganada durante el render
+ * (X-PDF-Render-RSS-Delta, diferencia de process.memoryUsage().rss; el pico del
+ * proceso no sirve porque nunca baja entre casos) y bytes del PDF. Compara contra
+ * el baseline versionado en scripts/benchmarks/ y termina con código 1 si el tamaño
+ * o la latencia empeoran más de la tolerancia. Con CI definido también falla si no
+ * hay baseline o si falta algún caso del corpus en él: hay que generarlo con
+ * --update-baseline en la misma máquina de CI y commitearlo.
+ *
+ * Uso:
+ *   npm run dev   (o npm start)
+ *   node scripts/bench-pdf.js                      # compara contra el baseline
+ *   node scripts/bench-pdf.js --update-baseline    # guarda los resultados como baseline
+ *   node scripts/bench-pdf.js --quick              # subconjunto rápido del corpus
+ *
+ * Opciones:
+ *   --url <base>              URL del servidor (por defecto http://localhost:3000)
+ *   --iterations <n>          Repeticiones por caso; se usa la mediana (por defecto 3)
+ *   --baseline <archivo>      Archivo de baseline (por defecto scripts/benchmarks/pdf-baseline.json)
+ *   --size-tolerance <pct>    Aumento de bytes permitido (por defecto 5)
+ *   --time-tolerance <pct>    Aumento de latencia permitido (por defecto 30)
+ *   --write-corpus <dir>      Guarda los payloads JSON del corpus en este directorio
+ */
+
+// Cargar variables de entorno
+require('dotenv').config({ path: '.env.local' });
+
+const fs = require('fs');
+const path = require('path');
+
+// Colores para la consola
+const colors = {
+  green: '\x1b[32m',
+  red: '\x1b[31m',
+  yellow: '\x1b[33m',
+  blue: '\x1b[34m',
+  cyan: '\x1b[36m',
+  magenta: '\x1b[35m',
+  reset: '\x1b[0m',
+  bold: '\x1b[1m'
+};
+
+function log(message, color = 'reset') {
+  console.log(`${colors[color]}${message}${colors.reset}`);
+}
+
+function formatBytes(bytes) {
+  if (bytes === 0) return '0 Bytes';
+  const k = 1024;
+  const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+  const i = Math.floor(Math.log(bytes) / Math.log(k));
+  return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+}
+
+function parseArgs(argv) {
+  const args = {
+    url: process.env.BENCH_BASE_URL || 'http://localhost:3000',
+    iterations: 3,
+    baseline: path.join(__dirname, 'benchmarks', 'pdf-baseline.json'),
+    sizeTolerance: 5,
+    timeTolerance: 30,
+    updateBaseline: false,
+    quick: false,
+    writeCorpus: null
+  };
+  for (let i = 2; i < argv.length; i++) {
+    const arg = argv[i];
+    if (arg === '--url') args.url = argv[++i];
+    else if (arg === '--iterations') args.iterations = parseInt(argv[++i], 10);
+    else if (arg === '--baseline') args.baseline = argv[++i];
+    else if (arg === '--size-tolerance') args.sizeTolerance = parseFloat(argv[++i]);
+    else if (arg === '--time-tolerance') args.timeTolerance = parseFloat(argv[++i]);
+    else if (arg === '--update-baseline') args.updateBaseline = true;
+    else if (arg === '--quick') args.quick = true;
+    else if (arg === '--write-corpus') args.writeCorpus = argv[++i];
+    else throw new Error(`Opción desconocida: ${arg}`);
+  }
+  return args;
+}
+
+// PRNG determinístico (mulberry32) para que el corpus sea idéntico entre corridas
+function createRandom(seed) {
+  let a = seed >>> 0;
+  return function () {
+    a |= 0;
+    a = (a + 0x6D2B79F5) | 0;
+    let t = Math.imul(a ^ (a >>> 15), 1 | a);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+const LINE_COUNTS = [1, 10, 50, 150, 500];
+const LOGOS = ['none', 'png-small', 'png-large', 'jpeg-large'];
+const DESCRIPTIONS = ['short', 'long'];
+const CURRENCIES = ['CRC', 'USD'];
+
+const QUICK_CASES = new Set([
+  '1-none-short-CRC',
+  '10-png-small-short-CRC',
+  '50-png-large-long-USD',
+  '500-jpeg-large-long-CRC'
+]);
+
+const WORDS = ['servicio', 'consultoría', 'desarrollo', 'licencia', 'soporte', 'mantenimiento', 'equipo',
+  'instalación', 'capacitación', 'implementación', 'hardware', 'software', 'mensual', 'anual', 'premium'];
+
+/**
+ * Genera los logos con sharp: ruido gaussiano para que el peso sea realista
+ * (un color sólido comprime a casi nada y oculta el costo real)
+ */
+async function buildLogos() {
+  const sharp = require('sharp');
+  const noisy = (size) => sharp({
+    create: {
+      width: size,
+      height: size,
+      channels: 3,
+      noise: { type: 'gaussian', mean: 128, sigma: 40 }
+    }
+  });
+  return {
+    'none': null,
+    'png-small': (await noisy(120).png().toBuffer()).toString('base64'),
+    'png-large': (await noisy(1600).png().toBuffer()).toString('base64'),
+    'jpeg-large': (await noisy(2400).jpeg({ quality: 92 }).toBuffer()).toString('base64')
+  };
+}
+
+function buildDescription(random, kind) {
+  const count = kind === 'long' ? 60 : 3;
+  const words = [];
+  for (let i = 0; i < count; i++) {
+    words.push(WORDS[Math.floor(random() * WORDS.length)]);
+  }
+  const text = words.join(' ');
+  return text.charAt(0).toUpperCase() + text.slice(1);
+}
+
+function buildCase(lineCount, logoKind, descriptionKind, currency, logos) {
+  const id = `${lineCount}-${logoKind}-${descriptionKind}-${currency}`;
+  const random = createRandom(lineCount * 7919 + LOGOS.indexOf(logoKind) * 31 + DESCRIPTIONS.indexOf(descriptionKind) * 7 + CURRENCIES.indexOf(currency));
+  const items = [];
+  let subtotal = 0;
+  let totalImpuesto = 0;
+
+  for (let i = 0; i < lineCount; i++) {
+    const cantidad = 1 + Math.floor(random() * 10);
+    const precioUnitario = Math.round((currency === 'USD' ? 5 + random() * 500 : 2500 + random() * 250000) * 100) / 100;
+    const base = Math.round(cantidad * precioUnitario * 100) / 100;
+    const impuesto = Math.round(base * 0.13 * 100) / 100;
+    subtotal += base;
+    totalImpuesto += impuesto;
+    items.push({
+      numeroLinea: i + 1,
+      codigoCABYS: '8399000000000',
+      cantidad,
+      unidadMedida: 'Sp',
+      detalle: buildDescription(random, descriptionKind),
+      precioUnitario,
+      montoTotal: base,
+      subTotal: base,
+      baseImponible: base,
+      montoTotalLinea: base + impuesto,
+      impuesto: [{ codigo: '01', codigoTarifaIVA: '08', tarifa: 13, monto: impuesto }],
+      impuestoNeto: impuesto
+    });
+  }
+
+  const logo = logos[logoKind];
+  return {
+    id,
+    payload: {
+      invoice: {
+        consecutivo: 'FE-0000000161',
+        clave: '50605102500310286786000100001010000000161196090626',
+        fechaEmision: '2025-10-05T10:00:00',
+        currency,
+        exchangeRate: currency === 'USD' ? 512.35 : 1,
+        paymentMethod: '04',
+        condicionVenta: '01',
+        items,
+        subtotal: Math.round(subtotal * 100) / 100,
+        totalImpuesto: Math.round(totalImpuesto * 100) / 100,
+        totalDescuento: 0,
+        total: Math.round((subtotal + totalImpuesto) * 100) / 100,
+        notes: 'Corpus de benchmark de PDF'
+      },
+      company: {
+        name: 'InnovaSell Costa Rica',
+        identification: '3102867860',
+        phone: '22223333',
+        email: 'facturas@example.com',
+        otrasSenas: 'Avenida Central, Edificio Torre Empresarial, Piso 5',
+        province: '1',
+        canton: '101',
+        district: '10101',
+        economicActivity: { codigo: '620100', descripcion: 'Desarrollo de software' },
+        logo: logo ? { fileName: `logo-${logoKind}`, type: logoKind.startsWith('jpeg') ? 'image/jpeg' : 'image/png', size: logo.length, fileData: logo } : null
+      },
+      client: {
+        name: 'Cliente Benchmark S.A.',
+        identification: '3101123456',
+        email: 'cliente@example.com',
+        phone: '88888888',
+        economicActivity: { codigo: '924103', descripcion: 'Comercio' }
+      }
+    }
+  };
+}
+
+async function buildCorpus(quick) {
+  const logos = await buildLogos();
+  const cases = [];
+  for (const lineCount of LINE_COUNTS) {
+    for (const logoKind of LOGOS) {
+      for (const descriptionKind of DESCRIPTIONS) {
+        for (const currency of CURRENCIES) {
+          const id = `${lineCount}-${logoKind}-${descriptionKind}-${currency}`;
+          if (quick && !QUICK_CASES.has(id)) continue;
+          cases.push(buildCase(lineCount, logoKind, descriptionKind, currency, logos));
+        }
+      }
+    }
+  }
+  return cases;
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  const mid = Math.floor(sorted.length / 2);
+  return sorted.length % 2 ? sorted[mid] : (sorted[mid - 1] + sorted[mid]) / 2;
+}
+
+async function runCase(url, testCase, iterations) {
+  const body = JSON.stringify(testCase.payload);
+  const renderTimes = [];
+  const latencies = [];
+  const rssDeltas = [];
+  let pdfBytes = 0;
+
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now();
+    const response = await fetch(`${url}/api/generate-pdf-optimized`, {
+      method: 'POST',
+      // Sin caché: cada iteración mide un render completo
+      headers: { 'Content-Type': 'application/json', 'X-PDF-Cache': 'bypass' },
+      body
+    });
+    const result = await response.json();
+    const latency = performance.now() - start;
+
+    if (!response.ok || !result.success) {
+      throw new Error(`Caso ${testCase.id}: ${result.error || response.status}`);
+    }
+
+    latencies.push(latency);
+    renderTimes.push(parseFloat(response.headers.get('x-pdf-render-ms') || String(latency)));
+    rssDeltas.push(parseInt(response.headers.get('x-pdf-render-rss-delta') || '0', 10));
+    pdfBytes = result.pdf_size_bytes;
+  }
+
+  return {
+    renderMs: Math.round(median(renderTimes) * 10) / 10,
+    latencyMs: Math.round(median(latencies) * 10) / 10,
+    pdfBytes,
+    rssDelta: median(rssDeltas),
+    requestBytes: Buffer.byteLength(body)
+  };
+}
+
+function compareWithBaseline(results, baseline, args) {
+  const regressions = [];
+  // Holgura absoluta para que casos de pocos ms no fallen por ruido
+  const timeSlackMs = 50;
+
+  for (const [id, current] of Object.entries(results)) {
+    const previous = baseline.cases[id];
+    if (!previous) continue;
+
+    const maxBytes = previous.pdfBytes * (1 + args.sizeTolerance / 100);
+    if (current.pdfBytes > maxBytes) {
+      regressions.push(`${id}: tamaño ${formatBytes(previous.pdfBytes)} → ${formatBytes(current.pdfBytes)}`);
+    }
+
+    const maxMs = previous.renderMs * (1 + args.timeTolerance / 100) + timeSlackMs;
+    if (current.renderMs > maxMs) {
+      regressions.push(`${id}: render ${previous.renderMs}ms → ${current.renderMs}ms`);
+    }
+  }
+  return regressions;
+}
+
+async function benchPDF() {
+  const args = parseArgs(process.argv);
+
+  log('\n📊 Benchmark de Generación de PDF', 'bold');
+  log('='.repeat(60), 'blue');
+  log(`🌐 Servidor: ${args.url}`, 'cyan');
+
+  const corpus = await buildCorpus(args.quick);
+  log(`📚 Corpus: ${corpus.length} casos x ${args.iterations} iteraciones`, 'cyan');
+
+  if (args.writeCorpus) {
+    fs.mkdirSync(args.writeCorpus, { recursive: true });
+    for (const testCase of corpus) {
+      fs.writeFileSync(path.join(args.writeCorpus, `${testCase.id}.json`), JSON.stringify(testCase.payload));
+    }
+    log(`💾 Corpus guardado en ${args.writeCorpus}`, 'blue');
+  }
+
+  // Calentamiento: compila la ruta en dev y carga sharp/jsPDF antes de medir
+  await runCase(args.url, corpus[0], 1);
+
+  const results = {};
+  for (const testCase of corpus) {
+    const result = await runCase(args.url, testCase, args.iterations);
+    results[testCase.id] = result;
+    log(`  ${testCase.id.padEnd(28)} render ${String(result.renderMs).padStart(8)}ms  ` +
+      `total ${String(result.latencyMs).padStart(8)}ms  pdf ${formatBytes(result.pdfBytes).padStart(10)}  ` +
+      `rss ${result.rssDelta < 0 ? '-' : '+'}${formatBytes(Math.abs(result.rssDelta))}`);
+  }
+
+  if (args.updateBaseline) {
+    fs.mkdirSync(path.dirname(args.baseline), { recursive: true });
+    fs.writeFileSync(args.baseline, JSON.stringify({
+      createdAt: new Date().toISOString(),
+      node: process.version,
+      iterations: args.iterations,
+      cases: results
+    }, null, 2) + '\n');
+    log(`\n💾 Baseline actualizado: ${args.baseline}`, 'green');
+    return true;
+  }
+
+  // En CI un baseline ausente o incompleto es un error: de lo contrario nada se compara
+  const strict = !!process.env.CI;
+
+  if (!fs.existsSync(args.baseline)) {
+    log(`\n${strict ? '❌' : '⚠️'} No existe baseline en ${args.baseline}; ejecute con --update-baseline para crearlo`, strict ? 'red' : 'yellow');
+    return !strict;
+  }
+
+  const baseline = JSON.parse(fs.readFileSync(args.baseline, 'utf8'));
+  const missing = Object.keys(results).filter(id => !baseline.cases[id]);
+  if (missing.length > 0) {
+    log(`\n${strict ? '❌' : '⚠️'} ${missing.length} casos sin baseline: ${missing.join(', ')}`, strict ? 'red' : 'yellow');
+    if (strict) return false;
+  }
+
+  const regressions = compareWithBaseline(results, baseline, args);
+
+  if (regressions.length > 0) {
+    log(`\n❌ ${regressions.length} REGRESIONES DETECTADAS`, 'red');
+    regressions.forEach(r => log(`   ${r}`, 'red'));
+    return false;
+  }
+
+  log('\n✅ Sin regresiones de tamaño ni latencia respecto al baseline', 'green');
+  return true;
+}
+
+benchPDF()
+  .then(ok => process.exit(ok ? 0 : 1))
+  .catch(error => {
+    log(`❌ Error en benchmark: ${error.message}`, 'red');
+    process.exit(1);
+  });
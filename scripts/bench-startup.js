@@ -0,0 +1,329 @@
+#!/usr/bin/env node
+
+/**
+ * Benchmark de arranque en frío de las rutas de API con detección de regresiones
+ *
+ * Mide dos cosas sobre el build de producción (.next):
+ *   1. Tiempo de import por ruta: cada route.js bajo .next/server/app/api se carga en
+ *      un proceso de Node nuevo, que registra el tiempo del require, los módulos
+ *      cargados, el RSS agregado y los paquetes externos pesados que terminó cargando
+ *      (sharp, puppeteer, nodemailer...).
+ *   2. Latencia de arranque en frío: levanta `next start`, mide el tiempo hasta aceptar
+ *      conexiones y la primera solicitud a cada ruta (OPTIONS, sin efectos secundarios;
+ *      Next carga el módulo de la ruta en la primera solicitud) contra la segunda.
+ *
+ * Compara contra el baseline versionado en scripts/benchmarks/ y termina con código 1
+ * si alguna ruta empeora más de la tolerancia o empieza a cargar un paquete pesado
+ * que antes no cargaba. Con CI definido también falla si no hay baseline o si falta
+ * alguna ruta en él: hay que generarlo con --update-baseline en la misma máquina de
+ * CI y commitearlo.
+ *
+ * Uso:
+ *   npm run build
+ *   node scripts/bench-startup.js                      # compara contra el baseline
+ *   node scripts/bench-startup.js --update-baseline    # guarda los resultados como baseline
+ *
+ * Opciones:
+ *   --iterations <n>          Procesos por ruta para el tiempo de import; se usa la mediana (por defecto 3)
+ *   --filter <texto>          Solo rutas cuyo path contenga el texto
+ *   --port <n>                Puerto para `next start` (por defecto 3999)
+ *   --skip-server             Solo mide tiempos de import (sin levantar el servidor)
+ *   --baseline <archivo>      Archivo de baseline (por defecto scripts/benchmarks/startup-baseline.json)
+ *   --time-tolerance <pct>    Aumento de tiempo permitido (por defecto 30)
+ */
+
+// Cargar variables de entorno
+require('dotenv').config({ path: '.env.local' });
+
+const fs = require('fs');
+const path = require('path');
+const { spawn, execFileSync } = require('child_process');
+
+// Colores para la consola
+const colors = {
+  green: '\x1b[32m',
+  red: '\x1b[31m',
+  yellow: '\x1b[33m',
+  blue: '\x1b[34m',
+  cyan: '\x1b[36m',
+  magenta: '\x1b[35m',
+  reset: '\x1b[0m',
+  bold: '\x1b[1m'
+};
+
+function log(message, color = 'reset') {
+  console.log(`${colors[color]}${message}${colors.reset}`);
+}
+
+const ROOT = path.join(__dirname, '..');
+const ROUTES_DIR = path.join(ROOT, '.next', 'server', 'app', 'api');
+
+// Dependencias que no deberían cargarse en rutas que no las usan
+const HEAVY_PACKAGES = ['sharp', 'puppeteer', 'jspdf', 'node-forge', 'nodemailer', 'nylas', 'fast-xml-parser', 'exceljs', 'firebase-admin'];
+
+// Proceso hijo: carga el bundle de la ruta y reporta lo que costó
+const IMPORT_PROBE = `
+const heavy = ${JSON.stringify(HEAVY_PACKAGES)};
+const rssBefore = process.memoryUsage().rss;
+const start = process.hrtime.bigint();
+require(process.argv[1]);
+const importMs = Number(process.hrtime.bigint() - start) / 1e6;
+const modules = Object.keys(require.cache);
+process.stdout.write(JSON.stringify({
+  importMs,
+  modules: modules.length,
+  rssBytes: process.memoryUsage().rss - rssBefore,
+  heavy: heavy.filter(name => modules.some(file => file.includes('/node_modules/' + name + '/')))
+}));
+process.exit(0);
+`;
+
+function parseArgs(argv) {
+  const args = {
+    iterations: 3,
+    filter: null,
+    port: 3999,
+    skipServer: false,
+    baseline: path.join(__dirname, 'benchmarks', 'startup-baseline.json'),
+    timeTolerance: 30,
+    updateBaseline: false
+  };
+  for (let i = 2; i < argv.length; i++) {
+    const arg = argv[i];
+    if (arg === '--iterations') args.iterations = parseInt(argv[++i], 10);
+    else if (arg === '--filter') args.filter = argv[++i];
+    else if (arg === '--port') args.port = parseInt(argv[++i], 10);
+    else if (arg === '--skip-server') args.skipServer = true;
+    else if (arg === '--baseline') args.baseline = argv[++i];
+    else if (arg === '--time-tolerance') args.timeTolerance = parseFloat(argv[++i]);
+    else if (arg === '--update-baseline') args.updateBaseline = true;
+    else throw new Error(`Opción desconocida: ${arg}`);
+  }
+  return args;
+}
+
+function median(values) {
+  const sorted = [...values].sort((a, b) => a - b);
+  const mid = Math.floor(sorted.length / 2);
+  return sorted.length % 2 ? sorted[mid] : (sorted[mid - 1] + sorted[mid]) / 2;
+}
+
+function round(ms) {
+  return Math.round(ms * 10) / 10;
+}
+
+function formatBytes(bytes) {
+  if (bytes <= 0) return '0 Bytes';
+  const k = 1024;
+  const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+  const i = Math.floor(Math.log(bytes) / Math.log(k));
+  return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+}
+
+/**
+ * Bundles de rutas de API del build: [{ route: '/api/invoices/create', file }]
+ */
+function findRoutes(filter) {
+  const routes = [];
+  const walk = (dir) => {
+    for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+      const fullPath = path.join(dir, entry.name);
+      if (entry.isDirectory()) {
+        walk(fullPath);
+      } else if (entry.name === 'route.js') {
+        const route = '/api/' + path.relative(ROUTES_DIR, path.dirname(fullPath)).split(path.sep).join('/');
+        if (!filter || route.includes(filter)) {
+          routes.push({ route, file: fullPath });
+        }
+      }
+    }
+  };
+  walk(ROUTES_DIR);
+  return routes.sort((a, b) => a.route.localeCompare(b.route));
+}
+
+function measureImport(file, iterations) {
+  const samples = [];
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now();
+    const output = execFileSync(process.execPath, ['-e', IMPORT_PROBE, file], {
+      cwd: ROOT,
+      env: { ...process.env, NODE_ENV: 'production' },
+      stdio: ['ignore', 'pipe', 'ignore']
+    });
+    samples.push({ ...JSON.parse(output.toString()), processMs: performance.now() - start });
+  }
+
+  return {
+    importMs: round(median(samples.map(s => s.importMs))),
+    processMs: round(median(samples.map(s => s.processMs))),
+    modules: samples[0].modules,
+    rssBytes: Math.round(median(samples.map(s => s.rssBytes))),
+    heavy: samples[0].heavy
+  };
+}
+
+/**
+ * Levanta `next start` y espera a que acepte conexiones
+ */
+async function startServer(port) {
+  const nextBin = path.join(ROOT, 'node_modules', 'next', 'dist', 'bin', 'next');
+  const start = performance.now();
+  const server = spawn(process.execPath, [nextBin, 'start', '-p', String(port)], {
+    cwd: ROOT,
+    env: { ...process.env, NODE_ENV: 'production' },
+    stdio: 'ignore'
+  });
+
+  let exited = false;
+  server.on('exit', () => { exited = true; });
+
+  const deadline = Date.now() + 60 * 1000;
+  while (Date.now() < deadline) {
+    if (exited) throw new Error('next start terminó antes de aceptar conexiones');
+    try {
+      await fetch(`http://127.0.0.1:${port}/api/`, { method: 'OPTIONS' });
+      return { server, bootMs: round(performance.now() - start) };
+    } catch {
+      await new Promise(resolve => setTimeout(resolve, 25));
+    }
+  }
+  server.kill();
+  throw new Error('next start no respondió en 60s');
+}
+
+async function timeRequest(url) {
+  const start = performance.now();
+  const response = await fetch(url, { method: 'OPTIONS' });
+  await response.arrayBuffer();
+  return { ms: performance.now() - start, status: response.status };
+}
+
+async function measureColdRequests(routes, port) {
+  const results = {};
+  for (const { route } of routes) {
+    // Segmentos dinámicos ([id]) con un valor cualquiera; trailingSlash está activo
+    const url = `http://127.0.0.1:${port}${route.replace(/\[[^\]]+\]/g, 'bench')}/`;
+    const cold = await timeRequest(url);
+    const warm = await timeRequest(url);
+    results[route] = { coldMs: round(cold.ms), warmMs: round(warm.ms), status: cold.status };
+  }
+  return results;
+}
+
+function compareWithBaseline(results, baseline, args) {
+  const regressions = [];
+  // Holgura absoluta para que rutas de pocos ms no fallen por ruido
+  const timeSlackMs = 20;
+  const limit = (previous) => previous * (1 + args.timeTolerance / 100) + timeSlackMs;
+
+  if (baseline.bootMs && results.bootMs && results.bootMs > limit(baseline.bootMs)) {
+    regressions.push(`arranque del servidor ${baseline.bootMs}ms → ${results.bootMs}ms`);
+  }
+
+  for (const [route, current] of Object.entries(results.routes)) {
+    const previous = baseline.routes[route];
+    if (!previous) continue;
+
+    if (current.importMs > limit(previous.importMs)) {
+      regressions.push(`${route}: import ${previous.importMs}ms → ${current.importMs}ms`);
+    }
+    if (current.coldMs !== undefined && previous.coldMs !== undefined && current.coldMs > limit(previous.coldMs)) {
+      regressions.push(`${route}: primera solicitud ${previous.coldMs}ms → ${current.coldMs}ms`);
+    }
+    const added = current.heavy.filter(name => !previous.heavy.includes(name));
+    if (added.length > 0) {
+      regressions.push(`${route}: ahora carga ${added.join(', ')} al importar`);
+    }
+  }
+  return regressions;
+}
+
+async function benchStartup() {
+  const args = parseArgs(process.argv);
+
+  log('\n📊 Benchmark de Arranque en Frío de Rutas de API', 'bold');
+  log('='.repeat(60), 'blue');
+
+  if (!fs.existsSync(ROUTES_DIR)) {
+    throw new Error('No existe .next/server/app/api; ejecute npm run build primero');
+  }
+
+  const routes = findRoutes(args.filter);
+  log(`📚 ${routes.length} rutas x ${args.iterations} procesos`, 'cyan');
+
+  const results = { bootMs: null, routes: {} };
+  for (const { route, file } of routes) {
+    results.routes[route] = measureImport(file, args.iterations);
+  }
+
+  if (!args.skipServer) {
+    const { server, bootMs } = await startServer(args.port);
+    results.bootMs = bootMs;
+    log(`🚀 next start listo en ${bootMs}ms`, 'cyan');
+    try {
+      const cold = await measureColdRequests(routes, args.port);
+      for (const [route, timing] of Object.entries(cold)) {
+        Object.assign(results.routes[route], timing);
+      }
+    } finally {
+      server.kill();
+    }
+  }
+
+  log('');
+  for (const [route, result] of Object.entries(results.routes)) {
+    const request = result.coldMs !== undefined
+      ? `  1ª ${String(result.coldMs).padStart(7)}ms  2ª ${String(result.warmMs).padStart(6)}ms`
+      : '';
+    log(`  ${route.padEnd(48)} import ${String(result.importMs).padStart(7)}ms  ` +
+      `módulos ${String(result.modules).padStart(5)}  rss ${formatBytes(result.rssBytes).padStart(10)}${request}` +
+      (result.heavy.length > 0 ? `  [${result.heavy.join(', ')}]` : ''),
+      result.heavy.length > 0 ? 'yellow' : 'reset');
+  }
+
+  if (args.updateBaseline) {
+    fs.mkdirSync(path.dirname(args.baseline), { recursive: true });
+    fs.writeFileSync(args.baseline, JSON.stringify({
+      createdAt: new Date().toISOString(),
+      node: process.version,
+      iterations: args.iterations,
+      ...results
+    }, null, 2) + '\n');
+    log(`\n💾 Baseline actualizado: ${args.baseline}`, 'green');
+    return true;
+  }
+
+  // En CI un baseline ausente o incompleto es un error: de lo contrario nada se compara
+  const strict = !!process.env.CI;
+
+  if (!fs.existsSync(args.baseline)) {
+    log(`\n${strict ? '❌' : '⚠️'} No existe baseline en ${args.baseline}; ejecute con --update-baseline para crearlo`, strict ? 'red' : 'yellow');
+    return !strict;
+  }
+
+  const baseline = JSON.parse(fs.readFileSync(args.baseline, 'utf8'));
+  const missing = Object.keys(results.routes).filter(route => !baseline.routes[route]);
+  if (missing.length > 0) {
+    log(`\n${strict ? '❌' : '⚠️'} ${missing.length} rutas sin baseline: ${missing.join(', ')}`, strict ? 'red' : 'yellow');
+    if (strict) return false;
+  }
+
+  const regressions = compareWithBaseline(results, baseline, args);
+
+  if (regressions.length > 0) {
+    log(`\n❌ ${regressions.length} REGRESIONES DETECTADAS`, 'red');
+    regressions.forEach(r => log(`   ${r}`, 'red'));
+    return false;
+  }
+
+  log('\n✅ Sin regresiones de arranque respecto al baseline', 'green');
+  return true;
+}
+
+benchStartup()
+  .then(ok => process.exit(ok ? 0 : 1))
+  .catch(error => {
+    log(`❌ Error en benchmark: ${error.message}`, 'red');
+    process.exit(1);
+  });
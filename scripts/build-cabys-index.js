@@ -0,0 +1,197 @@
+/**
+ * Genera el índice local del catálogo CABYS (public/data/cabys/cabys-index.json)
+ *
+ * Fuente: el catálogo oficial de bienes y servicios de Hacienda exportado a CSV
+ * (o un JSON con [{ codigo, descripcion, impuesto }]). Por defecto se lee
+ * data/cabys/cabys.csv; se puede indicar otra ruta como argumento o con CABYS_SOURCE.
+ * En el CSV oficial la columna del código es la que contiene los códigos de 13
+ * dígitos, la siguiente es su descripción y la de "Impuesto" la tarifa de IVA.
+ *
+ * El índice contiene las filas ordenadas por código y un índice invertido de
+ * palabras normalizadas (sin tildes, en minúscula) con listas de filas codificadas
+ * por diferencias. lib/cabys.ts lo carga y resuelve búsquedas por prefijo.
+ *
+ * Se ejecuta antes de `next build` (prebuild). Sin catálogo el índice queda vacío y
+ * las rutas no validan los códigos CABYS, por eso en CI (CI=true) o con
+ * CABYS_REQUIRED=true la falta del catálogo hace fallar el build.
+ * Ejecutar manualmente con:
+ *   node scripts/build-cabys-index.js [ruta-al-catalogo]
+ */
+
+const fs = require('fs')
+const path = require('path')
+
+const ROOT = path.join(__dirname, '..')
+const SOURCE = process.argv[2] || process.env.CABYS_SOURCE || path.join(ROOT, 'data', 'cabys', 'cabys.csv')
+const OUTPUT = path.join(ROOT, 'public', 'data', 'cabys', 'cabys-index.json')
+const INDEX_VERSION = 1
+const REQUIRED = process.env.CABYS_REQUIRED === 'true' || process.env.CI === 'true'
+
+// Mantener en sincronía con normalizeCabysText / tokenizeCabysText de lib/cabys.ts
+const STOPWORDS = new Set(['de', 'del', 'la', 'las', 'el', 'los', 'y', 'o', 'en', 'para', 'con', 'por', 'sin', 'al', 'a', 'e', 'u'])
+
+function normalizeText(text) {
+  return String(text || '')
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+}
+
+function tokenize(text) {
+  return normalizeText(text)
+    .split(/[^a-z0-9]+/)
+    .filter(token => token.length >= 2 && !STOPWORDS.has(token))
+}
+
+/**
+ * Parser de CSV mínimo (comillas dobles, separador "," o ";")
+ */
+function parseCsv(content) {
+  const firstLine = content.slice(0, content.indexOf('\n'))
+  const separator = (firstLine.match(/;/g) || []).length > (firstLine.match(/,/g) || []).length ? ';' : ','
+  const rows = []
+  let row = []
+  let field = ''
+  let quoted = false
+
+  for (let i = 0; i < content.length; i++) {
+    const char = content[i]
+    if (quoted) {
+      if (char === '"' && content[i + 1] === '"') {
+        field += '"'
+        i++
+      } else if (char === '"') {
+        quoted = false
+      } else {
+        field += char
+      }
+    } else if (char === '"') {
+      quoted = true
+    } else if (char === separator) {
+      row.push(field)
+      field = ''
+    } else if (char === '\n' || char === '\r') {
+      if (char === '\r' && content[i + 1] === '\n') i++
+      row.push(field)
+      rows.push(row)
+      row = []
+      field = ''
+    } else {
+      field += char
+    }
+  }
+  if (field || row.length > 0) {
+    row.push(field)
+    rows.push(row)
+  }
+  return rows.filter(r => r.some(cell => cell.trim() !== ''))
+}
+
+function readCsvEntries(content) {
+  const rows = parseCsv(content.replace(/^\uFEFF/, ''))
+  const header = rows[0].map(cell => normalizeText(cell))
+  const data = rows.slice(1)
+
+  // Columna del código: la que tiene más valores de 13 dígitos
+  const columns = header.length
+  let codeColumn = -1
+  let bestHits = 0
+  for (let column = 0; column < columns; column++) {
+    const hits = data.reduce((sum, r) => sum + (/^\d{13}$/.test((r[column] || '').trim()) ? 1 : 0), 0)
+    if (hits > bestHits) {
+      bestHits = hits
+      codeColumn = column
+    }
+  }
+  if (codeColumn === -1) {
+    throw new Error('No se encontró una columna con códigos CABYS de 13 dígitos')
+  }
+
+  const taxColumn = header.findIndex(cell => cell.includes('impuesto'))
+
+  return data.map(r => ({
+    codigo: (r[codeColumn] || '').trim(),
+    descripcion: (r[codeColumn + 1] || '').trim(),
+    impuesto: taxColumn >= 0 ? r[taxColumn] : null
+  }))
+}
+
+function parseTax(value) {
+  if (value === null || value === undefined || value === '') return null
+  const tax = parseFloat(String(value).replace('%', '').replace(',', '.'))
+  if (isNaN(tax)) return null
+  // El catálogo puede traer la tarifa como fracción (0.13) o como porcentaje (13)
+  return tax > 0 && tax < 1 ? Math.round(tax * 100) : tax
+}
+
+function buildIndex(entries) {
+  const byCode = new Map()
+  for (const entry of entries) {
+    if (/^\d{13}$/.test(entry.codigo) && entry.descripcion && !byCode.has(entry.codigo)) {
+      byCode.set(entry.codigo, entry)
+    }
+  }
+
+  const rows = Array.from(byCode.values()).sort((a, b) => (a.codigo < b.codigo ? -1 : 1))
+  const postings = new Map()
+
+  rows.forEach((row, index) => {
+    for (const token of new Set(tokenize(row.descripcion))) {
+      if (!postings.has(token)) postings.set(token, [])
+      postings.get(token).push(index)
+    }
+  })
+
+  const tokens = {}
+  for (const token of Array.from(postings.keys()).sort()) {
+    const list = postings.get(token)
+    tokens[token] = list.map((value, i) => (i === 0 ? value : value - list[i - 1]))
+  }
+
+  return {
+    version: INDEX_VERSION,
+    generatedAt: new Date().toISOString(),
+    source: path.basename(SOURCE),
+    count: rows.length,
+    codes: rows.map(row => row.codigo),
+    descriptions: rows.map(row => row.descripcion),
+    taxes: rows.map(row => parseTax(row.impuesto)),
+    tokens
+  }
+}
+
+function buildCabysIndex() {
+  if (!fs.existsSync(SOURCE)) {
+    if (REQUIRED) {
+      console.error(`❌ Catálogo CABYS no encontrado (${SOURCE}). Es obligatorio en CI o con CABYS_REQUIRED=true:`)
+      console.error('   descargue el catálogo de Hacienda en data/cabys/cabys.csv o indique la ruta con CABYS_SOURCE.')
+      process.exit(1)
+    }
+    if (fs.existsSync(OUTPUT)) {
+      console.log(`⚠️ Catálogo CABYS no encontrado (${SOURCE}); se conserva el índice existente`)
+      return
+    }
+    // Índice vacío: la búsqueda no devuelve resultados y la validación de las rutas se omite
+    console.warn('⚠️ ============================================================')
+    console.warn(`⚠️ Catálogo CABYS no encontrado (${SOURCE}); se genera un índice VACÍO.`)
+    console.warn('⚠️ Los comprobantes se emitirán SIN validar los códigos CABYS.')
+    console.warn('⚠️ Use CABYS_REQUIRED=true para que el build falle en este caso.')
+    console.warn('⚠️ ============================================================')
+    fs.mkdirSync(path.dirname(OUTPUT), { recursive: true })
+    fs.writeFileSync(OUTPUT, JSON.stringify(buildIndex([])))
+    return
+  }
+
+  const start = Date.now()
+  const content = fs.readFileSync(SOURCE, 'utf8')
+  const entries = SOURCE.endsWith('.json') ? JSON.parse(content) : readCsvEntries(content)
+  const index = buildIndex(entries)
+
+  fs.mkdirSync(path.dirname(OUTPUT), { recursive: true })
+  fs.writeFileSync(OUTPUT, JSON.stringify(index))
+
+  const size = fs.statSync(OUTPUT).size
+  console.log(`✅ Índice CABYS: ${index.count} códigos, ${Object.keys(index.tokens).length} palabras, ${(size / 1024).toFixed(0)} KB en ${Date.now() - start}ms`)
+}
+
+buildCabysIndex()
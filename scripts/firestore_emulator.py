@@ -0,0 +1,168 @@
+"""
+Escritura por lotes hacia el emulador de Firestore o hacia archivos JSONL locales
+
+Lo usan los scripts de carga masiva (import-clients.py, generate-dataset.py).
+Ambos destinos exponen la misma interfaz:
+
+    writer.add(coleccion, doc_id, datos)
+    writer.close()
+
+- FirestoreEmulatorWriter: acumula escrituras y las envía con `documents:commit`
+  (máximo 500 por commit) sobre una sola conexión HTTP persistente. Los campos
+  indicados en `server_timestamps` se resuelven con REQUEST_TIME, igual que
+  `serverTimestamp()` en el SDK.
+- JsonlWriter: escribe un `<coleccion>.jsonl` por colección, un documento por
+  línea con su `id`. Es el formato que consume audit-consecutives.py.
+
+Solo usa la librería estándar.
+"""
+
+import base64
+import datetime
+import http.client
+import json
+import os
+import random
+import string
+
+MAX_WRITES_PER_COMMIT = 500
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+def auto_id(rng=random):
+    """ID de 20 caracteres alfanuméricos, como los de addDoc()"""
+    return ''.join(rng.choice(_AUTO_ID_CHARS) for _ in range(20))
+
+
+def utc_now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def to_firestore_value(value):
+    """Convierte un valor de Python al formato `Value` de la API REST de Firestore"""
+    if value is None:
+        return {'nullValue': None}
+    if isinstance(value, bool):
+        return {'booleanValue': value}
+    if isinstance(value, int):
+        return {'integerValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, str):
+        return {'stringValue': value}
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return {'timestampValue': value.isoformat().replace('+00:00', 'Z')}
+    if isinstance(value, bytes):
+        return {'bytesValue': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, dict):
+        return {'mapValue': {'fields': {k: to_firestore_value(v) for k, v in value.items()}}}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [to_firestore_value(v) for v in value]}}
+    raise TypeError(f'Tipo no soportado para Firestore: {type(value).__name__}')
+
+
+class FirestoreEmulatorWriter:
+    def __init__(self, host, project_id, batch_size=400, server_timestamps=('createdAt', 'updatedAt')):
+        if batch_size < 1 or batch_size > MAX_WRITES_PER_COMMIT:
+            raise ValueError(f'batch_size debe estar entre 1 y {MAX_WRITES_PER_COMMIT}')
+        self.host = host
+        self.project_id = project_id
+        self.batch_size = batch_size
+        self.server_timestamps = tuple(server_timestamps)
+        self.database = f'projects/{project_id}/databases/(default)'
+        self.connection = http.client.HTTPConnection(host, timeout=60)
+        self.pending = []
+        self.written = 0
+        self.commits = 0
+
+    def add(self, collection, doc_id, data):
+        fields = {k: to_firestore_value(v) for k, v in data.items() if k not in self.server_timestamps}
+        write = {
+            'update': {
+                'name': f'{self.database}/documents/{collection}/{doc_id}',
+                'fields': fields,
+            }
+        }
+        transforms = [
+            {'fieldPath': campo, 'setToServerValue': 'REQUEST_TIME'}
+            for campo in self.server_timestamps if campo in data
+        ]
+        if transforms:
+            write['updateTransforms'] = transforms
+        self.pending.append(write)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        body = json.dumps({'writes': self.pending})
+        self.connection.request(
+            'POST',
+            f'/v1/{self.database}/documents:commit',
+            body=body,
+            headers={
+                'Content-Type': 'application/json',
+                # El emulador acepta "owner" como credencial de administrador
+                'Authorization': 'Bearer owner',
+            },
+        )
+        response = self.connection.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError(f'Commit rechazado por el emulador ({response.status}): {payload[:500]!r}')
+        self.written += len(self.pending)
+        self.commits += 1
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+class JsonlWriter:
+    def __init__(self, directory, server_timestamps=('createdAt', 'updatedAt')):
+        self.directory = directory
+        self.server_timestamps = tuple(server_timestamps)
+        self.files = {}
+        self.written = 0
+        self.commits = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, collection, doc_id, data):
+        f = self.files.get(collection)
+        if f is None:
+            f = open(os.path.join(self.directory, f'{collection}.jsonl'), 'w', encoding='utf-8')
+            self.files[collection] = f
+        documento = {'id': doc_id}
+        for campo, valor in data.items():
+            if campo in self.server_timestamps:
+                valor = utc_now_iso()
+            elif isinstance(valor, datetime.datetime):
+                valor = valor.isoformat()
+            documento[campo] = valor
+        f.write(json.dumps(documento, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n')
+        self.written += 1
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+def create_writer(emulator_host=None, project_id=None, output_dir=None, batch_size=400,
+                  server_timestamps=('createdAt', 'updatedAt')):
+    """Emulador si hay host (argumento o FIRESTORE_EMULATOR_HOST), si no JSONL local"""
+    emulator_host = emulator_host or (None if output_dir else os.environ.get('FIRESTORE_EMULATOR_HOST'))
+    if emulator_host:
+        project_id = project_id or os.environ.get('NEXT_PUBLIC_FIREBASE_PROJECT_ID') or 'demo-project'
+        return FirestoreEmulatorWriter(emulator_host, project_id, batch_size, server_timestamps)
+    return JsonlWriter(output_dir or 'firestore-local', server_timestamps)
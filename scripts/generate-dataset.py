@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos multi-tenant a escala de producción
+
+Produce tenants, companies, clients, products, invoices, tickets y creditNotes
+con la misma forma que guardan los endpoints de la app, para pruebas de
+rendimiento con volúmenes reales (cientos de miles de documentos por empresa).
+
+  - Reproducible: todo se deriva de --seed; cada empresa usa su propio RNG, así
+    que cambiar la cantidad de tenants no altera las empresas ya generadas
+  - Memoria acotada: los documentos se escriben apenas se generan; solo se
+    mantienen en memoria los clientes/productos de la empresa en curso y las
+    últimas facturas (para referenciarlas desde notas de crédito)
+  - Distribuciones: documentos por empresa con cola pesada (Pareto), líneas por
+    documento con cola larga, CRC/USD según el perfil de la empresa (POS o B2B),
+    ubicaciones sobre los distritos reales de public/data/costa-rica
+  - Claves y consecutivos válidos (FE/TE/NC), de modo que la salida sirve de
+    entrada para audit-consecutives.py; --defect-rate inyecta huecos y duplicados
+
+Salida: JSONL por colección (--output-dir) o commits por lotes al emulador de
+Firestore (--emulator-host / FIRESTORE_EMULATOR_HOST). Desde el emulador se
+puede obtener el formato de importación con `firebase emulators:export`.
+
+Uso:
+    python3 scripts/generate-dataset.py --seed 42 --tenants 20 --output-dir /tmp/dataset
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/generate-dataset.py --tenants 5 --documents-mean 50000
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from firestore_emulator import auto_id, create_writer
+
+GEO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'data', 'costa-rica')
+
+CR_TZ = datetime.timezone(datetime.timedelta(hours=-6))
+
+# Muestra de códigos CABYS por rubro: (código, descripción base, unidad, tarifa IVA, código tarifa)
+CABYS = [
+    ('8399000000000', 'Servicios profesionales', 'Sp', 13, '08'),
+    ('8311100000000', 'Consultoría en gestión empresarial', 'Sp', 13, '08'),
+    ('8313100000000', 'Servicios de tecnologías de la información', 'Sp', 13, '08'),
+    ('8314200000000', 'Desarrollo de software a la medida', 'Sp', 13, '08'),
+    ('8212000000000', 'Servicios de contabilidad', 'Sp', 13, '08'),
+    ('6331000000000', 'Servicio de comidas en restaurante', 'Un', 13, '08'),
+    ('6332000000000', 'Servicio de bebidas', 'Un', 13, '08'),
+    ('2399100000000', 'Café tostado', 'Kg', 1, '02'),
+    ('2111100000000', 'Carne de res', 'Kg', 1, '02'),
+    ('0121100000000', 'Frutas frescas', 'Kg', 1, '02'),
+    ('2441000000000', 'Bebidas gaseosas', 'Un', 13, '08'),
+    ('3521000000000', 'Medicamentos', 'Un', 2, '03'),
+    ('4521100000000', 'Computadoras portátiles', 'Un', 13, '08'),
+    ('4731500000000', 'Teléfonos celulares', 'Un', 13, '08'),
+    ('3211000000000', 'Papel y artículos de oficina', 'Un', 13, '08'),
+    ('3891000000000', 'Artículos de ferretería', 'Un', 13, '08'),
+    ('5411000000000', 'Servicios de construcción', 'Sp', 4, '04'),
+    ('9211000000000', 'Servicios educativos', 'Sp', 0, '01'),
+    ('9311000000000', 'Servicios médicos', 'Sp', 4, '04'),
+    ('6411000000000', 'Transporte de carga', 'Sp', 13, '08'),
+]
+
+NOMBRES = ['María', 'José', 'Ana', 'Luis', 'Carmen', 'Carlos', 'Laura', 'Jorge', 'Sofía', 'Andrés',
+           'Valeria', 'Diego', 'Daniela', 'Fernando', 'Gabriela', 'Ricardo', 'Mónica', 'Esteban']
+APELLIDOS = ['Rodríguez', 'Jiménez', 'Mora', 'Vargas', 'Rojas', 'Sánchez', 'Solís', 'Araya', 'Chaves',
+             'Quesada', 'Alvarado', 'Campos', 'Castro', 'Herrera', 'Ramírez', 'Salas', 'Brenes', 'Ulate']
+GIROS = ['Comercial', 'Servicios', 'Distribuidora', 'Soluciones', 'Inversiones', 'Grupo', 'Tecnología',
+         'Alimentos', 'Consultores', 'Importadora']
+SUFIJOS = ['S.A.', 'S.R.L.', 'Limitada', 'S.A.']
+ADJETIVOS = ['Premium', 'Básico', 'Estándar', 'Profesional', 'Express', 'Plus', 'Mensual', 'Anual']
+
+PLANES = ['basic', 'pro', 'enterprise']
+ESTADOS_HACIENDA = [('aceptado', 0.93), ('rechazado', 0.02), ('procesando', 0.03), ('Pendiente Envío Hacienda', 0.02)]
+
+
+class IndiceGeo:
+    """Distritos reales con peso ~ 1/sqrt(área): los urbanos son pequeños y densos"""
+
+    def __init__(self, directorio=GEO_DIR):
+        with open(os.path.join(directorio, 'cantones.json'), encoding='utf-8') as f:
+            provincia_de_canton = {c['codigo']: c['provinciaCodigo'] for c in json.load(f)}
+        with open(os.path.join(directorio, 'distritos.json'), encoding='utf-8') as f:
+            distritos = json.load(f)
+        self.ubicaciones = []
+        self.pesos = []
+        acumulado = 0.0
+        for d in distritos:
+            provincia = provincia_de_canton.get(d['cantonCodigo'])
+            if provincia is None:
+                continue
+            self.ubicaciones.append((str(provincia), str(d['cantonCodigo']), str(d['codigo']), d['nombre']))
+            acumulado += 1.0 / max(d.get('area') or 1.0, 0.5) ** 0.5
+            self.pesos.append(acumulado)
+
+    def elegir(self, rng):
+        return rng.choices(self.ubicaciones, cum_weights=self.pesos, k=1)[0]
+
+
+def rng_para(seed, *partes):
+    """RNG independiente y estable por entidad"""
+    semilla = hashlib.sha256(':'.join(str(p) for p in (seed,) + partes).encode()).digest()
+    return random.Random(int.from_bytes(semilla[:8], 'big'))
+
+
+def nombre_persona(rng):
+    return f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}'
+
+
+def nombre_empresa(rng):
+    return f'{rng.choice(GIROS)} {rng.choice(APELLIDOS)} {rng.choice(SUFIJOS)}'
+
+
+def cedula_fisica(rng):
+    return str(rng.randint(1, 9)) + ''.join(str(rng.randint(0, 9)) for _ in range(8))
+
+
+def cedula_juridica(rng):
+    return '3101' + ''.join(str(rng.randint(0, 9)) for _ in range(6))
+
+
+def formatear_cedula(numeros, tipo):
+    if tipo == '01':
+        return f'{numeros[0]}-{numeros[1:5]}-{numeros[5:9]}'
+    return f'{numeros[0:3]}-{numeros[3:6]}-{numeros[6:10]}'
+
+
+def elegir_ponderado(rng, opciones):
+    r = rng.random()
+    acumulado = 0.0
+    for valor, probabilidad in opciones:
+        acumulado += probabilidad
+        if r < acumulado:
+            return valor
+    return opciones[-1][0]
+
+
+def cantidad_lineas(rng, media, maximo=200):
+    """Mayoría de documentos con 1-3 líneas y una cola larga de documentos grandes"""
+    return min(maximo, 1 + int(rng.expovariate(1.0 / max(media - 1, 0.01))))
+
+
+def generar_clave(fecha, cedula, tipo, numero, rng):
+    return (
+        '506'
+        + fecha.strftime('%d%m%y')
+        + cedula.replace('-', '').zfill(12)
+        + '001' + '00001' + tipo + f'{numero:010d}'
+        + '1'
+        + str(rng.randint(10000000, 99999999))
+    )
+
+
+def generar_tenant(args, indice):
+    rng = rng_para(args.seed, 'tenant', indice)
+    tenant_id = auto_id(rng)
+    owner = nombre_persona(rng)
+    creado = args.inicio - datetime.timedelta(days=rng.randint(0, 90))
+    return tenant_id, {
+        'name': nombre_empresa(rng),
+        'description': None,
+        'ownerName': owner,
+        'ownerEmail': f'owner{indice}@tenant{indice}.example.com',
+        'ownerPhone': f'8{rng.randint(1000000, 9999999)}',
+        'plan': rng.choice(PLANES),
+        'status': 'active',
+        'maxCompanies': None,
+        'maxUsers': None,
+        'maxDocumentsPerMonth': None,
+        'documentsThisMonth': 0,
+        'documentsLastMonth': 0,
+        'totalDocuments': 0,
+        'lastDocumentDate': None,
+        'notes': None,
+        'tags': ['synthetic'],
+        'createdBy': 'synthetic-generator',
+        'createdAt': creado,
+        'updatedAt': creado,
+    }
+
+
+def generar_productos(args, tenant_id, tenant_indice, writer):
+    rng = rng_para(args.seed, 'productos', tenant_indice)
+    cantidad = max(1, int(rng.lognormvariate(0, 0.8) * args.products_mean))
+    rubros = rng.sample(CABYS, k=rng.randint(2, 6))
+    productos = []
+    for i in range(cantidad):
+        codigo, descripcion, unidad, tarifa, codigo_tarifa = rng.choice(rubros)
+        precio = round(rng.lognormvariate(9, 1.2), 2) if unidad == 'Sp' else round(rng.lognormvariate(7.5, 1.0), 2)
+        producto = {
+            'codigoCABYS': codigo,
+            'detalle': f'{descripcion} {rng.choice(ADJETIVOS)} #{i + 1}',
+            'precioUnitario': precio,
+            'unidadMedida': unidad,
+            'tipoImpuesto': '01',
+            'codigoTarifaImpuesto': codigo_tarifa,
+            'tarifaImpuesto': tarifa,
+            'tieneExoneracion': False,
+            'porcentajeExoneracion': 0,
+            'numeroDocumentoExoneracion': '',
+            'nombreInstitucionExoneracion': '',
+            'fechaEmisionExoneracion': '',
+            'montoExoneracion': 0,
+            'activo': True,
+            'tenantId': tenant_id,
+            'createdBy': 'synthetic-generator',
+            'fechaCreacion': args.inicio,
+            'fechaActualizacion': args.inicio,
+        }
+        writer.add('products', auto_id(rng), producto)
+        productos.append(producto)
+    return productos
+
+
+def generar_empresa(args, geo, tenant_id, tenant_indice, empresa_indice, writer):
+    rng = rng_para(args.seed, 'empresa', tenant_indice, empresa_indice)
+    company_id = auto_id(rng)
+    provincia, canton, distrito, nombre_distrito = geo.elegir(rng)
+    cedula = cedula_juridica(rng)
+    nombre = nombre_empresa(rng)
+    perfil = 'pos' if rng.random() < args.pos_ratio else 'b2b'
+    empresa = {
+        'name': nombre,
+        'nombreComercial': nombre.rsplit(' ', 1)[0],
+        'identification': cedula,
+        'identificationType': '02',
+        'phone': f'2{rng.randint(1000000, 9999999)}',
+        'phoneCountryCode': '+506',
+        'email': f'facturacion@empresa{tenant_indice}-{empresa_indice}.example.com',
+        'province': provincia,
+        'canton': canton,
+        'district': distrito,
+        'barrio': '',
+        'otrasSenas': f'{nombre_distrito}, 100 m norte de la iglesia',
+        'countryCode': '506',
+        'brandColor': '#314e7c',
+        'status': 'Activa',
+        'isDefault': empresa_indice == 0,
+        'tenantId': tenant_id,
+        'proveedorSistemas': '3102867860',
+        'economicActivity': {'codigo': '620100', 'descripcion': 'Actividad sintética', 'estado': 'A'},
+        'consecutive': 0,
+        'consecutiveTK': 0,
+        'consecutiveNT': 0,
+        'createdBy': 'synthetic-generator',
+        'updatedBy': 'synthetic-generator',
+        'createdAt': args.inicio,
+        'updatedAt': args.inicio,
+    }
+    return company_id, empresa, perfil, rng
+
+
+def generar_clientes(args, geo, tenant_id, company_id, perfil, rng, writer):
+    media = args.clients_mean * (0.3 if perfil == 'pos' else 1.0)
+    cantidad = max(1, int(rng.lognormvariate(0, 0.7) * media))
+    clientes = []
+    for _ in range(cantidad):
+        provincia, canton, distrito, nombre_distrito = geo.elegir(rng)
+        if rng.random() < 0.65:
+            tipo, numeros, nombre = '01', cedula_fisica(rng), nombre_persona(rng)
+        else:
+            tipo, numeros, nombre = '02', cedula_juridica(rng), nombre_empresa(rng)
+        cliente = {
+            'name': nombre,
+            'commercialName': '',
+            'identification': formatear_cedula(numeros, tipo),
+            'identificationType': tipo,
+            'email': f'{numeros}@cliente.example.com',
+            'phone': f'8{rng.randint(1000000, 9999999)}',
+            'phoneCountryCode': '506',
+            'province': provincia,
+            'canton': canton,
+            'district': distrito,
+            'otrasSenas': nombre_distrito,
+            'economicActivity': {'codigo': '924909', 'descripcion': '', 'estado': 'A'} if tipo == '02' else {
+                'codigo': '', 'descripcion': '', 'estado': ''},
+            'tieneExoneracion': False,
+            'exoneracion': None,
+            'tenantId': tenant_id,
+            'createdBy': 'synthetic-generator',
+            'createdAt': args.inicio,
+            'updatedBy': 'synthetic-generator',
+            'updatedAt': args.inicio,
+            'status': 'active',
+            'totalInvoices': 0,
+            'totalAmount': 0,
+            'companyIds': [company_id],
+        }
+        client_id = auto_id(rng)
+        writer.add('clients', client_id, cliente)
+        clientes.append((client_id, cliente))
+    return clientes
+
+
+def generar_lineas(rng, productos, media_lineas, tipo_cambio):
+    lineas = []
+    subtotal = 0.0
+    total_impuesto = 0.0
+    for numero in range(1, cantidad_lineas(rng, media_lineas) + 1):
+        producto = rng.choice(productos)
+        cantidad = 1 if producto['unidadMedida'] == 'Sp' else rng.randint(1, 12)
+        precio = round(producto['precioUnitario'] / tipo_cambio, 2)
+        base = round(cantidad * precio, 2)
+        impuesto = round(base * producto['tarifaImpuesto'] / 100, 2)
+        subtotal += base
+        total_impuesto += impuesto
+        lineas.append({
+            'numeroLinea': numero,
+            'codigoCABYS': producto['codigoCABYS'],
+            'cantidad': cantidad,
+            'unidadMedida': producto['unidadMedida'],
+            'detalle': producto['detalle'],
+            'codigoComercial': '',
+            'unidadMedidaComercial': '',
+            'precioUnitario': precio,
+            'montoTotal': base,
+            'subTotal': base,
+            'baseImponible': base,
+            'montoTotalLinea': round(base + impuesto, 2),
+            'impuesto': [{
+                'codigo': '01',
+                'codigoTarifaIVA': producto['codigoTarifaImpuesto'],
+                'tarifa': producto['tarifaImpuesto'],
+                'monto': impuesto,
+            }],
+            'impuestoAsumidoEmisorFabrica': 0,
+            'impuestoNeto': impuesto,
+        })
+    return lineas, round(subtotal, 2), round(total_impuesto, 2)
+
+
+def cliente_embebido(client_id, cliente):
+    return {
+        'id': client_id,
+        'name': cliente['name'],
+        'identification': cliente['identification'],
+        'identificationType': cliente['identificationType'],
+        'email': cliente['email'],
+        'economicActivity': cliente['economicActivity'],
+    }
+
+
+def generar_documentos(args, tenant_id, company_id, empresa, perfil, clientes, productos, rng, writer):
+    """Emite los documentos de la empresa en orden cronológico, sin acumularlos"""
+    escala = args.documents_mean / 3.0  # media de Pareto(1.5) = 3
+    cantidad = min(args.max_documents_per_company, max(1, int(escala * rng.paretovariate(1.5))))
+    proporcion_tiquetes = 0.8 if perfil == 'pos' else 0.05
+    proporcion_usd = 0.03 if perfil == 'pos' else 0.2
+
+    contadores = {'01': 0, '04': 0, '03': 0}
+    facturas_recientes = deque(maxlen=500)
+    clientes_con_actividad = [c for c in clientes if c[1]['economicActivity']['codigo']] or clientes
+
+    duracion = (args.fin - args.inicio).total_seconds()
+    paso_medio = duracion / cantidad
+    momento = args.inicio
+    escritos = 0
+
+    for _ in range(cantidad):
+        momento = momento + datetime.timedelta(seconds=rng.expovariate(1.0) * paso_medio)
+        if momento > args.fin:
+            break
+        fecha_cr = momento.astimezone(CR_TZ)
+
+        r = rng.random()
+        if facturas_recientes and r < args.credit_note_ratio:
+            tipo = '03'
+        elif r < args.credit_note_ratio + proporcion_tiquetes:
+            tipo = '04'
+        else:
+            tipo = '01'
+
+        contadores[tipo] += 1
+        numero = contadores[tipo]
+        if args.defect_rate and rng.random() < args.defect_rate:
+            # Defecto inyectado: o se salta un consecutivo o se repite el anterior
+            if rng.random() < 0.5:
+                contadores[tipo] += 1
+                numero = contadores[tipo]
+            elif numero > 1:
+                numero -= 1
+                contadores[tipo] -= 1
+
+        clave = generar_clave(fecha_cr, empresa['identification'], tipo, numero, rng)
+        estado = elegir_ponderado(rng, ESTADOS_HACIENDA)
+        fecha_texto = fecha_cr.strftime('%Y-%m-%dT%H:%M:%S')
+
+        if tipo == '03':
+            factura = rng.choice(facturas_recientes)
+            total_anulacion = rng.random() < 0.7
+            documento = {
+                'consecutivo': f'NC-{numero:010d}',
+                'consecutivo20Digitos': clave[21:41],
+                'clave': clave,
+                'tipo': 'nota-credito',
+                'tipoNotaCredito': '01' if total_anulacion else '03',
+                'razon': 'Anulación de factura' if total_anulacion else 'Corrección de monto',
+                'esAnulacionTotal': total_anulacion,
+                'referenciaFactura': {
+                    'clave': factura['clave'],
+                    'consecutivo': factura['consecutivo'],
+                    'fechaEmision': factura['fecha'],
+                },
+                'companyId': company_id,
+                'tenantId': tenant_id,
+                'cliente': factura['cliente'],
+                'formaPago': '01',
+                'condicionVenta': '01',
+                'items': factura['items'] if total_anulacion else factura['items'][:1],
+                'total': factura['total'] if total_anulacion else round(factura['total'] * rng.uniform(0.05, 0.5), 2),
+                'subtotal': factura['subtotal'],
+                'totalImpuesto': factura['totalImpuesto'],
+                'currency': factura['currency'],
+                'status': estado,
+                'haciendaSubmission': {'clave': clave, 'ind-estado': estado},
+                'createdAt': momento,
+                'createdBy': tenant_id,
+            }
+            writer.add('creditNotes', auto_id(rng), documento)
+            escritos += 1
+            continue
+
+        moneda = 'USD' if rng.random() < proporcion_usd else 'CRC'
+        tipo_cambio = round(rng.uniform(505, 540), 2) if moneda == 'USD' else 1
+        media_lineas = 1.8 if tipo == '04' else 3.5
+        lineas, subtotal, total_impuesto = generar_lineas(rng, productos, media_lineas, tipo_cambio)
+        total = round(subtotal + total_impuesto, 2)
+
+        if tipo == '04':
+            client_id, cliente = rng.choice(clientes) if rng.random() < 0.3 else (None, None)
+            documento = {
+                'consecutivo': f'TE-{numero:010d}',
+                'clave': clave,
+                'status': estado,
+                'documentType': 'tiquetes',
+                'clientId': client_id or '',
+                'companyId': company_id,
+                'tenantId': tenant_id,
+                'subtotal': subtotal,
+                'totalImpuesto': total_impuesto,
+                'totalDescuento': 0,
+                'total': total,
+                'exchangeRate': tipo_cambio,
+                'currency': moneda,
+                'condicionVenta': '01',
+                'paymentTerm': '01',
+                'paymentMethod': rng.choice(['01', '02', '04']),
+                'notes': '',
+                'items': lineas,
+                'fecha': fecha_texto,
+                'haciendaSubmission': {'clave': clave, 'ind-estado': estado},
+                'createdBy': 'synthetic-generator',
+                'createdAt': momento,
+                'updatedAt': momento,
+            }
+            if cliente:
+                documento['cliente'] = cliente_embebido(client_id, cliente)
+            writer.add('tickets', auto_id(rng), documento)
+        else:
+            client_id, cliente = rng.choice(clientes_con_actividad)
+            documento = {
+                'consecutivo': f'FE-{numero:010d}',
+                'status': estado,
+                'clientId': client_id,
+                'companyId': company_id,
+                'tenantId': tenant_id,
+                'createdBy': 'synthetic-generator',
+                'condicionVenta': rng.choice(['01', '01', '01', '02']),
+                'paymentTerm': rng.choice(['01', '15', '30']),
+                'paymentMethod': rng.choice(['01', '02', '04']),
+                'notes': '',
+                'subtotal': subtotal,
+                'totalImpuesto': total_impuesto,
+                'totalDescuento': 0,
+                'total': total,
+                'exchangeRate': tipo_cambio,
+                'currency': moneda,
+                'items': lineas,
+                'cliente': cliente_embebido(client_id, cliente),
+                'tieneExoneracion': False,
+                'exoneracion': None,
+                'haciendaSubmission': {'clave': clave, 'ind-estado': estado},
+                'createdAt': momento,
+                'updatedAt': momento,
+            }
+            writer.add('invoices', auto_id(rng), documento)
+            if estado == 'aceptado':
+                facturas_recientes.append({
+                    'clave': clave,
+                    'consecutivo': documento['consecutivo'],
+                    'fecha': fecha_texto,
+                    'cliente': documento['cliente'],
+                    'items': lineas,
+                    'total': total,
+                    'subtotal': subtotal,
+                    'totalImpuesto': total_impuesto,
+                    'currency': moneda,
+                })
+        escritos += 1
+
+    empresa['consecutive'] = contadores['01']
+    empresa['consecutiveTK'] = contadores['04']
+    empresa['consecutiveNT'] = contadores['03']
+    return escritos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos multi-tenant reproducibles')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tenants', type=int, default=10)
+    parser.add_argument('--companies-per-tenant', type=float, default=2.0, help='Media de empresas por tenant')
+    parser.add_argument('--clients-mean', type=int, default=500, help='Media de clientes por empresa B2B')
+    parser.add_argument('--products-mean', type=int, default=150, help='Media de productos por tenant')
+    parser.add_argument('--documents-mean', type=int, default=20000, help='Media de documentos por empresa')
+    parser.add_argument('--max-documents-per-company', type=int, default=2000000)
+    parser.add_argument('--pos-ratio', type=float, default=0.4, help='Proporción de empresas con perfil POS (tiquetes)')
+    parser.add_argument('--credit-note-ratio', type=float, default=0.02)
+    parser.add_argument('--defect-rate', type=float, default=0.0,
+                        help='Probabilidad de inyectar huecos/duplicados de consecutivo por documento')
+    parser.add_argument('--months', type=int, default=24, help='Meses de historia hasta --end-date')
+    parser.add_argument('--end-date', help='Fecha final AAAA-MM-DD (por defecto hoy)')
+    parser.add_argument('--emulator-host', help='host:puerto del emulador (por defecto FIRESTORE_EMULATOR_HOST)')
+    parser.add_argument('--project-id', help='Proyecto del emulador')
+    parser.add_argument('--output-dir', help='Escribe JSONL por colección en este directorio')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.end_date:
+        args.fin = datetime.datetime.strptime(args.end_date, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+    else:
+        args.fin = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    args.inicio = args.fin - datetime.timedelta(days=30 * args.months)
+
+    geo = IndiceGeo()
+    writer = create_writer(args.emulator_host, args.project_id, args.output_dir, args.batch_size,
+                           server_timestamps=())
+    inicio = time.time()
+    total_documentos = 0
+
+    try:
+        for tenant_indice in range(args.tenants):
+            tenant_id, tenant = generar_tenant(args, tenant_indice)
+            productos = generar_productos(args, tenant_id, tenant_indice, writer)
+
+            rng_tenant = rng_para(args.seed, 'empresas', tenant_indice)
+            cantidad_empresas = 1 + int(rng_tenant.expovariate(1.0 / max(args.companies_per_tenant - 1, 0.01)))
+            documentos_tenant = 0
+
+            for empresa_indice in range(cantidad_empresas):
+                company_id, empresa, perfil, rng = generar_empresa(
+                    args, geo, tenant_id, tenant_indice, empresa_indice, writer)
+                clientes = generar_clientes(args, geo, tenant_id, company_id, perfil, rng, writer)
+                documentos_tenant += generar_documentos(
+                    args, tenant_id, company_id, empresa, perfil, clientes, productos, rng, writer)
+                # La empresa se escribe al final para que sus contadores de consecutivo coincidan
+                writer.add('companies', company_id, empresa)
+
+            tenant['totalDocuments'] = documentos_tenant
+            writer.add('tenants', tenant_id, tenant)
+            total_documentos += documentos_tenant
+            print(f'🏢 Tenant {tenant_indice + 1}/{args.tenants}: {cantidad_empresas} empresas, '
+                  f'{documentos_tenant} documentos', file=sys.stderr)
+    finally:
+        writer.close()
+
+    duracion = time.time() - inicio
+    print(f'✅ Documentos escritos: {writer.written} ({total_documentos} comprobantes)')
+    print(f'⏱️ Duración: {duracion:.1f}s ({writer.written / duracion if duracion else 0:.0f} docs/s)')
+
+
+if __name__ == '__main__':
+    main()
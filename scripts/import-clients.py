@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de clientes desde CSV / XLSX
+
+Alternativa a llamar /api/clients/create una vez por cliente al incorporar un
+tenant con miles de clientes existentes:
+
+  - Lee el archivo fila por fila (CSV con el módulo csv, XLSX con openpyxl en
+    modo read_only), sin cargarlo completo en memoria
+  - Valida cédula según el tipo de identificación (01 Física, 02 Jurídica,
+    03 DIMEX, 04 NITE), correo, nombre comercial y que provincia / cantón /
+    distrito existan y sean coherentes entre sí según public/data/costa-rica
+  - Escribe los documentos de `clients` con la misma forma que el endpoint,
+    en commits por lotes al emulador de Firestore o a JSONL local
+  - Las filas rechazadas van a un CSV con la columna `motivo`
+
+Los IDs de documento se derivan de tenant + cédula, así que re-ejecutar la
+importación sobrescribe los clientes en vez de duplicarlos.
+
+Uso:
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python3 scripts/import-clients.py clientes.csv \\
+        --tenant-id TENANT --created-by UID --company-id COMPANY
+    python3 scripts/import-clients.py clientes.xlsx --tenant-id T --created-by U --output-dir /tmp/carga
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from firestore_emulator import create_writer
+
+GEO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'data', 'costa-rica')
+
+# Encabezados aceptados (en minúscula) -> campo del documento `clients`
+ALIAS_COLUMNAS = {
+    'name': 'name', 'nombre': 'name', 'razonsocial': 'name', 'razon social': 'name',
+    'commercialname': 'commercialName', 'nombrecomercial': 'commercialName', 'nombre comercial': 'commercialName',
+    'identification': 'identification', 'cedula': 'identification', 'cédula': 'identification',
+    'identificacion': 'identification', 'identificación': 'identification',
+    'identificationtype': 'identificationType', 'tipoidentificacion': 'identificationType',
+    'tipo identificacion': 'identificationType', 'tipo': 'identificationType',
+    'email': 'email', 'correo': 'email', 'correoelectronico': 'email',
+    'phone': 'phone', 'telefono': 'phone', 'teléfono': 'phone',
+    'phonecountrycode': 'phoneCountryCode', 'codigopais': 'phoneCountryCode',
+    'province': 'province', 'provincia': 'province',
+    'canton': 'canton', 'cantón': 'canton',
+    'district': 'district', 'distrito': 'district',
+    'otrassenas': 'otrasSenas', 'otras senas': 'otrasSenas', 'otras señas': 'otrasSenas', 'direccion': 'otrasSenas',
+    'economicactivity': 'economicActivityCode', 'actividadeconomica': 'economicActivityCode',
+    'actividad': 'economicActivityCode', 'codigoactividad': 'economicActivityCode',
+}
+
+# Longitudes válidas de cédula por tipo de identificación de Hacienda
+LONGITUDES_CEDULA = {
+    '01': (9,),       # Física
+    '02': (10,),      # Jurídica
+    '03': (11, 12),   # DIMEX
+    '04': (10,),      # NITE
+}
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RechazoCliente(Exception):
+    pass
+
+
+class IndiceGeo:
+    """Índice en memoria de provincias, cantones y distritos (por código)"""
+
+    def __init__(self, directorio=GEO_DIR):
+        with open(os.path.join(directorio, 'provincias.json'), encoding='utf-8') as f:
+            self.provincias = {p['codigo'] for p in json.load(f)}
+        with open(os.path.join(directorio, 'cantones.json'), encoding='utf-8') as f:
+            self.provincia_de_canton = {c['codigo']: c['provinciaCodigo'] for c in json.load(f)}
+        with open(os.path.join(directorio, 'distritos.json'), encoding='utf-8') as f:
+            self.canton_de_distrito = {d['codigo']: d['cantonCodigo'] for d in json.load(f)}
+
+    def validar(self, provincia, canton, distrito):
+        try:
+            provincia, canton, distrito = int(provincia), int(canton), int(distrito)
+        except (TypeError, ValueError):
+            raise RechazoCliente('Provincia, cantón y distrito deben ser códigos numéricos')
+        if provincia not in self.provincias:
+            raise RechazoCliente(f'Provincia {provincia} no existe')
+        if self.provincia_de_canton.get(canton) != provincia:
+            raise RechazoCliente(f'Cantón {canton} no pertenece a la provincia {provincia}')
+        if self.canton_de_distrito.get(distrito) != canton:
+            raise RechazoCliente(f'Distrito {distrito} no pertenece al cantón {canton}')
+        return str(provincia), str(canton), str(distrito)
+
+
+def formatear_cedula(numeros, tipo):
+    """Mismo formato que aplica el wizard de clientes (1-1234-5678 / 3-101-123456)"""
+    if tipo == '01':
+        return f'{numeros[0]}-{numeros[1:5]}-{numeros[5:9]}'
+    if tipo == '02':
+        return f'{numeros[0:3]}-{numeros[3:6]}-{numeros[6:10]}'
+    return numeros
+
+
+def inferir_tipo(numeros):
+    if len(numeros) == 9:
+        return '01'
+    if len(numeros) == 10 and numeros.startswith('3'):
+        return '02'
+    if len(numeros) in (11, 12):
+        return '03'
+    return None
+
+
+def validar_cedula(valor, tipo):
+    numeros = re.sub(r'\D', '', valor or '')
+    if not numeros:
+        raise RechazoCliente('Cédula requerida')
+    tipo = (tipo or '').strip().zfill(2) if (tipo or '').strip() else inferir_tipo(numeros)
+    if tipo not in LONGITUDES_CEDULA:
+        raise RechazoCliente(f'Tipo de identificación inválido o no inferible: {tipo or "vacío"}')
+    if len(numeros) not in LONGITUDES_CEDULA[tipo]:
+        esperadas = ' o '.join(str(n) for n in LONGITUDES_CEDULA[tipo])
+        raise RechazoCliente(f'Cédula {valor} debe tener {esperadas} dígitos para el tipo {tipo}')
+    if tipo == '01' and numeros[0] == '0':
+        raise RechazoCliente(f'Cédula física {valor} no puede iniciar con 0')
+    return formatear_cedula(numeros, tipo), tipo
+
+
+def leer_filas(ruta):
+    """Genera diccionarios encabezado -> valor (texto) por fila"""
+    if ruta.lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            sys.exit('❌ Para leer XLSX instale openpyxl: pip install openpyxl')
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [str(c or '').strip() for c in next(filas, [])]
+        for fila in filas:
+            if fila is None or all(c is None for c in fila):
+                continue
+            yield {
+                encabezados[i]: ('' if c is None else str(c).strip())
+                for i, c in enumerate(fila) if i < len(encabezados)
+            }
+        libro.close()
+        return
+
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        for fila in csv.DictReader(f, dialect=dialecto):
+            yield {(k or '').strip(): (v or '').strip() for k, v in fila.items()}
+
+
+def normalizar_fila(fila):
+    normalizada = {}
+    for columna, valor in fila.items():
+        campo = ALIAS_COLUMNAS.get(columna.lower()) or ALIAS_COLUMNAS.get(columna.lower().replace('_', ''))
+        if campo:
+            normalizada[campo] = valor
+    return normalizada
+
+
+def construir_cliente(fila, geo, args):
+    datos = normalizar_fila(fila)
+
+    name = datos.get('name', '')
+    email = datos.get('email', '')
+    if not name:
+        raise RechazoCliente('Nombre requerido')
+    if not email or not EMAIL_RE.match(email):
+        raise RechazoCliente(f'Correo inválido: {email or "vacío"}')
+
+    commercial_name = datos.get('commercialName', '')
+    if len(commercial_name) > 80:
+        raise RechazoCliente('El nombre comercial no puede tener más de 80 caracteres')
+
+    identification, identification_type = validar_cedula(datos.get('identification'), datos.get('identificationType'))
+    province, canton, district = geo.validar(datos.get('province'), datos.get('canton'), datos.get('district'))
+
+    actividad = datos.get('economicActivityCode', '')
+
+    cliente = {
+        'name': name,
+        'commercialName': commercial_name,
+        'identification': identification,
+        'identificationType': identification_type,
+        'email': email,
+        'phone': re.sub(r'\D', '', datos.get('phone', '')),
+        'phoneCountryCode': datos.get('phoneCountryCode', '') or ('506' if datos.get('phone') else ''),
+        'province': province,
+        'canton': canton,
+        'district': district,
+        'otrasSenas': datos.get('otrasSenas', ''),
+        'economicActivity': {
+            'codigo': actividad,
+            'descripcion': '',
+            'estado': 'A' if actividad else '',
+        },
+        'tieneExoneracion': False,
+        'exoneracion': None,
+        'tenantId': args.tenant_id,
+        'createdBy': args.created_by,
+        'createdAt': None,
+        'updatedBy': args.created_by,
+        'updatedAt': None,
+        'status': 'active',
+        'totalInvoices': 0,
+        'totalAmount': 0,
+        'companyIds': [args.company_id] if args.company_id else [],
+    }
+    cliente.update(campos_busqueda(cliente))
+    return cliente
+
+
+# Igual que EntitySearchService.searchFields (lib/services/entity-search.ts)
+MAX_PREFIJO_BUSQUEDA = 20
+
+
+def sin_tildes(texto):
+    descompuesto = unicodedata.normalize('NFD', str(texto or ''))
+    return ''.join(c for c in descompuesto if not ('\u0300' <= c <= '\u036f')).lower()
+
+
+def campos_busqueda(cliente):
+    textos = [
+        cliente['name'],
+        cliente['commercialName'],
+        cliente['identification'],
+        re.sub(r'\D', '', cliente['identification']),
+        cliente['email'],
+    ]
+    prefijos = {}
+    for texto in textos:
+        for palabra in re.split(r'[^a-z0-9]+', sin_tildes(texto)):
+            palabra = palabra[:MAX_PREFIJO_BUSQUEDA]
+            for largo in range(1, len(palabra) + 1):
+                prefijos.setdefault(palabra[:largo], None)
+    return {'searchTokens': list(prefijos), 'searchSort': sin_tildes(cliente['name'])}
+
+
+def id_cliente(tenant_id, identification):
+    return hashlib.sha1(f'{tenant_id}:{identification}'.encode('utf-8')).hexdigest()[:20]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa clientes en lote desde CSV/XLSX')
+    parser.add_argument('archivo', help='Archivo CSV o XLSX con encabezados')
+    parser.add_argument('--tenant-id', required=True)
+    parser.add_argument('--created-by', required=True, help='UID del usuario que realiza la importación')
+    parser.add_argument('--company-id', help='Empresa a asociar en companyIds')
+    parser.add_argument('--emulator-host', help='host:puerto del emulador (por defecto FIRESTORE_EMULATOR_HOST)')
+    parser.add_argument('--project-id', help='Proyecto del emulador (por defecto NEXT_PUBLIC_FIREBASE_PROJECT_ID)')
+    parser.add_argument('--output-dir', help='Escribe JSONL local en este directorio en lugar del emulador')
+    parser.add_argument('--batch-size', type=int, default=400, help='Escrituras por commit (máximo 500)')
+    parser.add_argument('--rechazos', help='CSV de filas rechazadas (por defecto <archivo>.rechazos.csv)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo valida, no escribe')
+    args = parser.parse_args()
+
+    inicio = time.time()
+    geo = IndiceGeo()
+    writer = None if args.dry_run else create_writer(
+        args.emulator_host, args.project_id, args.output_dir, args.batch_size)
+
+    ruta_rechazos = args.rechazos or os.path.splitext(args.archivo)[0] + '.rechazos.csv'
+    archivo_rechazos = None
+    rechazos_csv = None
+    vistos = set()
+    aceptados = 0
+    rechazados = 0
+
+    try:
+        for numero_fila, fila in enumerate(leer_filas(args.archivo), start=2):
+            try:
+                cliente = construir_cliente(fila, geo, args)
+                if cliente['identification'] in vistos:
+                    raise RechazoCliente(f"Cédula {cliente['identification']} repetida en el archivo")
+                vistos.add(cliente['identification'])
+            except RechazoCliente as rechazo:
+                if rechazos_csv is None:
+                    archivo_rechazos = open(ruta_rechazos, 'w', newline='', encoding='utf-8')
+                    rechazos_csv = csv.DictWriter(
+                        archivo_rechazos, fieldnames=['fila', 'motivo'] + list(fila.keys()), extrasaction='ignore')
+                    rechazos_csv.writeheader()
+                rechazos_csv.writerow({'fila': numero_fila, 'motivo': str(rechazo), **fila})
+                rechazados += 1
+                continue
+
+            if writer is not None:
+                writer.add('clients', id_cliente(args.tenant_id, cliente['identification']), cliente)
+            aceptados += 1
+            if aceptados % 10000 == 0:
+                print(f'⏳ {aceptados} clientes procesados...', file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+        if archivo_rechazos is not None:
+            archivo_rechazos.close()
+
+    duracion = time.time() - inicio
+    print(f'✅ Clientes importados: {aceptados}')
+    if writer is not None and writer.commits:
+        print(f'📦 Commits: {writer.commits}')
+    if rechazados:
+        print(f'❌ Rechazados: {rechazados} (ver {ruta_rechazos})')
+    print(f'⏱️ Duración: {duracion:.1f}s ({aceptados / duracion if duracion else 0:.0f} clientes/s)')
+    sys.exit(1 if rechazados else 0)
+
+
+if __name__ == '__main__':
+    main()
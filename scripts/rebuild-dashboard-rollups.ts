@@ -0,0 +1,44 @@
+/**
+ * Reconstruye los resúmenes mensuales del dashboard (companies/{id}/dashboardRollups)
+ *
+ * Sin argumentos recorre todas las empresas; con IDs solo esas. Útil para la carga
+ * inicial de empresas con historial o para corregir descuadres. Correrlo sin emisión
+ * en curso en esas empresas (ver DashboardRollupService.rebuildCompany). Para una sola
+ * empresa también está POST /api/dashboard/rollups (solo administradores de tenants).
+ *
+ * Ejecutar con:
+ *   npx ts-node scripts/rebuild-dashboard-rollups.ts [companyId ...]
+ */
+
+import { initializeApp } from 'firebase/app'
+import { getFirestore, getDocs, collection } from 'firebase/firestore'
+import { firebaseConfig } from '../lib/firebase-config'
+import { DashboardRollupService } from '../lib/services/dashboard-rollups'
+
+async function rebuildDashboardRollups() {
+  const db = getFirestore(initializeApp(firebaseConfig))
+
+  let companyIds = process.argv.slice(2)
+  if (companyIds.length === 0) {
+    const companies = await getDocs(collection(db, 'companies'))
+    companyIds = companies.docs.map(snap => snap.id)
+  }
+
+  console.log(`🔄 Reconstruyendo resúmenes del dashboard para ${companyIds.length} empresas`)
+
+  let documents = 0
+  for (const companyId of companyIds) {
+    const start = performance.now()
+    const result = await DashboardRollupService.rebuildCompany(db, companyId)
+    documents += result.documents
+    console.log(`   ${companyId}: ${result.documents} documentos, ${result.months} meses, ${result.resynced} resincronizados (${((performance.now() - start) / 1000).toFixed(1)}s)`)
+  }
+
+  console.log(`✅ Listo: ${documents} documentos procesados`)
+  process.exit(0)
+}
+
+rebuildDashboardRollups().catch(error => {
+  console.error('❌ Error reconstruyendo resúmenes:', error)
+  process.exit(1)
+})
@@ -0,0 +1,123 @@
+/**
+ * Prueba de la caché de consultas de contribuyentes contra un servidor local
+ *
+ * Levanta un servidor que imita a api.hacienda.go.cr/fe/ae (latencia fija, 404 para
+ * cédulas terminadas en 0 y 429 cuando hay demasiadas consultas simultáneas) y verifica:
+ *   - consultas concurrentes de la misma cédula hacen una sola solicitud
+ *   - las respuestas encontradas y los 404 se sirven de la caché
+ *   - los errores (429) no se guardan
+ *   - el límite LRU descarta las cédulas menos usadas
+ *   - la precarga respeta la concurrencia y deja la caché caliente
+ *
+ * Ejecutar con:
+ *   npx ts-node scripts/test-company-info-cache.ts
+ */
+
+import http from 'http'
+import { AddressInfo } from 'net'
+import {
+  HaciendaCompanyInfoCache,
+  createHaciendaCompanyInfoFetcher
+} from '../lib/services/hacienda-company-info'
+
+const LATENCY_MS = 80
+const MAX_CONCURRENT = 4
+
+const requests = new Map<string, number>()
+let active = 0
+let maxActive = 0
+let forceThrottle = false
+
+function startStandIn(): Promise<http.Server> {
+  const server = http.createServer((req, res) => {
+    const identificacion = new URL(req.url || '', 'http://localhost').searchParams.get('identificacion') || ''
+    requests.set(identificacion, (requests.get(identificacion) || 0) + 1)
+    active++
+    maxActive = Math.max(maxActive, active)
+
+    setTimeout(() => {
+      active--
+      if (forceThrottle || active >= MAX_CONCURRENT) {
+        res.writeHead(429)
+        res.end()
+      } else if (identificacion.endsWith('0')) {
+        res.writeHead(404)
+        res.end()
+      } else {
+        res.writeHead(200, { 'Content-Type': 'application/json' })
+        res.end(JSON.stringify({
+          nombre: `CONTRIBUYENTE ${identificacion}`,
+          tipoIdentificacion: '02',
+          regimen: { codigo: 1, descripcion: 'Régimen General' },
+          situacion: { moroso: 'NO', omiso: 'NO', estado: 'Inscrito', administracionTributaria: 'Grandes Contribuyentes' },
+          actividades: [{ estado: 'A', tipo: 'P', codigo: '620100', descripcion: 'DESARROLLO DE SOFTWARE' }]
+        }))
+      }
+    }, LATENCY_MS)
+  })
+  return new Promise(resolve => server.listen(0, '127.0.0.1', () => resolve(server)))
+}
+
+function check(condition: boolean, message: string) {
+  console.log(`   ${condition ? '✅' : '❌'} ${message}`)
+  if (!condition) process.exitCode = 1
+}
+
+async function testCompanyInfoCache() {
+  const server = await startStandIn()
+  const baseUrl = `http://127.0.0.1:${(server.address() as AddressInfo).port}/fe/ae`
+  const fetcher = createHaciendaCompanyInfoFetcher(baseUrl)
+
+  console.log('🧪 Prueba de caché de consultas de contribuyentes')
+
+  // 1. Single-flight
+  const cache = new HaciendaCompanyInfoCache(fetcher, { maxEntries: 3 })
+  const concurrent = await Promise.all(Array.from({ length: 20 }, () => cache.lookup('3101123451')))
+  check(concurrent.every(lookup => lookup.status === 'found'), '20 consultas concurrentes resueltas')
+  check(requests.get('3101123451') === 1, `una sola solicitud a Hacienda (${requests.get('3101123451')})`)
+
+  // 2. Caché positiva y negativa
+  const hit = await cache.lookup('3101123451')
+  check(hit.cached === true && requests.get('3101123451') === 1, 'la segunda consulta sale de la caché')
+  await cache.lookup('3101123450')
+  const negative = await cache.lookup('3101123450')
+  check(negative.status === 'not_found' && negative.cached === true, '404 guardado en caché negativa')
+  check(requests.get('3101123450') === 1, 'el 404 no se vuelve a consultar')
+
+  // 3. Errores no se guardan
+  forceThrottle = true
+  const throttled = await cache.lookup('3101999991')
+  forceThrottle = false
+  const retried = await cache.lookup('3101999991')
+  check(throttled.status === 'error' && throttled.httpStatus === 429, '429 devuelto como error')
+  check(retried.status === 'found' && requests.get('3101999991') === 2, 'tras el error se reintenta')
+
+  // 4. LRU: capacidad 3, la menos usada sale
+  await cache.lookup('3101123451') // usar de nuevo para que no sea la más antigua
+  await cache.lookup('3101777771')
+  const stats = cache.getStats()
+  check(stats.size === 3, `tamaño acotado a 3 (${stats.size})`)
+  await cache.lookup('3101123450')
+  check(requests.get('3101123450') === 2, 'la cédula menos usada fue descartada y se vuelve a consultar')
+
+  // 5. Precarga
+  maxActive = 0
+  const prefetchCache = new HaciendaCompanyInfoCache(fetcher)
+  const ids = Array.from({ length: 40 }, (_, i) => `31020000${String(i).padStart(2, '0')}`)
+  const start = performance.now()
+  const result = await prefetchCache.prefetch([...ids, ...ids.slice(0, 10), '123'], 3)
+  const elapsed = performance.now() - start
+  check(result.requested === 40, `cédulas únicas y válidas (${result.requested})`)
+  check(result.found + result.notFound === 40 && result.errors === 0, `sin errores de throttling (${result.found} encontradas, ${result.notFound} no existen)`)
+  check(maxActive <= 3, `concurrencia máxima respetada (${maxActive})`)
+  const again = await prefetchCache.prefetch(ids, 3)
+  check(again.alreadyCached === 40, 'una segunda precarga no consulta a Hacienda')
+  console.log(`   ⏱️ Precarga de 40 cédulas: ${elapsed.toFixed(0)}ms`)
+
+  server.close()
+}
+
+testCompanyInfoCache().catch(error => {
+  console.error('❌ Error en la prueba:', error)
+  process.exit(1)
+})
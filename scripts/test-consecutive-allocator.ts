@@ -0,0 +1,114 @@
+/**
+ * Prueba del asignador de consecutivos por bloques contra el emulador de Firestore
+ *
+ * Simula varias instancias del servidor (un ConsecutiveAllocator y una app de
+ * Firebase por instancia) emitiendo tiquetes en paralelo para la misma empresa,
+ * después de que otra instancia muriera sin liberar su bloque, y verifica que:
+ *   - no se entregue el mismo número dos veces
+ *   - el bloque de la instancia muerta se reutilice al vencer
+ *   - al liberar los bloques, todos los números no emitidos queden devueltos
+ *     al contador o registrados en consecutiveLeases
+ *
+ * Ejecutar con:
+ *   firebase emulators:start --only firestore
+ *   FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 npx ts-node scripts/test-consecutive-allocator.ts [instancias] [tiquetes]
+ */
+
+import { initializeApp } from 'firebase/app'
+import { getFirestore, connectFirestoreEmulator, doc, setDoc, getDoc, getDocs, collection } from 'firebase/firestore'
+import { ConsecutiveAllocator } from '../lib/services/consecutive-allocator'
+
+const EMULATOR_HOST = process.env.FIRESTORE_EMULATOR_HOST || '127.0.0.1:8080'
+const INSTANCES = parseInt(process.argv[2] || '4', 10)
+const TICKETS = parseInt(process.argv[3] || '1000', 10)
+const BLOCK_SIZE = parseInt(process.env.CONSECUTIVE_LEASE_SIZE || '50', 10)
+
+function connect(name: string) {
+  const app = initializeApp({ projectId: 'demo-consecutivos', apiKey: 'demo' }, name)
+  const db = getFirestore(app)
+  const [host, port] = EMULATOR_HOST.split(':')
+  connectFirestoreEmulator(db, host, parseInt(port, 10))
+  return db
+}
+
+async function testConsecutiveAllocator() {
+  console.log('🧪 Prueba de consecutivos por bloques')
+  console.log(`   Emulador: ${EMULATOR_HOST}  Instancias: ${INSTANCES}  Tiquetes: ${TICKETS}  Bloque: ${BLOCK_SIZE}`)
+
+  const companyId = `empresa-${Date.now()}`
+  const setupDb = connect('setup')
+  await setDoc(doc(setupDb, 'companies', companyId), { name: 'Empresa de prueba', consecutiveTK: 0 })
+
+  // Instancia que emite unos pocos tiquetes y "muere" sin liberar su bloque
+  const dead = new ConsecutiveAllocator(connect('muerta'), {
+    blockSize: BLOCK_SIZE,
+    maxLeaseAgeMs: 500,
+    leaseGraceMs: 0,
+    instanceId: 'muerta'
+  })
+  const issued: number[] = []
+  for (let i = 0; i < 3; i++) {
+    issued.push(await dead.allocate(companyId, 'tiquetes'))
+  }
+  await new Promise(resolve => setTimeout(resolve, 1000))
+
+  const allocators = Array.from({ length: INSTANCES }, (_, i) =>
+    new ConsecutiveAllocator(connect(`instancia-${i}`), { blockSize: BLOCK_SIZE, instanceId: `instancia-${i}` })
+  )
+
+  // Repartir los tiquetes entre instancias, con varias solicitudes concurrentes por instancia
+  const start = Date.now()
+  await Promise.all(allocators.map(async (allocator, i) => {
+    const share = Math.floor(TICKETS / INSTANCES) + (i < TICKETS % INSTANCES ? 1 : 0)
+    const requests = Array.from({ length: share }, () => allocator.allocate(companyId, 'tiquetes'))
+    issued.push(...await Promise.all(requests))
+  }))
+  const elapsed = Date.now() - start
+
+  await Promise.all(allocators.map(allocator => allocator.releaseAll()))
+
+  const errors: string[] = []
+
+  const unique = new Set(issued)
+  if (unique.size !== issued.length) {
+    errors.push(`${issued.length - unique.size} consecutivos duplicados`)
+  }
+
+  // Los números no emitidos deben estar devueltos (por encima del contador) o en bloques liberados
+  const counter = (await getDoc(doc(setupDb, 'companies', companyId))).data()?.consecutiveTK ?? 0
+  const leases = await getDocs(collection(setupDb, 'companies', companyId, 'consecutiveLeases'))
+  const unused = new Set<number>()
+  leases.forEach(lease => {
+    const data = lease.data()
+    if (data.instanceId === 'muerta' && data.status !== 'reclaimed' && BLOCK_SIZE > 3) {
+      errors.push(`Bloque de la instancia muerta quedó ${data.status}, no se reutilizó`)
+    }
+    if (data.status === 'active') {
+      errors.push(`Bloque ${data.start}-${data.end} quedó activo tras liberar`)
+    }
+    if (data.status === 'released') {
+      for (let n = data.unusedStart; n <= data.unusedEnd; n++) unused.add(n)
+    }
+  })
+  for (let n = 1; n <= counter; n++) {
+    if (!unique.has(n) && !unused.has(n)) {
+      errors.push(`Consecutivo ${n} no emitido y sin registrar`)
+      break
+    }
+  }
+
+  console.log(`\n📊 Emitidos en paralelo: ${TICKETS} en ${elapsed}ms (${Math.round(TICKETS / (elapsed / 1000))}/s)`)
+  console.log(`📊 Bloques arrendados: ${leases.size}  Contador final: ${counter}  Sin usar registrados: ${unused.size}`)
+
+  if (errors.length > 0) {
+    errors.forEach(error => console.error('❌', error))
+    process.exit(1)
+  }
+  console.log('✅ Sin duplicados y sin números perdidos')
+  process.exit(0)
+}
+
+testConsecutiveAllocator().catch(error => {
+  console.error('❌ Error en la prueba:', error)
+  process.exit(1)
+})
@@ -0,0 +1,134 @@
+/**
+ * Prueba de la caché de render de PDFs con un renderizador simulado
+ *
+ * Verifica:
+ *   - un comprobante se genera una sola vez aunque se pida en paralelo
+ *   - la clave ignora el orden de las llaves y los campos volátiles (updatedAt, emailSent...)
+ *   - un cambio de contenido o de versión de plantilla genera otro PDF
+ *   - la LRU respeta el límite de bytes
+ *   - los comprobantes aceptados se recuperan del disco tras reiniciar (los pendientes no se guardan)
+ *   - la aceptación sale del documento guardado, no del estado que trae la solicitud
+ *   - la carpeta de disco respeta su límite de bytes descartando los PDFs más antiguos
+ *
+ * Ejecutar con:
+ *   npx ts-node scripts/test-pdf-render-cache.ts
+ */
+
+import { promises as fs } from 'fs'
+import os from 'os'
+import path from 'path'
+import { PdfRenderCache, PdfRenderer, PdfAcceptanceCheck, isAcceptedStatus } from '../lib/services/pdf-render-cache'
+
+const RENDER_MS = 50
+const PDF_BYTES = 10 * 1024
+
+let renders = 0
+
+const fakeRenderer: PdfRenderer = async (pdfData: any) => {
+  renders++
+  await new Promise(resolve => setTimeout(resolve, RENDER_MS))
+  const body = Buffer.alloc(PDF_BYTES, 0x20)
+  body.write(`%PDF-1.3 ${pdfData.invoice?.consecutivo}`, 'latin1')
+  return body
+}
+
+// Estado de los documentos "guardados" (consecutivo → estado), en lugar de Firestore
+const storedStatus = new Map<string, string>()
+
+const storedAcceptance: PdfAcceptanceCheck = async (pdfData: any) => {
+  return isAcceptedStatus(storedStatus.get(pdfData.invoice?.consecutivo))
+}
+
+function invoiceData(consecutivo: string, status: string = 'aceptado', extra: Record<string, any> = {}) {
+  return {
+    invoice: {
+      consecutivo,
+      status,
+      total: 11300,
+      items: [{ numeroLinea: 1, detalle: 'Servicio', cantidad: 1, precioUnitario: 10000 }],
+      ...extra
+    },
+    company: { name: 'Empresa de Prueba', identification: '3101123456' },
+    client: { name: 'Cliente', identification: '114560789' },
+    haciendaResponse: { 'ind-estado': status }
+  }
+}
+
+function check(condition: boolean, message: string) {
+  console.log(`   ${condition ? '✅' : '❌'} ${message}`)
+  if (!condition) process.exitCode = 1
+}
+
+async function testPdfRenderCache() {
+  console.log('🧪 Prueba de caché de render de PDFs')
+  const diskDir = await fs.mkdtemp(path.join(os.tmpdir(), 'pdf-cache-'))
+  storedStatus.set('00100001010000000001', 'Aceptado')
+
+  // 1. Single-flight
+  const cache = new PdfRenderCache(fakeRenderer, { maxBytes: 3 * PDF_BYTES, diskDir, isAccepted: storedAcceptance })
+  const first = await Promise.all(Array.from({ length: 10 }, () => cache.render(invoiceData('00100001010000000001'))))
+  check(renders === 1, `10 solicitudes concurrentes, un solo render (${renders})`)
+  check(first.every(result => result.key === first[0].key), 'todas comparten la misma clave')
+
+  // 2. Clave estable
+  const reordered = { haciendaResponse: { 'ind-estado': 'aceptado' }, ...invoiceData('00100001010000000001', 'aceptado', { emailSent: true, updatedAt: new Date() }) }
+  const hit = await cache.render(reordered)
+  check(hit.source === 'memory' && renders === 1, 'orden de llaves y campos volátiles no cambian la clave')
+
+  const changed = await cache.render(invoiceData('00100001010000000001', 'aceptado', { total: 11301 }))
+  check(changed.source === 'render' && renders === 2, 'un cambio de contenido genera otro PDF')
+
+  const otherTemplate = new PdfRenderCache(fakeRenderer, { templateVersion: 'test-2' })
+  check(otherTemplate.keyFor(invoiceData('00100001010000000001')) !== first[0].key, 'otra versión de plantilla cambia la clave')
+
+  // 3. LRU por bytes (capacidad: 3 PDFs)
+  for (let i = 2; i <= 5; i++) {
+    await cache.render(invoiceData(`0010000101000000000${i}`, 'pendiente'))
+  }
+  const stats = cache.getStats()
+  check(stats.bytes <= 3 * PDF_BYTES && stats.entries === 3, `memoria acotada (${stats.entries} PDFs, ${stats.bytes} bytes)`)
+  check(stats.evictions === 3, `PDFs descartados por LRU (${stats.evictions})`)
+
+  // 4. Disco: "reinicio" con una caché nueva sobre el mismo directorio
+  renders = 0
+  const restarted = new PdfRenderCache(fakeRenderer, { diskDir, isAccepted: storedAcceptance })
+  const fromDisk = await restarted.render(invoiceData('00100001010000000001'))
+  check(fromDisk.source === 'disk' && renders === 0, 'comprobante aceptado recuperado del disco sin generar')
+  check(fromDisk.pdf.subarray(0, 4).toString('latin1') === '%PDF', 'el PDF en disco es válido')
+  const pending = await restarted.render(invoiceData('00100001010000000002', 'pendiente'))
+  check(pending.source === 'render' && renders === 1, 'los pendientes no se guardan en disco')
+
+  // El estado enviado no cuenta: el documento guardado sigue pendiente
+  const claimed = invoiceData('00100001010000000009', 'aceptado')
+  await restarted.render(claimed)
+  const afterClaim = new PdfRenderCache(fakeRenderer, { diskDir, isAccepted: storedAcceptance })
+  const claimedAgain = await afterClaim.render(claimed)
+  check(claimedAgain.source === 'render', 'un estado "aceptado" enviado sin respaldo en Firestore no llega al disco')
+
+  // 5. Bypass
+  const bypass = await restarted.render(invoiceData('00100001010000000001'), { bypass: true })
+  check(bypass.source === 'render' && renders === 2, 'bypass siempre genera')
+
+  // 6. Límite de la carpeta de disco (capacidad: 2 PDFs)
+  const boundedDir = await fs.mkdtemp(path.join(os.tmpdir(), 'pdf-cache-bounded-'))
+  const bounded = new PdfRenderCache(fakeRenderer, { diskDir: boundedDir, maxDiskBytes: 2 * PDF_BYTES, isAccepted: storedAcceptance })
+  for (let i = 1; i <= 3; i++) {
+    storedStatus.set(`0010000101000000010${i}`, 'Aceptado')
+    await bounded.render(invoiceData(`0010000101000000010${i}`))
+  }
+  const diskStats = bounded.getStats()
+  check(diskStats.diskFiles === 2 && diskStats.diskBytes <= 2 * PDF_BYTES, `disco acotado (${diskStats.diskFiles} PDFs, ${diskStats.diskBytes} bytes)`)
+
+  const reopened = new PdfRenderCache(fakeRenderer, { diskDir: boundedDir, isAccepted: storedAcceptance })
+  const evicted = await reopened.render(invoiceData('00100001010000000101'))
+  const kept = await reopened.render(invoiceData('00100001010000000103'))
+  check(evicted.source === 'render' && kept.source === 'disk', 'se descarta el PDF más antiguo y se conserva el más reciente')
+
+  await fs.rm(diskDir, { recursive: true, force: true })
+  await fs.rm(boundedDir, { recursive: true, force: true })
+}
+
+testPdfRenderCache().catch(error => {
+  console.error('❌ Error en la prueba:', error)
+  process.exit(1)
+})